@@ -0,0 +1,536 @@
+"""
+Account Orchestrator - Headless multi-account supervisor
+account_orchestrator.py
+One worker process per terminal / account, each running its own trading engine.
+Workers are restarted with backoff, report status over a pipe into one aggregated
+view, and receive config changes pushed from the orchestrator
+"""
+
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional
+
+# ห้าม import MetaTrader5 / engine modules ที่ระดับ module - worker ต้อง install emulator ก่อน (spawn)
+from engine_logger import get_logger, setup_engine_logging, shutdown_engine_logging
+
+log = get_logger(__name__)
+
+EXIT_OK, EXIT_CONNECT, EXIT_START, EXIT_CRASH = 0, 2, 3, 4
+STATUS_KEYS = ('trading_active', 'gold_symbol', 'total_pnl', 'unrealized_pnl', 'realized_pnl', 'current_drawdown',
+               'max_drawdown', 'active_positions', 'pending_orders', 'trades_opened', 'trades_closed', 'win_rate',
+               'survivability_used', 'emergency_stop', 'magic_number', 'ai_health_score', 'account_risk')
+
+@dataclass
+class AccountSpec:
+    """หนึ่ง account / terminal"""
+    name: str
+    login: int = 0
+    password: str = ""
+    server: str = ""
+    terminal_path: str = ""                                  # terminal64.exe ของ account นี้ (แยก data folder)
+    enabled: bool = True
+    config: Dict = field(default_factory=dict)               # overrides ต่อ section สำหรับ account นี้
+    survivability_params: Dict = field(default_factory=dict) # ว่าง = คำนวณจาก balance (SurvivabilityEngine)
+    emulator: Optional[Dict] = None                          # mt5_emulator section -> รันกับ emulator
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AccountSpec':
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+@dataclass
+class OrchestratorSettings:
+    accounts: List[Dict] = field(default_factory=list)
+    work_dir: str = "accounts"                 # แต่ละ worker ทำงานใน work_dir/<name> (logs / dumps แยกกัน)
+    status_file: str = "orchestrator_status.json"
+    status_interval: float = 5.0               # worker ส่ง status ทุกกี่วินาที
+    heartbeat_timeout: float = 60.0            # ไม่มีข่าวจาก worker นานเกินนี้ = ค้าง -> restart
+    start_interval: float = 2.0                # เว้นระยะการเปิด worker (ไม่ให้ทุก terminal เริ่มพร้อมกัน)
+    restart_backoff_initial: float = 5.0
+    restart_backoff_max: float = 300.0
+    stable_seconds: float = 600.0              # รันนานกว่านี้ก่อนตาย = reset backoff
+    stop_timeout: float = 30.0
+    worker_nice: int = 5                       # ลด priority ของ worker (POSIX)
+    cpu_affinity: List[int] = field(default_factory=list)   # CPUs ที่ worker ใช้ได้ (ว่าง = ทั้งหมด)
+    worker_config: Dict = field(default_factory=dict)       # overrides ที่ใช้กับทุก worker
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'OrchestratorSettings':
+        orchestrator_config = (config or {}).get('account_orchestrator', {})
+        return cls(**{key: value for key, value in orchestrator_config.items() if key in cls.__dataclass_fields__})
+
+def merge_sections(config: Dict, *overrides: Dict) -> Dict:
+    """Deep copy ของ config + overrides ทีละ section (dict = merge keys, อื่นๆ = แทนที่)"""
+    merged = copy.deepcopy(config)
+    for override in overrides:
+        for section, values in (override or {}).items():
+            if isinstance(values, dict) and isinstance(merged.get(section), dict):
+                merged[section] = dict(merged[section], **copy.deepcopy(values))
+            else:
+                merged[section] = copy.deepcopy(values)
+    return merged
+
+def build_worker_config(config: Dict, settings: OrchestratorSettings, spec: AccountSpec, index: int) -> Dict:
+    """Config ของ worker: base + worker_config + overrides ของ account (metrics port แยกต่อ worker)"""
+    worker_config = merge_sections(config, settings.worker_config, spec.config)
+    worker_config.pop('account_orchestrator', None)
+    metrics = worker_config.get('metrics_server', {})
+    if metrics.get('enabled') and 'port' not in spec.config.get('metrics_server', {}):
+        metrics['port'] = metrics.get('port', 9108) + index
+    return worker_config
+
+def limit_cpu(nice: int, affinity: List[int]):
+    """Worker priority / CPU set - best effort (Windows ไม่มี os.nice / sched_setaffinity)"""
+    try:
+        if nice and hasattr(os, 'nice'):
+            os.nice(nice)
+        if affinity and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, set(affinity))
+    except Exception as e:
+        log.warning(f"⚠️ CPU limit error: {e}")
+
+def summarize_status(status: Dict) -> Dict:
+    """get_grid_status() -> ส่วนที่ aggregate ได้ (JSON-safe, ไม่ต้อง import engine ฝั่ง orchestrator)"""
+    summary = {key: status.get(key) for key in STATUS_KEYS if key in status}
+    if 'symbols' in status:
+        summary['symbols'] = list(status['symbols'])
+    if 'error' in status:
+        summary['error'] = str(status['error'])
+    return json.loads(json.dumps(summary, default=str))
+
+# ----- Worker process -----
+
+def worker_main(spec_data: Dict, config: Dict, conn, status_interval: float, nice: int, affinity: List[int]):
+    """Entry point ของ worker process (spawn)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)      # Ctrl+C -> orchestrator สั่ง stop เอง
+    spec = AccountSpec.from_dict(spec_data)
+    limit_cpu(nice, affinity)
+    if spec.emulator is not None:
+        import mt5_emulator
+        emulator_config = dict(spec.emulator, login=spec.login or spec.emulator.get('login', 5000001))
+        mt5_emulator.install(mt5_emulator.configure({'mt5_emulator': emulator_config}))
+    sys.exit(AccountWorker(spec, config, conn, status_interval).run())
+
+class AccountWorker:
+    """
+    Runs one account's engine inside its worker process
+
+    Connects to the account's own terminal, builds SmartProfitManager (or
+    MultiSymbolEngine when multi_symbol.enabled), then loops on the pipe: status every
+    status_interval, 'config' = stop + rebuild + start with the new config, 'stop' =
+    stop_trading and exit. An emergency stop keeps the worker alive (no auto restart).
+    A closed pipe means the orchestrator is gone - the engine is stopped.
+    """
+
+    def __init__(self, spec: AccountSpec, config: Dict, conn, status_interval: float):
+        self.spec = spec
+        self.config = config
+        self.conn = conn
+        self.status_interval = status_interval
+        self.connector = None
+        self.engine = None
+
+    def send(self, kind: str, **data):
+        self.conn.send(dict(data, type=kind, account=self.spec.name, pid=os.getpid(), ts=time.time()))
+
+    def run(self) -> int:
+        setup_engine_logging(self.config)
+        try:
+            if not self.connect():
+                self.send('error', error="MT5 connection failed")
+                return EXIT_CONNECT
+            if not self.start_engine():
+                self.send('error', error="Engine start failed")
+                return EXIT_START
+            self.send('started', login=self.spec.login)
+
+            while True:
+                if self.conn.poll(self.status_interval):
+                    message = self.conn.recv()
+                    if message.get('type') == 'stop':
+                        self.stop_engine()
+                        self.send('stopped')
+                        return EXIT_OK
+                    if message.get('type') == 'config':
+                        self.reload(message['config'])
+                self.send('status', status=summarize_status(self.engine.get_grid_status()))
+
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            log.warning(f"⚠️ {self.spec.name}: orchestrator pipe closed - stopping engine")
+            self.stop_engine()
+            return EXIT_OK
+        except Exception as e:
+            log.error(f"❌ {self.spec.name} worker error: {e}")
+            self.stop_engine()
+            return EXIT_CRASH
+        finally:
+            shutdown_engine_logging()
+
+    def connect(self) -> bool:
+        from mt5_auto_connector import MT5AutoConnector
+        self.connector = MT5AutoConnector()
+        return self.connector.auto_connect(path=self.spec.terminal_path or None, login=self.spec.login or None,
+                                           password=self.spec.password or None, server=self.spec.server or None)
+
+    def survivability_params(self) -> Optional[Dict]:
+        if self.spec.survivability_params:
+            return self.spec.survivability_params
+        from survivability_engine import SurvivabilityEngine
+        balance = (self.connector.get_account_info() or {}).get('balance', 0)
+        results = SurvivabilityEngine(self.config).calculate_for_balance(balance)
+        return results if results and results.get('target_met', False) else None
+
+    def start_engine(self) -> bool:
+        params = self.survivability_params()
+        if not params:
+            log.error(f"❌ {self.spec.name}: survivability parameters not available")
+            return False
+        if self.config.get('multi_symbol', {}).get('enabled', False):
+            from multi_symbol_engine import MultiSymbolEngine as engine_class
+        else:
+            from smart_profit_manager import SmartProfitManager as engine_class
+        self.engine = engine_class(self.connector, params, self.config)
+        return bool(self.engine.start_trading())
+
+    def stop_engine(self):
+        if self.engine is not None:
+            try:
+                self.engine.stop_trading()
+            except Exception as e:
+                log.error(f"❌ {self.spec.name} stop error: {e}")
+
+    def reload(self, config: Dict):
+        if config == self.config:
+            return
+        log.info(f"🔄 {self.spec.name}: config changed - restarting engine")
+        self.stop_engine()
+        self.config = config
+        setup_engine_logging(config)
+        if not self.start_engine():
+            raise RuntimeError("engine restart with new config failed")
+
+# ----- Orchestrator -----
+
+@dataclass
+class WorkerHandle:
+    spec: AccountSpec
+    index: int
+    process: Optional[multiprocessing.Process] = None
+    conn: object = None
+    state: str = "pending"         # pending / running / backoff / stopped / failed
+    started_at: float = 0.0
+    last_seen: float = 0.0
+    next_start: float = 0.0
+    backoff: float = 0.0
+    restarts: int = 0
+    exit_code: Optional[int] = None
+    last_error: Optional[str] = None
+    last_status: Dict = field(default_factory=dict)
+    stopping: bool = False
+
+class AccountOrchestrator:
+    """
+    Supervises one worker process per account (spawn context - same on Windows / Linux)
+
+    run() waits on all worker pipes at once (multiprocessing.connection.wait), so an idle
+    desk costs no polling. Dead or silent (heartbeat_timeout) workers are restarted after
+    restart_backoff_initial, doubling up to restart_backoff_max; a run longer than
+    stable_seconds resets the backoff. Workers start staggered by start_interval, run
+    at worker_nice / cpu_affinity, in their own work_dir/<name>. push_config() sends the
+    merged config to every live worker; the config file is watched and pushed on change.
+    """
+
+    def __init__(self, config: Dict, settings: OrchestratorSettings = None, config_path: str = None):
+        self.config = config
+        self.settings = settings or OrchestratorSettings.from_config(config)
+        self.config_path = config_path
+        self.config_mtime = os.path.getmtime(config_path) if config_path and os.path.exists(config_path) else None
+        self.context = multiprocessing.get_context("spawn")
+        self.workers: Dict[str, WorkerHandle] = {}
+        self.stop_event = threading.Event()
+        self.next_status_write = 0.0
+        for index, data in enumerate(self.settings.accounts):
+            spec = AccountSpec.from_dict(data)
+            if spec.enabled and spec.name not in self.workers:
+                self.workers[spec.name] = WorkerHandle(spec, index)
+
+    # ----- Lifecycle -----
+
+    def start(self):
+        now = time.monotonic()
+        for position, handle in enumerate(self.workers.values()):
+            handle.next_start = now + position * self.settings.start_interval
+        log.info(f"🛰️ Orchestrator: {len(self.workers)} accounts, status every {self.settings.status_interval}s")
+
+    def run(self):
+        """Supervisor loop (blocking) - จบเมื่อ stop_event ถูก set"""
+        self.start()
+        try:
+            while not self.stop_event.is_set():
+                self.step(timeout=1.0)
+        finally:
+            self.stop()
+
+    def step(self, timeout: float = 1.0):
+        self.launch_due()
+        connections = {handle.conn: handle for handle in self.workers.values()
+                       if handle.state == "running" and handle.conn is not None}
+        if connections:
+            for conn in wait(list(connections), timeout=timeout):
+                self.receive(connections[conn])
+        else:
+            self.stop_event.wait(timeout)
+        self.check_workers()
+        self.check_config_file()
+        if time.monotonic() >= self.next_status_write:
+            self.next_status_write = time.monotonic() + self.settings.status_interval
+            self.write_status()
+
+    def launch_due(self):
+        now = time.monotonic()
+        for handle in self.workers.values():
+            if handle.state in ("pending", "backoff") and now >= handle.next_start:
+                self.launch(handle)
+
+    def launch(self, handle: WorkerHandle):
+        s = self.settings
+        spec = handle.spec
+        account_dir = os.path.abspath(os.path.join(s.work_dir, spec.name))
+        os.makedirs(account_dir, exist_ok=True)
+        parent_conn, child_conn = self.context.Pipe()
+        config = build_worker_config(self.config, s, spec, handle.index)
+        handle.process = self.context.Process(
+            target=_worker_entry, name=f"account-{spec.name}",
+            args=(account_dir, spec.__dict__, config, child_conn, s.status_interval, s.worker_nice, s.cpu_affinity),
+            daemon=False)
+        handle.process.start()
+        child_conn.close()
+        handle.conn = parent_conn
+        handle.state = "running"
+        handle.started_at = handle.last_seen = time.monotonic()
+        handle.exit_code = None
+        handle.stopping = False
+        log.info(f"🚀 {spec.name}: worker started (pid {handle.process.pid})")
+
+    def receive(self, handle: WorkerHandle):
+        try:
+            while handle.conn.poll():
+                message = handle.conn.recv()
+                handle.last_seen = time.monotonic()
+                kind = message.get('type')
+                if kind == 'status':
+                    handle.last_status = message['status']
+                elif kind == 'error':
+                    handle.last_error = message.get('error')
+                    log.error(f"❌ {handle.spec.name}: {handle.last_error}")
+                elif kind == 'started':
+                    log.info(f"✅ {handle.spec.name}: trading (login {message.get('login')})")
+        except (EOFError, OSError):
+            pass        # process จบแล้ว - check_workers จัดการต่อ
+
+    def check_workers(self):
+        now = time.monotonic()
+        s = self.settings
+        for handle in self.workers.values():
+            if handle.state != "running":
+                continue
+            process = handle.process
+            if process.is_alive() and now - handle.last_seen > s.heartbeat_timeout:
+                log.warning(f"⚠️ {handle.spec.name}: no status for {now - handle.last_seen:.0f}s - restarting")
+                handle.last_error = "heartbeat timeout"
+                process.terminate()
+                process.join(5)
+            if process.is_alive():
+                continue
+
+            handle.exit_code = process.exitcode
+            handle.conn.close()
+            handle.conn = None
+            if handle.stopping:
+                handle.state = "stopped"
+                continue
+            ran = now - handle.started_at
+            handle.backoff = s.restart_backoff_initial if ran >= s.stable_seconds or not handle.backoff \
+                else min(s.restart_backoff_max, handle.backoff * 2)
+            handle.next_start = now + handle.backoff
+            handle.restarts += 1
+            handle.state = "backoff"
+            log.warning(f"🔁 {handle.spec.name}: worker exited ({handle.exit_code}) after {ran:.0f}s - "
+                        f"restart in {handle.backoff:.0f}s")
+
+    # ----- Config -----
+
+    def push_config(self, config: Dict):
+        """Config ใหม่ -> ทุก worker ที่รันอยู่ (worker restart engine ถ้า config ของมันเปลี่ยน)"""
+        self.config = config
+        self.settings = OrchestratorSettings.from_config(config) if 'account_orchestrator' in config else self.settings
+        for handle in self.workers.values():
+            if handle.state == "running" and handle.conn is not None:
+                try:
+                    handle.conn.send({'type': 'config',
+                                      'config': build_worker_config(config, self.settings, handle.spec, handle.index)})
+                except (BrokenPipeError, OSError) as e:
+                    log.warning(f"⚠️ {handle.spec.name}: config push failed: {e}")
+        log.info(f"📤 Config pushed to {sum(h.state == 'running' for h in self.workers.values())} workers")
+
+    def check_config_file(self):
+        if not self.config_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self.config_mtime:
+                return
+            self.config_mtime = mtime
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+            self.push_config(config)
+        except Exception as e:
+            log.warning(f"⚠️ Config reload error: {e}")
+
+    # ----- Status -----
+
+    def aggregate_status(self) -> Dict:
+        now = time.monotonic()
+        accounts = {}
+        totals = {'active_positions': 0, 'pending_orders': 0, 'total_pnl': 0.0, 'realized_pnl': 0.0}
+        states: Dict[str, int] = {}
+        for name, handle in self.workers.items():
+            status = handle.last_status
+            states[handle.state] = states.get(handle.state, 0) + 1
+            for key in totals:
+                totals[key] += status.get(key) or 0
+            accounts[name] = {
+                'state': handle.state,
+                'pid': handle.process.pid if handle.process else None,
+                'login': handle.spec.login,
+                'uptime_seconds': round(now - handle.started_at, 1) if handle.state == "running" else 0,
+                'last_seen_seconds': round(now - handle.last_seen, 1) if handle.last_seen else None,
+                'restarts': handle.restarts,
+                'exit_code': handle.exit_code,
+                'last_error': handle.last_error,
+                'status': status,
+            }
+        return {
+            'updated': datetime.now().isoformat(),
+            'accounts_total': len(self.workers),
+            'states': states,
+            'totals': {key: round(value, 2) for key, value in totals.items()},
+            'emergency_accounts': [name for name, h in self.workers.items() if h.last_status.get('emergency_stop')],
+            'accounts': accounts,
+        }
+
+    def write_status(self) -> bool:
+        path = self.settings.status_file
+        if not path:
+            return False
+        try:
+            temp_file = f"{path}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(self.aggregate_status(), f, indent=2)
+            os.replace(temp_file, path)
+            return True
+        except Exception as e:
+            log.warning(f"⚠️ Orchestrator status write error: {e}")
+            return False
+
+    def stop(self):
+        """stop ทุก worker (stop_trading) - terminate ตัวที่ไม่จบใน stop_timeout"""
+        running = [handle for handle in self.workers.values() if handle.state == "running"]
+        for handle in running:
+            handle.stopping = True
+            try:
+                handle.conn.send({'type': 'stop'})
+            except (BrokenPipeError, OSError):
+                pass
+        deadline = time.monotonic() + self.settings.stop_timeout
+        for handle in running:
+            handle.process.join(max(0.0, deadline - time.monotonic()))
+            if handle.process.is_alive():
+                log.warning(f"⚠️ {handle.spec.name}: did not stop in time - terminating")
+                handle.process.terminate()
+                handle.process.join(5)
+        for handle in self.workers.values():
+            if handle.state in ("pending", "backoff"):
+                handle.state = "stopped"
+        self.check_workers()
+        self.write_status()
+        log.info("🛑 Orchestrator stopped")
+
+def _worker_entry(account_dir: str, spec_data: Dict, config: Dict, conn, status_interval: float,
+                  nice: int, affinity: List[int]):
+    """Worker: ทำงานใน account_dir, stdout / stderr -> worker.log"""
+    os.chdir(account_dir)
+    log_file = open("worker.log", 'a', buffering=1, encoding='utf-8')
+    sys.stdout = sys.stderr = log_file
+    worker_main(spec_data, config, conn, status_interval, nice, affinity)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every account in config.account_orchestrator headless")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--test", action="store_true", help="self-test with 3 emulator accounts")
+    options = parser.parse_args()
+    if options.test:
+        test_account_orchestrator()
+        return
+
+    with open(options.config, 'r') as f:
+        config = json.load(f)
+    setup_engine_logging(config)
+    orchestrator = AccountOrchestrator(config, config_path=options.config)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: orchestrator.stop_event.set())
+    orchestrator.run()
+    shutdown_engine_logging()
+
+# Test function for standalone usage
+def test_account_orchestrator():
+    """3 emulator accounts: start, kill หนึ่ง worker (restart + backoff), push config, stop"""
+    import tempfile
+    print("🧪 Testing Account Orchestrator...")
+    work_dir = tempfile.mkdtemp()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json"), 'r') as f:
+        config = json.load(f)
+    params = {'base_lot': 0.01, 'grid_spacing': 300, 'max_levels': 10, 'realistic_survivability': 20000}
+    config['account_orchestrator'] = {
+        'work_dir': work_dir, 'status_file': os.path.join(work_dir, "status.json"), 'status_interval': 1.0,
+        'heartbeat_timeout': 10.0, 'start_interval': 0.5, 'restart_backoff_initial': 1.0, 'stop_timeout': 15.0,
+        'worker_config': {'logging': {'console': False}, 'cycle_profiler': {'control_file': ""}},
+        'accounts': [{'name': f"demo{i}", 'login': 5000001 + i, 'survivability_params': params,
+                      'emulator': {'balance': 5000.0 * (i + 1), 'seed': i}} for i in range(3)],
+    }
+    orchestrator = AccountOrchestrator(config)
+    orchestrator.start()
+
+    def run_for(seconds):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            orchestrator.step(timeout=0.5)
+
+    run_for(20)
+    victim = orchestrator.workers['demo1']
+    print(f"   Killing demo1 (pid {victim.process.pid})")
+    victim.process.kill()
+    run_for(15)
+    orchestrator.push_config(merge_sections(config, {'portfolio_recovery': {'auto_mode': False}}))
+    run_for(15)
+
+    status = orchestrator.aggregate_status()
+    for name, account in status['accounts'].items():
+        print(f"   {name}: {account['state']} pid {account['pid']} restarts {account['restarts']} | "
+              f"positions {account['status'].get('active_positions')} pending {account['status'].get('pending_orders')}")
+    print(f"   Totals: {status['totals']} | states {status['states']}")
+    orchestrator.stop()
+    print(f"   After stop: {orchestrator.aggregate_status()['states']}")
+    print("✅ Account Orchestrator Test Completed")
+
+if __name__ == "__main__":
+    main()
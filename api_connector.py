@@ -6,12 +6,18 @@ Pure API communication layer for backend status checking
 
 import requests
 import json
-from datetime import datetime
-from typing import Dict, Optional, Tuple
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Optional, Tuple
 import time
 
+DEFAULT_API_BASE_URL = "http://123.253.62.50:8080/api"
+
 class BackendAPIConnector:
-    def __init__(self, api_base_url: str, timeout: int = 10, bot_name: str = "Grid", bot_version: str = "0.0.1"):
+    def __init__(self, api_base_url: str, timeout: int = 10, bot_name: str = "Grid", bot_version: str = "0.0.1",
+                 pool_maxsize: int = 2):
         """
         Initialize Backend API Connector
         
@@ -20,6 +26,7 @@ class BackendAPIConnector:
             timeout: Request timeout in seconds
             bot_name: Name of the bot for identification
             bot_version: Version of the bot
+            pool_maxsize: Keep-alive connections kept per host
         """
         self.api_base_url = api_base_url.rstrip('/')  # Remove trailing slash
         self.timeout = timeout
@@ -33,6 +40,11 @@ class BackendAPIConnector:
             'User-Agent': f'{bot_name}/{bot_version}'
         })
         
+        # Keep-alive pool - ใช้ TCP/TLS connection เดิมซ้ำระหว่าง status checks
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # print(f"🔗 Backend API Connector initialized")
         # print(f"   Base URL: {self.api_base_url}")
         # print(f"   Bot: {self.bot_name} v{self.bot_version}")
@@ -323,6 +335,131 @@ class BackendAPIConnector:
         except:
             pass
 
+@dataclass(frozen=True)
+class BackendStatus:
+    """ผลการเช็คสถานะล่าสุด (immutable - engine อ่านได้โดยไม่ต้อง lock)"""
+    success: bool
+    processed_status: Optional[str] = None
+    next_report_time: Optional[datetime] = None
+    error: Optional[str] = None
+    checked_at: Optional[datetime] = None
+    checks: int = 0
+    response: Dict = field(default_factory=dict)
+
+class BackendStatusClient:
+    """
+    Long-lived backend status reporter
+
+    Owns one BackendAPIConnector (pooled keep-alive session) and runs
+    check_trading_status on its own thread, scheduled by the backend's nextReportTime
+    (fallback_interval if missing, retry_interval after a failure).
+    The latest BackendStatus is published by swapping one attribute - the trading
+    engine reads client.status without ever waiting on the network.
+    """
+
+    def __init__(self, connector: BackendAPIConnector, account_provider: Callable[[], Dict],
+                 on_status: Callable[[BackendStatus], None] = None,
+                 fallback_interval: float = 900, retry_interval: float = 60, min_interval: float = 5):
+        self.connector = connector
+        self.account_provider = account_provider
+        self.on_status = on_status
+        self.fallback_interval = fallback_interval
+        self.retry_interval = retry_interval
+        self.min_interval = min_interval
+
+        self.status = BackendStatus(success=False, error="Not checked yet")
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, config: Dict, account_provider: Callable[[], Dict],
+                    on_status: Callable[[BackendStatus], None] = None) -> 'BackendStatusClient':
+        backend_config = (config or {}).get('backend_api', {})
+        connector = BackendAPIConnector(
+            api_base_url=backend_config.get('base_url') or DEFAULT_API_BASE_URL,
+            timeout=backend_config.get('timeout', 10),
+            bot_name=backend_config.get('bot_name', 'Grid'),
+            bot_version=backend_config.get('bot_version', '0.0.1')
+        )
+        return cls(connector, account_provider, on_status,
+                   fallback_interval=backend_config.get('status_check_interval_minutes', 15) * 60,
+                   retry_interval=backend_config.get('retry_interval_seconds', 60))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True, name="backend-status")
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+
+    def close(self):
+        self.stop()
+        self.connector.close()
+
+    def is_alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def check_now(self):
+        """ปลุก thread ให้เช็คทันที (ไม่รอผล)"""
+        self.wake_event.set()
+
+    def run(self):
+        """Heartbeat loop - เช็คแล้วหลับจนถึง nextReportTime"""
+        while not self.stop_event.is_set():
+            status = self.check_once()
+            delay = self.seconds_until_next(status)
+            self.wake_event.wait(delay)
+            self.wake_event.clear()
+
+    def check_once(self) -> BackendStatus:
+        """เช็คสถานะหนึ่งครั้งแล้ว publish"""
+        try:
+            account_data = self.account_provider() or {}
+            success, response_data, error_msg = self.connector.check_trading_status(account_data)
+        except Exception as e:
+            success, response_data, error_msg = False, None, f"Status client error: {e}"
+
+        response_data = response_data or {}
+        next_report_time = None
+        if success and response_data.get("nextReportTime"):
+            next_report_time = self.connector.format_datetime_response(response_data.get("nextReportTime"))
+
+        status = BackendStatus(
+            success=success,
+            processed_status=response_data.get("processedStatus") if success else self.status.processed_status,
+            next_report_time=next_report_time,
+            error=error_msg,
+            checked_at=datetime.now(timezone.utc),
+            checks=self.status.checks + 1,
+            response=response_data
+        )
+        self.status = status
+
+        if self.on_status:
+            try:
+                self.on_status(status)
+            except Exception as e:
+                print(f"❌ Backend status callback error: {e}")
+        return status
+
+    def seconds_until_next(self, status: BackendStatus) -> float:
+        """เวลารอก่อนเช็คครั้งถัดไป"""
+        if not status.success:
+            return self.retry_interval
+        if status.next_report_time:
+            # naive nextReportTime = เวลาท้องถิ่นของเครื่อง (astimezone แบบเดิม) - backend ยังไม่ยืนยันว่าส่ง UTC
+            next_time = status.next_report_time.astimezone(timezone.utc)
+            delay = (next_time - datetime.now(timezone.utc)).total_seconds()
+            return max(self.min_interval, delay)
+        return self.fallback_interval
+
 # Example usage and testing
 def test_backend_connector():
     """Test the backend connector with sample data"""
@@ -379,5 +516,50 @@ def test_backend_connector():
     print(f"\n" + "="*50)
     print(f"✅ Backend Connector Test Completed")
 
+def test_backend_status_client():
+    """Test background status client against a local stand-in backend"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    print("🧪 Testing Backend Status Client (local server)...")
+
+    client_ports = set()
+
+    class StandInBackend(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            client_ports.add(self.client_address[1])
+            next_time = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+            body = json.dumps({"processedStatus": "active", "nextReportTime": next_time.isoformat()}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    connector = BackendAPIConnector(f"http://127.0.0.1:{server.server_address[1]}/api", timeout=2)
+    client = BackendStatusClient(connector, lambda: {'login': 1, 'currency': 'USD'}, min_interval=0.1)
+    client.start()
+
+    started = time.perf_counter()
+    reads = 0
+    while time.perf_counter() - started < 1.5:
+        status = client.status          # engine side: attribute read only
+        reads += 1
+    client.close()
+    server.shutdown()
+
+    print(f"   Checks: {client.status.checks} | Status: {client.status.processed_status} | "
+          f"TCP connections: {len(client_ports)} | Engine reads: {reads:,}")
+    print("✅ Backend Status Client Test Completed")
+
 if __name__ == "__main__":
+    test_backend_status_client()
     test_backend_connector()
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Basket Close Executor - Back-to-Back Basket Closing with Compensation
+basket_close_executor.py
+Prepares every close request of a basket from one tick, nets opposite BUY/SELL legs
+with TRADE_ACTION_CLOSE_BY, dispatches through a dedicated order channel
+and compensates legs that fail
+"""
+
+import time
+import MetaTrader5 as mt5
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional
+from engine_logger import get_logger
+from order_dispatcher import OrderPriority
+
+log = get_logger(__name__)
+
+class CompensationPolicy(Enum):
+    NONE = "NONE"                             # รายงานอย่างเดียว
+    RETRY = "RETRY"                           # ลองปิดใหม่ด้วยราคาใหม่ แล้วแจ้งเตือน (default)
+    REHEDGE = "REHEDGE"                       # เปิดไม้ตรงข้ามล็อคขาที่ค้าง (opt-in - เพิ่ม exposure)
+    RETRY_THEN_REHEDGE = "RETRY_THEN_REHEDGE" # ลองใหม่ก่อน ถ้ายังไม่ได้ค่อย hedge (opt-in)
+
+@dataclass
+class LegResult:
+    position_id: int
+    direction: str
+    volume: float
+    pnl: float
+    success: bool = False
+    retcode: Optional[int] = None
+    latency_ms: float = 0.0
+    attempts: int = 0
+    compensation: str = ""
+    method: str = "DEAL"           # DEAL / CLOSE_BY / CLOSE_BY+DEAL
+    netted_volume: float = 0.0     # volume ที่ปิดไปแล้วด้วย close-by
+
+    @property
+    def remaining_volume(self) -> float:
+        return round(max(0.0, self.volume - self.netted_volume), 8)
+
+@dataclass
+class BasketCloseReport:
+    pair_type: str
+    expected_net: float
+    legs: List[LegResult] = field(default_factory=list)
+    prepare_ms: float = 0.0
+    dispatch_ms: float = 0.0
+    order_sends: int = 0
+
+    @property
+    def success_count(self) -> int:
+        return sum(1 for leg in self.legs if leg.success)
+
+    @property
+    def completed(self) -> bool:
+        return bool(self.legs) and self.success_count == len(self.legs)
+
+    @property
+    def orphaned_legs(self) -> List[LegResult]:
+        return [leg for leg in self.legs if not leg.success]
+
+class BasketCloseExecutor:
+    """
+    Closes baskets from find_profitable_pairs without sleeping between legs
+
+    - one tick + one positions_get for all baskets being closed
+    - opposite BUY/SELL legs are matched by volume and netted with TRADE_ACTION_CLOSE_BY
+      (one round-trip, no second spread); leftover volume falls back to a normal close
+    - every request is queued on a single dedicated order thread, so legs go out
+      back-to-back while the caller only waits for the results
+    - per-leg latency/retcode is recorded, failed legs go through the compensation policy;
+      the default only retries and reports - re-hedging opens new positions, so it must be
+      enabled explicitly with basket_executor.compensation_policy
+    """
+
+    NO_RETRY_ERRORS = (10026, 10027)   # autotrading disabled (server / client)
+
+    def __init__(self, manager, policy: CompensationPolicy = CompensationPolicy.RETRY,
+                 max_retries: int = 2, deviation: int = 50, use_close_by: bool = True):
+        self.manager = manager
+        self.policy = policy
+        self.max_retries = max_retries
+        self.deviation = deviation
+        self.use_close_by = use_close_by
+        self.close_by_supported = None   # ตรวจครั้งแรกที่ใช้ (ต้องเป็น hedging account)
+        self.channel = ThreadPoolExecutor(max_workers=1, thread_name_prefix="basket-close")
+        self.reports: List[BasketCloseReport] = []
+
+    @classmethod
+    def from_config(cls, manager, config: Dict) -> 'BasketCloseExecutor':
+        executor_config = (config or {}).get('basket_executor', {})
+        try:
+            policy = CompensationPolicy(executor_config.get('compensation_policy', 'RETRY'))
+        except ValueError:
+            log.warning(f"⚠️ Unknown compensation_policy {executor_config.get('compensation_policy')} - using RETRY")
+            policy = CompensationPolicy.RETRY
+        return cls(manager, policy=policy,
+                   max_retries=executor_config.get('max_retries', 2),
+                   deviation=executor_config.get('deviation', 50),
+                   use_close_by=executor_config.get('use_close_by', True))
+
+    def close_baskets(self, baskets: List[Dict]) -> List[BasketCloseReport]:
+        """ปิดหลาย basket พร้อมกัน: เตรียม request ทั้งหมดจาก tick เดียว แล้วส่งต่อเนื่อง"""
+        if not baskets:
+            return []
+
+        started = time.perf_counter()
+        tick = mt5.symbol_info_tick(self.manager.gold_symbol)
+        if not tick:
+            log.error("   ❌ Basket close: cannot get tick data")
+            return []
+
+        live_positions = {pos.ticket: pos for pos in (mt5.positions_get(symbol=self.manager.gold_symbol) or ())}
+
+        close_by = self.use_close_by and self.is_close_by_supported()
+
+        prepared = []
+        reports = []
+        for basket in baskets:
+            report = BasketCloseReport(basket.get('pair_type', 'BASKET'), basket.get('net_profit', 0.0))
+            live_legs = []
+            for pos in basket['losing_positions'] + basket['profitable_positions']:
+                mt5_position = live_positions.get(pos.position_id)
+                leg = LegResult(pos.position_id, pos.direction,
+                                mt5_position.volume if mt5_position else pos.lot_size, pos.pnl)
+                report.legs.append(leg)
+                if mt5_position is None:
+                    leg.success = True   # ปิดไปแล้ว
+                    leg.compensation = "ALREADY_CLOSED"
+                    continue
+                live_legs.append((leg, mt5_position))
+
+            # 1) netting BUY/SELL ด้วย close-by  2) volume ที่เหลือปิดแบบ DEAL ปกติ
+            if close_by:
+                for buy_leg, sell_leg, volume in self.match_close_by(live_legs):
+                    prepared.append((report, self._send_close_by, (buy_leg, sell_leg, volume,
+                                                                   self.build_close_by_request(buy_leg, sell_leg))))
+            for leg, mt5_position in live_legs:
+                prepared.append((report, self._send_leg, (leg, self.build_close_request(mt5_position, tick))))
+
+            report.prepare_ms = (time.perf_counter() - started) * 1000
+            reports.append(report)
+
+        # ✅ ส่งทุก request เข้า order channel ทันที (ไม่มี sleep ระหว่างขา, ลำดับคงเดิม)
+        dispatch_started = time.perf_counter()
+        futures = [(report, self.channel.submit(send, *args)) for report, send, args in prepared]
+        for report, future in futures:
+            if future.result():
+                report.order_sends += 1
+        dispatch_ms = (time.perf_counter() - dispatch_started) * 1000
+
+        for report in reports:
+            report.dispatch_ms = dispatch_ms
+            for leg in report.orphaned_legs:
+                self.compensate(leg)
+            self.print_report(report)
+
+        self.reports = (self.reports + reports)[-50:]
+        return reports
+
+    def close_basket(self, basket: Dict) -> BasketCloseReport:
+        """ปิด basket เดียว"""
+        reports = self.close_baskets([basket])
+        return reports[0] if reports else BasketCloseReport(basket.get('pair_type', 'BASKET'), basket.get('net_profit', 0.0))
+
+    def build_close_request(self, mt5_position, tick) -> Dict:
+        """สร้าง close request ของ position จาก tick ที่ให้มา"""
+        if mt5_position.type == mt5.POSITION_TYPE_BUY:
+            close_price = tick.bid
+            order_type = mt5.ORDER_TYPE_SELL
+        else:
+            close_price = tick.ask
+            order_type = mt5.ORDER_TYPE_BUY
+
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": self.manager.gold_symbol,
+            "volume": mt5_position.volume,
+            "type": order_type,
+            "position": mt5_position.ticket,
+            "price": close_price,
+            "deviation": self.deviation,
+            "magic": self.manager.magic_number,
+            "comment": "AI_BASKET_CLOSE"
+        }
+        if getattr(self.manager, 'filling_cache', None):
+            self.manager.filling_cache.apply(request, "CLOSE")
+        return request
+
+    def build_close_by_request(self, buy_leg: LegResult, sell_leg: LegResult) -> Dict:
+        """สร้าง TRADE_ACTION_CLOSE_BY request ปิด BUY ด้วย SELL"""
+        return {
+            "action": mt5.TRADE_ACTION_CLOSE_BY,
+            "symbol": self.manager.gold_symbol,
+            "position": buy_leg.position_id,
+            "position_by": sell_leg.position_id,
+            "magic": self.manager.magic_number,
+            "comment": "AI_BASKET_CLOSE_BY"
+        }
+
+    @staticmethod
+    def match_close_by(live_legs) -> List[tuple]:
+        """จับคู่ BUY กับ SELL ตาม volume (ใหญ่ก่อน) -> [(buy_leg, sell_leg, matched_volume)]"""
+        buys = sorted([leg for leg, _ in live_legs if leg.direction == "BUY"], key=lambda x: -x.volume)
+        sells = sorted([leg for leg, _ in live_legs if leg.direction == "SELL"], key=lambda x: -x.volume)
+
+        matches = []
+        remaining = {id(leg): leg.volume for leg in buys + sells}
+        i = j = 0
+        while i < len(buys) and j < len(sells):
+            buy_leg, sell_leg = buys[i], sells[j]
+            volume = round(min(remaining[id(buy_leg)], remaining[id(sell_leg)]), 8)
+            matches.append((buy_leg, sell_leg, volume))
+            remaining[id(buy_leg)] = round(remaining[id(buy_leg)] - volume, 8)
+            remaining[id(sell_leg)] = round(remaining[id(sell_leg)] - volume, 8)
+            if remaining[id(buy_leg)] <= 0:
+                i += 1
+            if remaining[id(sell_leg)] <= 0:
+                j += 1
+        return matches
+
+    def is_close_by_supported(self) -> bool:
+        """CLOSE_BY ใช้ได้เฉพาะ hedging account"""
+        if self.close_by_supported is None:
+            try:
+                account = mt5.account_info()
+                hedging_mode = getattr(mt5, 'ACCOUNT_MARGIN_MODE_RETAIL_HEDGING', 2)
+                self.close_by_supported = bool(account and getattr(account, 'margin_mode', None) == hedging_mode)
+            except Exception as e:
+                log.warning(f"⚠️ Cannot detect account margin mode: {e}")
+                self.close_by_supported = False
+            log.debug("   🔄 Close-by netting: %s",
+                      'ENABLED' if self.close_by_supported else 'DISABLED (netting account)')
+        return self.close_by_supported
+
+    def _submit(self, request: Dict, label):
+        try:
+            return self.manager.submit_order_request(request, OrderPriority.RESCUE)
+        except Exception as e:
+            log.error(f"❌ Basket {label} send error: {e}")
+            return None
+
+    def _send_close_by(self, buy_leg: LegResult, sell_leg: LegResult, volume: float, request: Dict) -> bool:
+        """รันบน order channel thread - คืน True ถ้ามีการ order_send"""
+        # ถ้า close-by ก่อนหน้าของขานี้ล้มเหลว ให้ DEAL ปกติจัดการแทน
+        if (buy_leg.attempts and not buy_leg.netted_volume) or (sell_leg.attempts and not sell_leg.netted_volume):
+            return False
+
+        sent = time.perf_counter()
+        result = self._submit(request, f"close-by {buy_leg.position_id}/{sell_leg.position_id}")
+        latency_ms = (time.perf_counter() - sent) * 1000
+
+        for leg in (buy_leg, sell_leg):
+            leg.attempts += 1
+            leg.latency_ms += latency_ms
+            leg.retcode = result.retcode if result else None
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                leg.netted_volume = round(leg.netted_volume + volume, 8)
+                leg.method = "CLOSE_BY"
+        return True
+
+    def _send_leg(self, leg: LegResult, request: Dict) -> bool:
+        """รันบน order channel thread - ปิด volume ที่เหลือหลัง netting, คืน True ถ้ามีการ order_send"""
+        order_sent = False
+        if leg.netted_volume and leg.remaining_volume <= 0:
+            leg.success = True
+        else:
+            if leg.netted_volume:
+                request = dict(request, volume=leg.remaining_volume)
+                leg.method = "CLOSE_BY+DEAL"
+
+            sent = time.perf_counter()
+            result = self._submit(request, f"leg {leg.position_id}")
+            self.manager.record_filling_result("CLOSE", request.get("type_filling"), result)
+            leg.latency_ms += (time.perf_counter() - sent) * 1000
+            leg.attempts += 1
+            leg.retcode = result.retcode if result else None
+            leg.success = bool(result and result.retcode == mt5.TRADE_RETCODE_DONE)
+            order_sent = True
+
+        if leg.success:
+            self.manager.state_store.remove_position(leg.position_id)
+        return order_sent
+
+    def compensate(self, leg: LegResult):
+        """จัดการขาที่ปิดไม่สำเร็จตาม policy"""
+        if self.policy == CompensationPolicy.NONE:
+            leg.compensation = "NONE"
+            return
+
+        if leg.retcode in self.NO_RETRY_ERRORS:
+            leg.compensation = "SKIPPED_AUTOTRADING_DISABLED"
+            return
+
+        if self.policy in (CompensationPolicy.RETRY, CompensationPolicy.RETRY_THEN_REHEDGE):
+            for _ in range(self.max_retries):
+                leg.attempts += 1
+                # close_entire_position ดึง position + tick ใหม่ และไล่ filling modes ให้เอง
+                if self.manager.close_entire_position({'ticket': leg.position_id}):
+                    leg.success = True
+                    leg.compensation = "RETRIED"
+                    return
+
+        if self.policy in (CompensationPolicy.REHEDGE, CompensationPolicy.RETRY_THEN_REHEDGE):
+            hedge_direction = "SELL" if leg.direction == "BUY" else "BUY"
+            ticket = self.manager.place_market_order(hedge_direction, leg.remaining_volume, f"AI_REHEDGE_{leg.position_id}")
+            leg.compensation = f"REHEDGED_{ticket}" if ticket else "REHEDGE_FAILED"
+            return
+
+        leg.compensation = "RETRY_FAILED"
+        log.error(f"🚨 Leg {leg.position_id} ({leg.direction} {leg.remaining_volume}) still open after "
+                  f"{leg.attempts} attempts (retcode {leg.retcode}) - manual action required")
+
+    def print_report(self, report: BasketCloseReport):
+        """สรุปผล basket"""
+        latencies = [leg.latency_ms for leg in report.legs if leg.attempts]
+        avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        status = "🎉" if report.completed else "⚠️"
+        log.debug("   %s %s: %s/%s legs closed | expected $%.2f | prepare %.1fms | dispatch %.1fms | "
+                  "avg leg %.1fms | %s sends", status, report.pair_type, report.success_count, len(report.legs),
+                  report.expected_net, report.prepare_ms, report.dispatch_ms, avg_latency, report.order_sends)
+        for leg in report.legs:
+            if not leg.success or leg.compensation or leg.method != "DEAL":
+                log.debug("      %s %s %s $%.2f %s retcode=%s %s", '✅' if leg.success else '❌', leg.position_id,
+                          leg.direction, leg.pnl, leg.method, leg.retcode, leg.compensation)
+
+    def close(self):
+        """ปิด order channel"""
+        self.channel.shutdown(wait=True)
+
+# Test function for standalone usage
+def test_basket_close_executor():
+    """Test basket close executor (ต้องเชื่อมต่อ MT5)"""
+    print("🧪 Testing Basket Close Executor...")
+
+    if not mt5.initialize():
+        print("❌ MT5 not available - skip")
+        return
+
+    print(f"   Policies: {[p.value for p in CompensationPolicy]}")
+    print("✅ Basket Close Executor Test Completed")
+
+if __name__ == "__main__":
+    test_basket_close_executor()
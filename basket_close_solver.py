@@ -0,0 +1,313 @@
+"""
+Basket Close Solver - Conflict-Free Rescue Basket Selection
+basket_close_solver.py
+Set-packing solver that picks disjoint close baskets maximizing loss reduction
+subject to net >= threshold: exact for small books, a deterministic seeded
+heuristic (NumPy best-fit + restarts) with an iteration budget otherwise
+"""
+
+import time
+import numpy as np
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+@dataclass
+class SolverSettings:
+    """Limits ของ basket solver"""
+    min_net_profit: float = -1.0       # net ของแต่ละ basket ต้อง >= ค่านี้
+    profit_threshold: float = 0.3      # pnl > ค่านี้ = ไม้ช่วย (helper)
+    loss_threshold: float = -0.5       # pnl < ค่านี้ = ไม้ขาดทุน
+    max_legs: int = 6                  # จำนวนไม้สูงสุดต่อ basket
+    max_baskets: int = 15
+    max_iterations: int = 100          # budget หลักของ heuristic (จำนวนลำดับ loser ที่ลอง)
+    time_budget_ms: float = 250.0      # hard cap เวลาเท่านั้น (ปกติ max_iterations / stall ถึงก่อน)
+    stall_iterations: int = 20         # หยุดก่อนถ้าไม่ดีขึ้นติดกันเท่านี้รอบ
+    exact_max_positions: int = 10      # losers + helpers <= ค่านี้ = ค้นหาแบบ exact (0 = ปิด)
+    random_seed: Optional[int] = 0     # seed คงที่ = position ชุดเดิมได้ basket ชุดเดิมเสมอ
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'SolverSettings':
+        solver_config = (config or {}).get('basket_solver', {})
+        return cls(
+            min_net_profit=solver_config.get('min_net_profit', cls.min_net_profit),
+            profit_threshold=solver_config.get('profit_threshold', cls.profit_threshold),
+            loss_threshold=solver_config.get('loss_threshold', cls.loss_threshold),
+            max_legs=solver_config.get('max_legs', cls.max_legs),
+            max_baskets=solver_config.get('max_baskets', cls.max_baskets),
+            max_iterations=solver_config.get('max_iterations', cls.max_iterations),
+            time_budget_ms=solver_config.get('time_budget_ms', cls.time_budget_ms),
+            stall_iterations=solver_config.get('stall_iterations', cls.stall_iterations),
+            exact_max_positions=solver_config.get('exact_max_positions', cls.exact_max_positions),
+            random_seed=solver_config.get('random_seed', cls.random_seed),
+        )
+
+@dataclass
+class SolverResult:
+    """ผลลัพธ์ของ solver: baskets เป็น list ของ (loser_idx[], helper_idx[]) ตาม index ของ input"""
+    baskets: List[tuple]
+    loss_reduction: float
+    net_profit: float
+    iterations: int
+    elapsed_ms: float
+    exact: bool = False
+
+class BasketCloseSolver:
+    """
+    Bounded set packing over the PnL vector
+
+    Each basket = one or more losers + helpers, at most max_legs legs, net >= min_net_profit.
+    Baskets never share a position, and the total legs closed is capped by max_close.
+    Objective: maximize total loss closed (sum |loser pnl|); ties -> higher net, fewer legs.
+
+    Small books (losers + helpers <= exact_max_positions, with max_close / max_baskets not
+    binding) are solved exactly by memoized search over the set of still-open positions.
+
+    Larger books use a heuristic, so the packing is good but not proven optimal.
+    Construction is a vectorized best-fit: for each loser pick the fewest helpers that
+    cover it (prefix sums on the descending helper vector), then swap each helper down to
+    the smallest one that still covers, and absorb extra small losers into the spare surplus.
+    Further iterations try seeded random loser orders and keep the best packing; the search
+    stops after max_iterations or stall_iterations, so the same PnL vector always gives the
+    same baskets. time_budget_ms is only a safety cap on slow machines.
+    """
+
+    def __init__(self, settings: SolverSettings = None):
+        self.settings = settings or SolverSettings()
+
+    def solve(self, pnl, max_close: int = None) -> SolverResult:
+        """pnl: sequence ของ pnl ต่อ position -> SolverResult (index อ้างอิง pnl เดิม)"""
+        started = time.perf_counter()
+        s = self.settings
+        pnl = np.asarray(pnl, dtype=float)
+
+        if max_close is None:
+            max_close = len(pnl)
+
+        loser_idx = np.flatnonzero(pnl < s.loss_threshold)
+        helper_idx = np.flatnonzero(pnl > s.profit_threshold)
+
+        empty = SolverResult([], 0.0, 0.0, 0, 0.0)
+        if len(loser_idx) == 0 or len(helper_idx) == 0 or max_close < 2:
+            empty.elapsed_ms = (time.perf_counter() - started) * 1000
+            return empty
+
+        candidates = len(loser_idx) + len(helper_idx)
+        if (candidates <= s.exact_max_positions and max_close >= candidates
+                and s.max_baskets >= min(len(loser_idx), len(helper_idx))):
+            baskets, loss_reduction, net_profit = self._solve_exact(pnl, loser_idx, helper_idx)
+            return SolverResult(baskets, loss_reduction, net_profit, 1,
+                                (time.perf_counter() - started) * 1000, exact=True)
+
+        # helpers เรียงจากมากไปน้อย
+        helper_idx = helper_idx[np.argsort(-pnl[helper_idx], kind='stable')]
+        helper_pnl = pnl[helper_idx]
+        rng = np.random.default_rng(s.random_seed)
+
+        # ลำดับ deterministic ก่อน: ขาดทุนหนักสุดก่อน / เบาสุดก่อน
+        worst_first = loser_idx[np.argsort(pnl[loser_idx], kind='stable')]
+        orders = [worst_first, worst_first[::-1]]
+
+        best = None
+        iterations = 0
+        stalled = 0
+        deadline = started + s.time_budget_ms / 1000.0
+
+        while True:
+            if iterations < len(orders):
+                order = orders[iterations]
+            else:
+                order = rng.permutation(worst_first)
+
+            candidate = self._construct(pnl, order, helper_idx, helper_pnl, max_close)
+            iterations += 1
+
+            if best is None or self._score(candidate) > self._score(best):
+                best = candidate
+                stalled = 0
+            else:
+                stalled += 1
+
+            if (iterations >= s.max_iterations or len(worst_first) <= 1 or stalled >= s.stall_iterations
+                    or time.perf_counter() >= deadline):
+                break
+
+        baskets, loss_reduction, net_profit = best
+        return SolverResult(
+            baskets=baskets,
+            loss_reduction=loss_reduction,
+            net_profit=net_profit,
+            iterations=iterations,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    def _solve_exact(self, pnl, loser_idx, helper_idx):
+        """Exact packing: best(open) = max(ไม่ปิดตัวแรก, basket ที่มีตัวแรก + best(ที่เหลือ))"""
+        s = self.settings
+        positions = [int(i) for i in np.concatenate([loser_idx, helper_idx])]
+        values = [float(pnl[i]) for i in positions]
+        is_loser = [i < len(loser_idx) for i in range(len(positions))]
+        count = len(positions)
+
+        # basket ที่ valid ทั้งหมด จัดกลุ่มตามบิตต่ำสุด (เป็นตัวแรกที่ยังเปิดอยู่เสมอ)
+        by_lowest = [[] for _ in range(count)]
+        for mask in range(1, 1 << count):
+            members = [i for i in range(count) if mask >> i & 1]
+            losers = [i for i in members if is_loser[i]]
+            if not losers or len(losers) == len(members) or len(members) > s.max_legs:
+                continue
+            net = sum(values[i] for i in members)
+            if net < s.min_net_profit:
+                continue
+            gain = (-sum(values[i] for i in losers), net, -len(members))
+            by_lowest[members[0]].append((mask, gain))
+
+        @lru_cache(maxsize=None)
+        def best(open_mask):
+            if open_mask == 0:
+                return (0.0, 0.0, 0), ()
+            lowest = (open_mask & -open_mask).bit_length() - 1
+            score, chosen = best(open_mask & ~(1 << lowest))
+            for mask, gain in by_lowest[lowest]:
+                if mask & open_mask != mask:
+                    continue
+                rest_score, rest = best(open_mask & ~mask)
+                total = tuple(a + b for a, b in zip(gain, rest_score))
+                if total > score:
+                    score, chosen = total, (mask,) + rest
+            return score, chosen
+
+        (loss_reduction, net_profit, _), chosen = best((1 << count) - 1)
+        baskets = []
+        for mask in sorted(chosen, key=lambda m: sum(values[i] for i in range(count) if m >> i & 1 and is_loser[i])):
+            members = [i for i in range(count) if mask >> i & 1]
+            baskets.append(([positions[i] for i in members if is_loser[i]],
+                            [positions[i] for i in sorted(members, key=lambda i: -values[i]) if not is_loser[i]]))
+        return baskets, float(loss_reduction), float(net_profit)
+
+    @staticmethod
+    def _score(candidate):
+        baskets, loss_reduction, net_profit = candidate
+        legs = sum(len(losers) + len(helpers) for losers, helpers in baskets)
+        return (round(loss_reduction, 6), round(net_profit, 6), -legs)
+
+    def _construct(self, pnl, loser_order, helper_idx, helper_pnl, max_close):
+        """สร้าง packing หนึ่งชุดตามลำดับ loser ที่กำหนด"""
+        s = self.settings
+        helper_free = np.ones(len(helper_idx), dtype=bool)
+        loser_free = {int(i): True for i in loser_order}
+        legs_left = max_close
+
+        baskets = []
+        loss_reduction = 0.0
+        net_total = 0.0
+
+        for loser in loser_order:
+            loser = int(loser)
+            if not loser_free[loser]:
+                continue
+            if len(baskets) >= s.max_baskets or legs_left < 2:
+                break
+
+            need = s.min_net_profit - pnl[loser]
+            max_helpers = min(s.max_legs, legs_left) - 1
+
+            chosen = self._cover(need, helper_pnl, helper_free, max_helpers)
+            if chosen is None:
+                continue
+
+            losers = [loser]
+            surplus = helper_pnl[chosen].sum() - need
+
+            # ใช้ surplus ที่เหลือดูดไม้ขาดทุนเล็กๆ เพิ่ม (N:M)
+            slots = min(s.max_legs, legs_left) - 1 - len(chosen)
+            if slots > 0 and surplus > 0:
+                for extra in loser_order:
+                    extra = int(extra)
+                    if slots <= 0:
+                        break
+                    if extra == loser or not loser_free[extra]:
+                        continue
+                    if -pnl[extra] <= surplus:
+                        losers.append(extra)
+                        surplus += pnl[extra]
+                        slots -= 1
+
+            for idx in losers:
+                loser_free[idx] = False
+            helper_free[chosen] = False
+
+            legs = len(losers) + len(chosen)
+            legs_left -= legs
+            basket_net = pnl[losers].sum() + helper_pnl[chosen].sum()
+
+            baskets.append((losers, [int(i) for i in helper_idx[chosen]]))
+            loss_reduction += float(-pnl[losers].sum())
+            net_total += float(basket_net)
+
+        return baskets, loss_reduction, net_total
+
+    @staticmethod
+    def _cover(need, helper_pnl, helper_free, max_helpers):
+        """เลือก helper น้อยตัวที่สุดที่รวมกัน >= need แล้ว swap ลงเป็นตัวเล็กสุดที่ยังพอ"""
+        if max_helpers < 1:
+            return None
+
+        free_positions = np.flatnonzero(helper_free)
+        if len(free_positions) == 0:
+            return None
+
+        values = helper_pnl[free_positions]          # ยังเรียงมากไปน้อย
+        prefix = np.cumsum(values)
+        count = int(np.searchsorted(prefix, need - 1e-9)) + 1
+        if count > min(max_helpers, len(values)):
+            return None
+
+        picked = np.arange(count)
+        total = prefix[count - 1]
+
+        # best fit: แทนที่ helper ตัวใหญ่ด้วยตัวที่เล็กที่สุดที่ยังคลุม need ได้
+        unused = np.ones(len(values), dtype=bool)
+        unused[picked] = False
+        for slot in range(count):
+            current = picked[slot]
+            slack = total - need
+            floor = values[current] - slack
+            fits = unused & (values >= floor - 1e-9) & (values < values[current])
+            if not fits.any():
+                continue
+            replacement = np.flatnonzero(fits)[-1]   # ตัวเล็กสุดที่ยังพอ
+            unused[current] = True
+            unused[replacement] = False
+            total += values[replacement] - values[current]
+            picked[slot] = replacement
+
+        return free_positions[picked]
+
+# Test function for standalone usage
+def test_basket_close_solver():
+    """Test the basket close solver"""
+    print("🧪 Testing Basket Close Solver...")
+
+    solver = BasketCloseSolver()
+
+    small = [-8.0, -3.0, -1.2, 2.5, 4.0, 6.0, 1.0, 0.8]
+    result = solver.solve(small)
+    heuristic = BasketCloseSolver(SolverSettings(exact_max_positions=0)).solve(small)
+    print(f"   Small book (exact={result.exact}): {result.baskets}")
+    print(f"   Loss reduction ${result.loss_reduction:.2f} | Net ${result.net_profit:.2f} "
+          f"(heuristic ${heuristic.loss_reduction:.2f} in {heuristic.iterations} iterations)")
+
+    rng = np.random.default_rng(1)
+    large = rng.normal(0, 4, 600)
+    result = solver.solve(large, max_close=400)
+    used = [i for losers, helpers in result.baskets for i in losers + helpers]
+    print(f"   600 positions: {len(result.baskets)} baskets, {len(used)} legs, "
+          f"loss reduction ${result.loss_reduction:.2f}, {result.iterations} iterations in {result.elapsed_ms:.1f}ms")
+    print(f"   Conflict free: {len(used) == len(set(used))}")
+    print(f"   Deterministic: {BasketCloseSolver().solve(large, max_close=400).baskets == result.baskets}")
+
+    print("✅ Basket Close Solver Test Completed")
+
+if __name__ == "__main__":
+    test_basket_close_solver()
@@ -27,6 +27,24 @@ a = Analysis(
         ('ai_money_manager.py', '.'),
         ('gold_hedge_calculator.py', '.'),
         ('api_connector.py', '.'),
+        ('pending_order_book.py', '.'),
+        ('basket_close_solver.py', '.'),
+        ('basket_close_executor.py', '.'),
+        ('filling_mode_cache.py', '.'),
+        ('engine_scheduler.py', '.'),
+        ('state_store.py', '.'),
+        ('engine_logger.py', '.'),
+        ('monte_carlo_engine.py', '.'),
+        ('grid_reconciler.py', '.'),
+        ('virtual_ladder.py', '.'),
+        ('order_dispatcher.py', '.'),
+        ('order_metrics.py', '.'),
+        ('cycle_profiler.py', '.'),
+        ('metrics_server.py', '.'),
+        ('market_data_service.py', '.'),
+        ('multi_symbol_engine.py', '.'),
+        ('account_orchestrator.py', '.'),
+        ('headless_daemon.py', '.'),
     ],
     hiddenimports=[
         'mt5_auto_connector',
@@ -35,7 +53,27 @@ a = Analysis(
         'ai_money_manager',
         'gold_hedge_calculator',
         'api_connector',
+        'pending_order_book',
+        'basket_close_solver',
+        'basket_close_executor',
+        'filling_mode_cache',
+        'engine_scheduler',
+        'state_store',
+        'engine_logger',
+        'monte_carlo_engine',
+        'grid_reconciler',
+        'virtual_ladder',
+        'order_dispatcher',
+        'order_metrics',
+        'cycle_profiler',
+        'metrics_server',
+        'market_data_service',
+        'multi_symbol_engine',
+        'account_orchestrator',
+        'headless_daemon',
+        'http.server',
         'MetaTrader5',
+        'concurrent.futures',
         'numpy',
         'numpy.core',
         'numpy.core.multiarray',
@@ -103,7 +141,25 @@ def check_files():
         'survivability_engine.py',
         'ai_money_manager.py', 
         'gold_hedge_calculator.py',
-        'api_connector.py'
+        'api_connector.py',
+        'pending_order_book.py',
+        'basket_close_solver.py',
+        'basket_close_executor.py',
+        'filling_mode_cache.py',
+        'engine_scheduler.py',
+        'state_store.py',
+        'engine_logger.py',
+        'monte_carlo_engine.py',
+        'grid_reconciler.py',
+        'virtual_ladder.py',
+        'order_dispatcher.py',
+        'order_metrics.py',
+        'cycle_profiler.py',
+        'metrics_server.py',
+        'market_data_service.py',
+        'multi_symbol_engine.py',
+        'account_orchestrator.py',
+        'headless_daemon.py'
     ]
     
     missing = []
@@ -0,0 +1,273 @@
+"""
+Cycle Profiler - Per-stage wall / CPU timing + sampling capture
+cycle_profiler.py
+Named stages of each AI / monitor cycle are timed (wall + thread CPU) into a ring
+buffer. An optional sampling profiler writes flamegraph-compatible collapsed stacks.
+Both can be switched on / off at runtime (API or control file), no restart needed
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+_DISABLED = nullcontext()
+
+@dataclass
+class ProfilerSettings:
+    enabled: bool = False                       # เปิดตอน start (เปิด / ปิดทีหลังได้)
+    ring_size: int = 500                        # จำนวน cycles ล่าสุดที่เก็บ
+    control_file: str = "profiler_control.json" # {"enabled": true, "sample_seconds": 30}
+    sample_interval_ms: float = 5.0
+    sample_seconds: float = 30.0
+    output_dir: str = "profiles"
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'ProfilerSettings':
+        profiler_config = (config or {}).get('cycle_profiler', {})
+        return cls(**{key: value for key, value in profiler_config.items() if key in cls.__dataclass_fields__})
+
+def profiled_stage(method):
+    """Decorator สำหรับ method ของ object ที่มี self.profiler - ชื่อ stage = ชื่อ method"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.profiler.stage(name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class _Stage:
+    """Context ของหนึ่ง stage - stage แรกบน thread = root ของ cycle"""
+    __slots__ = ('profiler', 'name', 'wall', 'cpu', 'record')
+
+    def __init__(self, profiler: 'CycleProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        local = self.profiler.local
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+        if not stack:
+            local.record = {'cycle': self.name, 'started': time.time(), 'stages': {}}
+        stack.append(self.name)
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ms = (time.perf_counter() - self.wall) * 1000
+        cpu_ms = (time.thread_time() - self.cpu) * 1000
+        local = self.profiler.local
+        path = "/".join(local.stack)
+        local.stack.pop()
+        record = local.record
+        total = record['stages'].get(path)
+        record['stages'][path] = (wall_ms, cpu_ms) if total is None else (total[0] + wall_ms, total[1] + cpu_ms)
+        if not local.stack:
+            record['wall_ms'], record['cpu_ms'] = wall_ms, cpu_ms
+            self.profiler.cycles.append(record)
+        return False
+
+class CycleProfiler:
+    """
+    Built-in cycle profiler
+
+    stage(name): `with profiler.stage("find_profitable_pairs"):` - the outermost stage on
+    a thread opens a cycle record, nested stages are stored by path
+    (run_ai_cycle/run_smart_profit_management/find_profitable_pairs). Disabled = a shared
+    nullcontext, so the hooks cost one attribute check.
+    start_sampling(): background thread snapshots sys._current_frames() every interval
+    and writes "frame;frame;frame count" lines (flamegraph.pl / speedscope input).
+    poll_control(): applies the control file when its mtime changes.
+    """
+
+    def __init__(self, settings: ProfilerSettings = None):
+        self.settings = settings or ProfilerSettings()
+        self.enabled = self.settings.enabled
+        self.cycles = deque(maxlen=self.settings.ring_size)
+        self.local = threading.local()
+        self.sampler: Optional[threading.Thread] = None
+        self.sampling_stop = threading.Event()
+        self.last_capture: Optional[str] = None
+        self.control_mtime = None
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, name)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            log.info("⏱️ Cycle profiler ON")
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            log.info("⏱️ Cycle profiler OFF")
+
+    # ----- Sampling -----
+
+    def is_sampling(self) -> bool:
+        return self.sampler is not None and self.sampler.is_alive()
+
+    def start_sampling(self, seconds: float = None, interval_ms: float = None) -> bool:
+        """เริ่ม capture collapsed stacks (ถ้ายังไม่มี capture ที่รันอยู่)"""
+        if self.is_sampling():
+            return False
+        seconds = seconds or self.settings.sample_seconds
+        interval = (interval_ms or self.settings.sample_interval_ms) / 1000
+        self.sampling_stop.clear()
+        self.sampler = threading.Thread(target=self._sample, args=(seconds, interval), daemon=True,
+                                        name="CycleProfilerSampler")
+        self.sampler.start()
+        log.info(f"🔥 Sampling profiler started: {seconds:g}s @ {interval * 1000:.1f}ms")
+        return True
+
+    def stop_sampling(self):
+        self.sampling_stop.set()
+
+    def _sample(self, seconds: float, interval: float):
+        stacks: Dict[str, int] = {}
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        samples = 0
+        while time.monotonic() < deadline and not self.sampling_stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                key = ";".join([names.get(ident, str(ident))] + self._frames(frame))
+                stacks[key] = stacks.get(key, 0) + 1
+            samples += 1
+            self.sampling_stop.wait(interval)
+        self.last_capture = self._write_stacks(stacks)
+        log.info(f"🔥 Sampling profiler done: {samples} samples -> {self.last_capture}")
+
+    @staticmethod
+    def _frames(frame) -> List[str]:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}")
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def _write_stacks(self, stacks: Dict[str, int]) -> Optional[str]:
+        try:
+            os.makedirs(self.settings.output_dir, exist_ok=True)
+            path = os.path.join(self.settings.output_dir, f"cycle_profile_{datetime.now():%Y%m%d_%H%M%S}.collapsed")
+            with open(path, 'w') as f:
+                for stack, count in sorted(stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            return path
+        except Exception as e:
+            log.warning(f"⚠️ Profile capture write error: {e}")
+            return None
+
+    # ----- Control / report -----
+
+    def poll_control(self):
+        """อ่าน control file เมื่อมีการแก้ - {"enabled": bool, "sample_seconds": n}"""
+        path = self.settings.control_file
+        try:
+            if not path or not os.path.exists(path):
+                return
+            mtime = os.path.getmtime(path)
+            if mtime == self.control_mtime:
+                return
+            self.control_mtime = mtime
+            with open(path, 'r') as f:
+                control = json.load(f)
+            if 'enabled' in control:
+                self.enable() if control['enabled'] else self.disable()
+            if control.get('sample_seconds'):
+                self.start_sampling(control['sample_seconds'], control.get('sample_interval_ms'))
+        except Exception as e:
+            log.warning(f"⚠️ Profiler control file error: {e}")
+
+    def summary(self) -> Dict:
+        """Per cycle / stage จาก ring buffer: wall p50 / p99 / max + cpu mean (ms)"""
+        timings: Dict[str, Dict[str, List]] = {}
+        for record in list(self.cycles):
+            stages = timings.setdefault(record['cycle'], {})
+            for path, (wall_ms, cpu_ms) in record['stages'].items():
+                walls, cpus = stages.setdefault(path, ([], []))
+                walls.append(wall_ms)
+                cpus.append(cpu_ms)
+
+        report = {}
+        for cycle, stages in timings.items():
+            rows = {}
+            for path, (walls, cpus) in stages.items():
+                ordered = sorted(walls)
+                rows[path] = {
+                    'count': len(walls),
+                    'wall_p50_ms': round(ordered[len(ordered) // 2], 3),
+                    'wall_p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+                    'wall_max_ms': round(ordered[-1], 3),
+                    'cpu_mean_ms': round(sum(cpus) / len(cpus), 3),
+                }
+            report[cycle] = dict(sorted(rows.items(), key=lambda item: -item[1]['wall_p50_ms']))
+        return {
+            'enabled': self.enabled,
+            'cycles_recorded': len(self.cycles),
+            'sampling': self.is_sampling(),
+            'last_capture': self.last_capture,
+            'stages': report,
+        }
+
+# Test function for standalone usage
+def test_cycle_profiler():
+    """Cycle จำลอง: analyze (CPU) + backend (I/O wait)"""
+    import tempfile
+    print("🧪 Testing Cycle Profiler...")
+    output_dir = tempfile.mkdtemp()
+    profiler = CycleProfiler(ProfilerSettings(output_dir=output_dir, control_file=os.path.join(output_dir, "control.json")))
+
+    def busy(ms):
+        end = time.perf_counter() + ms / 1000
+        while time.perf_counter() < end:
+            pass
+
+    def cycle():
+        with profiler.stage("run_ai_cycle"):
+            with profiler.stage("analyze_portfolio_positions"):
+                busy(4)
+            with profiler.stage("report_backend_status"):
+                time.sleep(0.006)
+
+    cycle()
+    print(f"   Disabled: {profiler.summary()['cycles_recorded']} cycles recorded")
+
+    with open(profiler.settings.control_file, 'w') as f:
+        json.dump({"enabled": True, "sample_seconds": 0.3, "sample_interval_ms": 2}, f)
+    profiler.poll_control()
+    for _ in range(25):
+        cycle()
+    profiler.sampler.join()
+
+    for path, row in profiler.summary()['stages']['run_ai_cycle'].items():
+        print(f"   {path}: {row}")
+    with open(profiler.last_capture) as f:
+        lines = f.readlines()
+    print(f"   Collapsed stacks: {len(lines)} unique -> {os.path.basename(profiler.last_capture)}")
+    print("✅ Cycle Profiler Test Completed")
+
+if __name__ == "__main__":
+    test_cycle_profiler()
@@ -0,0 +1,252 @@
+"""
+Engine Logger - Structured, Level-Filtered, Asynchronous Logging
+engine_logger.py
+Queue-backed logging for the trading engine: per-module levels from config,
+rate-limited debug categories, console + compact JSON-lines sinks
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+ROOT_LOGGER = "engine"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+def get_logger(module_name: str) -> logging.Logger:
+    """Logger ของ module (engine.<module>) - ใช้แทน print ใน engine"""
+    name = module_name.rsplit('.', 1)[-1]
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+class JsonLinesFormatter(logging.Formatter):
+    """หนึ่ง record ต่อบรรทัด: ts, level, module, msg (+ category / data ถ้ามี)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'module': record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name,
+            'msg': record.getMessage().strip(),
+        }
+        category = getattr(record, 'category', None)
+        if category:
+            entry['category'] = category
+        data = getattr(record, 'data', None)
+        if data is not None:
+            entry['data'] = data
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    """Console: ข้อความเหมือน print เดิม (+ จำนวนที่ถูก rate-limit)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            message += f"  (+{suppressed} similar suppressed)"
+        return message
+
+class CategoryRateLimitFilter(logging.Filter):
+    """
+    จำกัดความถี่ของ record ตาม category
+
+    Category = extra={'category': ...} หรือ (สำหรับ DEBUG) ชื่อฟังก์ชันที่เรียก log ถ้ามีใน intervals
+    เช่น "run_smart_profit_management": 30 = แสดง debug block ของ cycle นั้นทุก 30 วินาที.
+    เมื่อ category เปิดหน้าต่าง record ทั้งหมดภายใน burst_window วินาทีจะผ่าน (ทั้ง block ของ cycle),
+    หลังจากนั้นถูกนับแล้วรายงานรวมใน record ถัดไปที่ผ่าน (record.suppressed)
+    """
+
+    def __init__(self, intervals: Dict[str, float] = None, default_interval: float = 0.0,
+                 burst_window: float = 0.05):
+        super().__init__()
+        self.intervals = intervals or {}
+        self.default_interval = default_interval
+        self.burst_window = burst_window
+        self.window_start: Dict[str, float] = {}
+        self.suppressed: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def category_of(self, record: logging.LogRecord) -> Optional[str]:
+        category = getattr(record, 'category', None)
+        if category:
+            return category
+        if record.levelno <= logging.DEBUG and record.funcName in self.intervals:
+            return record.funcName
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = self.category_of(record)
+        if not category:
+            return True
+
+        interval = self.intervals.get(category, self.default_interval)
+        if interval <= 0:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.window_start.get(category, -interval)
+            if elapsed < self.burst_window:
+                return True
+            if elapsed < interval:
+                self.suppressed[category] = self.suppressed.get(category, 0) + 1
+                return False
+            self.window_start[category] = now
+            record.suppressed = self.suppressed.pop(category, 0)
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler ที่ไม่ block engine เมื่อ queue เต็ม (นับจำนวนที่ทิ้ง)"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+def setup_engine_logging(config: Dict = None) -> logging.Logger:
+    """
+    ตั้งค่า logging ของ engine จาก config (เรียกซ้ำได้ - จะ restart listener)
+
+    config keys:
+      log_level                      ระดับหลัก (เดิมมีใน config แต่ยังไม่ถูกใช้)
+      logging.modules                {"smart_profit_manager": "DEBUG", ...}
+      logging.console                true/false
+      logging.jsonl_file             path ของ JSON-lines sink ("" = ปิด)
+      logging.rate_limits            {"category" หรือ "function_name": seconds}
+      logging.default_rate_limit     seconds สำหรับ category อื่นๆ
+      logging.burst_window           seconds ที่ปล่อยทั้ง block หลังเปิดหน้าต่าง
+      logging.queue_size             ขนาด queue (เต็มแล้วทิ้ง record แทนการ block engine)
+    """
+    global _listener
+
+    config = config or {}
+    log_config = config.get('logging', {})
+
+    with _setup_lock:
+        shutdown_engine_logging()
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(_level(config.get('log_level', 'INFO')))
+        root.propagate = False
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        for module_name, level in log_config.get('modules', {}).items():
+            get_logger(module_name).setLevel(_level(level))
+
+        sinks = []
+        if log_config.get('console', True):
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(ConsoleFormatter("%(message)s"))
+            sinks.append(console)
+
+        jsonl_file = log_config.get('jsonl_file', '')
+        if jsonl_file:
+            directory = os.path.dirname(jsonl_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                jsonl_file,
+                maxBytes=log_config.get('jsonl_max_bytes', 20 * 1024 * 1024),
+                backupCount=log_config.get('jsonl_backups', 3),
+                encoding='utf-8'
+            )
+            file_handler.setFormatter(JsonLinesFormatter())
+            sinks.append(file_handler)
+
+        # Engine thread แค่ใส่ record ลง queue - I/O ทั้งหมดอยู่ที่ listener thread
+        log_queue = queue.Queue(maxsize=log_config.get('queue_size', 10000))
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(CategoryRateLimitFilter(
+            log_config.get('rate_limits', {}),
+            log_config.get('default_rate_limit', 0.0),
+            log_config.get('burst_window', 0.05)
+        ))
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+        _listener.start()
+
+    return root
+
+def shutdown_engine_logging():
+    """Flush queue แล้วหยุด listener thread"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+def _level(value) -> int:
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+def _install_default():
+    """ถ้ายังไม่มีใครเรียก setup ให้ log ออก console ทันที (ใช้ตอนรัน module เดี่ยว)"""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(ConsoleFormatter("%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        root.propagate = False
+
+_install_default()
+
+# Test function for standalone usage
+def test_engine_logger():
+    """Test structured async logging"""
+    import tempfile
+    print("🧪 Testing Engine Logger...")
+
+    jsonl_file = os.path.join(tempfile.mkdtemp(), "engine_test.jsonl")
+    setup_engine_logging({
+        'log_level': 'INFO',
+        'logging': {
+            'modules': {'test_module': 'DEBUG'},
+            'jsonl_file': jsonl_file,
+            'rate_limits': {'burst': 0.5},
+            'burst_window': 0.0,
+        }
+    })
+
+    log = get_logger("test_module")
+    other = get_logger("quiet_module")
+
+    started = time.perf_counter()
+    for i in range(1000):
+        log.debug(f"candidate {i}", extra={'category': 'burst'})
+        other.debug(f"filtered {i}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    log.info("📊 Cycle summary", extra={'data': {'positions': 120, 'pnl': -12.5}})
+    shutdown_engine_logging()
+
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    print(f"   2000 log calls in {elapsed_ms:.1f}ms | {len(lines)} JSON lines written")
+    print(f"   Last: {lines[-1].strip()}")
+
+    print("✅ Engine Logger Test Completed")
+
+if __name__ == "__main__":
+    test_engine_logger()
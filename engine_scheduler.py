@@ -0,0 +1,232 @@
+"""
+Engine Scheduler - Event-Driven Core for the Trading Engine
+engine_scheduler.py
+Watches tick stream, position/order counts and timers on one thread and
+dispatches only the handlers whose inputs changed (bursts are coalesced)
+"""
+
+import time
+import threading
+import MetaTrader5 as mt5
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+class EngineEvent(Enum):
+    TICK = "TICK"             # ราคาเปลี่ยน
+    POSITIONS = "POSITIONS"   # จำนวน positions เปลี่ยน (fill / close)
+    ORDERS = "ORDERS"         # จำนวน pending orders เปลี่ยน
+    TIMER = "TIMER"           # ครบรอบเวลา
+
+@dataclass
+class EngineHandler:
+    name: str
+    callback: Callable[[Set[EngineEvent]], None]
+    triggers: Set[EngineEvent]
+    min_interval: float = 0.0            # เว้นระยะขั้นต่ำระหว่างการรัน (coalesce burst)
+    timer_interval: Optional[float] = None
+    pending: Set[EngineEvent] = field(default_factory=set)
+    last_run: float = 0.0
+    runs: int = 0
+    coalesced: int = 0
+    errors: int = 0
+    last_duration_ms: float = 0.0
+
+class EngineScheduler:
+    """
+    Single-thread event loop replacing fixed-sleep polling
+
+    Every poll_interval it reads cheap change signals (symbol_info_tick, positions_total,
+    orders_total). Changed inputs are queued on the handlers that subscribe to them;
+    a handler runs once its min_interval has passed, so a burst of ticks becomes one run.
+    Handlers run on the scheduler thread one at a time, never concurrently.
+    signal_source: optional () -> (tick key, positions key, orders key) replacing the MT5 reads,
+    e.g. MarketDataService.signals(symbol) when many engines share one terminal; its keys
+    include the highest ticket so a close + fill in one poll still raises POSITIONS.
+    Counts alone can miss that case, so timer handlers should also resync periodically.
+    """
+
+    def __init__(self, symbol: str, poll_interval: float = 0.1, min_reaction_seconds: float = 0.5,
+                 is_running: Callable[[], bool] = None, signal_source: Callable[[], Tuple] = None):
+        self.symbol = symbol
+        self.poll_interval = poll_interval
+        self.min_reaction_seconds = min_reaction_seconds
+        self.is_running = is_running or (lambda: True)
+        self.signal_source = signal_source
+
+        self.handlers: List[EngineHandler] = []
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.last_tick_key = None
+        self.last_positions_total = None
+        self.last_orders_total = None
+        self.events_seen = {event: 0 for event in EngineEvent}
+        self.started_at = None
+
+    @classmethod
+    def from_config(cls, symbol: str, config: Dict, is_running: Callable[[], bool] = None,
+                    signal_source: Callable[[], Tuple] = None) -> 'EngineScheduler':
+        scheduler_config = (config or {}).get('engine_scheduler', {})
+        return cls(symbol,
+                   poll_interval=scheduler_config.get('poll_interval', 0.1),
+                   min_reaction_seconds=scheduler_config.get('min_reaction_seconds', 0.5),
+                   is_running=is_running,
+                   signal_source=signal_source)
+
+    def register(self, name: str, callback: Callable[[Set[EngineEvent]], None], triggers=(),
+                 min_interval: float = None, timer_interval: float = None) -> EngineHandler:
+        """ลงทะเบียน handler - triggers = events ที่ทำให้ handler นี้ต้องรัน"""
+        triggers = set(triggers)
+        if timer_interval:
+            triggers.add(EngineEvent.TIMER)
+        handler = EngineHandler(
+            name=name,
+            callback=callback,
+            triggers=triggers,
+            min_interval=self.min_reaction_seconds if min_interval is None else min_interval,
+            timer_interval=timer_interval,
+        )
+        self.handlers.append(handler)
+        return handler
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True, name="engine-scheduler")
+        self.thread.start()
+        log.info(f"⚡ Engine Scheduler started: {len(self.handlers)} handlers, poll {self.poll_interval}s, "
+                 f"min reaction {self.min_reaction_seconds}s")
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def run(self):
+        """Scheduler loop"""
+        log.info("⚡ Event-driven engine active...")
+
+        # รอบแรก: ให้ทุก handler รันหนึ่งครั้ง
+        for handler in self.handlers:
+            handler.pending.update(handler.triggers)
+
+        while not self.stop_event.is_set() and self.is_running():
+            try:
+                events = self.detect_changes()
+                self.queue_events(events)
+                self.dispatch()
+            except Exception as e:
+                log.error(f"❌ Engine scheduler error: {e}")
+            self.stop_event.wait(self.poll_interval)
+
+        log.info("🛑 Engine scheduler stopped")
+
+    def detect_changes(self) -> Set[EngineEvent]:
+        """อ่านสัญญาณการเปลี่ยนแปลงราคาถูก (ไม่ดึง position list เต็ม)"""
+        events = set()
+
+        if self.signal_source:
+            tick_key, positions_total, orders_total = self.signal_source()
+        else:
+            tick = mt5.symbol_info_tick(self.symbol)
+            tick_key = (getattr(tick, 'time_msc', tick.time), tick.bid, tick.ask) if tick else None
+            positions_total = mt5.positions_total()
+            orders_total = mt5.orders_total()
+
+        if tick_key is not None and tick_key != self.last_tick_key:
+            self.last_tick_key = tick_key
+            events.add(EngineEvent.TICK)
+
+        if positions_total is not None and positions_total != self.last_positions_total:
+            if self.last_positions_total is not None:
+                events.add(EngineEvent.POSITIONS)
+            self.last_positions_total = positions_total
+
+        if orders_total is not None and orders_total != self.last_orders_total:
+            if self.last_orders_total is not None:
+                events.add(EngineEvent.ORDERS)
+            self.last_orders_total = orders_total
+
+        for event in events:
+            self.events_seen[event] += 1
+        return events
+
+    def queue_events(self, events: Set[EngineEvent]):
+        now = time.monotonic()
+        for handler in self.handlers:
+            matched = events & handler.triggers
+            if handler.timer_interval and now - handler.last_run >= handler.timer_interval:
+                matched.add(EngineEvent.TIMER)
+            if matched:
+                if handler.pending:
+                    handler.coalesced += 1
+                handler.pending.update(matched)
+
+    def dispatch(self):
+        """รัน handler ที่มี event ค้างและพ้น min_interval แล้ว"""
+        for handler in self.handlers:
+            if not handler.pending or self.stop_event.is_set():
+                continue
+            now = time.monotonic()
+            if now - handler.last_run < handler.min_interval:
+                continue
+
+            events = handler.pending
+            handler.pending = set()
+            handler.last_run = now
+            try:
+                handler.callback(events)
+            except Exception as e:
+                handler.errors += 1
+                log.error(f"❌ Engine handler {handler.name} error: {e}")
+            handler.runs += 1
+            handler.last_duration_ms = (time.monotonic() - now) * 1000
+
+    def get_stats(self) -> Dict:
+        """สถิติของ scheduler สำหรับ GUI / debug"""
+        return {
+            'running': self.is_alive(),
+            'uptime_seconds': round(time.monotonic() - self.started_at, 1) if self.started_at else 0,
+            'events_seen': {event.value: count for event, count in self.events_seen.items()},
+            'handlers': {
+                h.name: {
+                    'runs': h.runs,
+                    'coalesced': h.coalesced,
+                    'errors': h.errors,
+                    'last_duration_ms': round(h.last_duration_ms, 2),
+                } for h in self.handlers
+            },
+        }
+
+# Test function for standalone usage
+def test_engine_scheduler():
+    """Test engine scheduler (ต้องเชื่อมต่อ MT5)"""
+    print("🧪 Testing Engine Scheduler...")
+
+    if not mt5.initialize():
+        print("❌ MT5 not available - skip")
+        return
+
+    scheduler = EngineScheduler("XAUUSD", poll_interval=0.05, min_reaction_seconds=0.5)
+    scheduler.register("tick_printer", lambda events: print(f"   {datetime.now():%H:%M:%S.%f} {sorted(e.value for e in events)}"),
+                       triggers={EngineEvent.TICK, EngineEvent.POSITIONS})
+    scheduler.register("heartbeat", lambda events: print("   ⏱️ timer"), timer_interval=2.0)
+    scheduler.start()
+    time.sleep(5)
+    scheduler.stop()
+    print(f"   Stats: {scheduler.get_stats()}")
+
+    print("✅ Engine Scheduler Test Completed")
+
+if __name__ == "__main__":
+    test_engine_scheduler()
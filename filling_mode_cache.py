@@ -0,0 +1,235 @@
+"""
+Filling Mode Cache - Learned Order Filling Modes per Broker/Symbol
+filling_mode_cache.py
+Probes symbol_info().filling_mode once, remembers which mode actually worked
+for each action type and persists it per (server, symbol)
+"""
+
+import json
+import os
+import threading
+import MetaTrader5 as mt5
+from datetime import datetime
+from typing import Dict, List, Optional
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+ACTION_TYPES = ("MARKET", "PENDING", "CLOSE")
+AUTO = "AUTO"   # ไม่ระบุ type_filling (ให้ MT5 เลือก)
+
+class FillingModeCache:
+    """
+    Ordered filling-mode candidates per action type
+
+    - ordered_modes(action): learned mode first, then the modes the symbol allows
+    - record_success / record_failure: learn from order_send results
+    - learned modes are saved to a JSON file keyed by "server|symbol" so the
+      first order after a restart already uses the right mode
+    """
+
+    _file_locks: Dict[str, threading.Lock] = {}   # ไฟล์เดียวใช้ร่วมหลาย instance (multi-symbol)
+    _file_locks_lock = threading.Lock()
+
+    FILLING_ERRORS = (10030,)   # TRADE_RETCODE_INVALID_FILL (10018 = market closed ไม่เกี่ยวกับ mode)
+
+    def __init__(self, server: str, symbol: str, cache_file: str = "filling_mode_cache.json"):
+        self.server = server or "UNKNOWN"
+        self.symbol = symbol
+        self.cache_file = cache_file
+        self.key = f"{self.server}|{self.symbol}"
+        self.lock = threading.Lock()
+
+        self.learned: Dict[str, Optional[int]] = {}
+        self.candidates: Dict[str, List[Optional[int]]] = {}
+        self.symbol_filling_flags = None
+
+        self.load()
+        self.probe_symbol()
+
+    @classmethod
+    def file_lock(cls, cache_file: str) -> threading.Lock:
+        """Lock เดียวต่อ path ของไฟล์ - read-modify-write ของทุก symbol ไม่ทับกัน"""
+        path = os.path.abspath(cache_file)
+        with cls._file_locks_lock:
+            lock = cls._file_locks.get(path)
+            if lock is None:
+                lock = cls._file_locks[path] = threading.Lock()
+            return lock
+
+    @classmethod
+    def from_config(cls, symbol: str, config: Dict) -> 'FillingModeCache':
+        cache_file = (config or {}).get('filling_mode_cache', {}).get('file', 'filling_mode_cache.json')
+        account_info = mt5.account_info()
+        server = account_info.server if account_info else None
+        return cls(server, symbol, cache_file)
+
+    # ----- Persistence -----
+
+    def load(self):
+        """โหลด modes ที่เคยเรียนรู้ของ server/symbol นี้"""
+        try:
+            with self.file_lock(self.cache_file):
+                if not os.path.exists(self.cache_file):
+                    return
+                with open(self.cache_file, 'r') as f:
+                    entry = json.load(f).get(self.key, {})
+            for action in ACTION_TYPES:
+                if action in entry.get('modes', {}):
+                    self.learned[action] = self._decode(entry['modes'][action])
+            if self.learned:
+                log.info(f"📂 Filling modes loaded for {self.key}: {self.describe()}")
+        except Exception as e:
+            log.warning(f"⚠️ Filling mode cache load error: {e}")
+
+    def save(self):
+        """บันทึกลงไฟล์ (lock ต่อไฟล์ + เขียนไฟล์ชั่วคราวชื่อไม่ซ้ำแล้ว replace)"""
+        try:
+            with self.file_lock(self.cache_file):
+                data = {}
+                if os.path.exists(self.cache_file):
+                    with open(self.cache_file, 'r') as f:
+                        data = json.load(f)
+
+                data[self.key] = {
+                    'modes': {action: self._encode(mode) for action, mode in self.learned.items()},
+                    'symbol_filling_flags': self.symbol_filling_flags,
+                    'updated': datetime.now().isoformat()
+                }
+
+                temp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_file, 'w') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            log.warning(f"⚠️ Filling mode cache save error: {e}")
+
+    @staticmethod
+    def _encode(mode: Optional[int]):
+        return AUTO if mode is None else int(mode)
+
+    @staticmethod
+    def _decode(value) -> Optional[int]:
+        return None if value in (AUTO, None) else int(value)
+
+    # ----- Probe -----
+
+    def probe_symbol(self):
+        """อ่าน symbol_info().filling_mode ครั้งเดียว แล้วจัดลำดับ modes ที่ broker อนุญาต"""
+        try:
+            info = mt5.symbol_info(self.symbol)
+            self.symbol_filling_flags = int(info.filling_mode) if info else None
+        except Exception as e:
+            log.warning(f"⚠️ Filling mode probe error: {e}")
+            self.symbol_filling_flags = None
+
+        flags = self.symbol_filling_flags
+        fok_flag = getattr(mt5, 'SYMBOL_FILLING_FOK', 1)
+        ioc_flag = getattr(mt5, 'SYMBOL_FILLING_IOC', 2)
+
+        market_modes = []
+        if flags is not None:
+            if flags & fok_flag:
+                market_modes.append(mt5.ORDER_FILLING_FOK)
+            if flags & ioc_flag:
+                market_modes.append(mt5.ORDER_FILLING_IOC)
+        # RETURN / AUTO เป็นตัวสำรองเสมอ (flags อาจไม่ครบในบาง build)
+        for mode in (mt5.ORDER_FILLING_RETURN, None, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK):
+            if mode not in market_modes:
+                market_modes.append(mode)
+
+        pending_modes = [mt5.ORDER_FILLING_RETURN, None] + [m for m in market_modes if m not in (mt5.ORDER_FILLING_RETURN, None)]
+
+        self.candidates = {
+            "MARKET": market_modes,
+            "CLOSE": list(market_modes),
+            "PENDING": pending_modes,
+        }
+
+    # ----- Lookup / learning -----
+
+    def ordered_modes(self, action: str) -> List[Optional[int]]:
+        """Modes ที่จะลองตามลำดับ - mode ที่เรียนรู้แล้วมาก่อน"""
+        modes = list(self.candidates.get(action, [None]))
+        if action in self.learned:
+            learned = self.learned[action]
+            modes = [learned] + [m for m in modes if m != learned]
+        return modes
+
+    def preferred_mode(self, action: str) -> Optional[int]:
+        """Mode แรกที่ควรใช้ (ใช้กับ request ที่ส่งครั้งเดียว)"""
+        return self.ordered_modes(action)[0]
+
+    def apply(self, request: Dict, action: str) -> Dict:
+        """ใส่ type_filling ที่ควรใช้ลงใน request"""
+        mode = self.preferred_mode(action)
+        if mode is not None:
+            request["type_filling"] = mode
+        else:
+            request.pop("type_filling", None)
+        return request
+
+    def record_success(self, action: str, mode: Optional[int]):
+        """จำ mode ที่ order_send สำเร็จ (บันทึกเมื่อเปลี่ยนเท่านั้น)"""
+        with self.lock:
+            if action in self.learned and self.learned[action] == mode:
+                return
+            self.learned[action] = mode
+            self.save()
+        log.info(f"💾 Filling mode learned: {action} = {self._encode(mode)} ({self.key})")
+
+    def record_failure(self, action: str, mode: Optional[int], retcode: Optional[int]):
+        """ถ้า mode ที่เรียนรู้ไว้โดน reject เพราะ filling ให้ลืมไป"""
+        if retcode not in self.FILLING_ERRORS:
+            return
+        with self.lock:
+            if action in self.learned and self.learned[action] == mode:
+                del self.learned[action]
+                self.save()
+                log.info(f"🗑️ Filling mode forgotten: {action} = {self._encode(mode)} ({self.key})")
+
+    def describe(self) -> str:
+        return ", ".join(f"{action}={self._encode(mode)}" for action, mode in self.learned.items()) or "none learned"
+
+# Test function for standalone usage
+def test_filling_mode_cache():
+    """Learn -> persist -> reload (temp file) + symbol probe ถ้าเชื่อมต่อ MT5 ได้"""
+    import tempfile
+    print("🧪 Testing Filling Mode Cache...")
+
+    cache_file = os.path.join(tempfile.mkdtemp(), "filling_mode_cache.json")
+    cache = FillingModeCache("Test-Server", "XAUUSD", cache_file)
+    print(f"   Fresh CLOSE order: {[cache._encode(m) for m in cache.ordered_modes('CLOSE')]}")
+    cache.record_success("CLOSE", mt5.ORDER_FILLING_IOC)
+    cache.record_success("PENDING", None)
+    cache.record_failure("CLOSE", mt5.ORDER_FILLING_IOC, 10018)   # market closed - ไม่ลืม
+
+    reloaded = FillingModeCache("Test-Server", "XAUUSD", cache_file)
+    print(f"   Reloaded: {reloaded.describe()}")
+    print(f"   CLOSE first = IOC: {reloaded.preferred_mode('CLOSE') == mt5.ORDER_FILLING_IOC} | "
+          f"PENDING first = AUTO: {reloaded.preferred_mode('PENDING') is None}")
+    reloaded.record_failure("CLOSE", mt5.ORDER_FILLING_IOC, 10030)
+    print(f"   After 10030: {FillingModeCache('Test-Server', 'XAUUSD', cache_file).describe()}")
+
+    symbols = [FillingModeCache("Test-Server", f"SYM{i}", cache_file) for i in range(8)]
+    threads = [threading.Thread(target=c.record_success, args=("MARKET", mt5.ORDER_FILLING_FOK)) for c in symbols]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(cache_file, 'r') as f:
+        saved = json.load(f)
+    print(f"   Concurrent saves kept: {sum(1 for key in saved if key.startswith('Test-Server|SYM'))}/8 symbols")
+
+    if mt5.initialize():
+        probed = FillingModeCache.from_config("XAUUSD", {'filling_mode_cache': {'file': cache_file}})
+        print(f"   Symbol flags: {probed.symbol_filling_flags}")
+        for action in ACTION_TYPES:
+            print(f"   {action}: {[probed._encode(m) for m in probed.ordered_modes(action)]}")
+    else:
+        print("   MT5 not available - symbol probe skipped")
+
+    print("✅ Filling Mode Cache Test Completed")
+
+if __name__ == "__main__":
+    test_filling_mode_cache()
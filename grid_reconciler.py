@@ -0,0 +1,256 @@
+"""
+Grid Reconciler - Desired Ladder vs Live Orders Diff
+grid_reconciler.py
+Builds the desired grid ladder once per cycle as an array of (price, direction, lot),
+diffs it against live orders + open positions with tolerance and emits a minimal
+place / modify / cancel plan for the manager to execute in one batch
+"""
+
+import math
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+BUY, SELL = 1, -1
+DIRECTION_NAMES = {BUY: "BUY", SELL: "SELL"}
+LADDER_DTYPE = np.dtype([('price', 'f8'), ('direction', 'i1'), ('lot', 'f8')])
+
+@dataclass
+class ReconcileSettings:
+    """รูปแบบ ladder + tolerance ของการ match"""
+    enabled: bool = True
+    levels_per_side: int = 5
+    spacing_multiplier: float = 1.5     # ระยะระหว่าง level = grid spacing x ค่านี้ (wide_spacing เดิม)
+    tolerance_ratio: float = 0.3        # match ได้ถ้าห่างไม่เกิน tolerance_ratio * level step
+    min_gap_ratio: float = 0.2          # ไม่วาง / ย้าย order ใหม่ใกล้ราคากว่านี้ (x level step)
+    min_price: float = 100.0
+    use_modify: bool = True             # ย้าย order ส่วนเกินไป level ที่ขาดแทน cancel + place
+    freeze_refresh_seconds: float = 60.0  # อ่าน stops / freeze level ของ symbol ใหม่ทุกกี่วินาที
+    max_actions_per_cycle: int = 20
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'ReconcileSettings':
+        reconcile_config = (config or {}).get('grid_reconciler', {})
+        return cls(**{key: value for key, value in reconcile_config.items() if key in cls.__dataclass_fields__})
+
+@dataclass
+class GridAction:
+    """หนึ่ง action ของ plan - PLACE / MODIFY / CANCEL"""
+    kind: str
+    direction: str
+    price: float
+    lot: float = 0.0
+    order_id: Optional[int] = None
+    from_price: Optional[float] = None
+
+@dataclass
+class ReconcilePlan:
+    """ผลต่างระหว่าง desired ladder กับ orders ที่มีอยู่"""
+    price: float
+    level_step: float
+    desired: np.ndarray
+    cancels: List[GridAction] = field(default_factory=list)
+    modifies: List[GridAction] = field(default_factory=list)
+    places: List[GridAction] = field(default_factory=list)
+    matched: int = 0
+    occupied: int = 0
+    frozen: int = 0
+
+    @property
+    def actions(self) -> List[GridAction]:
+        """ลำดับ execute: cancel ก่อน (คืน slot ให้ broker) -> modify -> place"""
+        return self.cancels + self.modifies + self.places
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.cancels or self.modifies or self.places)
+
+    def summary(self) -> str:
+        return (f"{len(self.desired)} levels | {self.matched} matched, {self.occupied} positions, {self.frozen} frozen | "
+                f"place {len(self.places)}, modify {len(self.modifies)}, cancel {len(self.cancels)}")
+
+class GridReconciler:
+    """
+    Desired-state grid maintenance
+
+    desired_ladder(): levels sit on a fixed price lattice (multiples of the level step),
+    the nearest levels_per_side free lattice points below price are BUY, above are SELL.
+    Lattice points that already hold an open position (filled) are skipped, so as price
+    walks the ladder slides one level at a time instead of following every tick.
+    plan(): greedy nearest matching per direction (one order per level). Unmatched
+    levels become PLACE, unmatched orders become CANCEL - or MODIFY onto a missing
+    level of the same side when use_modify is on. New levels closer than min_gap (or the
+    broker stops level) to price are left for the next cycle (an existing order there is
+    still kept). Orders inside the broker freeze level cannot be touched, so they are
+    never cancelled / moved - they stay until price leaves the freeze zone.
+    """
+
+    def __init__(self, settings: ReconcileSettings = None):
+        self.settings = settings or ReconcileSettings()
+
+    def level_step(self, spacing: float) -> float:
+        return spacing * self.settings.spacing_multiplier
+
+    def desired_ladder(self, price: float, spacing: float, lot: float,
+                       positions: Iterable[Dict] = (), levels_per_side: int = None) -> np.ndarray:
+        """price / spacing เป็นหน่วยราคา ($) -> structured array (price, direction, lot) ใกล้ราคาก่อน"""
+        s = self.settings
+        levels_per_side = levels_per_side or s.levels_per_side
+        step = self.level_step(spacing)
+        tolerance = step * s.tolerance_ratio
+        positions = list(positions)
+        sides = []
+
+        for direction in (BUY, SELL):
+            entries = np.sort([p['price'] for p in positions if p['direction'] == DIRECTION_NAMES[direction]])
+            count = levels_per_side + len(entries)             # เผื่อ lattice points ที่ fill แล้ว
+            offsets = np.arange(count, dtype=float)
+            if direction == BUY:
+                prices = (math.ceil(price / step) - 1 - offsets) * step
+            else:
+                prices = (math.floor(price / step) + 1 + offsets) * step
+            prices = np.round(prices, 8)
+            if len(entries):
+                prices = prices[self._distance_to_nearest(prices, entries) > tolerance]
+            prices = prices[prices > s.min_price][:levels_per_side]
+
+            side = np.empty(len(prices), dtype=LADDER_DTYPE)
+            side['price'] = prices
+            side['direction'] = direction
+            side['lot'] = lot
+            sides.append(side)
+        return np.concatenate(sides)
+
+    def plan(self, price: float, spacing: float, lot: float, orders: Iterable[Dict],
+             positions: Iterable[Dict] = (), stops_distance: float = 0.0,
+             freeze_distance: float = 0.0, desired: np.ndarray = None) -> ReconcilePlan:
+        """
+        orders: [{'order_id', 'price', 'direction', 'lot_size'}] ที่ live อยู่
+        positions: [{'price', 'direction'}] ของ positions ที่เปิดอยู่ (level ที่ fill แล้ว)
+        stops_distance / freeze_distance: trade_stops_level / trade_freeze_level เป็นราคา
+        desired: ladder ที่คำนวณไว้แล้ว (เช่น live window ของ VirtualLadder) - None = desired_ladder()
+        """
+        s = self.settings
+        orders = list(orders)
+        positions = list(positions)
+        step = self.level_step(spacing)
+        if desired is None:
+            desired = self.desired_ladder(price, spacing, lot, positions)
+        tolerance = step * s.tolerance_ratio
+        min_gap = max(step * s.min_gap_ratio, stops_distance)
+        plan = ReconcilePlan(price=price, level_step=step, desired=desired, occupied=len(positions))
+
+        for direction in (BUY, SELL):
+            name = DIRECTION_NAMES[direction]
+            levels = desired['price'][desired['direction'] == direction]
+            live = [order for order in orders if order['direction'] == name]
+            live_prices = np.asarray([order['price'] for order in live], dtype=float)
+
+            level_match, order_match = self._match(levels, live_prices, tolerance)
+            plan.matched += int((level_match >= 0).sum())
+
+            # order ที่ไม่มี level ให้ match (รวมที่ซ้อน level ที่ fill แล้ว) = ส่วนเกิน
+            missing = levels[level_match < 0]
+            ready = np.abs(missing - price) > min_gap
+            deferred = int((~ready).sum())
+            missing = missing[ready]
+            extra = [live[i] for i in np.flatnonzero(order_match < 0)]
+            frozen = [order for order in extra if abs(order['price'] - price) <= freeze_distance]
+            if frozen:
+                plan.frozen += len(frozen)
+                extra = [order for order in extra if abs(order['price'] - price) > freeze_distance]
+
+            # ใกล้ราคาก่อน - ถ้าโดนจำกัด actions จะได้เติม level สำคัญก่อน
+            missing = missing[np.argsort(np.abs(missing - price), kind='stable')]
+            extra.sort(key=lambda order: -abs(order['price'] - price))
+            if deferred:
+                extra = extra[:max(0, len(extra) - deferred)]     # เก็บไว้ย้ายเข้า level ที่ยังใกล้ราคาเกิน
+
+            pairs = min(len(missing), len(extra)) if s.use_modify else 0
+            for target, order in zip(missing[:pairs], extra[:pairs]):
+                plan.modifies.append(GridAction("MODIFY", name, float(target), order.get('lot_size', lot),
+                                                order['order_id'], order['price']))
+            for order in extra[pairs:]:
+                plan.cancels.append(GridAction("CANCEL", name, order['price'], order.get('lot_size', lot),
+                                               order['order_id']))
+            for target in missing[pairs:]:
+                plan.places.append(GridAction("PLACE", name, float(target), lot))
+
+        self._limit(plan)
+        return plan
+
+    def _limit(self, plan: ReconcilePlan):
+        budget = self.settings.max_actions_per_cycle
+        if budget <= 0:
+            return
+        plan.cancels = plan.cancels[:budget]
+        budget -= len(plan.cancels)
+        plan.modifies = plan.modifies[:budget]
+        budget -= len(plan.modifies)
+        plan.places = plan.places[:max(0, budget)]
+
+    @staticmethod
+    def _distance_to_nearest(values: np.ndarray, sorted_refs: np.ndarray) -> np.ndarray:
+        """ระยะจากแต่ละค่าไปยัง reference ที่ใกล้สุด (refs ต้อง sort แล้ว)"""
+        right = np.clip(np.searchsorted(sorted_refs, values), 0, len(sorted_refs) - 1)
+        left = np.clip(right - 1, 0, len(sorted_refs) - 1)
+        return np.minimum(np.abs(values - sorted_refs[left]), np.abs(values - sorted_refs[right]))
+
+    @staticmethod
+    def _match(levels: np.ndarray, live: np.ndarray, tolerance: float):
+        """Greedy one-to-one match ตามระยะใกล้สุด -> (order index ต่อ level, level index ต่อ order), -1 = ไม่มีคู่"""
+        level_match = np.full(len(levels), -1)
+        order_match = np.full(len(live), -1)
+        if len(levels) == 0 or len(live) == 0:
+            return level_match, order_match
+
+        distance = np.abs(levels[:, None] - live[None, :])
+        candidates = np.argwhere(distance <= tolerance)
+        order = np.argsort(distance[candidates[:, 0], candidates[:, 1]], kind='stable')
+        for level_idx, order_idx in candidates[order]:
+            if level_match[level_idx] < 0 and order_match[order_idx] < 0:
+                level_match[level_idx] = order_idx
+                order_match[order_idx] = level_idx
+        return level_match, order_match
+
+# Test function for standalone usage
+def test_grid_reconciler():
+    """Desired ladder vs live orders"""
+    print("🧪 Testing Grid Reconciler...")
+    reconciler = GridReconciler(ReconcileSettings(levels_per_side=5))
+    spacing = 0.90
+
+    empty = reconciler.plan(2000.0, spacing, 0.01, orders=[])
+    print(f"   Empty book: {empty.summary()}")
+
+    orders = [{'order_id': 1000 + i, 'price': a.price, 'direction': a.direction, 'lot_size': a.lot}
+              for i, a in enumerate(empty.places)]
+    steady = reconciler.plan(2000.4, spacing, 0.01, orders)
+    print(f"   Same anchor: {steady.summary()} | empty plan: {steady.is_empty}")
+
+    drifted = reconciler.plan(2003.1, spacing, 0.01, orders)
+    print(f"   Price up 3.1 (2+ levels): {drifted.summary()}")
+    for action in drifted.actions[:4]:
+        moved = f" (from ${action.from_price:.2f})" if action.from_price else ""
+        print(f"      {action.kind} {action.direction} ${action.price:.2f}{moved}")
+
+    filled = [{'price': empty.places[0].price, 'direction': empty.places[0].direction}]
+    with_position = reconciler.plan(empty.places[0].price - 0.1, spacing, 0.01, orders[1:], filled)
+    print(f"   Level 1 filled, price just below it: {with_position.summary()}")
+    for action in with_position.actions:
+        print(f"      {action.kind} {action.direction} ${action.price:.2f}")
+
+    duplicates = orders + [{'order_id': 9999, 'price': orders[0]['price'] + 0.05, 'direction': orders[0]['direction'],
+                            'lot_size': 0.01}]
+    print(f"   Duplicate order: {reconciler.plan(2000.0, spacing, 0.01, duplicates).summary()}")
+
+    frozen = reconciler.plan(2003.1, spacing, 0.01, orders, stops_distance=1.0, freeze_distance=1.5)
+    print(f"   Price up 3.1, freeze 1.5 / stops 1.0: {frozen.summary()}")
+    for action in frozen.actions:
+        moved = f" (from ${action.from_price:.2f})" if action.from_price else ""
+        print(f"      {action.kind} {action.direction} ${action.price:.2f}{moved}")
+
+    print("✅ Grid Reconciler Test Completed")
+
+if __name__ == "__main__":
+    test_grid_reconciler()
@@ -0,0 +1,288 @@
+"""
+Headless Daemon - Run the trading engine without Tkinter
+headless_daemon.py
+connect -> calculate_for_balance -> start_trading from config.json + CLI flags,
+graceful stop on SIGINT / SIGTERM, status written to a JSON file and commands read
+from a control file (the GUI / any tool can be a client of those two files)
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+# ห้าม import tkinter / MetaTrader5 / engine modules ที่ระดับ module - --emulator ต้อง install ก่อน
+from engine_logger import get_logger, setup_engine_logging, shutdown_engine_logging
+
+log = get_logger(__name__)
+
+EXIT_OK, EXIT_CONNECT, EXIT_START = 0, 2, 3
+
+@dataclass
+class DaemonSettings:
+    status_file: str = "engine_status.json"
+    status_interval: float = 5.0               # เขียน status ทุกกี่วินาที
+    control_file: str = "engine_control.json"  # {"command": "stop" | "trigger_recovery"} / {"recovery_auto_mode": bool}
+    trading_mode: str = ""                     # ว่าง = default_trading_mode ของ config
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'DaemonSettings':
+        daemon_config = (config or {}).get('headless', {})
+        return cls(**{key: value for key, value in daemon_config.items() if key in cls.__dataclass_fields__})
+
+class HeadlessDaemon:
+    """
+    Single-account engine process, no display needed
+
+    start(): MT5AutoConnector.auto_connect (terminal / login from flags), survivability
+    from SurvivabilityEngine.calculate_for_balance in the configured trading mode, then
+    SmartProfitManager (or MultiSymbolEngine when multi_symbol.enabled).start_trading.
+    run(): blocks on stop_event, writing status_file (atomic) every status_interval and
+    applying the control file when its mtime changes. An emergency stop is reported in
+    the status and the process stays up - it is not restarted by the daemon.
+    """
+
+    def __init__(self, config: Dict, settings: DaemonSettings = None, terminal: Dict = None):
+        self.config = config
+        self.settings = settings or DaemonSettings.from_config(config)
+        self.terminal = {key: value for key, value in (terminal or {}).items() if value}
+        self.stop_event = threading.Event()
+        self.connector = None
+        self.engine = None
+        self.calculations: Dict = {}
+        self.state = "starting"
+        self.started = datetime.now()
+        self.last_error: Optional[str] = None
+        self.control_mtime = None
+
+    # ----- Lifecycle -----
+
+    def start(self) -> int:
+        from mt5_auto_connector import MT5AutoConnector
+        from survivability_engine import SurvivabilityEngine, TradingMode
+
+        self.control_mtime = self.file_mtime(self.settings.control_file)   # คำสั่งเก่าค้างไฟล์ = ไม่ใช้
+        self.connector = MT5AutoConnector()
+        if not self.connector.auto_connect(**self.terminal):
+            return self.fail(EXIT_CONNECT, "MT5 connection failed")
+
+        account_info = self.connector.get_account_info() or {}
+        balance = account_info.get('balance', 0)
+        mode_name = (self.settings.trading_mode or self.config.get('default_trading_mode', 'BALANCED')).upper()
+        trading_mode = TradingMode.__members__.get(mode_name, TradingMode.BALANCED)
+        log.info(f"📊 Account {account_info.get('login')} | Balance ${balance:,.2f} | Mode {trading_mode.value}")
+
+        try:
+            results = SurvivabilityEngine(self.config).calculate_for_balance(balance, trading_mode=trading_mode)
+        except Exception as e:
+            return self.fail(EXIT_START, f"Survivability calculation error: {e}")
+        if not results or not results.get('target_met', False):
+            return self.fail(EXIT_START, "Survivability target not met for this balance")
+        self.calculations = results
+        log.info(f"🛡️ Base lot {results['base_lot']} | Spacing {results['grid_spacing']} | "
+                 f"Levels {results['max_levels']} | Survivability {results['realistic_survivability']:,} points")
+
+        if self.config.get('multi_symbol', {}).get('enabled', False):
+            from multi_symbol_engine import MultiSymbolEngine as engine_class
+        else:
+            from smart_profit_manager import SmartProfitManager as engine_class
+        self.engine = engine_class(self.connector, results, self.config)
+        if not self.engine.start_trading():
+            return self.fail(EXIT_START, "Engine start failed")
+
+        self.state = "trading"
+        log.info("🚀 Headless trading started")
+        self.write_status()
+        return EXIT_OK
+
+    def run(self) -> int:
+        """start() + status / control loop until stop_event"""
+        code = self.start()
+        if code != EXIT_OK:
+            self.stop()
+            return code
+        try:
+            while not self.stop_event.wait(self.settings.status_interval):
+                self.poll_control()
+                if self.state == "trading" and self.engine.emergency_stop_triggered:
+                    self.state = "emergency_stop"
+                    log.error("🚨 Emergency stop triggered - engine halted, daemon stays up for status")
+                self.write_status()
+        finally:
+            self.stop()
+        return EXIT_OK
+
+    def request_stop(self, *args):
+        self.stop_event.set()
+
+    def stop(self):
+        log.info("🛑 Stopping headless daemon...")
+        if self.engine is not None:
+            try:
+                self.engine.stop_trading()
+            except Exception as e:
+                log.error(f"❌ Stop trading error: {e}")
+        if self.connector is not None:
+            self.connector.disconnect()
+        if self.state != "failed":
+            self.state = "stopped"
+        self.write_status()
+
+    def fail(self, code: int, message: str) -> int:
+        log.error(f"❌ {message}")
+        self.state = "failed"
+        self.last_error = message
+        self.write_status()
+        return code
+
+    # ----- Control file -----
+
+    @staticmethod
+    def file_mtime(path: str) -> Optional[float]:
+        return os.path.getmtime(path) if path and os.path.exists(path) else None
+
+    def poll_control(self):
+        """อ่าน control file เมื่อมีการแก้ - stop / trigger_recovery / recovery_auto_mode"""
+        path = self.settings.control_file
+        try:
+            mtime = self.file_mtime(path)
+            if mtime is None or mtime == self.control_mtime:
+                return
+            self.control_mtime = mtime
+            with open(path, 'r') as f:
+                control = json.load(f)
+            command = control.get('command')
+            if 'recovery_auto_mode' in control:
+                self.engine.recovery_auto_mode = bool(control['recovery_auto_mode'])
+                log.info(f"💊 Auto Recovery: {'ENABLED' if control['recovery_auto_mode'] else 'DISABLED'}")
+            if command == "trigger_recovery":
+                log.info(f"💊 Manual recovery: {self.engine.manual_trigger_recovery()}")
+            elif command == "stop":
+                log.info("🛑 Stop requested by control file")
+                self.stop_event.set()
+            elif command:
+                log.warning(f"⚠️ Unknown control command: {command}")
+        except Exception as e:
+            log.warning(f"⚠️ Control file error: {e}")
+
+    # ----- Status -----
+
+    def status(self) -> Dict:
+        status = {
+            'state': self.state,
+            'pid': os.getpid(),
+            'started': self.started.isoformat(),
+            'updated': datetime.now().isoformat(),
+            'last_error': self.last_error,
+            'survivability': {key: self.calculations.get(key) for key in
+                              ('trading_mode', 'base_lot', 'grid_spacing', 'max_levels', 'realistic_survivability')},
+        }
+        if self.engine is not None:
+            status['engine'] = self.engine.get_grid_status()
+        return status
+
+    def write_status(self) -> bool:
+        path = self.settings.status_file
+        if not path:
+            return False
+        try:
+            temp_file = f"{path}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(self.status(), f, indent=2, default=str)
+            os.replace(temp_file, path)
+            return True
+        except Exception as e:
+            log.warning(f"⚠️ Status write error: {e}")
+            return False
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run the grid engine headless (no GUI)")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--terminal", help="terminal64.exe path (default: auto detect)")
+    parser.add_argument("--login", type=int)
+    parser.add_argument("--password")
+    parser.add_argument("--server")
+    parser.add_argument("--mode", help="trading mode: SAFE / BALANCED / AGGRESSIVE / TURBO")
+    parser.add_argument("--status-file")
+    parser.add_argument("--control-file")
+    parser.add_argument("--status-interval", type=float)
+    parser.add_argument("--emulator", action="store_true", help="run against mt5_emulator (config mt5_emulator)")
+    parser.add_argument("--test", action="store_true", help="self-test against mt5_emulator")
+    return parser
+
+def main(argv=None) -> int:
+    options = build_parser().parse_args(argv)
+    if options.test:
+        test_headless_daemon()
+        return EXIT_OK
+
+    with open(options.config, 'r') as f:
+        config = json.load(f)
+    setup_engine_logging(config)
+    if options.emulator:
+        import mt5_emulator
+        emulator_config = dict(config.get('mt5_emulator', {}))
+        if options.login:
+            emulator_config['login'] = options.login
+        mt5_emulator.install(mt5_emulator.configure({'mt5_emulator': emulator_config}))
+
+    settings = DaemonSettings.from_config(config)
+    for name, value in (('status_file', options.status_file), ('control_file', options.control_file),
+                        ('status_interval', options.status_interval), ('trading_mode', options.mode)):
+        if value is not None:
+            setattr(settings, name, value)
+    daemon = HeadlessDaemon(config, settings, terminal={'path': options.terminal, 'login': options.login,
+                                                        'password': options.password, 'server': options.server})
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), daemon.request_stop)
+    try:
+        return daemon.run()
+    finally:
+        shutdown_engine_logging()
+
+# Test function for standalone usage
+def test_headless_daemon():
+    """Emulator: start -> status file -> control file (recovery off, stop)"""
+    import tempfile
+    import mt5_emulator
+    print("🧪 Testing Headless Daemon...")
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json"), 'r') as f:
+        config = json.load(f)
+    config['cycle_profiler'] = dict(config.get('cycle_profiler', {}), control_file="")
+    os.chdir(tempfile.mkdtemp())     # grid state / dumps ของ engine ไม่ลง repo
+    setup_engine_logging(config)
+    mt5_emulator.install(mt5_emulator.configure({'mt5_emulator': {'balance': 10000.0, 'seed': 7}}))
+
+    daemon = HeadlessDaemon(config, DaemonSettings(status_interval=1.0))
+
+    def send(control, delay):
+        time.sleep(delay)
+        with open(daemon.settings.control_file, 'w') as f:
+            json.dump(control, f)
+
+    def script():
+        send({'recovery_auto_mode': False}, 8)
+        send({'command': "stop"}, 3)
+
+    threading.Thread(target=script, daemon=True).start()
+    code = daemon.run()
+
+    with open(daemon.settings.status_file, 'r') as f:
+        status = json.load(f)
+    engine = status['engine']
+    print(f"   Exit code {code} | state {status['state']} | survivability {status['survivability']}")
+    print(f"   Engine: positions {engine['active_positions']} pending {engine['pending_orders']} "
+          f"pnl {engine['total_pnl']} | hedge_positions {engine['smart_profit_status'].get('hedge_positions')}")
+    print(f"   Recovery auto mode: {engine['recovery_system'].get('auto_mode')}")
+    shutdown_engine_logging()
+    print("✅ Headless Daemon Test Completed")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ UPDATED VERSION - Using Smart Profit Manager as primary trading engine
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
+import multiprocessing
 import threading
 import time
 from datetime import datetime, timezone
@@ -18,11 +19,13 @@ import sys
 import requests
 
 from api_connector import BackendAPIConnector
+from engine_logger import setup_engine_logging, shutdown_engine_logging
 
 # Import custom modules
 try:
     from mt5_auto_connector import MT5AutoConnector
     from smart_profit_manager import SmartProfitManager
+    from multi_symbol_engine import MultiSymbolEngine
     from survivability_engine import SurvivabilityEngine, TradingMode
     from ai_money_manager import AIMoneyManager
     from gold_hedge_calculator import GoldHedgeCalculator
@@ -101,6 +104,12 @@ class AISmartProfitGUI:
             
         self.config = default_config
 
+        # Engine logging (queue + background writer) ตาม log_level / logging ใน config
+        try:
+            setup_engine_logging(self.config)
+        except Exception as e:
+            print(f"Logging setup error: {e}")
+
     def save_config(self):
         """Save current configuration"""
         try:
@@ -643,8 +652,10 @@ class AISmartProfitGUI:
         try:
             self.log_message("🧠 Starting AI Smart Profit Trading System...", "INFO")
             
-            # Initialize Smart Profit Manager
-            self.smart_profit_trader = SmartProfitManager(
+            # Initialize Smart Profit Manager (multi_symbol.enabled = หลาย symbol บน terminal เดียว)
+            engine_class = MultiSymbolEngine if self.config.get('multi_symbol', {}).get('enabled', False) \
+                else SmartProfitManager
+            self.smart_profit_trader = engine_class(
                 self.mt5_connector,
                 self.current_calculations,
                 self.config
@@ -969,6 +980,9 @@ class AISmartProfitGUI:
             # Final log
             self.log_message("👋 AI Smart Profit Trading System Closed Safely", "INFO")
             
+            # Flush engine logs
+            shutdown_engine_logging()
+            
             self.root.destroy()
             
         except Exception as e:
@@ -989,6 +1003,11 @@ class AISmartProfitGUI:
 
 def main():
     """Main entry point"""
+    if '--headless' in sys.argv:
+        # ไม่มี GUI - ใช้ headless_daemon (flags อื่นส่งต่อให้ daemon)
+        from headless_daemon import main as headless_main
+        sys.exit(headless_main([arg for arg in sys.argv[1:] if arg != '--headless']))
+
     try:
         if not getattr(sys, 'frozen', False):
             # Check if required files exist
@@ -1021,4 +1040,5 @@ def main():
         input("Press Enter to exit...")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()   # process pool ของ monte_carlo_engine ใน exe
     main()
@@ -0,0 +1,246 @@
+"""
+Market Data Service - One terminal read path for many symbols
+market_data_service.py
+Fetches all positions, all orders, account figures and every registered symbol's tick
+in one pass, publishes an immutable MarketSnapshot and fans it out per symbol to the
+grid engines sharing the terminal connection
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import MetaTrader5 as mt5
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+@dataclass
+class MarketDataSettings:
+    poll_interval: float = 0.1       # tick / totals poll (วินาที)
+    max_age_seconds: float = 1.0     # positions / orders เก่ากว่านี้ = ดึงใหม่ทั้ง terminal
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'MarketDataSettings':
+        data_config = (config or {}).get('multi_symbol', {}).get('market_data', {})
+        return cls(**{key: value for key, value in data_config.items() if key in cls.__dataclass_fields__})
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Terminal-wide view - positions / orders จัดกลุ่มตาม symbol แล้ว"""
+    version: int
+    created_at: float                                   # time.monotonic()
+    positions_by_symbol: Dict[str, Tuple] = field(default_factory=dict)
+    orders_by_symbol: Dict[str, Tuple] = field(default_factory=dict)
+    ticks: Dict[str, object] = field(default_factory=dict)
+    account: Dict = field(default_factory=dict)
+    positions_total: int = 0
+    orders_total: int = 0
+
+    def positions(self, symbol: str) -> Tuple:
+        return self.positions_by_symbol.get(symbol, ())
+
+    def orders(self, symbol: str) -> Tuple:
+        return self.orders_by_symbol.get(symbol, ())
+
+    def tick(self, symbol: str):
+        return self.ticks.get(symbol)
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.created_at
+
+def _group_by_symbol(records: Iterable) -> Dict[str, Tuple]:
+    grouped: Dict[str, List] = {}
+    for record in records:
+        grouped.setdefault(record.symbol, []).append(record)
+    return {symbol: tuple(items) for symbol, items in grouped.items()}
+
+class MarketDataService:
+    """
+    Shared market data for every engine on one terminal connection
+
+    refresh(): positions_get() + orders_get() without a symbol filter, account_info and
+    one symbol_info_tick per registered symbol (MT5 has no batch tick call), published
+    as one MarketSnapshot. current(): the published snapshot, refreshed on the caller's
+    thread when it is older than max_age or was invalidated by an order_send.
+    poll(): the service thread's cheap pass - ticks + positions_total / orders_total;
+    a full refresh only when a total changed. signals(symbol) gives each engine's
+    EngineScheduler its change signals from the snapshot, so N engines cost one poll.
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), settings: MarketDataSettings = None,
+                 account_provider: Callable[[], Optional[Dict]] = None):
+        self.settings = settings or MarketDataSettings()
+        self.symbols: List[str] = []
+        self.account_provider = account_provider
+        self.refresh_lock = threading.Lock()
+        self.snapshot = MarketSnapshot(version=0, created_at=float('-inf'))
+        self.stale = True
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'refreshes': 0, 'polls': 0, 'tick_reads': 0, 'failed': 0}
+        for symbol in symbols:
+            self.add_symbol(symbol)
+
+    def add_symbol(self, symbol: str):
+        if symbol and symbol not in self.symbols:
+            self.symbols.append(symbol)
+            self.stale = True
+
+    # ----- Read path -----
+
+    def current(self, max_age: float = None) -> MarketSnapshot:
+        """Snapshot ล่าสุด - ดึงใหม่ถ้าเก่าเกิน max_age หรือถูก invalidate"""
+        max_age = self.settings.max_age_seconds if max_age is None else max_age
+        snapshot = self.snapshot
+        if not self.stale and snapshot.age_seconds() <= max_age:
+            return snapshot
+        with self.refresh_lock:
+            snapshot = self.snapshot
+            if not self.stale and snapshot.age_seconds() <= max_age:
+                return snapshot     # thread อื่น refresh ให้แล้ว
+            return self._refresh()
+
+    def refresh(self) -> MarketSnapshot:
+        with self.refresh_lock:
+            return self._refresh()
+
+    def invalidate(self):
+        """เรียกหลัง order_send - การอ่านครั้งถัดไปดึงใหม่ทั้ง terminal"""
+        self.stale = True
+
+    def _refresh(self) -> MarketSnapshot:
+        self.stale = False
+        try:
+            positions = mt5.positions_get()
+            orders = mt5.orders_get()
+            if positions is None or orders is None:
+                # อ่านไม่ได้ - ใช้ชุดเดิม ไม่ publish ว่า "ไม่มี positions"
+                self.stats['failed'] += 1
+                log.warning(f"⚠️ Market data refresh failed: {mt5.last_error()}")
+                self.stale = True
+                return self.snapshot
+
+            account = (self.account_provider() if self.account_provider else None) or self.snapshot.account
+            snapshot = MarketSnapshot(
+                version=self.snapshot.version + 1,
+                created_at=time.monotonic(),
+                positions_by_symbol=_group_by_symbol(positions),
+                orders_by_symbol=_group_by_symbol(orders),
+                ticks=self._read_ticks(),
+                account=dict(account),
+                positions_total=len(positions),
+                orders_total=len(orders),
+            )
+            self.snapshot = snapshot
+            self.stats['refreshes'] += 1
+            return snapshot
+
+        except Exception as e:
+            log.error(f"❌ Market data refresh error: {e}")
+            self.stats['failed'] += 1
+            self.stale = True
+            return self.snapshot
+
+    def _read_ticks(self) -> Dict[str, object]:
+        ticks = dict(self.snapshot.ticks)
+        for symbol in self.symbols:
+            tick = mt5.symbol_info_tick(symbol)
+            if tick:
+                ticks[symbol] = tick
+        self.stats['tick_reads'] += len(self.symbols)
+        return ticks
+
+    def poll(self):
+        """Ticks + totals - full refresh เมื่อ totals เปลี่ยน / invalidate / หมดอายุ"""
+        self.stats['polls'] += 1
+        snapshot = self.snapshot
+        positions_total = mt5.positions_total()
+        orders_total = mt5.orders_total()
+        if (self.stale or snapshot.age_seconds() > self.settings.max_age_seconds
+                or positions_total != snapshot.positions_total or orders_total != snapshot.orders_total):
+            self.refresh()
+            return
+        with self.refresh_lock:
+            if self.snapshot is snapshot:
+                self.snapshot = replace(snapshot, ticks=self._read_ticks())
+
+    def signals(self, symbol: str) -> Tuple:
+        """
+        (tick key, positions key, orders key) ของ symbol - สำหรับ EngineScheduler.detect_changes
+
+        key = (จำนวน, ticket สูงสุด): ticket ใหม่สูงกว่าเดิมเสมอ จึงจับ close + fill ใน poll เดียวกันได้
+        """
+        snapshot = self.snapshot
+        tick = snapshot.tick(symbol)
+        tick_key = (getattr(tick, 'time_msc', tick.time), tick.bid, tick.ask) if tick else None
+        positions = snapshot.positions(symbol)
+        orders = snapshot.orders(symbol)
+        return (tick_key,
+                (len(positions), max((p.ticket for p in positions), default=0)),
+                (len(orders), max((o.ticket for o in orders), default=0)))
+
+    # ----- Service thread -----
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.refresh()
+        self.thread = threading.Thread(target=self.run, daemon=True, name="market-data")
+        self.thread.start()
+        log.info(f"📡 Market data service started: {', '.join(self.symbols)} "
+                 f"(poll {self.settings.poll_interval}s, max age {self.settings.max_age_seconds}s)")
+
+    def stop(self, timeout: float = 2.0):
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"❌ Market data poll error: {e}")
+            self.stop_event.wait(self.settings.poll_interval)
+
+    def get_stats(self) -> Dict:
+        snapshot = self.snapshot
+        return dict(self.stats,
+                    symbols=list(self.symbols),
+                    running=self.is_alive(),
+                    snapshot_version=snapshot.version,
+                    snapshot_age_seconds=round(snapshot.age_seconds(), 3) if snapshot.version else None,
+                    positions_total=snapshot.positions_total,
+                    orders_total=snapshot.orders_total)
+
+# Test function for standalone usage
+def test_market_data_service():
+    """Emulator 2 symbols: refresh ครั้งเดียว -> fan out ตาม symbol"""
+    print("🧪 Testing Market Data Service...")
+    if not mt5.initialize():
+        print("❌ MT5 not available - skip")
+        return
+
+    service = MarketDataService([s.name for s in (mt5.symbols_get() or ())][:2])
+    for symbol in service.symbols:
+        tick = mt5.symbol_info_tick(symbol)
+        mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "volume": 0.01, "type": mt5.ORDER_TYPE_BUY,
+                        "price": tick.ask, "magic": 1, "type_filling": mt5.ORDER_FILLING_IOC})
+    snapshot = service.current()
+    for symbol in service.symbols:
+        print(f"   {symbol}: {len(snapshot.positions(symbol))} positions, bid {snapshot.tick(symbol).bid}")
+    service.current()
+    service.invalidate()
+    service.current()
+    print(f"   Stats: {service.get_stats()}")
+    print("✅ Market Data Service Test Completed")
+
+if __name__ == "__main__":
+    test_market_data_service()
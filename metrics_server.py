@@ -0,0 +1,268 @@
+"""
+Metrics Server - Prometheus text endpoint for the engine
+metrics_server.py
+Optional in-process HTTP server (localhost by default) serving /metrics. Every scrape
+reads what the managers already hold (last portfolio snapshot, state store, order
+metrics, dispatcher, profiler) - no MT5 calls, so scraping adds no terminal load
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+@dataclass
+class MetricsServerSettings:
+    enabled: bool = False
+    host: str = "127.0.0.1"        # localhost เท่านั้น - เปิดออกนอกเครื่องต้องตั้งเอง
+    port: int = 9108
+    namespace: str = "grid"
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'MetricsServerSettings':
+        server_config = (config or {}).get('metrics_server', {})
+        return cls(**{key: value for key, value in server_config.items() if key in cls.__dataclass_fields__})
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsWriter:
+    """สร้าง Prometheus text exposition - HELP / TYPE ครั้งเดียวต่อ metric"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.families: Dict[str, Dict] = {}
+
+    def add(self, name: str, value, labels: Dict = None, kind: str = "gauge", help_text: str = ""):
+        if value is None:
+            return
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        family = self.families.setdefault(full_name, {'kind': kind, 'help': help_text, 'samples': []})
+        family['samples'].append((labels or {}, float(value)))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, family in self.families.items():
+            if family['help']:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for labels, value in family['samples']:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value!r}" if label_text else f"{name} {value!r}")
+        return "\n".join(lines) + "\n"
+
+def collect_manager_metrics(manager, writer: MetricsWriter):
+    """อ่าน state ที่ SmartProfitManager มีอยู่แล้ว -> metrics (ห้ามเรียก MT5 ที่นี่)"""
+    base = {'symbol': manager.gold_symbol, 'magic': manager.magic_number}
+
+    def labels(**extra):
+        return dict(base, **extra)
+
+    writer.add("trading_active", int(bool(manager.trading_active)), labels(), help_text="1 while the engine is trading")
+    writer.add("emergency_stop", int(bool(manager.emergency_stop_triggered)), labels())
+
+    snapshot = manager.last_portfolio_snapshot
+    if snapshot is not None:
+        writer.add("balance", snapshot.balance, labels(), help_text="Account balance at the last portfolio snapshot")
+        writer.add("equity", snapshot.equity, labels(), help_text="Account equity at the last portfolio snapshot")
+        writer.add("margin", snapshot.margin, labels())
+        writer.add("unrealized_pnl", snapshot.total_pnl, labels(), help_text="Floating PnL of our positions")
+        writer.add("snapshot_age_seconds", snapshot.age_seconds(), labels())
+        for kind, positions in (("grid", snapshot.grid_positions), ("hedge", snapshot.hedge_positions)):
+            for direction in ("BUY", "SELL"):
+                side = [pos for pos in positions if pos.direction == direction]
+                writer.add("positions", len(side), labels(kind=kind, direction=direction), help_text="Open positions")
+                writer.add("position_lots", sum(pos.lot_size for pos in side), labels(kind=kind, direction=direction))
+
+    state = manager.state_store.current
+    for direction in ("BUY", "SELL"):
+        writer.add("pending_orders", state.pending_orders.count(direction), labels(direction=direction),
+                   help_text="Live pending orders")
+    writer.add("state_version", state.version, labels())
+
+    writer.add("realized_pnl", manager.realized_pnl, labels(), help_text="Realized PnL since start")
+    writer.add("trades_opened_total", manager.trades_opened, labels(), "counter")
+    writer.add("trades_closed_total", manager.trades_closed, labels(), "counter")
+    writer.add("drawdown_points", manager.current_drawdown, labels(), help_text="Current drawdown in points")
+    writer.add("max_drawdown_points", manager.max_drawdown_points, labels())
+    writer.add("health_score", manager.ai_health_score, labels(), help_text="AI portfolio health score 0-100")
+    writer.add("recovery_enabled", int(bool(manager.recovery_enabled)), labels())
+    writer.add("recovery_active", int(bool(manager.recovery_active)), labels())
+
+    cycle = manager.ai_cycle_stats
+    writer.add("ai_cycle_seconds_count", cycle['count'], labels(), "counter", "run_ai_cycle calls")
+    writer.add("ai_cycle_seconds_sum", cycle['total_seconds'], labels(), "counter", "run_ai_cycle wall time")
+    writer.add("ai_cycle_last_seconds", cycle['last_seconds'], labels())
+    writer.add("ai_cycle_max_seconds", cycle['max_seconds'], labels())
+
+    if manager.profiler.enabled:
+        for cycle_name, stages in manager.profiler.summary()['stages'].items():
+            for path, row in stages.items():
+                for quantile, key in (("0.5", 'wall_p50_ms'), ("0.99", 'wall_p99_ms'), ("1", 'wall_max_ms')):
+                    writer.add("stage_wall_seconds", row[key] / 1000, labels(cycle=cycle_name, stage=path, quantile=quantile),
+                               help_text="Per-stage wall time from the cycle profiler ring buffer")
+
+    if manager.order_metrics:
+        order_metrics = manager.order_metrics.snapshot()
+        for action, data in order_metrics['actions'].items():
+            for retcode, count in data['retcodes'].items():
+                code, _, result = retcode.partition(" ")
+                writer.add("order_send_total", count, labels(action=action, retcode=code, result=result), "counter",
+                           "order_send calls by action and retcode")
+            latency = data['latency_ms']
+            for quantile, key in (("0.5", 'p50'), ("0.99", 'p99'), ("1", 'max')):
+                writer.add("order_send_latency_seconds", latency[key] / 1000, labels(action=action, quantile=quantile),
+                           help_text="order_send latency")
+            if 'slippage_points' in data:
+                slippage = data['slippage_points']
+                for quantile, key in (("0.5", 'p50'), ("0.99", 'p99'), ("1", 'max')):
+                    writer.add("slippage_points", slippage[key], labels(action=action, quantile=quantile),
+                               help_text="Adverse slippage vs requested price")
+        for kind, entry in order_metrics['filling_attempts'].items():
+            writer.add("filling_retries_total", entry['retries'], labels(kind=kind), "counter")
+
+    if manager.order_dispatcher:
+        stats = manager.order_dispatcher.stats()
+        writer.add("dispatcher_queue_depth", stats['queue_depth'], labels())
+        writer.add("dispatcher_tokens", stats['tokens'], labels())
+        for priority in ("emergency", "rescue", "grid"):
+            for key in ("sent", "retries", "rejected", "throttled"):
+                writer.add(f"dispatcher_{key}_total", stats[priority][key], labels(priority=priority), "counter")
+
+    if manager.grid_reconciler:
+        recenter = manager.get_recenter_status()
+        for key in ("recenters", "modifies", "modify_fallbacks", "fallback_replaces", "frozen_deferred",
+                    "modify_deferred", "cancels", "places"):
+            writer.add(f"reconcile_{key}_total", recenter[key], labels(), "counter")
+    if manager.virtual_ladder:
+        virtual = manager.virtual_ladder.status()
+        writer.add("virtual_levels", virtual['virtual_levels'], labels())
+        writer.add("virtual_triggered_total", virtual['triggered_total'], labels(), "counter")
+
+class MetricsServer:
+    """
+    /metrics on ThreadingHTTPServer (daemon thread)
+
+    One server per port - every manager in the process registers itself and is scraped
+    with its own symbol / magic labels. Collection errors are reported as
+    <namespace>_scrape_error instead of failing the scrape.
+    """
+
+    _servers: Dict = {}
+    _servers_lock = threading.Lock()
+
+    def __init__(self, settings: MetricsServerSettings = None):
+        self.settings = settings or MetricsServerSettings()
+        self.managers = []
+        self.lock = threading.Lock()
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+        self.scrapes = 0
+
+    @classmethod
+    def shared(cls, settings: MetricsServerSettings) -> 'MetricsServer':
+        with cls._servers_lock:
+            key = (settings.host, settings.port)
+            server = cls._servers.get(key)
+            if server is None:
+                server = cls._servers[key] = cls(settings)
+            return server
+
+    def register(self, manager):
+        with self.lock:
+            if manager not in self.managers:
+                self.managers.append(manager)
+        self.start()
+
+    def unregister(self, manager):
+        with self.lock:
+            if manager in self.managers:
+                self.managers.remove(manager)
+            empty = not self.managers
+        if empty:
+            self.stop()
+
+    def render(self) -> str:
+        started = time.perf_counter()
+        writer = MetricsWriter(self.settings.namespace)
+        with self.lock:
+            managers = list(self.managers)
+        for manager in managers:
+            try:
+                collect_manager_metrics(manager, writer)
+                error = 0
+            except Exception as e:
+                log.warning(f"⚠️ Metrics collection error ({getattr(manager, 'gold_symbol', '?')}): {e}")
+                error = 1
+            writer.add("scrape_error", error, {'symbol': getattr(manager, 'gold_symbol', '')})
+        self.scrapes += 1
+        writer.add("scrapes_total", self.scrapes, kind="counter")
+        writer.add("scrape_duration_seconds", time.perf_counter() - started)
+        return writer.render()
+
+    def start(self) -> bool:
+        if self.httpd is not None:
+            return True
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = server.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.settings.host, self.settings.port), Handler)
+            self.httpd.daemon_threads = True
+            self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="MetricsServer")
+            self.thread.start()
+            log.info(f"📈 Metrics endpoint: http://{self.settings.host}:{self.httpd.server_address[1]}/metrics")
+            return True
+        except Exception as e:
+            log.error(f"❌ Metrics server start error: {e}")
+            self.httpd = None
+            return False
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd = None
+        log.info("📈 Metrics endpoint stopped")
+
+# Test function for standalone usage
+def test_metrics_server():
+    """Writer + HTTP round trip (ไม่ต้องมี manager)"""
+    import urllib.request
+    print("🧪 Testing Metrics Server...")
+    writer = MetricsWriter("grid")
+    writer.add("equity", 10250.5, {'symbol': "XAUUSD"}, help_text="Account equity")
+    writer.add("order_send_total", 42, {'action': "PENDING", 'retcode': "10009", 'result': "DONE"}, "counter")
+    print("   " + writer.render().replace("\n", "\n   ").rstrip())
+
+    server = MetricsServer(MetricsServerSettings(port=0))
+    server.start()
+    url = f"http://127.0.0.1:{server.httpd.server_address[1]}/metrics"
+    with urllib.request.urlopen(url, timeout=5) as response:
+        body = response.read().decode()
+    print(f"   GET {url} -> {len(body.splitlines())} lines, scrapes_total in body: {'grid_scrapes_total 1' in body}")
+    server.stop()
+    print("✅ Metrics Server Test Completed")
+
+if __name__ == "__main__":
+    test_metrics_server()
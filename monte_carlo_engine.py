@@ -0,0 +1,318 @@
+"""
+Monte Carlo Engine - Grid + Hedge Survivability Distribution
+monte_carlo_engine.py
+Vectorized (NumPy) price paths (GBM + jumps or block bootstrap of historical returns)
+evaluated against the grid/hedge ladder in batch, split across a process pool
+"""
+
+import math
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+@dataclass
+class MonteCarloSettings:
+    """Market model + account ของ simulation"""
+    paths: int = 100000
+    horizon_days: float = 20.0
+    step_minutes: float = 60.0
+    start_price: float = 2000.0
+    annual_volatility: float = 0.16
+    annual_drift: float = 0.0
+    jumps_per_year: float = 10.0        # Poisson intensity ของ jump
+    jump_mean: float = 0.0              # log-return เฉลี่ยต่อ jump
+    jump_std: float = 0.015
+    block_size: int = 24                # bootstrap เป็น block (เก็บ volatility clustering)
+    point: float = 0.01
+    contract_size: float = 100.0
+    leverage: int = 100
+    stop_out_level: float = 50.0        # margin level % ที่โดน stop out
+    spread_points: float = 30.0         # ต้นทุนเปิดไม้ (grid + hedge)
+    chunk_size: int = 2000              # paths ต่อ task (คุม memory ต่อ process)
+    workers: int = 0                    # 0 = ทุก core
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'MonteCarloSettings':
+        mc_config = (config or {}).get('monte_carlo', {})
+        return cls(**{key: value for key, value in mc_config.items() if key in cls.__dataclass_fields__})
+
+    @property
+    def steps(self) -> int:
+        return max(1, int(round(self.horizon_days * 24 * 60 / self.step_minutes)))
+
+    @property
+    def step_years(self) -> float:
+        return self.step_minutes / (252 * 24 * 60)
+
+@dataclass
+class GridLadder:
+    """Grid สองฝั่ง (buy ด้านล่าง / sell ด้านบน) + hedge plan [(trigger_points, hedge_lot)]"""
+    balance: float
+    base_lot: float
+    grid_spacing: float
+    max_levels: int
+    hedge_plan: Tuple[Tuple[float, float], ...] = ()
+
+    @classmethod
+    def from_results(cls, results: Dict, hedge_plan: Sequence[Tuple[float, float]] = None) -> 'GridLadder':
+        """จากผลของ SurvivabilityEngine.calculate_for_balance (+ GoldHedgeCalculator.calculate_hedge_plan)"""
+        return cls(
+            balance=float(results['account_balance']),
+            base_lot=float(results['base_lot']),
+            grid_spacing=float(results['grid_spacing']),
+            max_levels=int(results['max_levels']),
+            hedge_plan=tuple((float(trigger), float(size)) for trigger, size in (hedge_plan or ())),
+        )
+
+@dataclass
+class MonteCarloResult:
+    """Distribution ของผลลัพธ์ทุก path"""
+    paths: int
+    steps: int
+    step_minutes: float
+    margin_call_probability: float
+    margin_call_ci95: Tuple[float, float]
+    median_hours_to_margin_call: Optional[float]
+    expected_max_drawdown: float
+    max_drawdown_percentiles: Dict[str, float]
+    recovery_probability: float
+    expected_recovery_hours: Optional[float]
+    recovery_hours_percentiles: Dict[str, float]
+    expected_final_pnl: float
+    final_pnl_percentiles: Dict[str, float]
+    workers: int
+    elapsed_seconds: float
+    model: str = "gbm_jump"
+    ladder: Dict = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def print_summary(self):
+        low, high = self.margin_call_ci95
+        print(f"🎲 Monte Carlo ({self.model}): {self.paths:,} paths x {self.steps} steps "
+              f"({self.steps * self.step_minutes / 60 / 24:.1f} days) | {self.workers} workers | {self.elapsed_seconds:.2f}s")
+        print(f"   💀 Margin call: {self.margin_call_probability * 100:.3f}% (95% CI {low * 100:.3f}-{high * 100:.3f}%)")
+        if self.median_hours_to_margin_call is not None:
+            print(f"   ⏱️ Median time to margin call: {self.median_hours_to_margin_call:,.1f}h")
+        print(f"   📉 Expected max drawdown: ${self.expected_max_drawdown:,.2f} | "
+              f"P95 ${self.max_drawdown_percentiles['p95']:,.2f} | P99 ${self.max_drawdown_percentiles['p99']:,.2f}")
+        recovery = f"{self.expected_recovery_hours:,.1f}h" if self.expected_recovery_hours is not None else "-"
+        print(f"   🔄 Recovered: {self.recovery_probability * 100:.1f}% | Expected time to recovery: {recovery}")
+        print(f"   💰 Expected final PnL: ${self.expected_final_pnl:,.2f} | "
+              f"P5 ${self.final_pnl_percentiles['p5']:,.2f} | P95 ${self.final_pnl_percentiles['p95']:,.2f}")
+
+def returns_from_prices(prices: Sequence[float]) -> np.ndarray:
+    """Log returns สำหรับ bootstrap (ราคาต้องห่างกันเท่ากับ step_minutes)"""
+    prices = np.asarray(prices, dtype=float)
+    prices = prices[prices > 0]
+    return np.diff(np.log(prices))
+
+def generate_log_returns(settings: MonteCarloSettings, count: int, rng: np.random.Generator,
+                         returns: np.ndarray = None) -> np.ndarray:
+    """(count, steps) log returns - GBM + compound Poisson jumps หรือ block bootstrap จาก returns"""
+    steps = settings.steps
+    if returns is not None and len(returns) > 0:
+        block = max(1, min(settings.block_size, len(returns)))
+        blocks = math.ceil(steps / block)
+        starts = rng.integers(0, len(returns) - block + 1, size=(count, blocks))
+        index = (starts[:, :, None] + np.arange(block)).reshape(count, -1)[:, :steps]
+        return returns[index]
+
+    dt = settings.step_years
+    sigma = settings.annual_volatility
+    log_returns = rng.standard_normal((count, steps))
+    log_returns *= sigma * math.sqrt(dt)
+    log_returns += (settings.annual_drift - 0.5 * sigma * sigma) * dt
+    if settings.jumps_per_year > 0:
+        jumps = rng.poisson(settings.jumps_per_year * dt, size=(count, steps))
+        hit = jumps > 0
+        if hit.any():
+            n = jumps[hit]
+            log_returns[hit] += n * settings.jump_mean + np.sqrt(n) * settings.jump_std * rng.standard_normal(n.size)
+    return log_returns
+
+def evaluate_ladder(moves: np.ndarray, ladder: GridLadder, settings: MonteCarloSettings) -> Dict[str, np.ndarray]:
+    """
+    moves: (paths, steps) ราคาเทียบจุดเริ่มเป็น points -> per-path metrics
+
+    Level k ฝั่ง buy เปิดที่ -k*spacing เมื่อราคาเคยลงถึง, ฝั่ง sell ที่ +k*spacing (ไม่เกิน max_levels)
+    จำนวนไม้ที่เปิดแล้วมาจาก running min/max จึงได้ PnL ของทั้ง ladder แบบ closed form ต่อ step
+    Hedge (trigger, lot) เปิดสวนฝั่งที่ติดลบเมื่อราคาวิ่งถึง trigger; stop out ตาม margin level
+    """
+    count, steps = moves.shape
+    value = settings.contract_size * settings.point          # $ ต่อ point ต่อ 1 lot
+    spacing, levels, lot = ladder.grid_spacing, ladder.max_levels, ladder.base_lot
+
+    low = np.minimum(np.minimum.accumulate(moves, axis=1), 0.0)
+    high = np.maximum(np.maximum.accumulate(moves, axis=1), 0.0)
+    buys = np.minimum(np.floor(-low / spacing), levels)
+    sells = np.minimum(np.floor(high / spacing), levels)
+
+    pnl = buys * moves + spacing * buys * (buys + 1) / 2
+    pnl += spacing * sells * (sells + 1) / 2 - sells * moves
+    pnl -= (buys + sells) * settings.spread_points
+    pnl *= lot * value
+    lots = (buys + sells) * lot
+
+    for trigger, size in ladder.hedge_plan:
+        down = -low >= trigger                      # buy grid ติดลบ -> hedge SELL ที่ -trigger
+        up = high >= trigger                        # sell grid ติดลบ -> hedge BUY ที่ +trigger
+        pnl += size * value * (down * (-trigger - moves - settings.spread_points)
+                               + up * (moves - trigger - settings.spread_points))
+        lots += size * (down.astype(float) + up)
+
+    equity = ladder.balance + pnl
+    margin = lots * settings.contract_size * (settings.start_price + moves * settings.point) / settings.leverage
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stopped = (equity <= 0) | ((margin > 0) & (equity * 100.0 <= margin * settings.stop_out_level))
+    stopped = np.logical_or.accumulate(stopped, axis=1)
+
+    margin_call = stopped[:, -1]
+    stop_step = np.where(margin_call, stopped.argmax(axis=1), -1)
+    if margin_call.any():
+        # หลัง stop out equity หยุดอยู่ที่ค่า ณ ตอนนั้น (ปิดทุกไม้)
+        frozen = equity[np.arange(count), np.maximum(stop_step, 0)]
+        equity = np.where(stopped, frozen[:, None], equity)
+
+    peak = np.maximum.accumulate(np.maximum(equity, ladder.balance), axis=1)
+    drawdown = peak - equity
+    trough = drawdown.argmax(axis=1)
+    max_drawdown = drawdown[np.arange(count), trough]
+
+    target = peak[np.arange(count), trough]
+    after = np.arange(steps) >= trough[:, None]
+    recovered_at = (equity >= target[:, None]) & after
+    recovered = recovered_at.any(axis=1) & ~margin_call
+    recovery_steps = np.where(recovered, recovered_at.argmax(axis=1) - trough, np.nan)
+    recovery_steps[max_drawdown <= 0] = 0.0
+
+    return {
+        'margin_call': margin_call,
+        'stop_step': stop_step,
+        'max_drawdown': max_drawdown,
+        'recovery_steps': recovery_steps,
+        'final_pnl': equity[:, -1] - ladder.balance,
+    }
+
+def _simulate_chunk(task) -> Dict[str, np.ndarray]:
+    """Worker (top-level เพื่อให้ pickle ได้บน Windows spawn)"""
+    settings, ladder, seed_sequence, count, returns = task
+    rng = np.random.default_rng(seed_sequence)
+    log_returns = generate_log_returns(settings, count, rng, returns)
+    np.cumsum(log_returns, axis=1, out=log_returns)
+    moves = settings.start_price * np.expm1(log_returns) / settings.point
+    metrics = evaluate_ladder(moves, ladder, settings)
+    return {
+        'margin_call': metrics['margin_call'],
+        'stop_step': metrics['stop_step'].astype(np.int32),
+        'max_drawdown': metrics['max_drawdown'].astype(np.float32),
+        'recovery_steps': metrics['recovery_steps'].astype(np.float32),
+        'final_pnl': metrics['final_pnl'].astype(np.float32),
+    }
+
+class MonteCarloSurvivability:
+    """
+    Survivability distribution ของ grid + hedge ladder
+
+    Paths แบ่งเป็น chunk (คุม memory) แต่ละ chunk มี seed ของตัวเองจาก SeedSequence.spawn
+    ผลจึงเหมือนกันไม่ว่าจะรันกี่ workers
+    """
+
+    def __init__(self, settings: MonteCarloSettings = None):
+        self.settings = settings or MonteCarloSettings()
+
+    def run(self, ladder: GridLadder, paths: int = None, returns: Sequence[float] = None,
+            workers: int = None) -> MonteCarloResult:
+        started = time.perf_counter()
+        s = self.settings
+        paths = int(paths or s.paths)
+        returns = np.asarray(returns, dtype=float) if returns is not None else None
+
+        chunk = max(1, min(s.chunk_size, paths))
+        counts = [chunk] * (paths // chunk) + ([paths % chunk] if paths % chunk else [])
+        seeds = np.random.SeedSequence(s.seed).spawn(len(counts))
+        tasks = [(s, ladder, seed, count, returns) for seed, count in zip(seeds, counts)]
+
+        workers = workers if workers is not None else (s.workers or os.cpu_count() or 1)
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            parts = [_simulate_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(_simulate_chunk, tasks))
+
+        merged = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+        return self.summarize(merged, ladder, workers, time.perf_counter() - started,
+                              "bootstrap" if returns is not None else "gbm_jump")
+
+    def summarize(self, metrics: Dict[str, np.ndarray], ladder: GridLadder, workers: int,
+                  elapsed: float, model: str) -> MonteCarloResult:
+        s = self.settings
+        hours = s.step_minutes / 60.0
+        paths = len(metrics['margin_call'])
+
+        calls = int(metrics['margin_call'].sum())
+        probability = calls / paths
+        # Wilson interval - ใช้ได้แม้ probability ใกล้ 0
+        z = 1.96
+        center = (probability + z * z / (2 * paths)) / (1 + z * z / paths)
+        half = z * math.sqrt(probability * (1 - probability) / paths + z * z / (4 * paths * paths)) / (1 + z * z / paths)
+
+        stop_steps = metrics['stop_step'][metrics['margin_call']]
+        recovery = metrics['recovery_steps'][~np.isnan(metrics['recovery_steps'])]
+
+        def percentiles(values, points):
+            if len(values) == 0:
+                return {f"p{p}": 0.0 for p in points}
+            return {f"p{p}": round(float(v), 2) for p, v in zip(points, np.percentile(values, points))}
+
+        return MonteCarloResult(
+            paths=paths,
+            steps=s.steps,
+            step_minutes=s.step_minutes,
+            margin_call_probability=probability,
+            margin_call_ci95=(max(0.0, center - half), min(1.0, center + half)),
+            median_hours_to_margin_call=float(np.median(stop_steps) * hours) if calls else None,
+            expected_max_drawdown=round(float(metrics['max_drawdown'].mean()), 2),
+            max_drawdown_percentiles=percentiles(metrics['max_drawdown'], (50, 95, 99)),
+            recovery_probability=len(recovery) / paths,
+            expected_recovery_hours=round(float(recovery.mean() * hours), 2) if len(recovery) else None,
+            recovery_hours_percentiles=percentiles(recovery * hours, (50, 95)),
+            expected_final_pnl=round(float(metrics['final_pnl'].mean()), 2),
+            final_pnl_percentiles=percentiles(metrics['final_pnl'], (5, 50, 95)),
+            workers=workers,
+            elapsed_seconds=round(elapsed, 3),
+            model=model,
+            ladder=asdict(ladder),
+        )
+
+# Test function for standalone usage
+def test_monte_carlo_engine():
+    """Grid จาก SurvivabilityEngine + hedge plan -> distribution"""
+    print("🧪 Testing Monte Carlo Engine...")
+    ladder = GridLadder(balance=10000.0, base_lot=0.01, grid_spacing=300, max_levels=40,
+                        hedge_plan=((3000, 0.05), (6000, 0.1)))
+    engine = MonteCarloSurvivability(MonteCarloSettings(seed=7))
+
+    single = engine.run(ladder, paths=20000, workers=1)
+    single.print_summary()
+    pooled = engine.run(ladder, paths=20000, workers=4)
+    print(f"   Same result with 4 workers: {pooled.margin_call_probability == single.margin_call_probability}")
+
+    unhedged = engine.run(GridLadder(10000.0, 0.01, 300, 40), paths=20000, workers=1)
+    print(f"   Margin call without hedges: {unhedged.margin_call_probability * 100:.3f}%")
+
+    history = 2000.0 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.002, 5000)))
+    bootstrap = engine.run(ladder, paths=20000, returns=returns_from_prices(history), workers=1)
+    print(f"   Bootstrap margin call: {bootstrap.margin_call_probability * 100:.3f}% | "
+          f"expected max drawdown ${bootstrap.expected_max_drawdown:,.2f}")
+
+    print("✅ Monte Carlo Engine Test Completed")
+
+if __name__ == "__main__":
+    test_monte_carlo_engine()
@@ -10,7 +10,10 @@ import time
 import re
 from datetime import datetime
 import psutil
-import winreg
+try:
+    import winreg
+except ImportError:  # Linux / emulator - ไม่มี registry
+    winreg = None
 from pathlib import Path
 
 class MT5AutoConnector:
@@ -41,7 +44,7 @@ class MT5AutoConnector:
             reg_paths = [
                 r"SOFTWARE\MetaQuotes\Terminal\D0E8200F298C41E24B9CC8DE03C7F02C",  # MT5 default
                 r"SOFTWARE\WOW6432Node\MetaQuotes\Terminal\D0E8200F298C41E24B9CC8DE03C7F02C",
-            ]
+            ] if winreg else []
             
             for reg_path in reg_paths:
                 try:
@@ -135,31 +138,41 @@ class MT5AutoConnector:
                     return False
         return True
         
-    def auto_connect(self):
+    def auto_connect(self, path=None, login=None, password=None, server=None):
         """
         Automatically connect to MT5
+        path / login / password / server: เชื่อม terminal + account ที่ระบุ (orchestrator หนึ่ง process ต่อ terminal)
         Returns: True if successful, False otherwise
         """
         try:
-            # Step 1: Detect MT5 installation
-            print("🔍 Detecting MT5 installation...")
-            mt5_path = self.detect_mt5_installation()
-            
-            if not mt5_path:
-                print("❌ MT5 installation not found")
-                return False
+            terminal_args = {key: value for key, value in
+                             (('path', path), ('login', login), ('password', password), ('server', server)) if value}
+            if getattr(mt5, 'IS_EMULATOR', False):
+                # mt5_emulator: ไม่มี terminal ให้หา/เปิด
+                print("🧪 Using MT5 emulator - skipping installation detection")
+            elif path:
+                print(f"🔗 Using terminal: {path}")
+                self.mt5_path = path
+            else:
+                # Step 1: Detect MT5 installation
+                print("🔍 Detecting MT5 installation...")
+                mt5_path = self.detect_mt5_installation()
                 
-            print(f"✅ MT5 found at: {mt5_path}")
-            
-            # Step 2: Check if MT5 is running, start if needed
-            print("🚀 Checking MT5 status...")
-            if not self.start_mt5_if_needed():
-                print("❌ Failed to start MT5")
-                return False
+                if not mt5_path:
+                    print("❌ MT5 installation not found")
+                    return False
+                    
+                print(f"✅ MT5 found at: {mt5_path}")
+                
+                # Step 2: Check if MT5 is running, start if needed
+                print("🚀 Checking MT5 status...")
+                if not self.start_mt5_if_needed():
+                    print("❌ Failed to start MT5")
+                    return False
                 
             # Step 3: Initialize MT5 connection
             print("🔗 Connecting to MT5...")
-            if not mt5.initialize():
+            if not mt5.initialize(**terminal_args):
                 print("❌ MT5 initialization failed")
                 return False
                 
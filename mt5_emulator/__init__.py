@@ -0,0 +1,71 @@
+"""
+MT5 Emulator - Drop-in MetaTrader5 replacement for Linux testing and benchmarking
+mt5_emulator/__init__.py
+Module-level MetaTrader5 API (constants + functions) backed by one EmulatorTerminal
+
+Usage:
+    import mt5_emulator
+    mt5_emulator.install()          # import MetaTrader5 -> this module
+    python -m mt5_emulator main.py  # run any entry point against the emulator
+"""
+
+import sys
+from typing import Dict
+
+from .constants import CONSTANTS, MT5Constants
+from .records import (AccountInfo, OrderSendResult, SymbolInfo, TerminalInfo, Tick, TradeDeal, TradeOrder,
+                      TradePosition, TradeRequest)
+from .terminal import DEFAULT_SYMBOLS, EmulatorTerminal, RandomWalkFeed, RealClock, SymbolSpec
+
+globals().update(CONSTANTS)
+
+IS_EMULATOR = True
+__version__ = "5.0.4000"
+__author__ = "MT5 Emulator"
+
+_terminal = EmulatorTerminal()
+
+API_FUNCTIONS = (
+    "initialize", "login", "shutdown", "last_error", "version", "terminal_info",
+    "symbols_total", "symbols_get", "symbol_select", "symbol_info", "symbol_info_tick",
+    "account_info", "positions_total", "positions_get", "orders_total", "orders_get",
+    "history_deals_get", "history_deals_total", "history_orders_get", "history_orders_total",
+    "order_calc_margin", "order_calc_profit", "order_send",
+)
+
+def get_terminal() -> EmulatorTerminal:
+    """Terminal ที่ module-level API ใช้อยู่"""
+    return _terminal
+
+def set_terminal(terminal: EmulatorTerminal) -> EmulatorTerminal:
+    """เปลี่ยน terminal ที่อยู่หลัง API (เช่น ตั้ง balance / latency / symbols ใหม่)"""
+    global _terminal
+    _terminal = terminal
+    return terminal
+
+def configure(config: Dict = None) -> EmulatorTerminal:
+    """สร้าง terminal จาก config['mt5_emulator']"""
+    emulator_config = dict((config or {}).get('mt5_emulator', {}))
+    symbols = emulator_config.pop('symbols', None)
+    if symbols:
+        emulator_config['symbols'] = [SymbolSpec.from_dict(spec) for spec in symbols]
+    known = EmulatorTerminal.__init__.__code__.co_varnames
+    return set_terminal(EmulatorTerminal(**{key: value for key, value in emulator_config.items() if key in known}))
+
+def install(terminal: EmulatorTerminal = None):
+    """ให้ `import MetaTrader5` ได้ module นี้ (เรียกก่อน import engine modules)"""
+    if terminal is not None:
+        set_terminal(terminal)
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+def _delegate(name: str):
+    def call(*args, **kwargs):
+        return getattr(_terminal, name)(*args, **kwargs)
+    call.__name__ = name
+    call.__doc__ = f"MetaTrader5.{name} (emulated)"
+    return call
+
+for _name in API_FUNCTIONS:
+    globals()[_name] = _delegate(_name)
+del _name
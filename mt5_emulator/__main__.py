@@ -0,0 +1,61 @@
+"""
+Run a script against the MT5 emulator
+python -m mt5_emulator [--config config.json] [--latency-ms 20] <script.py> [args...]
+Scripts inside a package (e.g. mt5_emulator/terminal.py) run as modules, like python -m
+"""
+
+import argparse
+import json
+import os
+import runpy
+import sys
+
+import mt5_emulator
+
+def module_name(script: str):
+    """dotted module name ถ้า script อยู่ใน package (มี __init__.py) -> (name, root dir) หรือ (None, None)"""
+    path = os.path.abspath(script)
+    directory, filename = os.path.split(path)
+    parts = [os.path.splitext(filename)[0]]
+    while os.path.exists(os.path.join(directory, "__init__.py")):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    if len(parts) == 1:
+        return None, None
+    return ".".join(parts), directory
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m mt5_emulator", description="Run a script with MetaTrader5 emulated")
+    parser.add_argument("--config", default="config.json", help="config file (section mt5_emulator)")
+    parser.add_argument("--balance", type=float, help="starting balance")
+    parser.add_argument("--latency-ms", type=float, help="order_send latency")
+    parser.add_argument("--seed", type=int, help="price feed / latency seed")
+    parser.add_argument("script", help="entry point, e.g. main.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args()
+
+    config = {}
+    if os.path.exists(options.config):
+        with open(options.config, 'r') as f:
+            config = json.load(f)
+    emulator_config = config.setdefault('mt5_emulator', {})
+    for key, value in (('balance', options.balance), ('latency_ms', options.latency_ms), ('seed', options.seed)):
+        if value is not None:
+            emulator_config[key] = value
+
+    mt5_emulator.install(mt5_emulator.configure(config))
+    print(f"🧪 MetaTrader5 emulated: {mt5_emulator.get_terminal().server} | "
+          f"symbols {list(mt5_emulator.get_terminal().specs)}")
+
+    sys.argv = [options.script] + options.args
+    name, root = module_name(options.script)
+    if name:
+        # relative imports ต้องรันแบบ module (run_path จะ ImportError)
+        sys.path.insert(0, root)
+        runpy.run_module(name, run_name="__main__", alter_sys=True)
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+        runpy.run_path(options.script, run_name="__main__")
+
+if __name__ == "__main__":
+    main()
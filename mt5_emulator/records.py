@@ -0,0 +1,53 @@
+"""
+MT5-shaped records (same field names as the MetaTrader5 package structures)
+mt5_emulator/records.py
+"""
+
+from collections import namedtuple
+
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+
+SymbolInfo = namedtuple('SymbolInfo', [
+    'name', 'description', 'path', 'visible', 'select', 'digits', 'point', 'spread', 'spread_float',
+    'trade_mode', 'trade_exemode', 'filling_mode', 'trade_contract_size', 'trade_tick_value',
+    'trade_tick_size', 'trade_stops_level', 'trade_freeze_level', 'volume_min', 'volume_max',
+    'volume_step', 'margin_initial', 'margin_maintenance', 'currency_base', 'currency_profit',
+    'currency_margin', 'bid', 'ask', 'time',
+])
+
+AccountInfo = namedtuple('AccountInfo', [
+    'login', 'trade_mode', 'leverage', 'limit_orders', 'margin_so_mode', 'trade_allowed', 'trade_expert',
+    'margin_mode', 'currency_digits', 'fifo_close', 'balance', 'credit', 'profit', 'equity', 'margin',
+    'margin_free', 'margin_level', 'margin_so_call', 'margin_so_so', 'name', 'server', 'currency', 'company',
+])
+
+TerminalInfo = namedtuple('TerminalInfo', [
+    'community_account', 'connected', 'trade_allowed', 'tradeapi_disabled', 'build', 'maxbars',
+    'ping_last', 'company', 'name', 'language', 'path', 'data_path',
+])
+
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'time_msc', 'time_update', 'type', 'magic', 'identifier', 'reason', 'volume',
+    'price_open', 'sl', 'tp', 'price_current', 'swap', 'profit', 'symbol', 'comment',
+])
+
+TradeOrder = namedtuple('TradeOrder', [
+    'ticket', 'time_setup', 'time_setup_msc', 'time_done', 'type', 'type_filling', 'state', 'magic',
+    'position_id', 'volume_initial', 'volume_current', 'price_open', 'sl', 'tp', 'price_current',
+    'symbol', 'comment',
+])
+
+TradeDeal = namedtuple('TradeDeal', [
+    'ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id', 'reason', 'volume',
+    'price', 'commission', 'swap', 'profit', 'symbol', 'comment',
+])
+
+TradeRequest = namedtuple('TradeRequest', [
+    'action', 'magic', 'order', 'symbol', 'volume', 'price', 'sl', 'tp', 'deviation', 'type',
+    'type_filling', 'comment', 'position', 'position_by',
+])
+
+OrderSendResult = namedtuple('OrderSendResult', [
+    'retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask', 'comment', 'request_id',
+    'retcode_external', 'request',
+])
@@ -0,0 +1,760 @@
+"""
+Emulator Terminal - Deterministic MT5 Matching Engine
+mt5_emulator/terminal.py
+In-process stand-in for the MT5 terminal + trade server: symbols, ticks, account,
+positions / orders / history and order_send with the trade server's retcodes
+"""
+
+import fnmatch
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .constants import MT5Constants
+from .records import (AccountInfo, OrderSendResult, SymbolInfo, TerminalInfo, Tick, TradeDeal, TradeOrder,
+                      TradePosition, TradeRequest)
+
+@dataclass
+class SymbolSpec:
+    name: str = "XAUUSD"
+    description: str = "Gold vs US Dollar"
+    digits: int = 2
+    point: float = 0.01
+    contract_size: float = 100.0
+    volume_min: float = 0.01
+    volume_max: float = 100.0
+    volume_step: float = 0.01
+    filling_flags: int = 3             # SYMBOL_FILLING_FOK | SYMBOL_FILLING_IOC
+    stops_level: int = 0               # points
+    freeze_level: int = 0              # points
+    spread_points: int = 30
+    trade_mode: int = 4                # SYMBOL_TRADE_MODE_FULL
+    start_price: float = 2000.0
+    volatility: float = 0.08           # ราคาเปลี่ยนต่อ tick (stdev) ของ RandomWalkFeed
+    tick_seconds: float = 1.0          # ระยะเวลาเฉลี่ยระหว่าง tick
+    currency_base: str = "XAU"
+    currency_profit: str = "USD"
+    currency_margin: str = "USD"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SymbolSpec':
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+DEFAULT_SYMBOLS = (
+    SymbolSpec(),
+    SymbolSpec(name="EURUSD", description="Euro vs US Dollar", digits=5, point=0.00001, contract_size=100000.0,
+               spread_points=12, start_price=1.08, volatility=0.00005, currency_base="EUR"),
+)
+
+class RealClock:
+    """เวลาจริง (ใช้ตอนรันบอททั้งตัวกับ emulator)"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class RandomWalkFeed:
+    """Tick stream ที่ deterministic - seed เดียวกัน + เวลาเดียวกัน = ticks ชุดเดียวกัน"""
+
+    MAX_CATCHUP_TICKS = 10000
+
+    def __init__(self, spec: SymbolSpec, seed: int, start_time: float):
+        self.spec = spec
+        self.rng = random.Random(f"{seed}:{spec.name}")
+        self.next_time = start_time
+        self.bid = spec.start_price
+
+    def advance(self, now: float) -> List[Tuple[float, float, float]]:
+        spec = self.spec
+        # ข้ามช่วงว่างยาวๆ (เช่น process หยุดไปนาน) แทนการสร้าง ticks ย้อนหลังทั้งหมด
+        if now - self.next_time > self.MAX_CATCHUP_TICKS * spec.tick_seconds:
+            self.next_time = now - self.MAX_CATCHUP_TICKS * spec.tick_seconds
+
+        ticks = []
+        while self.next_time <= now:
+            self.bid = round(max(spec.point, self.bid + self.rng.gauss(0, spec.volatility)), spec.digits)
+            ticks.append((self.next_time, self.bid, round(self.bid + spec.spread_points * spec.point, spec.digits)))
+            self.next_time += self.rng.expovariate(1.0 / spec.tick_seconds)
+        return ticks
+
+class EmulatorTerminal(MT5Constants):
+    """
+    Terminal + trade server in one object
+
+    Exposes the MetaTrader5 module API as methods (and the constants as attributes),
+    so an instance can stand in for `mt5` directly. Matching is deterministic:
+    market orders fill at the current bid/ask, limits at their price, stops at market
+    once crossed; validation follows the trade server (volume, filling, price side,
+    stops / freeze level, margin, autotrading, market hours).
+    """
+
+    def __init__(self, symbols: List[SymbolSpec] = None, balance: float = 10000.0, leverage: int = 100,
+                 hedging: bool = True, latency_ms: float = 0.0, latency_jitter_ms: float = 0.0,
+                 seed: int = 42, clock=None, use_feed: bool = True, stop_out_level: float = 50.0,
+                 login: int = 5000001, server: str = "Emulator-Demo", company: str = "MT5 Emulator",
+                 max_requests_per_second: int = 0):
+        self.lock = threading.RLock()
+        self.clock = clock or RealClock()
+        self.specs: Dict[str, SymbolSpec] = {spec.name: spec for spec in (symbols or DEFAULT_SYMBOLS)}
+        self.visible = {name: True for name in self.specs}
+
+        self.balance = balance
+        self.leverage = leverage
+        self.hedging = hedging
+        self.stop_out_level = stop_out_level
+        self.login_id = login
+        self.server = server
+        self.company = company
+
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_rng = random.Random(seed)
+        self.max_requests_per_second = max_requests_per_second   # 0 = ไม่ throttle (10024 เมื่อเกิน)
+        self.request_times = deque()
+        self.throttled = 0
+
+        self.connected = False
+        self.autotrading = True
+        self.market_open = True
+        self.error = (self.RES_S_OK, "Success")
+
+        now = self.clock.time()
+        self.ticks: Dict[str, Tuple[float, float, float]] = {}
+        self.feeds: Dict[str, RandomWalkFeed] = {}
+        for spec in self.specs.values():
+            self.ticks[spec.name] = (now, spec.start_price, round(spec.start_price + spec.spread_points * spec.point, spec.digits))
+            if use_feed:
+                self.feeds[spec.name] = RandomWalkFeed(spec, seed, now)
+
+        self.positions: Dict[int, Dict] = {}
+        self.orders: Dict[int, Dict] = {}
+        self.trigger_bounds: Dict[str, Tuple[float, float]] = {}   # symbol -> (rise, fall) - None = คำนวณใหม่
+        self.history_orders: List[Dict] = []
+        self.deals: List[Dict] = []
+        self.order_ids = itertools.count(10000001)
+        self.deal_ids = itertools.count(20000001)
+        self.order_sends = 0
+
+    # ----- Feed -----
+
+    def on_tick(self, symbol: str, timestamp: float, bid: float, ask: float):
+        """ป้อน tick จากภายนอก (backtester) - trigger pending orders และ stop-out"""
+        with self.lock:
+            self.ticks[symbol] = (timestamp, bid, ask)
+            if self.orders:
+                rise, fall = self._trigger_bounds(symbol)
+                if ask >= rise or bid <= fall:
+                    self._fill_triggered_orders(symbol)
+            if self.positions:
+                self._check_stop_out()
+
+    def _sync(self):
+        """ดึง ticks ของ feeds จนถึงเวลาปัจจุบัน"""
+        if not self.feeds:
+            return
+        now = self.clock.time()
+        for symbol, feed in self.feeds.items():
+            for timestamp, bid, ask in feed.advance(now):
+                self.on_tick(symbol, timestamp, bid, ask)
+
+    def _trigger_bounds(self, symbol: str) -> Tuple[float, float]:
+        """ราคาต่ำสุดที่ order ฝั่งขึ้นจะ trigger / สูงสุดของฝั่งลง - tick ที่อยู่ระหว่างนี้ไม่ต้อง scan"""
+        bounds = self.trigger_bounds.get(symbol)
+        if bounds is None:
+            rise = [o['price_open'] for o in self.orders.values() if o['symbol'] == symbol
+                    and o['type'] in (self.ORDER_TYPE_SELL_LIMIT, self.ORDER_TYPE_BUY_STOP)]
+            fall = [o['price_open'] for o in self.orders.values() if o['symbol'] == symbol
+                    and o['type'] in (self.ORDER_TYPE_BUY_LIMIT, self.ORDER_TYPE_SELL_STOP)]
+            bounds = (min(rise) if rise else float('inf'), max(fall) if fall else float('-inf'))
+            self.trigger_bounds[symbol] = bounds
+        return bounds
+
+    def _fill_triggered_orders(self, symbol: str):
+        _, bid, ask = self.ticks[symbol]
+        for ticket, order in list(self.orders.items()):
+            if order['symbol'] != symbol:
+                continue
+            order_type, price = order['type'], order['price_open']
+            if order_type == self.ORDER_TYPE_BUY_LIMIT and ask <= price:
+                fill_price = price
+            elif order_type == self.ORDER_TYPE_SELL_LIMIT and bid >= price:
+                fill_price = price
+            elif order_type == self.ORDER_TYPE_BUY_STOP and ask >= price:
+                fill_price = ask
+            elif order_type == self.ORDER_TYPE_SELL_STOP and bid <= price:
+                fill_price = bid
+            else:
+                continue
+            del self.orders[ticket]
+            self.trigger_bounds.pop(symbol, None)
+            is_buy = order_type in (self.ORDER_TYPE_BUY_LIMIT, self.ORDER_TYPE_BUY_STOP)
+            self._archive_order(order, self.ORDER_STATE_FILLED, position_id=ticket)
+            self._open(symbol, self.POSITION_TYPE_BUY if is_buy else self.POSITION_TYPE_SELL, order['volume'],
+                       fill_price, order['magic'], order['comment'], ticket)
+
+    def _check_stop_out(self):
+        while self.positions:
+            margin = self._margin()
+            if margin <= 0 or self._equity() / margin * 100 > self.stop_out_level:
+                return
+            worst = min(self.positions.values(), key=self._position_profit)
+            self._close(worst, worst['volume'], self._close_price(worst), next(self.order_ids),
+                        "so", self.DEAL_REASON_SO)
+
+    # ----- Accounting -----
+
+    def _close_price(self, position: Dict) -> float:
+        _, bid, ask = self.ticks[position['symbol']]
+        return bid if position['type'] == self.POSITION_TYPE_BUY else ask
+
+    def _position_profit(self, position: Dict, close_price: float = None) -> float:
+        price = self._close_price(position) if close_price is None else close_price
+        sign = 1 if position['type'] == self.POSITION_TYPE_BUY else -1
+        return (price - position['price_open']) * sign * position['volume'] * self.specs[position['symbol']].contract_size
+
+    def _equity(self) -> float:
+        return self.balance + sum(self._position_profit(p) for p in self.positions.values())
+
+    def _margin(self) -> float:
+        return sum(self._required_margin(p['symbol'], p['volume'], p['price_open']) for p in self.positions.values())
+
+    def _required_margin(self, symbol: str, volume: float, price: float) -> float:
+        return volume * self.specs[symbol].contract_size * price / self.leverage
+
+    def _open(self, symbol: str, position_type: int, volume: float, price: float, magic: int, comment: str,
+              ticket: int) -> int:
+        now = self.clock.time()
+        self.positions[ticket] = {
+            'ticket': ticket, 'symbol': symbol, 'type': position_type, 'volume': volume, 'price_open': price,
+            'magic': magic, 'comment': comment, 'time': now, 'time_update': now,
+        }
+        self._record_deal(ticket, ticket, symbol, position_type, self.DEAL_ENTRY_IN, volume, price, 0.0, magic, comment)
+        return ticket
+
+    def _close(self, position: Dict, volume: float, price: float, order_ticket: int, comment: str,
+               reason: int = None, entry: int = None) -> float:
+        volume = min(volume, position['volume'])
+        profit = self._position_profit(position, price) * volume / position['volume']
+        self.balance += profit
+        remaining = round(position['volume'] - volume, 8)
+        if remaining <= 1e-9:
+            del self.positions[position['ticket']]
+        else:
+            position['volume'] = remaining
+            position['time_update'] = self.clock.time()
+        deal_type = self.DEAL_TYPE_SELL if position['type'] == self.POSITION_TYPE_BUY else self.DEAL_TYPE_BUY
+        self._record_deal(order_ticket, position['ticket'], position['symbol'], deal_type,
+                          self.DEAL_ENTRY_OUT if entry is None else entry, volume, price, profit,
+                          position['magic'], comment, reason, position['price_open'], position['time'])
+        return profit
+
+    def _record_deal(self, order_ticket: int, position_id: int, symbol: str, deal_type: int, entry: int,
+                     volume: float, price: float, profit: float, magic: int, comment: str,
+                     reason: int = None, price_open: float = None, open_time: float = None):
+        self.deals.append({
+            'ticket': next(self.deal_ids), 'order': order_ticket, 'time': self.clock.time(),
+            'type': deal_type, 'entry': entry, 'magic': magic, 'position_id': position_id,
+            'reason': self.DEAL_REASON_EXPERT if reason is None else reason, 'volume': volume, 'price': price,
+            'profit': round(profit, 2), 'symbol': symbol, 'comment': comment,
+            'price_open': price_open, 'open_time': open_time, 'balance': round(self.balance, 2),
+        })
+
+    def _archive_order(self, order: Dict, state: int, position_id: int = 0):
+        self.history_orders.append(dict(order, state=state, time_done=self.clock.time(), position_id=position_id))
+
+    # ----- Connection -----
+
+    def _ready(self) -> bool:
+        if not self.connected:
+            self.error = (self.RES_E_INTERNAL_FAIL_CONNECT, "No IPC connection")
+            return False
+        self._sync()
+        return True
+
+    def initialize(self, path=None, login=None, password=None, server=None, timeout=None, portable=False) -> bool:
+        with self.lock:
+            if login is not None and int(login) != self.login_id:
+                self.error = (self.RES_E_INTERNAL_FAIL_INIT, "Authorization failed")
+                return False
+            self.connected = True
+            self.error = (self.RES_S_OK, "Success")
+            return True
+
+    def login(self, login, password=None, server=None, timeout=None) -> bool:
+        return self.initialize(login=login)
+
+    def shutdown(self):
+        with self.lock:
+            self.connected = False
+        return True
+
+    def last_error(self):
+        return self.error
+
+    def version(self):
+        return (500, 4000, "01 Jan 2024")
+
+    def terminal_info(self) -> Optional[TerminalInfo]:
+        with self.lock:
+            if not self._ready():
+                return None
+            return TerminalInfo(False, True, self.autotrading, False, 4000, 100000, 0, self.company,
+                                "MetaTrader 5 Emulator", "English", "", "")
+
+    # ----- Symbols / market data -----
+
+    def symbols_total(self) -> int:
+        return len(self.specs)
+
+    def symbols_get(self, group: str = None):
+        with self.lock:
+            if not self._ready():
+                return None
+            names = list(self.specs)
+            if group:
+                names = [name for name in names if self._match_group(name, group)]
+            return tuple(self._symbol_info(name) for name in names)
+
+    @staticmethod
+    def _match_group(name: str, group: str) -> bool:
+        matched = False
+        for pattern in group.split(','):
+            pattern = pattern.strip()
+            if pattern.startswith('!'):
+                if fnmatch.fnmatch(name, pattern[1:]):
+                    return False
+            elif fnmatch.fnmatch(name, pattern):
+                matched = True
+        return matched
+
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        with self.lock:
+            if symbol not in self.specs:
+                self.error = (self.RES_E_NOT_FOUND, "Symbol not found")
+                return False
+            self.visible[symbol] = enable
+            return True
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        with self.lock:
+            if not self._ready() or symbol not in self.specs:
+                return None
+            return self._symbol_info(symbol)
+
+    def _symbol_info(self, symbol: str) -> SymbolInfo:
+        spec = self.specs[symbol]
+        timestamp, bid, ask = self.ticks[symbol]
+        return SymbolInfo(
+            name=spec.name, description=spec.description, path=f"Emulator\\{spec.name}",
+            visible=self.visible[symbol], select=self.visible[symbol], digits=spec.digits, point=spec.point,
+            spread=int(round((ask - bid) / spec.point)), spread_float=True, trade_mode=spec.trade_mode,
+            trade_exemode=self.SYMBOL_TRADE_EXECUTION_MARKET, filling_mode=spec.filling_flags,
+            trade_contract_size=spec.contract_size, trade_tick_value=spec.contract_size * spec.point,
+            trade_tick_size=spec.point, trade_stops_level=spec.stops_level, trade_freeze_level=spec.freeze_level,
+            volume_min=spec.volume_min, volume_max=spec.volume_max, volume_step=spec.volume_step,
+            margin_initial=0.0, margin_maintenance=0.0, currency_base=spec.currency_base,
+            currency_profit=spec.currency_profit, currency_margin=spec.currency_margin,
+            bid=bid, ask=ask, time=int(timestamp),
+        )
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        with self.lock:
+            if not self._ready() or symbol not in self.ticks:
+                return None
+            timestamp, bid, ask = self.ticks[symbol]
+            return Tick(int(timestamp), bid, ask, 0.0, 0, int(timestamp * 1000), 6, 0.0)
+
+    # ----- Account / trading state -----
+
+    def account_info(self) -> Optional[AccountInfo]:
+        with self.lock:
+            if not self._ready():
+                return None
+            equity = self._equity()
+            margin = self._margin()
+            return AccountInfo(
+                login=self.login_id, trade_mode=self.ACCOUNT_TRADE_MODE_DEMO, leverage=self.leverage,
+                limit_orders=500, margin_so_mode=0, trade_allowed=True, trade_expert=self.autotrading,
+                margin_mode=self.ACCOUNT_MARGIN_MODE_RETAIL_HEDGING if self.hedging else self.ACCOUNT_MARGIN_MODE_RETAIL_NETTING,
+                currency_digits=2, fifo_close=False, balance=round(self.balance, 2), credit=0.0,
+                profit=round(equity - self.balance, 2), equity=round(equity, 2), margin=round(margin, 2),
+                margin_free=round(equity - margin, 2), margin_level=round(equity / margin * 100, 2) if margin else 0.0,
+                margin_so_call=100.0, margin_so_so=self.stop_out_level, name="Emulator Account",
+                server=self.server, currency="USD", company=self.company,
+            )
+
+    def positions_total(self) -> Optional[int]:
+        with self.lock:
+            return len(self.positions) if self._ready() else None
+
+    def positions_get(self, symbol: str = None, group: str = None, ticket: int = None):
+        with self.lock:
+            if not self._ready():
+                return None
+            result = []
+            for p in self.positions.values():
+                if (symbol and p['symbol'] != symbol) or (ticket is not None and p['ticket'] != ticket) or \
+                        (group and not self._match_group(p['symbol'], group)):
+                    continue
+                price = self._close_price(p)
+                result.append(TradePosition(
+                    p['ticket'], int(p['time']), int(p['time'] * 1000), int(p['time_update']), p['type'],
+                    p['magic'], p['ticket'], 3, p['volume'], p['price_open'], 0.0, 0.0, price, 0.0,
+                    round(self._position_profit(p, price), 2), p['symbol'], p['comment'],
+                ))
+            return tuple(result)
+
+    def orders_total(self) -> Optional[int]:
+        with self.lock:
+            return len(self.orders) if self._ready() else None
+
+    def orders_get(self, symbol: str = None, group: str = None, ticket: int = None):
+        with self.lock:
+            if not self._ready():
+                return None
+            return tuple(self._order_record(o) for o in self.orders.values()
+                         if not ((symbol and o['symbol'] != symbol) or (ticket is not None and o['ticket'] != ticket)
+                                 or (group and not self._match_group(o['symbol'], group))))
+
+    def _order_record(self, o: Dict) -> TradeOrder:
+        _, bid, _ = self.ticks[o['symbol']]
+        return TradeOrder(
+            o['ticket'], int(o['time_setup']), int(o['time_setup'] * 1000), int(o.get('time_done', 0)), o['type'],
+            o['type_filling'], o.get('state', self.ORDER_STATE_PLACED), o['magic'], o.get('position_id', 0),
+            o['volume'], o['volume'] if o.get('state', self.ORDER_STATE_PLACED) == self.ORDER_STATE_PLACED else 0.0,
+            o['price_open'], 0.0, 0.0, bid, o['symbol'], o['comment'],
+        )
+
+    # ----- History -----
+
+    @staticmethod
+    def _timestamp(value) -> Optional[float]:
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp()
+        return float(value)
+
+    def _in_range(self, timestamp: float, date_from, date_to) -> bool:
+        start, end = self._timestamp(date_from), self._timestamp(date_to)
+        return (start is None or timestamp >= start) and (end is None or timestamp <= end)
+
+    def history_deals_get(self, date_from=None, date_to=None, group: str = None, ticket: int = None,
+                          position: int = None):
+        with self.lock:
+            if not self._ready():
+                return None
+            return tuple(TradeDeal(
+                d['ticket'], d['order'], int(d['time']), int(d['time'] * 1000), d['type'], d['entry'], d['magic'],
+                d['position_id'], d['reason'], d['volume'], d['price'], 0.0, 0.0, d['profit'], d['symbol'], d['comment'],
+            ) for d in self.deals
+                if (ticket is None or d['order'] == ticket) and (position is None or d['position_id'] == position)
+                and (ticket is not None or position is not None or self._in_range(d['time'], date_from, date_to))
+                and (not group or self._match_group(d['symbol'], group)))
+
+    def history_deals_total(self, date_from=None, date_to=None) -> Optional[int]:
+        deals = self.history_deals_get(date_from, date_to)
+        return None if deals is None else len(deals)
+
+    def history_orders_get(self, date_from=None, date_to=None, group: str = None, ticket: int = None,
+                           position: int = None):
+        with self.lock:
+            if not self._ready():
+                return None
+            return tuple(self._order_record(o) for o in self.history_orders
+                         if (ticket is None or o['ticket'] == ticket) and (position is None or o['position_id'] == position)
+                         and (ticket is not None or position is not None or self._in_range(o['time_done'], date_from, date_to))
+                         and (not group or self._match_group(o['symbol'], group)))
+
+    def history_orders_total(self, date_from=None, date_to=None) -> Optional[int]:
+        orders = self.history_orders_get(date_from, date_to)
+        return None if orders is None else len(orders)
+
+    # ----- Calculations -----
+
+    def order_calc_margin(self, action: int, symbol: str, volume: float, price: float) -> Optional[float]:
+        if symbol not in self.specs:
+            return None
+        return round(self._required_margin(symbol, volume, price), 2)
+
+    def order_calc_profit(self, action: int, symbol: str, volume: float, price_open: float,
+                          price_close: float) -> Optional[float]:
+        if symbol not in self.specs:
+            return None
+        sign = 1 if action == self.ORDER_TYPE_BUY else -1
+        return round((price_close - price_open) * sign * volume * self.specs[symbol].contract_size, 2)
+
+    # ----- order_send -----
+
+    def order_send(self, request: Dict) -> Optional[OrderSendResult]:
+        """ส่ง trade request - latency จำลองเกิดก่อน match (ราคาอาจเปลี่ยนระหว่างทาง)"""
+        delay_ms = self.latency_ms + (self.latency_rng.uniform(0, self.latency_jitter_ms) if self.latency_jitter_ms else 0.0)
+        if delay_ms > 0:
+            self.clock.sleep(delay_ms / 1000)
+
+        with self.lock:
+            if not self._ready():
+                return None
+            self.order_sends += 1
+            if self._throttle():
+                retcode, order, deal, price, volume, comment = self.TRADE_RETCODE_TOO_MANY_REQUESTS, 0, 0, 0.0, 0.0, \
+                    "Too many requests"
+            else:
+                retcode, order, deal, price, volume, comment = self._execute(dict(request))
+            symbol = request.get('symbol')
+            if symbol not in self.ticks and request.get('position') in self.positions:
+                symbol = self.positions[request['position']]['symbol']
+            _, bid, ask = self.ticks.get(symbol, (0, 0.0, 0.0))
+            return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, self.order_sends, 0,
+                                   self._trade_request(request))
+
+    def _throttle(self) -> bool:
+        """Trade server rate limit - requests ในหนึ่งวินาทีล่าสุดเกิน max_requests_per_second"""
+        if not self.max_requests_per_second:
+            return False
+        now = self.clock.time()
+        while self.request_times and now - self.request_times[0] >= 1.0:
+            self.request_times.popleft()
+        if len(self.request_times) >= self.max_requests_per_second:
+            self.throttled += 1
+            return True
+        self.request_times.append(now)
+        return False
+
+    def _trade_request(self, request: Dict) -> TradeRequest:
+        return TradeRequest(*(request.get(name, 0 if name not in ('symbol', 'comment') else "")
+                              for name in TradeRequest._fields))
+
+    def _execute(self, request: Dict):
+        """คืน (retcode, order, deal, price, volume, comment)"""
+        action = request.get('action')
+        volume = request.get('volume', 0.0)
+        done = "Request executed"
+
+        if not self.autotrading:
+            return self.TRADE_RETCODE_CLIENT_DISABLES_AT, 0, 0, 0.0, 0.0, "AutoTrading disabled by client"
+
+        if action == self.TRADE_ACTION_CLOSE_BY:
+            return self._execute_close_by(request)
+        if action in (self.TRADE_ACTION_REMOVE, self.TRADE_ACTION_MODIFY):
+            return self._execute_order_change(request)
+
+        if action == self.TRADE_ACTION_DEAL and request.get('position'):
+            position = self.positions.get(request['position'])
+            if not position:
+                return self.TRADE_RETCODE_POSITION_CLOSED, 0, 0, 0.0, 0.0, "Position closed"
+            request.setdefault('symbol', position['symbol'])
+
+        symbol = request.get('symbol')
+        spec = self.specs.get(symbol)
+        if not spec:
+            return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+        if not self.market_open:
+            return self.TRADE_RETCODE_MARKET_CLOSED, 0, 0, 0.0, 0.0, "Market closed"
+        if spec.trade_mode == self.SYMBOL_TRADE_MODE_DISABLED:
+            return self.TRADE_RETCODE_TRADE_DISABLED, 0, 0, 0.0, 0.0, "Trade disabled"
+        if not self._valid_volume(spec, volume):
+            return self.TRADE_RETCODE_INVALID_VOLUME, 0, 0, 0.0, 0.0, "Invalid volume"
+        if not self._valid_filling(spec, action, request.get('type_filling', self.ORDER_FILLING_FOK)):
+            return self.TRADE_RETCODE_INVALID_FILL, 0, 0, 0.0, 0.0, "Unsupported filling mode"
+
+        if action == self.TRADE_ACTION_DEAL:
+            if request.get('position'):
+                return self._execute_close(request)
+            return self._execute_market(request)
+        if action == self.TRADE_ACTION_PENDING:
+            return self._execute_pending(request)
+        return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+
+    @staticmethod
+    def _valid_volume(spec: SymbolSpec, volume: float) -> bool:
+        if volume < spec.volume_min - 1e-9 or volume > spec.volume_max + 1e-9:
+            return False
+        steps = volume / spec.volume_step
+        return abs(steps - round(steps)) < 1e-6
+
+    def _valid_filling(self, spec: SymbolSpec, action: int, mode: int) -> bool:
+        if mode == self.ORDER_FILLING_FOK:
+            return bool(spec.filling_flags & self.SYMBOL_FILLING_FOK)
+        if mode == self.ORDER_FILLING_IOC:
+            return bool(spec.filling_flags & self.SYMBOL_FILLING_IOC)
+        # RETURN: ใช้ได้กับ pending orders เท่านั้น (market execution)
+        return mode == self.ORDER_FILLING_RETURN and action == self.TRADE_ACTION_PENDING
+
+    def _execute_market(self, request: Dict):
+        symbol, volume = request['symbol'], request['volume']
+        _, bid, ask = self.ticks[symbol]
+        if request.get('type') not in (self.ORDER_TYPE_BUY, self.ORDER_TYPE_SELL):
+            return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+        is_buy = request['type'] == self.ORDER_TYPE_BUY
+        price = ask if is_buy else bid
+        position_type = self.POSITION_TYPE_BUY if is_buy else self.POSITION_TYPE_SELL
+        order_ticket = next(self.order_ids)
+
+        if not self.hedging:
+            existing = next((p for p in self.positions.values() if p['symbol'] == symbol), None)
+            if existing and existing['type'] != position_type:
+                # Netting: ปิด/กลับด้าน position เดิม
+                closed = min(volume, existing['volume'])
+                self._close(existing, closed, price, order_ticket, request.get('comment', '')[:31])
+                volume = round(volume - closed, 8)
+                if volume <= 1e-9:
+                    return self.TRADE_RETCODE_DONE, order_ticket, self.deals[-1]['ticket'], price, closed, "Request executed"
+            elif existing:
+                total = existing['volume'] + volume
+                existing['price_open'] = round((existing['price_open'] * existing['volume'] + price * volume) / total,
+                                               self.specs[symbol].digits)
+                existing['volume'] = round(total, 8)
+                self._record_deal(order_ticket, existing['ticket'], symbol, position_type, self.DEAL_ENTRY_IN,
+                                  volume, price, 0.0, request.get('magic', 0), request.get('comment', '')[:31])
+                return self.TRADE_RETCODE_DONE, order_ticket, self.deals[-1]['ticket'], price, volume, "Request executed"
+
+        if self._equity() - self._margin() < self._required_margin(symbol, volume, price):
+            return self.TRADE_RETCODE_NO_MONEY, 0, 0, 0.0, 0.0, "No money"
+        self._open(symbol, position_type, volume, price, request.get('magic', 0), request.get('comment', '')[:31],
+                   order_ticket)
+        return self.TRADE_RETCODE_DONE, order_ticket, self.deals[-1]['ticket'], price, volume, "Request executed"
+
+    def _execute_close(self, request: Dict):
+        position = self.positions[request['position']]
+        expected_type = self.ORDER_TYPE_SELL if position['type'] == self.POSITION_TYPE_BUY else self.ORDER_TYPE_BUY
+        if request.get('type', expected_type) != expected_type:
+            return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+        if request['volume'] > position['volume'] + 1e-9:
+            return self.TRADE_RETCODE_INVALID_CLOSE_VOLUME, 0, 0, 0.0, 0.0, "Invalid close volume"
+        price = self._close_price(position)
+        order_ticket = next(self.order_ids)
+        self._close(position, request['volume'], price, order_ticket, request.get('comment', '')[:31])
+        return self.TRADE_RETCODE_DONE, order_ticket, self.deals[-1]['ticket'], price, request['volume'], "Request executed"
+
+    def _execute_close_by(self, request: Dict):
+        position = self.positions.get(request.get('position'))
+        opposite = self.positions.get(request.get('position_by'))
+        if not position or not opposite:
+            return self.TRADE_RETCODE_POSITION_CLOSED, 0, 0, 0.0, 0.0, "Position closed"
+        if not self.hedging or position['type'] == opposite['type'] or position['symbol'] != opposite['symbol']:
+            return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+        volume = min(position['volume'], opposite['volume'])
+        order_ticket = next(self.order_ids)
+        # ปิดชนกัน: ทั้งสองขาปิดที่ราคาเปิดของอีกขา (กำไรรวม = ส่วนต่างราคาเปิด)
+        price = opposite['price_open']
+        self._close(position, volume, price, order_ticket, request.get('comment', 'close by')[:31], entry=self.DEAL_ENTRY_OUT_BY)
+        self._close(opposite, volume, opposite['price_open'], order_ticket, request.get('comment', 'close by')[:31],
+                    entry=self.DEAL_ENTRY_OUT_BY)
+        return self.TRADE_RETCODE_DONE, order_ticket, self.deals[-1]['ticket'], price, volume, "Request executed"
+
+    def _price_error(self, spec: SymbolSpec, order_type: int, price: float) -> bool:
+        """ราคา pending ต้องอยู่ฝั่งที่ถูกและห่างตลาดอย่างน้อย stops_level"""
+        _, bid, ask = self.ticks[spec.name]
+        gap = spec.stops_level * spec.point
+        return not {
+            self.ORDER_TYPE_BUY_LIMIT: price <= ask - gap and price < ask,
+            self.ORDER_TYPE_SELL_LIMIT: price >= bid + gap and price > bid,
+            self.ORDER_TYPE_BUY_STOP: price >= ask + gap and price > ask,
+            self.ORDER_TYPE_SELL_STOP: price <= bid - gap and price < bid,
+        }.get(order_type, False)
+
+    def _frozen(self, order: Dict) -> bool:
+        """Order ที่อยู่ใกล้ตลาดภายใน freeze_level แก้ไข/ลบไม่ได้"""
+        spec = self.specs[order['symbol']]
+        if not spec.freeze_level:
+            return False
+        _, bid, ask = self.ticks[spec.name]
+        market = ask if order['type'] in (self.ORDER_TYPE_BUY_LIMIT, self.ORDER_TYPE_BUY_STOP) else bid
+        return abs(order['price_open'] - market) < spec.freeze_level * spec.point
+
+    def _execute_pending(self, request: Dict):
+        spec = self.specs[request['symbol']]
+        order_type, price = request.get('type'), round(request.get('price', 0.0), spec.digits)
+        if self._price_error(spec, order_type, price):
+            return self.TRADE_RETCODE_INVALID_PRICE, 0, 0, 0.0, 0.0, "Invalid price"
+        if self._equity() - self._margin() < self._required_margin(spec.name, request['volume'], price):
+            return self.TRADE_RETCODE_NO_MONEY, 0, 0, 0.0, 0.0, "No money"
+        ticket = next(self.order_ids)
+        self.orders[ticket] = {
+            'ticket': ticket, 'symbol': spec.name, 'type': order_type, 'volume': request['volume'],
+            'price_open': price, 'magic': request.get('magic', 0), 'comment': request.get('comment', '')[:31],
+            'type_filling': request.get('type_filling', self.ORDER_FILLING_FOK), 'time_setup': self.clock.time(),
+        }
+        self.trigger_bounds.pop(spec.name, None)
+        return self.TRADE_RETCODE_DONE, ticket, 0, price, request['volume'], "Request executed"
+
+    def _execute_order_change(self, request: Dict):
+        order = self.orders.get(request.get('order'))
+        if not order:
+            return self.TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, "Invalid request"
+        if self._frozen(order):
+            return self.TRADE_RETCODE_FROZEN, 0, 0, 0.0, 0.0, "Order frozen"
+        self.trigger_bounds.pop(order['symbol'], None)
+
+        if request['action'] == self.TRADE_ACTION_REMOVE:
+            del self.orders[order['ticket']]
+            self._archive_order(order, self.ORDER_STATE_CANCELED)
+            return self.TRADE_RETCODE_DONE, order['ticket'], 0, 0.0, 0.0, "Request executed"
+
+        spec = self.specs[order['symbol']]
+        price = round(request.get('price', order['price_open']), spec.digits)
+        if abs(price - order['price_open']) < spec.point / 2:
+            return self.TRADE_RETCODE_NO_CHANGES, 0, 0, 0.0, 0.0, "No changes"
+        if self._price_error(spec, order['type'], price):
+            return self.TRADE_RETCODE_INVALID_PRICE, 0, 0, 0.0, 0.0, "Invalid price"
+        order['price_open'] = price
+        return self.TRADE_RETCODE_DONE, order['ticket'], 0, price, order['volume'], "Request executed"
+
+# Test function for standalone usage
+def test_emulator_terminal():
+    """Test emulator matching + retcodes (python -m mt5_emulator.terminal)"""
+    print("🧪 Testing MT5 Emulator Terminal...")
+
+    class StepClock:
+        def __init__(self):
+            self.now = 1704067200.0
+
+        def time(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+    clock = StepClock()
+    terminal = EmulatorTerminal(seed=7, clock=clock, latency_ms=25)
+    terminal.initialize()
+    tick = terminal.symbol_info_tick("XAUUSD")
+    print(f"   Tick: {tick.bid} / {tick.ask}")
+
+    checks = {
+        "market FOK": terminal.order_send({"action": 1, "symbol": "XAUUSD", "volume": 0.01, "type": 0}).retcode,
+        "volume 0.015 (10014)": terminal.order_send({"action": 1, "symbol": "XAUUSD", "volume": 0.015, "type": 0}).retcode,
+        "market RETURN (10030)": terminal.order_send({"action": 1, "symbol": "XAUUSD", "volume": 0.01, "type": 0,
+                                                       "type_filling": 2}).retcode,
+        "buy limit above ask (10015)": terminal.order_send({"action": 5, "symbol": "XAUUSD", "volume": 0.01, "type": 2,
+                                                             "price": tick.ask + 5, "type_filling": 2}).retcode,
+        "buy limit": terminal.order_send({"action": 5, "symbol": "XAUUSD", "volume": 0.01, "type": 2,
+                                          "price": tick.ask - 1, "type_filling": 2}).retcode,
+    }
+    terminal.market_open = False
+    checks["market closed (10018)"] = terminal.order_send({"action": 1, "symbol": "XAUUSD", "volume": 0.01, "type": 1}).retcode
+    terminal.market_open = True
+    terminal.autotrading = False
+    checks["autotrading off (10027)"] = terminal.order_send({"action": 1, "symbol": "XAUUSD", "volume": 0.01, "type": 1}).retcode
+    terminal.autotrading = True
+    for name, retcode in checks.items():
+        print(f"   {name}: {retcode}")
+
+    clock.sleep(3600)
+    print(f"   After 1h: {terminal.positions_total()} positions, {terminal.orders_total()} orders, "
+          f"{len(terminal.history_deals_get(0, clock.now))} deals, equity ${terminal.account_info().equity:,.2f}")
+
+    print("✅ MT5 Emulator Terminal Test Completed")
+
+if __name__ == "__main__":
+    test_emulator_terminal()
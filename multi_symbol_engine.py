@@ -0,0 +1,358 @@
+"""
+Multi-Symbol Engine - Many instruments on one terminal connection
+multi_symbol_engine.py
+One SmartProfitManager per symbol (own survivability params + magic partition) fed by
+a single MarketDataService, with aggregate risk enforced at account level
+"""
+
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import MetaTrader5 as mt5
+from api_connector import BackendStatusClient
+from engine_logger import get_logger
+from market_data_service import MarketDataService, MarketDataSettings, MarketSnapshot
+from smart_profit_manager import SmartProfitManager
+
+log = get_logger(__name__)
+
+@dataclass
+class AccountRiskSettings:
+    """Limits ของทั้ง account (ทุก symbol รวมกัน)"""
+    max_total_lots: float = 0.0            # positions + pending ของเรา, 0 = ไม่จำกัด
+    min_margin_level: float = 300.0        # % - ต่ำกว่านี้ห้ามเพิ่ม exposure (0 = ปิด)
+    max_drawdown_pct: float = 20.0         # equity ต่ำกว่า balance เกินนี้ = ห้ามเพิ่ม exposure
+    emergency_drawdown_pct: float = 35.0   # เกินนี้ = emergency stop ทุก engine (0 = ปิด)
+    check_interval: float = 1.0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'AccountRiskSettings':
+        risk_config = (config or {}).get('multi_symbol', {}).get('account_risk', {})
+        return cls(**{key: value for key, value in risk_config.items() if key in cls.__dataclass_fields__})
+
+class AccountRiskGuard:
+    """
+    Aggregate exposure check over every engine's magic partition
+
+    evaluate() reads one MarketSnapshot: equity drawdown vs balance, margin level and the
+    total lots of our positions + pending orders across all symbols. Any breached limit
+    blocks new exposure (engines ask allows_new_exposure() before placing grid orders or
+    grid market orders - closes, hedges and emergency requests are never blocked).
+    emergency_drawdown_pct is latched and reported once so the engine can stop everything.
+    """
+
+    def __init__(self, settings: AccountRiskSettings = None):
+        self.settings = settings or AccountRiskSettings()
+        self.blocked = False
+        self.emergency = False
+        self.reasons: List[str] = []
+        self.figures: Dict = {}
+        self.checks = 0
+        self.blocks = 0
+
+    def allows_new_exposure(self) -> bool:
+        return not self.blocked and not self.emergency
+
+    def evaluate(self, snapshot: MarketSnapshot, partitions: Dict[str, int]) -> bool:
+        """partitions = {symbol: magic} -> True ครั้งแรกที่ถึง emergency_drawdown_pct"""
+        s = self.settings
+        account = snapshot.account
+        balance = account.get('balance', 0) or 0
+        equity = account.get('equity', balance) or 0
+        margin_level = account.get('margin_level', 0) or 0     # 0 = ไม่มี margin ใช้อยู่
+        drawdown_pct = max(0.0, (balance - equity) / balance * 100) if balance > 0 else 0.0
+
+        position_lots = sum(pos.volume for symbol, magic in partitions.items()
+                            for pos in snapshot.positions(symbol) if pos.magic == magic)
+        pending_lots = sum(order.volume_current for symbol, magic in partitions.items()
+                           for order in snapshot.orders(symbol) if order.magic == magic)
+
+        reasons = []
+        if s.max_total_lots and position_lots + pending_lots >= s.max_total_lots:
+            reasons.append(f"lots {position_lots + pending_lots:.2f} >= {s.max_total_lots:.2f}")
+        if s.min_margin_level and margin_level and margin_level < s.min_margin_level:
+            reasons.append(f"margin level {margin_level:.0f}% < {s.min_margin_level:.0f}%")
+        if s.max_drawdown_pct and drawdown_pct >= s.max_drawdown_pct:
+            reasons.append(f"drawdown {drawdown_pct:.1f}% >= {s.max_drawdown_pct:.1f}%")
+
+        self.checks += 1
+        self.figures = {
+            'balance': round(balance, 2),
+            'equity': round(equity, 2),
+            'drawdown_pct': round(drawdown_pct, 2),
+            'margin_level': round(margin_level, 1),
+            'position_lots': round(position_lots, 2),
+            'pending_lots': round(pending_lots, 2),
+        }
+
+        blocked = bool(reasons)
+        if blocked and not self.blocked:
+            self.blocks += 1
+            log.warning(f"🛡️ Account risk limit - new exposure blocked: {'; '.join(reasons)}")
+        elif self.blocked and not blocked:
+            log.info("🛡️ Account risk back within limits - new exposure allowed")
+        self.blocked = blocked
+        self.reasons = reasons
+
+        if s.emergency_drawdown_pct and drawdown_pct >= s.emergency_drawdown_pct and not self.emergency:
+            self.emergency = True
+            log.warning(f"🚨 Account drawdown {drawdown_pct:.1f}% >= {s.emergency_drawdown_pct:.1f}% - emergency stop")
+            return True
+        return False
+
+    def status(self) -> Dict:
+        return dict(self.figures, blocked=self.blocked, emergency=self.emergency, reasons=list(self.reasons),
+                    checks=self.checks, blocks=self.blocks)
+
+class SymbolConnector:
+    """
+    mt5_connector view ของ symbol เดียว
+
+    SmartProfitManager reads its symbol, specs, account and price through the connector;
+    this view answers for one symbol from the shared MarketDataService and delegates
+    everything else to the real MT5AutoConnector.
+    """
+
+    def __init__(self, base, symbol: str, market_data: MarketDataService):
+        self.base = base
+        self.symbol = symbol
+        self.market_data = market_data
+        # get_symbol_specifications เขียนทับ base.symbol_info - คืนค่าเดิมของ gold symbol
+        previous = getattr(base, 'symbol_info', None)
+        try:
+            self.symbol_info = base.get_symbol_specifications(symbol)
+        finally:
+            base.symbol_info = previous
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def get_gold_symbol(self):
+        return self.symbol
+
+    def get_symbol_info(self):
+        return self.symbol_info
+
+    def get_account_info(self):
+        return self.market_data.current().account or self.base.get_account_info()
+
+    def get_current_price(self):
+        tick = self.market_data.current().tick(self.symbol)
+        if not tick:
+            return None
+        return {'bid': tick.bid, 'ask': tick.ask, 'spread': tick.ask - tick.bid, 'time': tick.time}
+
+class MultiSymbolEngine:
+    """
+    Orchestrates one grid engine per symbol in this process
+
+    Engines keep their own loops / schedulers, survivability params and magic
+    (base magic + magic_offset, offset defaults to the symbol's index so the first
+    symbol keeps the single-symbol magic); a symbol entry may override whole config
+    sections for its engine ("config": {"grid_reconciler": {"min_price": 1.0}}).
+    Their MT5 reads go through one MarketDataService; order_send already shares one
+    OrderDispatcher per account.
+    A risk thread evaluates AccountRiskGuard every check_interval. Exposes the same
+    surface the GUI uses on SmartProfitManager (start / stop / status / recovery).
+    """
+
+    def __init__(self, mt5_connector, survivability_params: Dict, config: Dict):
+        self.config = config
+        multi_config = (config or {}).get('multi_symbol', {})
+        self.market_data = MarketDataService(settings=MarketDataSettings.from_config(config),
+                                             account_provider=mt5_connector.get_account_info)
+        self.account_risk = AccountRiskGuard(AccountRiskSettings.from_config(config))
+        self.backend_client = BackendStatusClient.from_config(config, account_provider=mt5_connector.get_account_info)
+        self.engines: Dict[str, SmartProfitManager] = {}
+        self.stop_event = threading.Event()
+        self.risk_thread = None
+
+        entries = multi_config.get('symbols') or [mt5_connector.get_gold_symbol()]
+        for index, entry in enumerate(entries):
+            entry = {'symbol': entry} if isinstance(entry, str) else dict(entry)
+            symbol = entry.get('symbol')
+            if not symbol or symbol in self.engines:
+                continue
+            if not mt5.symbol_select(symbol, True) or not mt5.symbol_info(symbol):
+                log.error(f"❌ Symbol {symbol} not available - skipped")
+                continue
+
+            self.market_data.add_symbol(symbol)
+            params = dict(survivability_params, **entry.get('survivability_params', {}))
+            manager = SmartProfitManager(SymbolConnector(mt5_connector, symbol, self.market_data), params,
+                                         self.engine_config(config, symbol, not self.engines, entry.get('config')),
+                                         magic_offset=entry.get('magic_offset', index))
+            if entry.get('grid_spacing'):
+                manager.grid_spacing = entry['grid_spacing']
+            manager.market_data = self.market_data
+            manager.account_risk = self.account_risk
+            manager.backend_client = self.backend_client
+            self.engines[symbol] = manager
+
+        log.info(f"🧩 Multi-symbol engine: " +
+                 ", ".join(f"{symbol} (magic {m.magic_number})" for symbol, m in self.engines.items()))
+
+    @staticmethod
+    def engine_config(config: Dict, symbol: str, primary: bool, overrides: Dict = None) -> Dict:
+        """Config ต่อ engine - overrides ต่อ section (เช่น grid_reconciler.min_price) + ไฟล์ dump แยกตาม symbol"""
+        engine_config = copy.deepcopy(config)
+        for section, values in (overrides or {}).items():
+            if isinstance(values, dict):
+                engine_config[section] = dict(engine_config.get(section, {}), **values)
+            else:
+                engine_config[section] = values
+        metrics_config = engine_config.setdefault('order_metrics', {})
+        dump_file = metrics_config.get('dump_file', "order_metrics.json")
+        if dump_file and not primary:
+            name, ext = dump_file.rsplit('.', 1) if '.' in dump_file else (dump_file, "json")
+            metrics_config['dump_file'] = f"{name}_{symbol}.{ext}"
+        return engine_config
+
+    def partitions(self) -> Dict[str, int]:
+        return {symbol: manager.magic_number for symbol, manager in self.engines.items()}
+
+    # ----- Lifecycle -----
+
+    def start_trading(self) -> bool:
+        if not self.engines:
+            log.error("❌ Multi-symbol engine has no tradable symbols")
+            return False
+        if self.account_risk.emergency:
+            log.error("❌ Cannot start trading - account emergency stop is active")
+            return False
+
+        self.market_data.start()
+        self.check_account_risk()
+        started = [symbol for symbol, manager in self.engines.items() if manager.start_trading()]
+        failed = [symbol for symbol in self.engines if symbol not in started]
+        if failed:
+            log.error(f"❌ Engines failed to start: {', '.join(failed)}")
+        if not started:
+            self.market_data.stop()
+            return False
+
+        self.stop_event.clear()
+        self.risk_thread = threading.Thread(target=self.risk_loop, daemon=True, name="account-risk")
+        self.risk_thread.start()
+        log.info(f"✅ Multi-symbol trading active: {', '.join(started)}")
+        return True
+
+    def stop_trading(self):
+        self.stop_event.set()
+        for manager in self.engines.values():
+            manager.stop_trading()
+        self.market_data.stop()
+        log.info("✅ Multi-symbol engine stopped")
+
+    def risk_loop(self):
+        while not self.stop_event.is_set():
+            self.check_account_risk()
+            self.stop_event.wait(self.account_risk.settings.check_interval)
+
+    def check_account_risk(self):
+        try:
+            if self.account_risk.evaluate(self.market_data.current(), self.partitions()):
+                self.trigger_emergency_stop()
+        except Exception as e:
+            log.error(f"❌ Account risk check error: {e}")
+
+    def trigger_emergency_stop(self):
+        """หยุดทุก engine + ยกเลิก pending (positions คงไว้ เหมือน trigger_emergency_stop ของแต่ละ engine)"""
+        for manager in self.engines.values():
+            manager.emergency_stop_triggered = True
+            manager.trigger_emergency_stop()
+
+    # ----- GUI surface -----
+
+    @property
+    def trading_active(self) -> bool:
+        return any(manager.trading_active for manager in self.engines.values())
+
+    @property
+    def emergency_stop_triggered(self) -> bool:
+        return self.account_risk.emergency or any(m.emergency_stop_triggered for m in self.engines.values())
+
+    @property
+    def recovery_auto_mode(self) -> bool:
+        return any(manager.recovery_auto_mode for manager in self.engines.values())
+
+    @recovery_auto_mode.setter
+    def recovery_auto_mode(self, value: bool):
+        for manager in self.engines.values():
+            manager.recovery_auto_mode = value
+
+    def manual_trigger_recovery(self) -> bool:
+        return any([manager.manual_trigger_recovery() for manager in self.engines.values()])
+
+    def get_grid_status(self) -> Dict:
+        """รวม status ทุก symbol (ผลรวม / ค่าที่แย่ที่สุด) + รายละเอียดต่อ symbol"""
+        try:
+            statuses = {symbol: manager.get_grid_status() for symbol, manager in self.engines.items()}
+            valid = [status for status in statuses.values() if 'error' not in status]
+            managers = list(self.engines.values())
+            closed = sum(manager.trades_closed for manager in managers)
+
+            def total(key):
+                return round(sum(status.get(key, 0) for status in valid), 2)
+
+            def worst(key):
+                return max((status.get(key, 0) for status in valid), default=0)
+
+            primary = valid[0] if valid else {}
+            return {
+                'trading_active': self.trading_active,
+                'symbols': statuses,
+                'gold_symbol': ", ".join(self.engines),
+                'total_pnl': total('total_pnl'),
+                'unrealized_pnl': total('unrealized_pnl'),
+                'realized_pnl': total('realized_pnl'),
+                'daily_pnl': total('daily_pnl'),
+                'active_positions': total('active_positions'),
+                'pending_orders': total('pending_orders'),
+                'trades_opened': total('trades_opened'),
+                'trades_closed': total('trades_closed'),
+                'win_rate': round(sum(m.winning_trades for m in managers) / closed * 100, 1) if closed else 0,
+                'current_drawdown': worst('current_drawdown'),
+                'max_drawdown': worst('max_drawdown'),
+                'survivability_used': worst('survivability_used'),
+                'ai_health_score': min((status.get('ai_health_score', 50) for status in valid), default=50),
+                'recovery_system': primary.get('recovery_system', {'enabled': False, 'active': False}),
+                'emergency_stop': self.account_risk.emergency or any(s.get('emergency_stop') for s in valid),
+                'account_risk': self.account_risk.status(),
+                'market_data': self.market_data.get_stats(),
+                'ai_control_mode': True,
+                'smart_profit_enabled': True
+            }
+        except Exception as e:
+            log.error(f"❌ Error getting multi-symbol status: {e}")
+            return {'error': str(e)}
+
+# Test function for standalone usage
+def test_multi_symbol_engine():
+    """Account risk guard บน snapshot จำลอง (ไม่ต้องมี MT5)"""
+    from collections import namedtuple
+    print("🧪 Testing Multi-Symbol Engine...")
+    Position = namedtuple('Position', 'symbol magic volume')
+    Order = namedtuple('Order', 'symbol magic volume_current')
+    guard = AccountRiskGuard(AccountRiskSettings(max_total_lots=0.5, max_drawdown_pct=10, emergency_drawdown_pct=20))
+    partitions = {"XAUUSD": 100, "XAGUSD": 101}
+
+    def snapshot(equity, gold_lots, silver_lots):
+        return MarketSnapshot(
+            version=1, created_at=0.0,
+            positions_by_symbol={"XAUUSD": (Position("XAUUSD", 100, gold_lots), Position("XAUUSD", 999, 5.0)),
+                                 "XAGUSD": (Position("XAGUSD", 101, silver_lots),)},
+            orders_by_symbol={"XAUUSD": (Order("XAUUSD", 100, 0.01),)},
+            account={'balance': 10000.0, 'equity': equity, 'margin_level': 2500.0})
+
+    for equity, gold, silver in ((9900, 0.1, 0.1), (9800, 0.3, 0.2), (8800, 0.1, 0.1), (7900, 0.1, 0.1)):
+        emergency = guard.evaluate(snapshot(equity, gold, silver), partitions)
+        print(f"   equity {equity} lots {gold}+{silver}: allows={guard.allows_new_exposure()} "
+              f"emergency={emergency} {guard.reasons}")
+    print(f"   {guard.status()}")
+    print("✅ Multi-Symbol Engine Test Completed")
+
+if __name__ == "__main__":
+    test_multi_symbol_engine()
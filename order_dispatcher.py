@@ -0,0 +1,240 @@
+"""
+Order Dispatcher - Rate-limited, prioritized order_send gate
+order_dispatcher.py
+One token bucket per trading account shared by every engine path. Requests wait in a
+priority queue (emergency > rescue > grid), low-priority work is shed under
+backpressure and broker throttling (10024) backs the whole account off
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable, Dict, Optional
+
+TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+
+class OrderPriority(IntEnum):
+    EMERGENCY = 0     # emergency close / cancel all - ไม่เคยถูกปฏิเสธ
+    RESCUE = 1        # basket / profit / hedge closes
+    GRID = 2          # pending orders, modify / cancel, grid market orders
+
+@dataclass
+class DispatcherSettings:
+    """Token bucket + backpressure ต่อ account"""
+    enabled: bool = True
+    rate_per_second: float = 8.0          # token เติมต่อวินาที
+    burst: int = 8                        # token สูงสุด (ส่งติดกันได้ทันที)
+    max_queue_grid: int = 20              # GRID ที่รอเกินนี้ = ปฏิเสธทันที
+    max_queue_rescue: int = 50
+    max_wait_grid: float = 5.0            # รอนานกว่านี้ = ปฏิเสธ (วินาที)
+    max_wait_rescue: float = 15.0
+    throttle_backoff_seconds: float = 1.0 # broker ตอบ 10024 -> หยุดทั้ง account
+    throttle_retries: int = 2
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'DispatcherSettings':
+        dispatcher_config = (config or {}).get('order_dispatcher', {})
+        return cls(**{key: value for key, value in dispatcher_config.items() if key in cls.__dataclass_fields__})
+
+    def max_queue(self, priority: OrderPriority) -> Optional[int]:
+        return {OrderPriority.GRID: self.max_queue_grid, OrderPriority.RESCUE: self.max_queue_rescue}.get(priority)
+
+    def max_wait(self, priority: OrderPriority) -> Optional[float]:
+        return {OrderPriority.GRID: self.max_wait_grid, OrderPriority.RESCUE: self.max_wait_rescue}.get(priority)
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    enqueued_at: float = field(compare=False)
+
+@dataclass
+class PriorityMetrics:
+    submitted: int = 0
+    sent: int = 0            # ครั้งเดียวต่อ submit (submitted = sent + rejected + รอในคิว)
+    retries: int = 0         # ส่งซ้ำหลัง broker ตอบ 10024
+    rejected: int = 0
+    throttled: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'submitted': self.submitted,
+            'sent': self.sent,
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'throttled': self.throttled,
+            'avg_wait_ms': round(self.wait_seconds / self.sent * 1000, 2) if self.sent else 0.0,
+            'max_wait_ms': round(self.max_wait_seconds * 1000, 2),
+        }
+
+class OrderDispatcher:
+    """
+    Central order_send gate
+
+    submit() blocks the calling thread until its request is at the head of the
+    priority queue and a token is available, then sends on that same thread (callers
+    keep their synchronous result). The head waits for tokens with time.sleep, the
+    rest wait on the condition, so a late emergency request jumps every grid request.
+    Backpressure: GRID / RESCUE requests are rejected (None) when their class queue is
+    full or the expected wait exceeds max_wait. A 10024 reply empties the bucket and
+    blocks the account for throttle_backoff_seconds before the request is retried.
+    """
+
+    _registry: Dict = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, settings: DispatcherSettings = None):
+        self.settings = settings or DispatcherSettings()
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.tokens = float(self.settings.burst)
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.metrics = {priority: PriorityMetrics() for priority in OrderPriority}
+        self.max_queue_depth = 0
+
+    @classmethod
+    def for_account(cls, account_key, settings: DispatcherSettings = None) -> 'OrderDispatcher':
+        """Dispatcher เดียวต่อ account - ทุก manager / symbol บน account เดียวกันแชร์ bucket"""
+        with cls._registry_lock:
+            dispatcher = cls._registry.get(account_key)
+            if dispatcher is None:
+                dispatcher = cls._registry[account_key] = cls(settings)
+            return dispatcher
+
+    def submit(self, request: Dict, send: Callable[[Dict], object], priority: OrderPriority = OrderPriority.GRID):
+        """ส่ง request ผ่าน bucket -> ผลจาก send(), None ถ้าโดน backpressure"""
+        result = None
+        with self.condition:
+            self.metrics[priority].submitted += 1
+        for attempt in range(self.settings.throttle_retries + 1):
+            if not self._acquire(priority, retry=attempt > 0):
+                return result
+            result = send(request)
+            if result is None or getattr(result, 'retcode', None) != TRADE_RETCODE_TOO_MANY_REQUESTS:
+                return result
+            self._on_throttled(priority)
+        return result
+
+    def _acquire(self, priority: OrderPriority, retry: bool = False) -> bool:
+        """รอคิว + token -> True เมื่อส่งได้ (retry = ส่งซ้ำหลัง 10024: นับใน retries ไม่ใช่ sent / rejected)"""
+        s = self.settings
+        metrics = self.metrics[priority]
+        with self.condition:
+            max_queue = s.max_queue(priority)
+            if max_queue is not None and sum(1 for t in self.queue if t.priority == priority) >= max_queue:
+                if not retry:
+                    metrics.rejected += 1
+                return False
+
+            ticket = _Ticket(int(priority), next(self.sequence), time.monotonic())
+            heapq.heappush(self.queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+            max_wait = s.max_wait(priority)
+
+            while True:
+                now = time.monotonic()
+                is_head = self.queue[0] is ticket
+                wait = self._token_wait(now) if is_head else 0.0
+                if is_head and wait <= 0:
+                    self.tokens -= 1
+                    heapq.heappop(self.queue)
+                    if retry:
+                        metrics.retries += 1
+                    else:
+                        waited = now - ticket.enqueued_at
+                        metrics.sent += 1
+                        metrics.wait_seconds += waited
+                        metrics.max_wait_seconds = max(metrics.max_wait_seconds, waited)
+                    self.condition.notify_all()
+                    return True
+
+                if max_wait is not None and now + wait - ticket.enqueued_at > max_wait:
+                    self.queue.remove(ticket)
+                    heapq.heapify(self.queue)
+                    if not retry:
+                        metrics.rejected += 1
+                    self.condition.notify_all()
+                    return False
+
+                if is_head:
+                    # รอ token นอก lock - request ที่ priority สูงกว่ายังเข้าคิวแซงได้
+                    self.condition.release()
+                    try:
+                        time.sleep(wait)
+                    finally:
+                        self.condition.acquire()
+                else:
+                    self.condition.wait(timeout=0.05)
+
+    def _token_wait(self, now: float) -> float:
+        """เติม token ตามเวลาที่ผ่านไป -> วินาทีที่ต้องรอจนได้ 1 token"""
+        s = self.settings
+        elapsed = now - self.refilled_at
+        if elapsed > 0:
+            self.tokens = min(float(s.burst), self.tokens + elapsed * s.rate_per_second)
+        elif elapsed < 0:
+            self.blocked_until = 0.0      # นาฬิกาถูกตั้งใหม่ (backtest รอบใหม่)
+        self.refilled_at = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / s.rate_per_second
+
+    def _on_throttled(self, priority: OrderPriority):
+        with self.condition:
+            self.metrics[priority].throttled += 1
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + self.settings.throttle_backoff_seconds)
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {
+                'rate_per_second': self.settings.rate_per_second,
+                'tokens': round(self.tokens, 2),
+                'queue_depth': len(self.queue),
+                'max_queue_depth': self.max_queue_depth,
+                'throttled_until': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                **{priority.name.lower(): metrics.to_dict() for priority, metrics in self.metrics.items()},
+            }
+
+# Test function for standalone usage
+def test_order_dispatcher():
+    """Grid burst vs emergency close บน bucket 5/s"""
+    from collections import namedtuple
+    print("🧪 Testing Order Dispatcher...")
+    Result = namedtuple('Result', 'retcode order')
+    dispatcher = OrderDispatcher(DispatcherSettings(rate_per_second=5.0, burst=2, max_queue_grid=6, max_wait_grid=2.0,
+                                                    throttle_backoff_seconds=0.3))
+    sent = []
+    calls = itertools.count()
+
+    def send(request):
+        sent.append(request['comment'])
+        if next(calls) == 3:
+            return Result(TRADE_RETCODE_TOO_MANY_REQUESTS, 0)    # broker throttle หนึ่งครั้ง
+        return Result(10009, len(sent))
+
+    threads = [threading.Thread(target=dispatcher.submit, args=({'comment': f"GRID_{i}"}, send, OrderPriority.GRID))
+               for i in range(10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    dispatcher.submit({'comment': "EMERGENCY"}, send, OrderPriority.EMERGENCY)
+    for thread in threads:
+        thread.join()
+
+    print(f"   Send order: {sent}")
+    print(f"   Emergency position: {sent.index('EMERGENCY') + 1} of {len(sent)}")
+    stats = dispatcher.stats()
+    print(f"   GRID: {stats['grid']}")
+    print(f"   EMERGENCY: {stats['emergency']}")
+    print("✅ Order Dispatcher Test Completed")
+
+if __name__ == "__main__":
+    test_order_dispatcher()
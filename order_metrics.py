@@ -0,0 +1,243 @@
+"""
+Order Metrics - order_send latency / retcode / slippage instrumentation
+order_metrics.py
+Every broker call is timed and counted per action and retcode. Latency and slippage
+go into HDR-style histograms (p50 / p99 / max), filling-mode retries are counted per
+placement, and the whole surface is dumped to a JSON file periodically
+"""
+
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict
+
+from engine_logger import get_logger
+
+log = get_logger(__name__)
+
+# MetaTrader5 values (ไม่ import MetaTrader5 เพื่อให้ใช้กับ emulator / backtest ได้ตรงๆ)
+ACTION_DEAL, ACTION_PENDING, ACTION_SLTP, ACTION_MODIFY, ACTION_REMOVE, ACTION_CLOSE_BY = 1, 5, 6, 7, 8, 10
+ORDER_TYPE_BUY = 0
+RETCODE_DONE = 10009
+RETCODE_NAMES = {
+    10004: "REQUOTE", 10006: "REJECT", 10008: "PLACED", 10009: "DONE", 10010: "DONE_PARTIAL", 10013: "INVALID",
+    10014: "INVALID_VOLUME", 10015: "INVALID_PRICE", 10016: "INVALID_STOPS", 10018: "MARKET_CLOSED",
+    10019: "NO_MONEY", 10020: "PRICE_CHANGED", 10021: "PRICE_OFF", 10024: "TOO_MANY_REQUESTS",
+    10025: "NO_CHANGES", 10026: "SERVER_DISABLES_AT", 10027: "CLIENT_DISABLES_AT", 10029: "FROZEN",
+    10030: "INVALID_FILL", 10031: "CONNECTION", 10036: "POSITION_CLOSED", 10038: "INVALID_CLOSE_VOLUME",
+}
+
+@dataclass
+class OrderMetricsSettings:
+    enabled: bool = True
+    dump_file: str = "order_metrics.json"
+    dump_interval_seconds: float = 60.0     # 0 = ไม่ dump
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'OrderMetricsSettings':
+        metrics_config = (config or {}).get('order_metrics', {})
+        return cls(**{key: value for key, value in metrics_config.items() if key in cls.__dataclass_fields__})
+
+class ValueHistogram:
+    """
+    HDR-style histogram - 3 significant digits per power of ten
+
+    Values under 1000 units are kept as whole units (exact for integer values), above that
+    each bucket spans 0.1% of its decade (~900 buckets per decade at most) and percentiles
+    report the bucket midpoint (capped at max), so they are within 0.5%.
+    Latency is recorded in microseconds, slippage in points.
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        value = max(0.0, value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    @staticmethod
+    def _bucket(value: float) -> int:
+        return int(value // ValueHistogram._width(value)) * ValueHistogram._width(value)
+
+    @staticmethod
+    def _width(value: float) -> int:
+        return 1 if value < 1000 else 10 ** (int(math.log10(value)) - 2)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                width = self._width(bucket)
+                return min(bucket + width / 2, self.max) if width > 1 else float(bucket)
+        return self.max
+
+    def summary(self, scale: float = 1.0, digits: int = 2) -> Dict:
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count / scale, digits) if self.count else 0.0,
+            'p50': round(self.percentile(50) / scale, digits),
+            'p99': round(self.percentile(99) / scale, digits),
+            'max': round(self.max / scale, digits),
+        }
+
+class ActionMetrics:
+    """ต่อ action (MARKET / CLOSE / PENDING / MODIFY / REMOVE / CLOSE_BY)"""
+
+    def __init__(self):
+        self.retcodes: Dict[int, int] = {}
+        self.latency_us = ValueHistogram()
+        self.slippage_points = ValueHistogram()   # adverse เท่านั้น
+        self.price_improved = 0
+        self.slippage_total = 0.0                 # signed (+ = adverse)
+
+    def to_dict(self) -> Dict:
+        data = {
+            'count': self.latency_us.count,
+            'retcodes': {f"{code} {RETCODE_NAMES.get(code, '')}".strip(): n
+                         for code, n in sorted(self.retcodes.items(), key=lambda item: str(item[0]))},
+            'latency_ms': self.latency_us.summary(scale=1000.0, digits=3),
+        }
+        fills = self.slippage_points.count + self.price_improved
+        if fills:
+            data['slippage_points'] = dict(self.slippage_points.summary(), fills=fills,
+                                           improved=self.price_improved,
+                                           mean_signed=round(self.slippage_total / fills, 2))
+        return data
+
+class OrderMetrics:
+    """
+    Thread-safe order_send instrumentation
+
+    record(): one broker call - action from the request (DEAL with a position = CLOSE),
+    retcode (None = no reply), latency, and slippage of filled deals in points
+    (+ = worse than requested for that side).
+    record_attempts(): one placement / close and how many filling-mode tries it took.
+    """
+
+    def __init__(self, point: float = 0.01, settings: OrderMetricsSettings = None):
+        self.settings = settings or OrderMetricsSettings()
+        self.point = point or 0.01
+        self.lock = threading.Lock()
+        self.actions: Dict[str, ActionMetrics] = {}
+        self.attempts: Dict[str, Dict] = {}
+        self.started = datetime.now()
+        self.last_dump = 0.0
+
+    @staticmethod
+    def action_name(request: Dict) -> str:
+        action = request.get('action')
+        if action == ACTION_DEAL:
+            return "CLOSE" if request.get('position') else "MARKET"
+        return {ACTION_PENDING: "PENDING", ACTION_SLTP: "SLTP", ACTION_MODIFY: "MODIFY",
+                ACTION_REMOVE: "REMOVE", ACTION_CLOSE_BY: "CLOSE_BY"}.get(action, str(action))
+
+    def record(self, request: Dict, result, latency_seconds: float):
+        name = self.action_name(request)
+        retcode = getattr(result, 'retcode', None) if result is not None else None
+        with self.lock:
+            metrics = self.actions.setdefault(name, ActionMetrics())
+            metrics.retcodes[retcode] = metrics.retcodes.get(retcode, 0) + 1
+            metrics.latency_us.record(latency_seconds * 1_000_000)
+
+            requested = request.get('price') or 0.0
+            filled = getattr(result, 'price', 0.0) or 0.0
+            if request.get('action') == ACTION_DEAL and retcode == RETCODE_DONE and requested > 0 and filled > 0:
+                side = 1 if request.get('type') == ORDER_TYPE_BUY else -1
+                slippage = round((filled - requested) * side / self.point, 3)
+                metrics.slippage_total += slippage
+                if slippage < 0:
+                    metrics.price_improved += 1
+                else:
+                    metrics.slippage_points.record(slippage)
+
+    def record_attempts(self, kind: str, attempts: int, success: bool):
+        with self.lock:
+            entry = self.attempts.setdefault(kind, {'calls': 0, 'attempts': 0, 'retries': 0, 'failed': 0,
+                                                    'max_attempts': 0})
+            entry['calls'] += 1
+            entry['attempts'] += attempts
+            entry['retries'] += max(0, attempts - 1)
+            entry['failed'] += 0 if success else 1
+            entry['max_attempts'] = max(entry['max_attempts'], attempts)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                'since': self.started.isoformat(),
+                'total_sends': sum(metrics.latency_us.count for metrics in self.actions.values()),
+                'actions': {name: metrics.to_dict() for name, metrics in sorted(self.actions.items())},
+                'filling_attempts': {kind: dict(entry) for kind, entry in self.attempts.items()},
+            }
+
+    def maybe_dump(self, now: float) -> bool:
+        """dump ถ้าครบ dump_interval_seconds (now = time.time() ของผู้เรียก)"""
+        interval = self.settings.dump_interval_seconds
+        if not interval or not self.settings.dump_file or now - self.last_dump < interval:
+            return False
+        self.last_dump = now
+        return self.dump(self.settings.dump_file)
+
+    def dump(self, path: str) -> bool:
+        """เขียน snapshot ลงไฟล์ (เขียนไฟล์ชั่วคราวแล้ว replace)"""
+        try:
+            data = dict(self.snapshot(), updated=datetime.now().isoformat())
+            temp_file = f"{path}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_file, path)
+            return True
+        except Exception as e:
+            log.warning(f"⚠️ Order metrics dump error: {e}")
+            return False
+
+# Test function for standalone usage
+def test_order_metrics():
+    """จำลอง order_send results"""
+    import random
+    from collections import namedtuple
+    print("🧪 Testing Order Metrics...")
+    Result = namedtuple('Result', 'retcode price')
+    metrics = OrderMetrics(point=0.01)
+    rng = random.Random(3)
+
+    for _ in range(500):
+        requested = 2000.0
+        filled = requested + rng.choice([0.0, 0.0, 0.01, 0.03, -0.01])
+        metrics.record({'action': ACTION_DEAL, 'type': ORDER_TYPE_BUY, 'price': requested},
+                       Result(RETCODE_DONE, filled), rng.lognormvariate(math.log(0.025), 0.4))
+    for retcode in [10009] * 40 + [10030] * 8 + [10024] * 2:
+        metrics.record({'action': ACTION_PENDING, 'price': 1995.0}, Result(retcode, 0.0), rng.uniform(0.01, 0.05))
+    metrics.record({'action': ACTION_REMOVE, 'order': 1}, None, 0.2)
+    for attempts in [1] * 30 + [2] * 8 + [4]:
+        metrics.record_attempts("PENDING", attempts, attempts < 4)
+
+    snapshot = metrics.snapshot()
+    for name, data in snapshot['actions'].items():
+        print(f"   {name}: {data}")
+    print(f"   Filling attempts: {snapshot['filling_attempts']}")
+
+    histogram = ValueHistogram()
+    for value in (10999.0, 1004.0, 123456.0, 7.0):
+        for _ in range(3):
+            histogram.record(value)
+        error = abs(histogram.percentile(50) - value) / value * 100
+        print(f"   Histogram constant {value:,.0f}: p50 {histogram.percentile(50):,.1f} ({error:.2f}% error)")
+        histogram = ValueHistogram()
+    print("✅ Order Metrics Test Completed")
+
+if __name__ == "__main__":
+    test_order_metrics()
@@ -0,0 +1,173 @@
+"""
+Pending Order Book - Price-Sorted Index for Resting Orders
+pending_order_book.py
+Dict-compatible store for pending orders with per-direction sorted price index (bisect)
+"""
+
+import bisect
+from collections.abc import MutableMapping
+from typing import Dict, List, Optional, Tuple
+
+DIRECTIONS = ("BUY", "SELL")
+
+class PendingOrderBook(MutableMapping):
+    """
+    Drop-in replacement for the plain pending_orders dict
+
+    Keys are order tickets, values are the usual order info dicts
+    ({'order_id', 'price', 'direction', 'lot_size', 'time'}).
+    Every insert/delete also updates a sorted (price, order_id) list per direction,
+    so near-price and range lookups are O(log n) instead of a full scan.
+    """
+
+    def __init__(self, orders: Dict = None):
+        self.orders = {}
+        self.price_index = {direction: [] for direction in DIRECTIONS}
+        self.frozen = False
+
+        if orders:
+            for order_id, order_info in orders.items():
+                self[order_id] = order_info
+
+    # ----- MutableMapping interface -----
+
+    def __getitem__(self, order_id):
+        return self.orders[order_id]
+
+    def __setitem__(self, order_id, order_info: Dict):
+        self._check_writable()
+        if order_id in self.orders:
+            self._unindex(order_id, self.orders[order_id])
+
+        self.orders[order_id] = order_info
+        self._index(order_id, order_info)
+
+    def __delitem__(self, order_id):
+        self._check_writable()
+        order_info = self.orders.pop(order_id)
+        self._unindex(order_id, order_info)
+
+    def __iter__(self):
+        return iter(self.orders)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __repr__(self):
+        return f"PendingOrderBook({len(self.orders)} orders: {self.count('BUY')} BUY, {self.count('SELL')} SELL)"
+
+    # ----- Copy-on-write support (state_store) -----
+
+    def freeze(self) -> 'PendingOrderBook':
+        """ทำให้ book นี้เป็น read-only (ใช้กับ state ที่ publish แล้ว)"""
+        self.frozen = True
+        return self
+
+    def copy(self) -> 'PendingOrderBook':
+        """Writable copy - O(n) ไม่ต้อง sort index ใหม่"""
+        book = PendingOrderBook()
+        book.orders = dict(self.orders)
+        book.price_index = {direction: list(index) for direction, index in self.price_index.items()}
+        return book
+
+    def _check_writable(self):
+        if self.frozen:
+            raise TypeError("PendingOrderBook is frozen - update it through the state store")
+
+    # ----- Index maintenance -----
+
+    def _index(self, order_id, order_info: Dict):
+        direction = order_info.get('direction')
+        if direction in self.price_index:
+            bisect.insort(self.price_index[direction], (order_info['price'], order_id))
+
+    def _unindex(self, order_id, order_info: Dict):
+        direction = order_info.get('direction')
+        if direction not in self.price_index:
+            return
+
+        index = self.price_index[direction]
+        key = (order_info['price'], order_id)
+        pos = bisect.bisect_left(index, key)
+        if pos < len(index) and index[pos] == key:
+            index.pop(pos)
+
+    def update_price(self, order_id, new_price: float):
+        """Move an order to a new price (e.g. after TRADE_ACTION_MODIFY) keeping the index in sync"""
+        order_info = dict(self.orders[order_id])
+        order_info['price'] = new_price
+        self[order_id] = order_info
+
+    # ----- Queries -----
+
+    def count(self, direction: str) -> int:
+        """Number of resting orders on one side"""
+        return len(self.price_index.get(direction, []))
+
+    def prices(self, direction: str) -> List[float]:
+        """Sorted prices of one side"""
+        return [price for price, _ in self.price_index.get(direction, [])]
+
+    def orders_for(self, direction: str) -> List[Dict]:
+        """Order info dicts of one side, sorted by price"""
+        return [self.orders[order_id] for _, order_id in self.price_index.get(direction, [])]
+
+    def price_bounds(self, direction: str) -> Optional[Tuple[float, float]]:
+        """(lowest, highest) price of one side or None when empty"""
+        index = self.price_index.get(direction, [])
+        if not index:
+            return None
+        return index[0][0], index[-1][0]
+
+    def nearest(self, target_price: float, direction: str) -> Optional[Tuple[float, Dict]]:
+        """Closest order to target_price on one side -> (distance, order_info) or None"""
+        index = self.price_index.get(direction, [])
+        if not index:
+            return None
+
+        pos = bisect.bisect_left(index, (target_price,))
+        candidates = []
+        if pos < len(index):
+            candidates.append(index[pos])
+        if pos > 0:
+            candidates.append(index[pos - 1])
+
+        price, order_id = min(candidates, key=lambda item: abs(item[0] - target_price))
+        return abs(price - target_price), self.orders[order_id]
+
+    def in_range(self, direction: str, low: float, high: float) -> List[Dict]:
+        """All orders of one side with low <= price <= high, sorted by price"""
+        index = self.price_index.get(direction, [])
+        start = bisect.bisect_left(index, (low,))
+        end = bisect.bisect_right(index, (high, float('inf')))
+        return [self.orders[order_id] for _, order_id in index[start:end]]
+
+    def has_near(self, target_price: float, direction: str, tolerance: float) -> bool:
+        """True if any order on that side is strictly within tolerance of target_price"""
+        nearest = self.nearest(target_price, direction)
+        return nearest is not None and nearest[0] < tolerance
+
+# Test function for standalone usage
+def test_pending_order_book():
+    """Test the pending order book index"""
+    print("🧪 Testing Pending Order Book...")
+
+    book = PendingOrderBook()
+    for i in range(1, 6):
+        book[100 + i] = {'order_id': 100 + i, 'price': 2000 - i * 1.5, 'direction': 'BUY', 'lot_size': 0.01}
+        book[200 + i] = {'order_id': 200 + i, 'price': 2000 + i * 1.5, 'direction': 'SELL', 'lot_size': 0.01}
+
+    print(f"   {book}")
+    print(f"   BUY bounds: {book.price_bounds('BUY')}")
+    print(f"   Nearest SELL to 2004.0: {book.nearest(2004.0, 'SELL')}")
+    print(f"   BUY in 1994-1998: {[o['order_id'] for o in book.in_range('BUY', 1994, 1998)]}")
+
+    del book[103]
+    book.update_price(201, 2010.0)
+    print(f"   After delete/modify: {book} | SELL prices {book.prices('SELL')}")
+    print(f"   Has BUY near 1995.5: {book.has_near(1995.5, 'BUY', 0.5)}")
+
+    print("✅ Pending Order Book Test Completed")
+
+if __name__ == "__main__":
+    test_pending_order_book()
@@ -5,6 +5,7 @@ Advanced profit taking with portfolio analysis, trailing stops, and intelligent
 ENHANCED VERSION - Full trading system with MT5 integration
 """
 
+import logging
 import math
 import time
 from datetime import datetime, timedelta, timezone
@@ -17,7 +18,22 @@ import threading
 import json
 import os
 
-from api_connector import BackendAPIConnector
+from api_connector import BackendStatusClient
+from pending_order_book import PendingOrderBook
+from state_store import EngineStateStore
+from basket_close_solver import BasketCloseSolver, SolverSettings
+from basket_close_executor import BasketCloseExecutor
+from filling_mode_cache import FillingModeCache
+from engine_scheduler import EngineScheduler, EngineEvent
+from grid_reconciler import GridReconciler, ReconcilePlan, ReconcileSettings
+from virtual_ladder import VirtualLadder, VirtualOrderSettings
+from order_dispatcher import DispatcherSettings, OrderDispatcher, OrderPriority
+from order_metrics import OrderMetrics, OrderMetricsSettings
+from cycle_profiler import CycleProfiler, ProfilerSettings, profiled_stage
+from metrics_server import MetricsServer, MetricsServerSettings
+from engine_logger import get_logger
+
+log = get_logger(__name__)
 
 # Import additional modules
 try:
@@ -61,28 +77,59 @@ class SmartPosition:
     profit_target: float = 0.0
     min_profit_lock: float = 0.0
 
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    """Immutable view of our positions + account figures, built once per cycle"""
+    version: int
+    created_at: datetime
+    symbol: str
+    raw_positions: Tuple = ()
+    grid_positions: Tuple[SmartPosition, ...] = ()
+    hedge_positions: Tuple[SmartPosition, ...] = ()
+    total_pnl: float = 0.0
+    balance: float = 0.0
+    equity: float = 0.0
+    margin: float = 0.0
+
+    @property
+    def positions(self) -> Tuple[SmartPosition, ...]:
+        return self.grid_positions + self.hedge_positions
+
+    @property
+    def total_positions(self) -> int:
+        return len(self.raw_positions)
+
+    def age_seconds(self) -> float:
+        return (datetime.now() - self.created_at).total_seconds()
+
 class SmartProfitManager:
-    def __init__(self, mt5_connector, survivability_params: Dict, config: dict):
+    # Broker ปฏิเสธ modify จริง (invalid request / price / stops) -> cancel + place ใหม่ได้
+    MODIFY_FALLBACK_RETCODES = (10013, 10015, 10016)
+
+    def __init__(self, mt5_connector, survivability_params: Dict, config: dict, magic_offset: int = 0):
         # Core systems
         self.mt5_connector = mt5_connector
         self.config = config
         self.survivability_params = survivability_params
+
+        # Per-stage cycle profiler (เปิด / ปิดได้ระหว่างรัน - control file หรือ enable() / disable())
+        self.profiler = CycleProfiler(ProfilerSettings.from_config(config))
         
         # Initialize AI Money Manager if available
         if MONEY_MANAGER_AVAILABLE:
             self.money_manager = AIMoneyManager(config)
-            print("✅ AI Money Manager integrated")
+            log.info("✅ AI Money Manager integrated")
         else:
             self.money_manager = None
-            print("⚠️ AI Money Manager not available")
+            log.warning("⚠️ AI Money Manager not available")
             
         # Initialize Survivability Engine if available
         if SURVIVABILITY_ENGINE_AVAILABLE:
             self.survivability_engine = SurvivabilityEngine(config)
-            print("✅ Survivability Engine integrated")
+            log.info("✅ Survivability Engine integrated")
         else:
             self.survivability_engine = None
-            print("⚠️ Survivability Engine not available")
+            log.warning("⚠️ Survivability Engine not available")
         
         # Trading parameters from survivability
         self.base_lot = survivability_params.get('base_lot', 0.01)
@@ -115,9 +162,58 @@ class SmartProfitManager:
         self.trading_active = False
         self.emergency_stop_triggered = False
         self.grid_levels = []
-        self.pending_orders = {}
-        self.active_positions = {}
-        
+        # active_positions / pending_orders อยู่ใน copy-on-write store (อ่านผ่าน properties)
+        self.state_store = EngineStateStore()
+
+        # Per-cycle portfolio snapshot (shared by AI loop, monitor and GUI)
+        self.portfolio_snapshot = None
+        self.last_portfolio_snapshot = None     # ไม่ถูก invalidate - metrics / status อ่านได้โดยไม่เรียก MT5
+        self.snapshot_version = 0
+        self.snapshot_max_age = config.get('portfolio_snapshot', {}).get('max_age_seconds', 3.0)
+        self.snapshot_lock = threading.RLock()
+
+        # Metrics for monitoring (Prometheus endpoint อ่านค่าเหล่านี้)
+        self.ai_health_score = None
+        self.ai_cycle_stats = {'count': 0, 'total_seconds': 0.0, 'last_seconds': 0.0, 'max_seconds': 0.0}
+        server_settings = MetricsServerSettings.from_config(config)
+        self.metrics_server = MetricsServer.shared(server_settings) if server_settings.enabled else None
+
+        # Basket-close solver (find_profitable_pairs)
+        self.basket_solver = BasketCloseSolver(SolverSettings.from_config(config))
+        self.basket_executor = BasketCloseExecutor.from_config(self, config)
+
+        # Grid reconciliation (desired ladder vs live orders) - แทน grid placement แบบ ad-hoc
+        reconcile_settings = ReconcileSettings.from_config(config)
+        self.grid_reconciler = GridReconciler(reconcile_settings) if reconcile_settings.enabled else None
+        self.grid_reconcile_requested = False
+        self.reconcile_lock = threading.Lock()
+        self.last_reconcile_plan = None
+        # Re-centering ด้วย MODIFY - stops / freeze level ของ broker (ราคา) + สถิติ
+        self.broker_stops_distance = 0.0
+        self.broker_freeze_distance = 0.0
+        self.learned_freeze_distance = 0.0
+        self.trade_levels_checked_at = 0.0
+        # Virtual orders - ladder ลึกในหน่วยความจำ, order จริงแค่ K levels ใกล้ราคาต่อฝั่ง
+        virtual_settings = VirtualOrderSettings.from_config(config)
+        self.virtual_ladder = VirtualLadder(virtual_settings) if virtual_settings.enabled and self.grid_reconciler else None
+        self.virtual_lock = threading.Lock()
+        self.recenter_stats = {'recenters': 0, 'modifies': 0, 'modify_fallbacks': 0, 'fallback_replaces': 0,
+                               'frozen_deferred': 0, 'modify_deferred': 0, 'cancels': 0, 'places': 0,
+                               'order_requests': 0, 'failed': 0}
+
+        # Event-driven engine (engine_scheduler.enabled) - สร้างตอน start_trading
+        self.engine_scheduler = None
+
+        # Multi-symbol mode (MultiSymbolEngine ตั้งให้) - อ่าน positions / orders / tick จาก MarketDataService
+        # ที่ใช้ร่วมกันทั้ง terminal และเช็ค account-level risk ก่อนเพิ่ม exposure
+        self.market_data = None
+        self.account_risk = None
+
+        # Backend status heartbeat (api_connector.BackendStatusClient) - สร้างตอน start_trading
+        self.backend_client = None
+        self.backend_checks_handled = 0
+        self.next_report_time = None
+
         # Performance tracking
         self.total_pnl = 0.0
         self.unrealized_pnl = 0.0
@@ -139,12 +235,17 @@ class SmartProfitManager:
             self.magic_number = int(str(account_id)[-6:]) if account_id else 77743410
         else:
             self.magic_number = 77743410
+        self.magic_number += magic_offset     # magic partition ต่อ symbol (multi-symbol mode)
             
         # Market info
         self.min_lot = self.symbol_info.get('volume_min', 0.01)
         self.max_lot = self.symbol_info.get('volume_max', 100.0)
         self.lot_step = self.symbol_info.get('volume_step', 0.01)
         self.point_value = self.symbol_info.get('point', 0.01)
+
+        # Order-send instrumentation (latency / retcodes / slippage / filling retries)
+        metrics_settings = OrderMetricsSettings.from_config(config)
+        self.order_metrics = OrderMetrics(self.point_value, metrics_settings) if metrics_settings.enabled else None
         
         # Smart profit parameters (existing)
         self.quick_profit_multiplier = 2.5      # 0.01 lot = $2.5 target
@@ -174,6 +275,12 @@ class SmartProfitManager:
         # Strategy selection based on account size
         account_info = mt5_connector.get_account_info()
         balance = account_info.get('balance', 1000) if account_info else 1000
+
+        # Order dispatcher - token bucket + priority queue ต่อ account (ทุก order_send ผ่าน submit_order_request)
+        dispatcher_settings = DispatcherSettings.from_config(config)
+        account_key = (account_info.get('server'), account_info.get('account_id')) if account_info else None
+        self.order_dispatcher = OrderDispatcher.for_account(account_key, dispatcher_settings) \
+            if dispatcher_settings.enabled else None
         
         if balance >= 10000:
             self.default_strategy = ProfitStrategy.AGGRESSIVE
@@ -189,94 +296,121 @@ class SmartProfitManager:
         self.recovery_start_time = None
         self.recovery_initial_pnl = 0
         
-        # Detect broker filling modes
-        self.detect_broker_filling_modes()
+        # Detect broker filling modes (probe symbol + learned cache per server/symbol)
+        self.filling_cache = None
+        self.detect_broker_filling_modes(config)
         
-        print(f"💊 Portfolio Recovery System:")
-        print(f"   Enabled: {self.recovery_enabled}")
-        print(f"   Trigger Loss: ${abs(self.recovery_trigger_loss)}")
-        print(f"   Auto Mode: {self.recovery_auto_mode}")    
-        print(f"🧠 Smart Profit Manager initialized:")
-        print(f"   💰 Balance: ${balance:,.0f}")
-        print(f"   🎯 Strategy: {self.default_strategy.value}")
-        print(f"   📈 Trailing Stop: {self.trailing_stop_distance} points")
-        print(f"   🛡️ Survivability: {self.survivability:,} points")
-        print(f"   🎯 Magic Number: {self.magic_number}")
-
-    def detect_broker_filling_modes(self):
-        """Detect broker-specific filling modes"""
-        try:
-            broker_name = str(self.mt5_connector.get_account_info().get('company', '')).lower()
-            
-            # Default safe settings
-            self.order_filling_mode = mt5.ORDER_FILLING_RETURN
-            self.close_filling_mode = mt5.ORDER_FILLING_RETURN
-            self.filling_mode_name = "RETURN (Safe default)"
-            
-            # Broker-specific optimizations
-            if any(x in broker_name for x in ['exness', 'ic markets', 'alpari']):
-                self.order_filling_mode = mt5.ORDER_FILLING_FOK
-                self.close_filling_mode = mt5.ORDER_FILLING_FOK
-                self.filling_mode_name = "FOK (Broker optimized)"
-            elif any(x in broker_name for x in ['forex.com', 'oanda']):
-                self.order_filling_mode = mt5.ORDER_FILLING_IOC  
-                self.close_filling_mode = mt5.ORDER_FILLING_IOC
-                self.filling_mode_name = "IOC (Broker optimized)"
+        log.info(f"💊 Portfolio Recovery System:")
+        log.info(f"   Enabled: {self.recovery_enabled}")
+        log.info(f"   Trigger Loss: ${abs(self.recovery_trigger_loss)}")
+        log.info(f"   Auto Mode: {self.recovery_auto_mode}")    
+        log.info(f"🧠 Smart Profit Manager initialized:")
+        log.info(f"   💰 Balance: ${balance:,.0f}")
+        log.info(f"   🎯 Strategy: {self.default_strategy.value}")
+        log.info(f"   📈 Trailing Stop: {self.trailing_stop_distance} points")
+        log.info(f"   🛡️ Survivability: {self.survivability:,} points")
+        log.info(f"   🎯 Magic Number: {self.magic_number}")
+
+    @property
+    def active_positions(self):
+        """Read-only view ของ positions ล่าสุด (lock-free, copy-on-write)"""
+        return self.state_store.current.active_positions
+
+    @property
+    def pending_orders(self) -> PendingOrderBook:
+        """Read-only pending order book ล่าสุด (lock-free, copy-on-write)"""
+        return self.state_store.current.pending_orders
+
+    def detect_broker_filling_modes(self, config: Dict = None):
+        """Detect broker filling modes - probe symbol_info().filling_mode + learned cache"""
+        try:
+            self.filling_cache = FillingModeCache.from_config(self.gold_symbol, config or {})
+            
+            self.order_filling_mode = self.filling_cache.preferred_mode("MARKET")
+            self.close_filling_mode = self.filling_cache.preferred_mode("CLOSE")
+            self.filling_mode_name = f"{self.filling_cache.describe()} (symbol flags: {self.filling_cache.symbol_filling_flags})"
+            log.info(f"🔧 Filling modes: {self.filling_mode_name}")
                 
         except Exception as e:
-            print(f"⚠️ Error detecting filling modes: {e}")
+            log.warning(f"⚠️ Error detecting filling modes: {e}")
             self.order_filling_mode = mt5.ORDER_FILLING_RETURN
             self.close_filling_mode = mt5.ORDER_FILLING_RETURN
             self.filling_mode_name = "RETURN (Safe fallback)"
 
+    def get_filling_modes(self, action: str) -> List:
+        """ลำดับ filling modes ที่จะลอง - mode ที่เคยสำเร็จมาก่อน"""
+        if self.filling_cache:
+            return self.filling_cache.ordered_modes(action)
+        return [None, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_RETURN]
+
+    def record_filling_result(self, action: str, filling_mode, result):
+        """ส่งผล order_send ให้ filling cache เรียนรู้"""
+        if not self.filling_cache or not result:
+            return
+        if result.retcode == mt5.TRADE_RETCODE_DONE:
+            self.filling_cache.record_success(action, filling_mode)
+        else:
+            self.filling_cache.record_failure(action, filling_mode, result.retcode)
+
     def start_trading(self):
         """Start AI Smart Profit Trading System"""
         
         if self.trading_active:
-            print("⚠️ Trading is already active")
+            log.warning("⚠️ Trading is already active")
             return True
             
         if self.emergency_stop_triggered:
-            print("❌ Cannot start trading - Emergency stop is active")
+            log.error("❌ Cannot start trading - Emergency stop is active")
             return False
             
         try:
-            print("🧠 AI Smart Profit Trading System Starting...")
-            print("="*60)
+            log.info("🧠 AI Smart Profit Trading System Starting...")
+            log.info("="*60)
             
             # Validate account
             if not self.validate_account_before_trading():
-                print("❌ Account validation failed - Cannot start trading")
+                log.error("❌ Account validation failed - Cannot start trading")
                 return False
             
-            print("🚀 ACTIVATING FULL AI SMART PROFIT CONTROL")
-            print("   🧠 Smart Profit Manager: PRIMARY CONTROL")
-            print("   🎯 AI Portfolio Analysis: ACTIVE")
-            print("   💰 All decisions: AI-OPTIMIZED")
+            log.info("🚀 ACTIVATING FULL AI SMART PROFIT CONTROL")
+            log.info("   🧠 Smart Profit Manager: PRIMARY CONTROL")
+            log.info("   🎯 AI Portfolio Analysis: ACTIVE")
+            log.info("   💰 All decisions: AI-OPTIMIZED")
             
             self.trading_active = True
             
+            # Backend status heartbeat (background)
+            self.start_backend_status_client()
+
+            # Prometheus /metrics (localhost) - อ่าน state ที่มีอยู่ ไม่เรียก MT5
+            if self.metrics_server:
+                self.metrics_server.register(self)
+            
             # Initialize portfolio
             self.initialize_smart_portfolio()
             
-            # Start AI management loop
-            self.start_ai_management_loop()
-            
-            # Start monitoring
-            self.start_monitoring_loop()
+            if self.config.get('engine_scheduler', {}).get('enabled', True):
+                # Event-driven engine: tick / fill / timer
+                self.start_event_engine()
+            else:
+                # Start AI management loop
+                self.start_ai_management_loop()
+                
+                # Start monitoring
+                self.start_monitoring_loop()
             
-            print("✅ AI Smart Profit System FULLY OPERATIONAL!")
-            print(f"📊 Configuration:")
-            print(f"   • AI Control: FULL CONTROL")
-            print(f"   • Base Lot: {self.base_lot}")
-            print(f"   • Grid Spacing: {self.grid_spacing} points")
-            print(f"   • Survivability: {self.survivability:,} points")
-            print(f"   • Magic Number: {self.magic_number}")
+            log.info("✅ AI Smart Profit System FULLY OPERATIONAL!")
+            log.info(f"📊 Configuration:")
+            log.info(f"   • AI Control: FULL CONTROL")
+            log.info(f"   • Base Lot: {self.base_lot}")
+            log.info(f"   • Grid Spacing: {self.grid_spacing} points")
+            log.info(f"   • Survivability: {self.survivability:,} points")
+            log.info(f"   • Magic Number: {self.magic_number}")
             
             return True
                 
         except Exception as e:
-            print(f"❌ Failed to start AI trading: {e}")
+            log.error(f"❌ Failed to start AI trading: {e}")
             self.trading_active = False
             return False
 
@@ -286,64 +420,64 @@ class SmartProfitManager:
             account_info = self.mt5_connector.get_account_info() if self.mt5_connector else None
             
             if not account_info:
-                print("❌ Cannot validate account - Missing account info")
+                log.error("❌ Cannot validate account - Missing account info")
                 return False
                 
             balance = account_info.get('balance', 0)
             equity = account_info.get('equity', 0)
             margin = account_info.get('margin', 0)
             
-            print(f"✅ Account Validation:")
-            print(f"   Balance: ${balance:,.2f}")
-            print(f"   Equity: ${equity:,.2f}")
-            print(f"   Margin Used: ${margin:,.2f}")
+            log.info(f"✅ Account Validation:")
+            log.info(f"   Balance: ${balance:,.2f}")
+            log.info(f"   Equity: ${equity:,.2f}")
+            log.info(f"   Margin Used: ${margin:,.2f}")
             
             # Check minimum balance
             if balance < 100:
-                print(f"❌ Insufficient balance: ${balance:.2f}")
+                log.error(f"❌ Insufficient balance: ${balance:.2f}")
                 return False
                 
             # If no positions (margin = 0) use balance as criteria
             if margin == 0:
                 if balance < 500:
-                    print(f"❌ Need minimum $500 to start trading: ${balance:.2f}")
+                    log.error(f"❌ Need minimum $500 to start trading: ${balance:.2f}")
                     return False
                 else:
-                    print(f"✅ Sufficient capital for trading: ${balance:,.2f}")
+                    log.info(f"✅ Sufficient capital for trading: ${balance:,.2f}")
                     return True
                     
-            print(f"✅ Account validation passed - Ready for AI trading")
+            log.info(f"✅ Account validation passed - Ready for AI trading")
             return True
             
         except Exception as e:
-            print(f"❌ Account validation error: {e}")
+            log.error(f"❌ Account validation error: {e}")
             return False
 
     def initialize_smart_portfolio(self):
         """Initialize smart portfolio with AI-guided setup"""
         try:
-            print("🧠 Initializing AI Smart Portfolio...")
+            log.info("🧠 Initializing AI Smart Portfolio...")
             
             # Check existing positions
             existing_positions = self.get_existing_positions()
             
             if existing_positions:
-                print(f"🔄 Continuing with {len(existing_positions)} existing positions")
-                self.active_positions = {pos['ticket']: pos for pos in existing_positions}
+                log.info(f"🔄 Continuing with {len(existing_positions)} existing positions")
+                self.state_store.replace_positions({pos['ticket']: pos for pos in existing_positions})
             else:
-                print("🆕 No existing positions - Creating initial portfolio")
+                log.info("🆕 No existing positions - Creating initial portfolio")
                 self.create_initial_smart_grid()
                 
             return True
             
         except Exception as e:
-            print(f"❌ Portfolio initialization error: {e}")
+            log.error(f"❌ Portfolio initialization error: {e}")
             return False
 
     def get_existing_positions(self):
         """Get existing positions from MT5"""
         try:
-            positions = mt5.positions_get(symbol=self.gold_symbol)
+            positions = self.fetch_positions()
             if not positions:
                 return []
                 
@@ -364,35 +498,40 @@ class SmartProfitManager:
             return our_positions
             
         except Exception as e:
-            print(f"❌ Error getting existing positions: {e}")
+            log.error(f"❌ Error getting existing positions: {e}")
             return []
 
     def create_initial_smart_grid(self):
         """Create initial smart grid using AI logic"""
+        if self.grid_reconciler:
+            plan = self.reconcile_grid()
+            return plan is not None
+
         try:
             # เช็ค existing orders ก่อน
-            existing_orders = mt5.orders_get(symbol=self.gold_symbol)
+            existing_orders = self.fetch_orders()
             our_orders = [order for order in (existing_orders or []) if order.magic == self.magic_number]
             
             if len(our_orders) > 0:
-                print(f"🔄 Found {len(our_orders)} existing orders - skipping grid creation")
+                log.info(f"🔄 Found {len(our_orders)} existing orders - skipping grid creation")
                 # อัพเดท pending_orders tracking
-                for order in our_orders:
-                    self.pending_orders[order.ticket] = {
-                        'order_id': order.ticket,
-                        'price': order.price_open,
-                        'direction': "BUY" if order.type in [mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_BUY_STOP] else "SELL",
-                        'lot_size': order.volume_initial,
-                        'time': datetime.fromtimestamp(order.time_setup)
-                    }
+                with self.state_store.write() as draft:
+                    for order in our_orders:
+                        draft.pending_orders[order.ticket] = {
+                            'order_id': order.ticket,
+                            'price': order.price_open,
+                            'direction': "BUY" if order.type in [mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_BUY_STOP] else "SELL",
+                            'lot_size': order.volume_initial,
+                            'time': datetime.fromtimestamp(order.time_setup)
+                        }
                 return True
                 
             current_price = self.get_current_price()
             if not current_price:
-                print("❌ Cannot get current price")
+                log.error("❌ Cannot get current price")
                 return False
                 
-            print(f"🧠 Creating AI Smart Grid at ${current_price:.2f}")
+            log.info(f"🧠 Creating AI Smart Grid at ${current_price:.2f}")
             
             spacing_dollars = self.grid_spacing * 0.01
             orders_placed = 0
@@ -409,15 +548,19 @@ class SmartProfitManager:
                 if self.place_pending_order(sell_price, 'SELL', self.base_lot):
                     orders_placed += 1
                     
-            print(f"✅ Smart Grid created: {orders_placed} orders placed")
+            log.info(f"✅ Smart Grid created: {orders_placed} orders placed")
             return orders_placed > 0
             
         except Exception as e:
-            print(f"❌ Smart grid creation error: {e}")
+            log.error(f"❌ Smart grid creation error: {e}")
             return False
 
-    def place_market_order(self, direction: str, lot_size: float, comment: str = "AI_MARKET"):
+    def place_market_order(self, direction: str, lot_size: float, comment: str = "AI_MARKET",
+                           priority: OrderPriority = OrderPriority.GRID):
         """Place market order immediately - แก้ไข filling mode สำหรับทุกโบรกเกอร์"""
+        if priority == OrderPriority.GRID and not self.allows_new_exposure():
+            log.debug("   🛡️ Account risk limit - %s market order skipped", direction)
+            return False
         try:
             # ✅ เพิ่มการตรวจสอบ lot size
             min_lot = self.symbol_info.get('volume_min', 0.01)
@@ -429,11 +572,11 @@ class SmartProfitManager:
             adjusted_lot = round(lot_size / lot_step) * lot_step
             adjusted_lot = max(min_lot, min(adjusted_lot, max_lot))
             
-            print(f"   🔍 Lot adjustment: {lot_size:.3f} → {adjusted_lot:.3f}")
+            log.debug("   🔍 Lot adjustment: %.3f → %.3f", lot_size, adjusted_lot)
             
             tick = mt5.symbol_info_tick(self.gold_symbol)
             if not tick:
-                print(f"   ❌ Cannot get tick data for {direction}")
+                log.error(f"   ❌ Cannot get tick data for {direction}")
                 return False
                 
             if direction == "BUY":
@@ -443,15 +586,11 @@ class SmartProfitManager:
                 order_type = mt5.ORDER_TYPE_SELL
                 price = tick.bid
                 
-            print(f"   🎯 Market {direction}: {adjusted_lot} lots @ ${price:.2f}")
+            log.debug("   🎯 Market %s: %s lots @ $%.2f", direction, adjusted_lot, price)
             
-            # ✅ ลอง filling modes ตามลำดับความปลอดภัย + เพิ่ม None
-            filling_modes = [
-                None,                      # ไม่ระบุ filling mode (ให้ MT5 เลือก)
-                mt5.ORDER_FILLING_IOC,     
-                mt5.ORDER_FILLING_FOK,     
-                mt5.ORDER_FILLING_RETURN   
-            ]
+            # ✅ ลอง filling modes - mode ที่เคยสำเร็จกับ broker/symbol นี้มาก่อน
+            filling_modes = self.get_filling_modes("MARKET")
+            attempts = 0
             
             for i, filling_mode in enumerate(filling_modes):
                 request = {
@@ -470,12 +609,15 @@ class SmartProfitManager:
                     request["type_filling"] = filling_mode
                     
                 mode_name = "AUTO" if filling_mode is None else str(filling_mode)
-                print(f"   🔄 Trying mode {i+1}: {mode_name}")
+                log.debug("   🔄 Trying mode %s: %s", i+1, mode_name)
                 
-                result = mt5.order_send(request)
+                attempts += 1
+                result = self.submit_order_request(request, priority)
+                self.record_filling_result("MARKET", filling_mode, result)
                 
                 if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"   ✅ Market {direction} SUCCESS with mode {i+1}")
+                    self.record_order_attempts("MARKET", attempts, True)
+                    log.debug("   ✅ Market %s SUCCESS with mode %s", direction, i+1)
                     return result.order
                 else:
                     error_msg = f"Mode {i+1} failed"
@@ -483,30 +625,34 @@ class SmartProfitManager:
                         error_msg += f" - Code: {result.retcode}"
                         if hasattr(result, 'comment'):
                             error_msg += f", {result.comment}"
-                    print(f"   ⚠️ {error_msg}")
+                    log.warning(f"   ⚠️ {error_msg}")
                     
                     # ถ้า volume ยังผิด ลองใช้ minimum lot
                     if result and result.retcode == 10014 and adjusted_lot != min_lot:
-                        print(f"   🔄 Retrying with minimum lot: {min_lot}")
+                        log.debug("   🔄 Retrying with minimum lot: %s", min_lot)
                         adjusted_lot = min_lot
                         continue
                     elif result and result.retcode in [10018, 10030]:  # Filling mode errors
                         continue  # ลอง mode ถัดไป
                     elif result and result.retcode == 10025:  # Autotrading disabled
-                        print(f"   ❌ Autotrading is disabled - cannot place orders")
+                        log.error(f"   ❌ Autotrading is disabled - cannot place orders")
                         break
                     elif result and result.retcode not in [10018, 10030]:  # ถ้าไม่ใช่ filling mode error
                         break
                         
-            print(f"   ❌ All filling modes failed for {direction}")
+            self.record_order_attempts("MARKET", attempts, False)
+            log.error(f"   ❌ All filling modes failed for {direction}")
             return False
             
         except Exception as e:
-            print(f"❌ Market order error: {e}")
+            log.error(f"❌ Market order error: {e}")
             return False
 
     def place_pending_order(self, price: float, direction: str, lot_size: float):
         """วาง pending order - แก้ไข filling mode สำหรับทุกโบรกเกอร์"""
+        if not self.allows_new_exposure():
+            log.debug("   🛡️ Account risk limit - %s pending order skipped", direction)
+            return False
         try:
             # ✅ เพิ่มการตรวจสอบ lot size
             min_lot = self.symbol_info.get('volume_min', 0.01)
@@ -520,28 +666,24 @@ class SmartProfitManager:
             
             current_price = self.get_current_price()
             if not current_price:
-                print(f"   ❌ Cannot get current price for {direction} order")
+                log.error(f"   ❌ Cannot get current price for {direction} order")
                 return False
                 
-            print(f"   🎯 Placing {direction} order: {adjusted_lot} lots @ ${price:.2f}")
-            print(f"      Lot adjustment: {lot_size:.3f} → {adjusted_lot:.3f}")
-            print(f"      Current price: ${current_price:.2f}")
-            print(f"      Distance: {abs(price - current_price):.2f}")
+            log.debug("   🎯 Placing %s order: %s lots @ $%.2f", direction, adjusted_lot, price)
+            log.debug("      Lot adjustment: %.3f → %.3f", lot_size, adjusted_lot)
+            log.debug("      Current price: $%.2f", current_price)
+            log.debug("      Distance: %.2f", abs(price - current_price))
                 
             if direction == "BUY":
                 order_type = mt5.ORDER_TYPE_BUY_STOP if price > current_price else mt5.ORDER_TYPE_BUY_LIMIT
             else:
                 order_type = mt5.ORDER_TYPE_SELL_STOP if price < current_price else mt5.ORDER_TYPE_SELL_LIMIT
                 
-            print(f"      Order type: {order_type}")
+            log.debug("      Order type: %s", order_type)
             
-            # ✅ ลอง filling modes ตามลำดับความปลอดภัย + เพิ่ม None
-            filling_modes = [
-                None,                      # ไม่ระบุ filling mode (ให้ MT5 เลือก)
-                mt5.ORDER_FILLING_RETURN,
-                mt5.ORDER_FILLING_IOC,
-                mt5.ORDER_FILLING_FOK
-            ]
+            # ✅ ลอง filling modes - mode ที่เคยสำเร็จกับ broker/symbol นี้มาก่อน
+            filling_modes = self.get_filling_modes("PENDING")
+            attempts = 0
             
             for i, filling_mode in enumerate(filling_modes):
                 request = {
@@ -559,19 +701,22 @@ class SmartProfitManager:
                     request["type_filling"] = filling_mode
                     
                 mode_name = "AUTO" if filling_mode is None else str(filling_mode)
-                print(f"      🔄 Trying mode {i+1}: {mode_name}")
+                log.debug("      🔄 Trying mode %s: %s", i+1, mode_name)
                 
-                result = mt5.order_send(request)
+                attempts += 1
+                result = self.submit_order_request(request)
+                self.record_filling_result("PENDING", filling_mode, result)
                 
                 if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                    self.pending_orders[result.order] = {
+                    self.record_order_attempts("PENDING", attempts, True)
+                    self.state_store.set_pending_order(result.order, {
                         'order_id': result.order,
                         'price': price,
                         'direction': direction,
                         'lot_size': adjusted_lot,
                         'time': datetime.now()
-                    }
-                    print(f"   ✅ {direction} order SUCCESS with mode {i+1}: {result.order} @ ${price:.2f}")
+                    })
+                    log.debug("   ✅ %s order SUCCESS with mode %s: %s @ $%.2f", direction, i+1, result.order, price)
                     return True
                 else:
                     error_msg = f"Mode {i+1} failed"
@@ -579,26 +724,27 @@ class SmartProfitManager:
                         error_msg += f" - Code: {result.retcode}"
                         if hasattr(result, 'comment'):
                             error_msg += f", {result.comment}"
-                    print(f"   ⚠️ {error_msg}")
+                    log.warning(f"   ⚠️ {error_msg}")
                     
                     # ถ้า volume ยังผิด ลองใช้ minimum lot
                     if result and result.retcode == 10014 and adjusted_lot != min_lot:
-                        print(f"   🔄 Retrying with minimum lot: {min_lot}")
+                        log.debug("   🔄 Retrying with minimum lot: %s", min_lot)
                         adjusted_lot = min_lot
                         continue
                     elif result and result.retcode in [10018, 10030]:  # Filling mode errors
                         continue  # ลอง mode ถัดไป
                     elif result and result.retcode == 10025:  # Autotrading disabled
-                        print(f"   ❌ Autotrading is disabled - cannot place orders")
+                        log.error(f"   ❌ Autotrading is disabled - cannot place orders")
                         break
                     elif result and result.retcode not in [10018, 10030]:  # ถ้าไม่ใช่ filling mode error
                         break
                         
-            print(f"   ❌ All filling modes failed for {direction} pending order")
+            self.record_order_attempts("PENDING", attempts, False)
+            log.error(f"   ❌ All filling modes failed for {direction} pending order")
             return False
                     
         except Exception as e:
-            print(f"   ❌ Place {direction} order exception: {e}")
+            log.error(f"   ❌ Place {direction} order exception: {e}")
             return False
 
     def close_entire_position(self, position) -> bool:
@@ -613,7 +759,7 @@ class SmartProfitManager:
                 
             positions = mt5.positions_get(ticket=position_id)
             if not positions or len(positions) == 0:
-                print(f"   Position {position_id} not found or already closed")
+                log.debug("   Position %s not found or already closed", position_id)
                 return True  # ถือว่าปิดแล้ว
                 
             mt5_position = positions[0]
@@ -621,7 +767,7 @@ class SmartProfitManager:
             # เตรียม close request
             tick = mt5.symbol_info_tick(self.gold_symbol)
             if not tick:
-                print(f"   Cannot get tick data")
+                log.debug("   Cannot get tick data")
                 return False
                 
             if mt5_position.type == mt5.POSITION_TYPE_BUY:
@@ -631,15 +777,11 @@ class SmartProfitManager:
                 close_price = tick.ask
                 order_type = mt5.ORDER_TYPE_BUY
                 
-            print(f"   🎯 Closing position {position_id}: {mt5_position.volume} lots @ ${close_price:.2f}")
+            log.debug("   🎯 Closing position %s: %s lots @ $%.2f", position_id, mt5_position.volume, close_price)
             
-            # ✅ ลอง filling modes ตามลำดับความปลอดภัย + เพิ่ม None
-            filling_modes = [
-                None,                      # ไม่ระบุ filling mode
-                mt5.ORDER_FILLING_IOC,
-                mt5.ORDER_FILLING_FOK,
-                mt5.ORDER_FILLING_RETURN
-            ]
+            # ✅ ลอง filling modes - mode ที่เคยสำเร็จกับ broker/symbol นี้มาก่อน
+            filling_modes = self.get_filling_modes("CLOSE")
+            attempts = 0
             
             for i, filling_mode in enumerate(filling_modes):
                 request = {
@@ -659,16 +801,18 @@ class SmartProfitManager:
                     request["type_filling"] = filling_mode
                     
                 mode_name = "AUTO" if filling_mode is None else str(filling_mode)
-                print(f"      🔄 Trying close mode {i+1}: {mode_name}")
+                log.debug("      🔄 Trying close mode %s: %s", i+1, mode_name)
                 
-                result = mt5.order_send(request)
+                attempts += 1
+                result = self.submit_order_request(request, OrderPriority.RESCUE)
+                self.record_filling_result("CLOSE", filling_mode, result)
                 
                 if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"   ✅ Position {position_id} closed with mode {i+1}")
+                    self.record_order_attempts("CLOSE", attempts, True)
+                    log.debug("   ✅ Position %s closed with mode %s", position_id, i+1)
                     
                     # Update internal tracking
-                    if position_id in self.active_positions:
-                        del self.active_positions[position_id]
+                    self.state_store.remove_position(position_id)
                         
                     return True
                 else:
@@ -677,21 +821,22 @@ class SmartProfitManager:
                         error_msg += f" - Code: {result.retcode}"
                         if hasattr(result, 'comment'):
                             error_msg += f", {result.comment}"
-                    print(f"   ⚠️ {error_msg}")
+                    log.warning(f"   ⚠️ {error_msg}")
                     
                     if result and result.retcode in [10018, 10030]:  # Filling mode errors
                         continue  # ลอง mode ถัดไป
                     elif result and result.retcode == 10025:  # Autotrading disabled
-                        print(f"   ❌ Autotrading is disabled - cannot close positions")
+                        log.error(f"   ❌ Autotrading is disabled - cannot close positions")
                         break
                     elif result and result.retcode not in [10018, 10030]:  # ถ้าไม่ใช่ filling mode error
                         break
                         
-            print(f"   ❌ All close modes failed for position {position_id}")
+            self.record_order_attempts("CLOSE", attempts, False)
+            log.error(f"   ❌ All close modes failed for position {position_id}")
             return False
                     
         except Exception as e:
-            print(f"❌ Close position error: {e}")
+            log.error(f"❌ Close position error: {e}")
             return False
 
     def get_current_price(self):
@@ -709,118 +854,565 @@ class SmartProfitManager:
             return 0
             
         except Exception as e:
-            print(f"❌ Error getting current price: {e}")
+            log.error(f"❌ Error getting current price: {e}")
+            return 0
+
+    # ----- Grid reconciliation -----
+
+    def request_grid_reconcile(self):
+        """ขอให้ reconcile grid ในรอบนี้ (ตอนจบ fill sync / AI cycle)"""
+        self.grid_reconcile_requested = True
+
+    def sync_live_orders(self) -> List[Dict]:
+        """orders_get ครั้งเดียว -> orders ของเรา และ sync pending_orders ใน state store ให้ตรง broker"""
+        orders = self.fetch_orders() or ()
+        live = []
+        for order in orders:
+            if order.magic != self.magic_number:
+                continue
+            live.append({
+                'order_id': order.ticket,
+                'price': order.price_open,
+                'direction': "BUY" if order.type in (mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_BUY_STOP) else "SELL",
+                'lot_size': order.volume_current,
+                'time': datetime.fromtimestamp(order.time_setup)
+            })
+
+        live_ids = {order_info['order_id'] for order_info in live}
+        with self.state_store.write() as draft:
+            book = draft.pending_orders
+            for order_id in [order_id for order_id in book if order_id not in live_ids]:
+                del book[order_id]
+            for order_info in live:
+                known = book.get(order_info['order_id'])
+                if known is None or known['price'] != order_info['price']:
+                    book[order_info['order_id']] = order_info
+        return live
+
+    @profiled_stage
+    def reconcile_grid(self) -> Optional[ReconcilePlan]:
+        """Desired ladder รอบนี้ vs orders + positions ที่มีอยู่ -> execute plan ครั้งเดียว"""
+        if not self.grid_reconciler or not self.reconcile_lock.acquire(blocking=False):
+            return None
+        try:
+            self.grid_reconcile_requested = False
+            current_price = self.get_current_price()
+            if not current_price:
+                return None
+
+            live_orders = self.sync_live_orders()
+            snapshot = self.get_portfolio_snapshot()
+            positions = [{'price': pos.entry_price, 'direction': pos.direction} for pos in snapshot.grid_positions]
+
+            spacing = self.grid_spacing * 0.01
+            desired = self.build_live_window(current_price, spacing, positions) if self.virtual_ladder else None
+            stops_distance, freeze_distance = self.get_trade_distances()
+            plan = self.grid_reconciler.plan(current_price, spacing, self.base_lot, live_orders, positions,
+                                             stops_distance, freeze_distance, desired)
+            self.last_reconcile_plan = plan
+            if plan.is_empty:
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("🧭 Grid in sync: %s", plan.summary())
+                return plan
+
+            log.info(f"🧭 Grid reconcile @ ${current_price:.2f}: {plan.summary()}")
+            self.execute_reconcile_plan(plan)
+            return plan
+
+        except Exception as e:
+            log.error(f"❌ Grid reconcile error: {e}")
+            return None
+        finally:
+            self.reconcile_lock.release()
+
+    def build_live_window(self, current_price: float, spacing: float, positions: List[Dict]):
+        """Ladder ลึก (deep_levels_per_side หรือ max_levels) -> เก็บ virtual, คืน K levels ต่อฝั่งให้ reconciler"""
+        settings = self.virtual_ladder.settings
+        deep_levels = max(settings.deep_levels_per_side or self.max_levels, settings.live_levels_per_side)
+        desired = self.grid_reconciler.desired_ladder(current_price, spacing, self.base_lot, positions, deep_levels)
+        with self.virtual_lock:
+            return self.virtual_ladder.split(desired)
+
+    def check_virtual_triggers(self, bid: float = None, ask: float = None) -> int:
+        """Tick stream -> virtual level ที่ราคาวิ่งผ่าน = market order ฝั่งเดียวกับ level"""
+        if not self.virtual_ladder or not self.trading_active or self.emergency_stop_triggered:
             return 0
+        if not self.virtual_lock.acquire(blocking=False):
+            return 0
+        try:
+            if bid is None or ask is None:
+                tick = self.fetch_tick()
+                if not tick:
+                    return 0
+                bid, ask = tick.bid, tick.ask
+
+            triggered = self.virtual_ladder.take_triggered(bid, ask)
+            for level in triggered:
+                log.info(f"👻 Virtual {level['direction']} ${level['price']:.2f} triggered "
+                         f"(bid ${bid:.2f} / ask ${ask:.2f})")
+                self.place_market_order(level['direction'], level['lot'], f"AI_VIRTUAL_{level['direction']}")
+            if triggered:
+                self.request_grid_reconcile()
+            return len(triggered)
+
+        except Exception as e:
+            log.error(f"❌ Virtual trigger error: {e}")
+            return 0
+        finally:
+            self.virtual_lock.release()
+
+    def execute_reconcile_plan(self, plan: ReconcilePlan) -> Dict:
+        """Cancel -> modify -> place ตามลำดับของ plan"""
+        done = {'CANCEL': 0, 'MODIFY': 0, 'PLACE': 0, 'FALLBACK': 0, 'failed': 0}
+        stats = self.recenter_stats
+        if plan.modifies or plan.cancels:
+            stats['recenters'] += 1
+
+        for action in plan.actions:
+            if action.kind == "CANCEL":
+                ok = self.cancel_pending_order(action.order_id, "AI_GRID_CANCEL")
+                stats['order_requests'] += 1
+            elif action.kind == "MODIFY":
+                retcode = self.modify_pending_order(action.order_id, action.price)
+                stats['order_requests'] += 1
+                if retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_NO_CHANGES):
+                    ok = True
+                elif retcode == mt5.TRADE_RETCODE_FROZEN:
+                    # อยู่ใน freeze zone - cancel ก็ไม่ได้เหมือนกัน รอรอบหน้า
+                    self.learn_freeze_distance(action.from_price)
+                    stats['frozen_deferred'] += 1
+                    continue
+                elif retcode in self.MODIFY_FALLBACK_RETCODES:
+                    # broker ปฏิเสธ modify -> cancel + place ใหม่ (นับแยกจาก modify)
+                    stats['modify_fallbacks'] += 1
+                    stats['order_requests'] += 2
+                    ok = self.cancel_pending_order(action.order_id, "AI_GRID_CANCEL") and \
+                         self.place_pending_order(action.price, action.direction, action.lot)
+                    done['FALLBACK' if ok else 'failed'] += 1
+                    continue
+                else:
+                    # None = dispatcher shed / send error, อื่นๆ = ชั่วคราว -> ไม่ยิงเพิ่ม รอ reconcile รอบหน้า
+                    stats['modify_deferred'] += 1
+                    continue
+            else:
+                ok = self.place_pending_order(action.price, action.direction, action.lot)
+                stats['order_requests'] += 1
+            if ok:
+                done[action.kind] += 1
+            else:
+                done['failed'] += 1
+
+        stats['modifies'] += done['MODIFY']
+        stats['fallback_replaces'] += done['FALLBACK']
+        stats['cancels'] += done['CANCEL']
+        stats['places'] += done['PLACE']
+        stats['failed'] += done['failed']
+        log.debug("   🧭 Plan executed: %s", done)
+        return done
+
+    def get_trade_distances(self) -> Tuple[float, float]:
+        """(stops distance, freeze distance) เป็นราคา - จาก symbol_info ทุก freeze_refresh_seconds + ที่เรียนรู้จาก 10029"""
+        now = time.time()
+        if now - self.trade_levels_checked_at >= self.grid_reconciler.settings.freeze_refresh_seconds:
+            self.trade_levels_checked_at = now
+            try:
+                info = mt5.symbol_info(self.gold_symbol)
+                if info:
+                    point = info.point or self.point_value
+                    self.broker_stops_distance = info.trade_stops_level * point
+                    self.broker_freeze_distance = info.trade_freeze_level * point
+            except Exception as e:
+                log.error(f"❌ Trade levels error: {e}")
+        return self.broker_stops_distance, max(self.broker_freeze_distance, self.learned_freeze_distance)
+
+    def learn_freeze_distance(self, order_price: Optional[float]):
+        """Broker ตอบ 10029 (frozen) -> freeze zone กว้างอย่างน้อยเท่าระยะ order นี้"""
+        current_price = self.get_current_price()
+        if not current_price or order_price is None:
+            return
+        distance = abs(order_price - current_price) + self.point_value
+        if distance > self.learned_freeze_distance:
+            self.learned_freeze_distance = distance
+            log.info(f"   🧊 Freeze distance learned: ${distance:.2f}")
+
+    def get_recenter_status(self) -> Dict:
+        """สถิติ re-centering สำหรับ get_grid_status"""
+        stats = dict(self.recenter_stats)
+        stats['requests_per_recenter'] = round(stats['order_requests'] / stats['recenters'], 2) if stats['recenters'] else 0.0
+        stats['stops_distance'] = round(self.broker_stops_distance, 5)
+        stats['freeze_distance'] = round(max(self.broker_freeze_distance, self.learned_freeze_distance), 5)
+        stats['last_plan'] = self.last_reconcile_plan.summary() if self.last_reconcile_plan else None
+        return stats
+
+    def cancel_pending_order(self, order_id: int, comment: str = "AI_CANCEL") -> bool:
+        """ยกเลิก pending order หนึ่งตัว"""
+        try:
+            request = {
+                "action": mt5.TRADE_ACTION_REMOVE,
+                "order": order_id,
+                "comment": comment
+            }
+            result = self.submit_order_request(request)
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                self.state_store.remove_pending_order(order_id)
+                log.debug("   ✅ Cancelled order %s", order_id)
+                return True
+
+            log.warning(f"   ⚠️ Cancel {order_id} failed - Code: {result.retcode if result else 'None'}")
+            return False
+
+        except Exception as e:
+            log.error(f"❌ Cancel order error: {e}")
+            return False
+
+    def modify_pending_order(self, order_id: int, new_price: float) -> Optional[int]:
+        """ย้าย pending order ไปราคาใหม่ (TRADE_ACTION_MODIFY) -> retcode, None ถ้าส่งไม่ได้"""
+        try:
+            request = {
+                "action": mt5.TRADE_ACTION_MODIFY,
+                "symbol": self.gold_symbol,
+                "order": order_id,
+                "price": new_price,
+                "sl": 0.0,
+                "tp": 0.0,
+                "magic": self.magic_number
+            }
+            result = self.submit_order_request(request)
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                with self.state_store.write() as draft:
+                    if order_id in draft.pending_orders:
+                        draft.pending_orders.update_price(order_id, new_price)
+                log.debug("   ✅ Moved order %s → $%.2f", order_id, new_price)
+                return result.retcode
+
+            log.warning(f"   ⚠️ Modify {order_id} failed - Code: {result.retcode if result else 'None'}")
+            return result.retcode if result else None
+
+        except Exception as e:
+            log.error(f"❌ Modify order error: {e}")
+            return None
+
+    def submit_order_request(self, request: Dict, priority: OrderPriority = OrderPriority.GRID):
+        """Send order to MT5 - ทุก order_send ต้องผ่านที่นี่ (rate limit + priority, invalidate snapshot)"""
+        try:
+            if self.order_dispatcher:
+                return self.order_dispatcher.submit(request, self.send_to_broker, priority)
+            return self.send_to_broker(request)
+        finally:
+            self.invalidate_portfolio_snapshot()
+
+    def send_to_broker(self, request: Dict):
+        """mt5.order_send ตัวจริง + จับเวลา / retcode / slippage"""
+        if not self.order_metrics:
+            return mt5.order_send(request)
+        started = time.perf_counter()
+        result = None
+        try:
+            result = mt5.order_send(request)
+            return result
+        finally:
+            self.order_metrics.record(request, result, time.perf_counter() - started)
+
+    def record_order_attempts(self, kind: str, attempts: int, success: bool):
+        """จำนวน filling-mode tries ต่อหนึ่ง placement / close"""
+        if self.order_metrics:
+            self.order_metrics.record_attempts(kind, attempts, success)
+
+    def build_portfolio_snapshot(self) -> PortfolioSnapshot:
+        """ดึง positions + account จาก MT5 ครั้งเดียว แล้วสร้าง snapshot ใหม่"""
+        positions = self.fetch_positions() or ()
+        our_positions = tuple(pos for pos in positions if pos.magic == self.magic_number)
+
+        grid_positions = []
+        hedge_positions = []
+
+        for pos in our_positions:
+            smart_pos = SmartPosition(
+                position_id=pos.ticket,
+                symbol=pos.symbol,
+                direction="BUY" if pos.type == mt5.POSITION_TYPE_BUY else "SELL",
+                lot_size=pos.volume,
+                entry_price=pos.price_open,
+                current_price=pos.price_current,
+                entry_time=datetime.fromtimestamp(pos.time),
+                pnl=pos.profit,
+                is_hedge="HEDGE" in pos.comment if hasattr(pos, 'comment') else False
+            )
+
+            if smart_pos.is_hedge:
+                hedge_positions.append(smart_pos)
+            else:
+                grid_positions.append(smart_pos)
+
+        account_info = self.mt5_connector.get_account_info() if self.mt5_connector else None
+        account_info = account_info or {}
+
+        self.snapshot_version += 1
+        return PortfolioSnapshot(
+            version=self.snapshot_version,
+            created_at=datetime.now(),
+            symbol=self.gold_symbol,
+            raw_positions=our_positions,
+            grid_positions=tuple(grid_positions),
+            hedge_positions=tuple(hedge_positions),
+            total_pnl=sum(pos.profit for pos in our_positions),
+            balance=account_info.get('balance', 0),
+            equity=account_info.get('equity', 0),
+            margin=account_info.get('margin', 0)
+        )
+
+    def get_portfolio_snapshot(self, max_age: float = None) -> PortfolioSnapshot:
+        """คืน snapshot ปัจจุบัน - สร้างใหม่เมื่อถูก invalidate หรือเก่าเกิน max_age"""
+        if max_age is None:
+            max_age = self.snapshot_max_age
+
+        with self.snapshot_lock:
+            snapshot = self.portfolio_snapshot
+            if snapshot is not None and snapshot.age_seconds() <= max_age:
+                return snapshot
+
+            self.portfolio_snapshot = self.last_portfolio_snapshot = self.build_portfolio_snapshot()
+            return self.portfolio_snapshot
+
+    @profiled_stage
+    def refresh_portfolio_snapshot(self) -> PortfolioSnapshot:
+        """บังคับสร้าง snapshot ใหม่ (ต้นรอบ AI cycle)"""
+        self.invalidate_portfolio_snapshot()
+        return self.get_portfolio_snapshot()
+
+    def invalidate_portfolio_snapshot(self):
+        """ทิ้ง snapshot ปัจจุบัน - เรียกหลัง order_send ทุกครั้ง"""
+        with self.snapshot_lock:
+            self.portfolio_snapshot = None
+        if self.market_data:
+            self.market_data.invalidate()
+
+    # ----- Market data (MT5 ตรง หรือ MarketDataService ที่ใช้ร่วมกันใน multi-symbol mode) -----
+
+    def fetch_positions(self):
+        """positions ของ symbol นี้ (ทุก magic) - None = อ่าน MT5 ไม่ได้"""
+        if self.market_data:
+            return self.market_data.current().positions(self.gold_symbol)
+        return mt5.positions_get(symbol=self.gold_symbol)
+
+    def fetch_orders(self):
+        """pending orders ของ symbol นี้ (ทุก magic) - None = อ่าน MT5 ไม่ได้"""
+        if self.market_data:
+            return self.market_data.current().orders(self.gold_symbol)
+        return mt5.orders_get(symbol=self.gold_symbol)
+
+    def fetch_tick(self):
+        if self.market_data:
+            return self.market_data.current().tick(self.gold_symbol)
+        return mt5.symbol_info_tick(self.gold_symbol)
+
+    def allows_new_exposure(self) -> bool:
+        """Account-level risk guard (multi-symbol) - False = ห้ามเปิด / วาง grid เพิ่ม"""
+        if self.account_risk is None:
+            return True
+        return self.account_risk.allows_new_exposure()
 
     def start_ai_management_loop(self):
         """Start AI management as primary control"""
         if not hasattr(self, 'ai_thread') or not self.ai_thread.is_alive():
             self.ai_thread = threading.Thread(target=self.ai_management_loop, daemon=True)
             self.ai_thread.start()
-            print("🧠 AI Management Loop started as PRIMARY CONTROL")
+            log.info("🧠 AI Management Loop started as PRIMARY CONTROL")
 
     def ai_management_loop(self):
-        """Main AI management loop - Smart Profit เป็นหลัก"""
-        print("🧠 AI PRIMARY CONTROL LOOP ACTIVE...")
+        """Main AI management loop - Smart Profit เป็นหลัก (legacy polling mode)"""
+        log.debug("🧠 AI PRIMARY CONTROL LOOP ACTIVE...")
         
         while self.trading_active and not self.emergency_stop_triggered:
             try:
-                connector = BackendAPIConnector(
-                    api_base_url="http://123.253.62.50:8080/api",
-                    timeout=10
-                )
+                with self.profiler.stage("ai_management_loop"):
+                    self.report_backend_status()
 
-                if self.should_report_status():
-                    account_info = self.mt5_connector.get_account_info()
-                    success, response_data, error_msg = connector.check_trading_status(account_info)
+                    log.debug("🛑 AI Management running")
 
-                    if success:
-                        # Handle response_data
-                        status = response_data.get("processedStatus")
-                        if status == "inactive":   
-                            self.stop_trading()         
-                            print("Your account is inactive. Trading has been disabled.")
-                        self.next_report_time = connector.format_datetime_response(response_data.get("nextReportTime"))
-                    else:
-                        # Handle error_msg - fail fast
-                        print(f"API Error: {error_msg}")
-
-                print("🛑 AI Management running")
-
-                # หลัก: Smart Profit Management
-                self.run_smart_profit_management()
-                
-                # เพิ่ม: AI Portfolio Health Check
-                self.ai_portfolio_health_check()
-                
-                # เพิ่ม: AI Performance Optimization (ทุก 5 นาที)
-                if hasattr(self, 'last_optimization') and (datetime.now() - self.last_optimization).total_seconds() > 300:
-                    self.ai_performance_optimization()
-                    self.last_optimization = datetime.now()
-                elif not hasattr(self, 'last_optimization'):
-                    self.last_optimization = datetime.now()
+                    self.run_ai_cycle()
+                    self.maybe_run_optimization()
                 
                 # เช็คทุก 3 วินาที - AI ทำงานถี่
                 time.sleep(3)
                 
             except Exception as e:
-                print(f"❌ AI Management error: {e}")
+                log.error(f"❌ AI Management error: {e}")
                 time.sleep(5)
                 
-        print("🛑 AI Management stopped")
+        log.debug("🛑 AI Management stopped")
+
+    def start_backend_status_client(self):
+        """Backend status heartbeat บน thread ของตัวเอง (connector + session เดียวตลอดอายุ manager)"""
+        if self.backend_client is None:
+            self.backend_client = BackendStatusClient.from_config(
+                self.config,
+                account_provider=lambda: self.mt5_connector.get_account_info() if self.mt5_connector else {}
+            )
+        self.backend_client.start()
+
+    @profiled_stage
+    def report_backend_status(self):
+        """อ่านสถานะล่าสุดที่ backend client publish ไว้ (ไม่รอ network)"""
+        if self.backend_client is None:
+            return
+
+        status = self.backend_client.status
+        if status.checks == self.backend_checks_handled:
+            return
+        self.backend_checks_handled = status.checks
+
+        if status.success:
+            self.next_report_time = status.next_report_time
+            if status.processed_status == "inactive":
+                self.stop_trading()
+                log.info("Your account is inactive. Trading has been disabled.")
+        else:
+            log.info(f"API Error: {status.error}")
+
+    @profiled_stage
+    def run_ai_cycle(self):
+        """หนึ่งรอบของ AI: snapshot -> smart profit -> health check"""
+        started = time.perf_counter()
+
+        # 📸 Snapshot เดียวต่อรอบ - ทุก decision ในรอบนี้เห็น positions ชุดเดียวกัน
+        cycle_snapshot = self.refresh_portfolio_snapshot()
+
+        # หลัก: Smart Profit Management
+        self.run_smart_profit_management(cycle_snapshot)
+
+        # Grid maintenance: desired ladder ครั้งเดียวต่อรอบ (virtual levels ที่หลุด tick ไปก่อน)
+        self.check_virtual_triggers()
+        if self.grid_reconciler:
+            self.reconcile_grid()
+        
+        # เพิ่ม: AI Portfolio Health Check (ใช้ snapshot เดิมถ้ายังไม่มี order_send)
+        self.ai_portfolio_health_check()
+
+        elapsed = time.perf_counter() - started
+        stats = self.ai_cycle_stats
+        stats['count'] += 1
+        stats['total_seconds'] += elapsed
+        stats['last_seconds'] = elapsed
+        stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    @profiled_stage
+    def maybe_run_optimization(self):
+        """AI Performance Optimization (ทุก 5 นาที)"""
+        if hasattr(self, 'last_optimization') and (datetime.now() - self.last_optimization).total_seconds() > 300:
+            self.ai_performance_optimization()
+            self.last_optimization = datetime.now()
+        elif not hasattr(self, 'last_optimization'):
+            self.last_optimization = datetime.now()
 
-    def should_report_status(self):
-        """Check if it's time to report status"""
-        if hasattr(self, 'next_report_time') and self.next_report_time:
-            current_utc = datetime.now(timezone.utc)
-            next_report_utc = self.next_report_time.astimezone(timezone.utc)
-            
-            print(f"Current UTC: {current_utc}")
-            print(f"Next report UTC: {next_report_utc}")
-            
-            return current_utc >= next_report_utc
-        return True  # Report if no scheduled time
-    
     def start_monitoring_loop(self):
         """Start monitoring thread"""
         if not hasattr(self, 'monitor_thread') or not self.monitor_thread.is_alive():
             self.monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
             self.monitor_thread.start()
-            print("📊 Monitoring Loop started")
+            log.info("📊 Monitoring Loop started")
 
     def monitoring_loop(self):
         """Monitoring loop for position updates"""
-        print("📊 AI Support Monitor active...")
+        log.debug("📊 AI Support Monitor active...")
         
         while self.trading_active and not self.emergency_stop_triggered:
             try:
-                # Update positions from MT5
-                self.update_positions_from_mt5()
-                
-                # Check for filled orders
-                self.check_pending_orders()
-                
-                # Monitor active positions
-                self.monitor_active_positions()
-                
-                # Update statistics
-                self.update_trading_statistics()
-                
-                # Check emergency conditions
-                self.check_emergency_conditions()
+                with self.profiler.stage("monitoring_loop"):
+                    self.sync_fills_and_orders()
+                    self.run_monitor_cycle()
                 
                 time.sleep(5)  # เช็คทุก 5 วินาที
                 
             except Exception as e:
-                print(f"❌ Monitor error: {e}")
+                log.error(f"❌ Monitor error: {e}")
                 time.sleep(10)
                 
-        print("🛑 Monitor stopped")
+        log.debug("🛑 Monitor stopped")
+
+    @profiled_stage
+    def sync_fills_and_orders(self):
+        """Update positions from MT5 + check for filled orders (-> replacement orders)"""
+        self.update_positions_from_mt5()
+        self.check_pending_orders()
+        if self.grid_reconcile_requested:
+            self.reconcile_grid()
+
+    @profiled_stage
+    def run_monitor_cycle(self):
+        """Monitor active positions, statistics และ emergency conditions"""
+        self.monitor_active_positions()
+        self.update_trading_statistics()
+        self.check_emergency_conditions()
+        if self.order_metrics:
+            self.order_metrics.maybe_dump(time.time())
+        self.profiler.poll_control()
+
+    def start_event_engine(self):
+        """Start event-driven engine (แทน AI loop + monitor loop)"""
+        if self.engine_scheduler and self.engine_scheduler.is_alive():
+            return
+            
+        scheduler_config = self.config.get('engine_scheduler', {})
+        self.engine_scheduler = EngineScheduler.from_config(
+            self.gold_symbol, self.config,
+            is_running=lambda: self.trading_active and not self.emergency_stop_triggered,
+            signal_source=(lambda: self.market_data.signals(self.gold_symbol)) if self.market_data else None
+        )
+        
+        # new fill / order change -> sync positions + replacement orders
+        self.engine_scheduler.register(
+            "fills", self.on_fill_event,
+            triggers={EngineEvent.POSITIONS, EngineEvent.ORDERS},
+            min_interval=0.0
+        )
+        # new tick -> virtual levels ที่ราคาวิ่งผ่าน
+        if self.virtual_ladder:
+            self.engine_scheduler.register(
+                "virtual_orders", lambda events: self.check_virtual_triggers(),
+                triggers={EngineEvent.TICK},
+                min_interval=0.0
+            )
+        # new tick / position change -> profit checks
+        self.engine_scheduler.register(
+            "profit", lambda events: self.run_ai_cycle(),
+            triggers={EngineEvent.TICK, EngineEvent.POSITIONS},
+            min_interval=scheduler_config.get('profit_check_interval', 1.0)
+        )
+        # timers -> monitor / health / backend / optimization
+        self.engine_scheduler.register(
+            "monitor", self.on_monitor_timer,
+            timer_interval=scheduler_config.get('monitor_interval', 5)
+        )
+        self.engine_scheduler.register(
+            "backend_status", lambda events: self.report_backend_status(),
+            timer_interval=scheduler_config.get('backend_check_interval', 30)
+        )
+        self.engine_scheduler.register(
+            "optimization", lambda events: self.maybe_run_optimization(),
+            timer_interval=scheduler_config.get('optimization_interval', 60)
+        )
+        
+        self.engine_scheduler.start()
+
+    @profiled_stage
+    def on_fill_event(self, events):
+        """Positions/orders count เปลี่ยน -> snapshot เดิมใช้ไม่ได้แล้ว"""
+        self.invalidate_portfolio_snapshot()
+        self.sync_fills_and_orders()
+
+    def on_monitor_timer(self, events):
+        """Timer ของ monitor: sync positions / profits ก่อนเสมอเหมือน monitoring_loop
+
+        (fill กับ close ใน poll เดียวกันทำให้จำนวนไม่เปลี่ยน - sync ตามรอบนี้จับได้)
+        """
+        self.sync_fills_and_orders()
+        self.run_monitor_cycle()
 
     def update_positions_from_mt5(self):
-        """Update positions from MT5"""
+        """Update positions from MT5 (ผ่าน portfolio snapshot)"""
         try:
-            positions = mt5.positions_get(symbol=self.gold_symbol)
+            positions = self.get_portfolio_snapshot().raw_positions
             
             if positions:
                 current_positions = {}
@@ -850,12 +1442,12 @@ class SmartProfitManager:
                     if ticket not in current_positions:
                         self.handle_closed_position(ticket)
                 
-                self.active_positions = current_positions
+                self.state_store.replace_positions(current_positions)
                 self.total_pnl = total_pnl
                 self.unrealized_pnl = total_pnl
                 
         except Exception as e:
-            print(f"❌ Position update error: {e}")
+            log.error(f"❌ Position update error: {e}")
 
     def handle_new_position(self, position_info):
         """Handle new position"""
@@ -865,7 +1457,7 @@ class SmartProfitManager:
             volume = position_info['volume']
             price = position_info['price_open']
             
-            print(f"🎯 NEW POSITION: {ticket} | {direction} | {volume} | ${price:.2f}")
+            log.info(f"🎯 NEW POSITION: {ticket} | {direction} | {volume} | ${price:.2f}")
             
             self.trades_opened += 1
             
@@ -876,7 +1468,7 @@ class SmartProfitManager:
             self.consider_replacement_order(position_info)
             
         except Exception as e:
-            print(f"❌ Error handling new position: {e}")
+            log.error(f"❌ Error handling new position: {e}")
 
     def handle_closed_position(self, ticket):
         """Handle closed position"""
@@ -885,7 +1477,7 @@ class SmartProfitManager:
                 pos_info = self.active_positions[ticket]
                 final_profit = pos_info.get('profit', 0)
                 
-                print(f"💰 POSITION CLOSED: {ticket} | PnL: ${final_profit:.2f}")
+                log.info(f"💰 POSITION CLOSED: {ticket} | PnL: ${final_profit:.2f}")
                 
                 self.trades_closed += 1
                 
@@ -903,7 +1495,7 @@ class SmartProfitManager:
                     self.win_rate = self.winning_trades / self.trades_closed
                     
         except Exception as e:
-            print(f"❌ Error handling closed position: {e}")
+            log.error(f"❌ Error handling closed position: {e}")
 
     def remove_filled_pending_order(self, position_info):
         """Remove filled pending order"""
@@ -911,26 +1503,17 @@ class SmartProfitManager:
             position_price = position_info['price_open']
             position_type = position_info['direction']
             
-            closest_order = None
-            min_distance = float('inf')
-            
-            for order_id, order_info in list(self.pending_orders.items()):
-                if order_info['direction'] == position_type:
-                    distance = abs(order_info['price'] - position_price)
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_order = order_id
-                        
-            if closest_order and min_distance < 0.50:
-                del self.pending_orders[closest_order]
+            nearest = self.pending_orders.nearest(position_price, position_type)
+            if nearest and nearest[0] < 0.50:
+                self.state_store.remove_pending_order(nearest[1]['order_id'])
                 
         except Exception as e:
-            print(f"❌ Error removing filled order: {e}")
+            log.error(f"❌ Error removing filled order: {e}")
 
     def check_pending_orders(self):
         """Check pending orders status"""
         try:
-            orders = mt5.orders_get(symbol=self.gold_symbol)
+            orders = self.fetch_orders()
             if orders is None:
                 return
                 
@@ -940,13 +1523,12 @@ class SmartProfitManager:
                     current_order_ids.add(order.ticket)
                     
             # Remove orders that no longer exist
-            for order_id in list(self.pending_orders.keys()):
-                if order_id not in current_order_ids:
-                    del self.pending_orders[order_id]
+            self.state_store.retain_pending_orders(current_order_ids)
                     
         except Exception as e:
-            print(f"❌ Error checking pending orders: {e}")
+            log.error(f"❌ Error checking pending orders: {e}")
 
+    @profiled_stage
     def monitor_active_positions(self):
         """Monitor active positions for changes"""
         try:
@@ -954,12 +1536,13 @@ class SmartProfitManager:
             pass
             
         except Exception as e:
-            print(f"❌ Error monitoring positions: {e}")
+            log.error(f"❌ Error monitoring positions: {e}")
 
-    def ai_portfolio_health_check(self):
+    @profiled_stage
+    def ai_portfolio_health_check(self, snapshot: PortfolioSnapshot = None):
         """AI ตรวจสอบสุขภาพ portfolio"""
         try:
-            portfolio = self.analyze_portfolio_positions()
+            portfolio = self.analyze_portfolio_positions(snapshot)
             
             if 'error' not in portfolio:
                 total_pnl = portfolio.get('total_pnl', 0)
@@ -967,16 +1550,17 @@ class SmartProfitManager:
                 
                 # AI Health Score
                 health_score = self.calculate_ai_health_score(portfolio)
+                self.ai_health_score = health_score
                 
                 # Log AI insights ทุก 30 วินาที
                 if not hasattr(self, 'last_health_log'):
                     self.last_health_log = datetime.now()
                 elif (datetime.now() - self.last_health_log).total_seconds() >= 30:
-                    print(f"🧠 AI Health: {health_score}/100 | {positions_count} pos | PnL: ${total_pnl:.2f}")
+                    log.debug("🧠 AI Health: %s/100 | %s pos | PnL: $%.2f", health_score, positions_count, total_pnl)
                     self.last_health_log = datetime.now()
                     
         except Exception as e:
-            print(f"❌ AI Health check error: {e}")
+            log.error(f"❌ AI Health check error: {e}")
 
     def calculate_ai_health_score(self, portfolio: Dict) -> int:
         """คำนวณ AI Health Score (0-100)"""
@@ -1017,19 +1601,19 @@ class SmartProfitManager:
             return max(0, min(100, score))
             
         except Exception as e:
-            print(f"❌ Health score error: {e}")
+            log.error(f"❌ Health score error: {e}")
             return 50
 
     def ai_performance_optimization(self):
         """AI Performance Optimization ทุก 5 นาที"""
         try:
-            print("🧠 AI OPTIMIZATION: Analyzing performance...")
+            log.debug("🧠 AI OPTIMIZATION: Analyzing performance...")
             
             # รัน optimization
             opportunities = self.identify_profit_opportunities()
             
             if opportunities:
-                print(f"💡 AI found {len(opportunities)} optimization opportunities")
+                log.debug("💡 AI found %s optimization opportunities", len(opportunities))
                 # Execute top opportunities
                 for opp in opportunities[:3]:  # Top 3 opportunities
                     if opp['type'] == 'PAIR_CLOSE':
@@ -1038,11 +1622,12 @@ class SmartProfitManager:
                         self.execute_smart_hedges([opp['data']])
                         
             else:
-                print("✅ AI: Portfolio optimally configured")
+                log.debug("✅ AI: Portfolio optimally configured")
                 
         except Exception as e:
-            print(f"❌ AI Optimization error: {e}")
+            log.error(f"❌ AI Optimization error: {e}")
 
+    @profiled_stage
     def check_emergency_conditions(self):
         """ตรวจสอบเงื่อนไข emergency stop - แก้ไขแล้ว ไม่มั่วซั่ว"""
         try:
@@ -1052,9 +1637,10 @@ class SmartProfitManager:
             
             # 🛡️ เปลี่ยนจาก 95% เป็น 85% เพื่อความปลอดภัย
             if survivability_used_pct > 85:
-                print(f"🚨 CRITICAL: Survivability {survivability_used_pct:.1f}% used (limit: 85%)")
-                print(f"   Current drawdown: {current_drawdown:,.0f} points")
-                print(f"   Max survivability: {self.survivability:,} points")
+                log.warning(f"🚨 CRITICAL: Survivability {survivability_used_pct:.1f}% used (limit: 85%)")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug(f"   Current drawdown: {current_drawdown:,.0f} points")
+                    log.debug(f"   Max survivability: {self.survivability:,} points")
                 return True
                 
             # ✅ ลบการเช็ค margin level ออกเพราะมั่วซั่ว
@@ -1063,7 +1649,7 @@ class SmartProfitManager:
             return False
             
         except Exception as e:
-            print(f"❌ Error checking emergency conditions: {e}")
+            log.error(f"❌ Error checking emergency conditions: {e}")
             return False
 
     def get_current_drawdown(self):
@@ -1083,34 +1669,34 @@ class SmartProfitManager:
                 return 0
                 
         except Exception as e:
-            print(f"❌ Error calculating drawdown: {e}")
+            log.error(f"❌ Error calculating drawdown: {e}")
             return 0
 
     def trigger_emergency_stop(self):
         """เรียก emergency stop - แก้ไขแล้ว ทำงานได้จริง"""
         try:
-            print("🚨 EMERGENCY STOP ACTIVATED!")
-            print("   Reason: Survivability limit exceeded")
+            log.warning("🚨 EMERGENCY STOP ACTIVATED!")
+            log.debug("   Reason: Survivability limit exceeded")
             
             # ✅ ตั้งค่า flag เท่านั้น - ไม่ปิด positions
             self.trading_active = False
             
             # ✅ ไม่ปิดไม้อัตโนมัติ - ให้ user ตัดสินใจเอง
-            print("🛑 Trading stopped - positions remain open")
-            print("💡 Use manual close if needed")
+            log.info("🛑 Trading stopped - positions remain open")
+            log.info("💡 Use manual close if needed")
             
             # ✅ ยกเลิก pending orders เท่านั้น
             self.cancel_all_pending_orders()
             
         except Exception as e:
-            print(f"❌ Error triggering emergency stop: {e}")
+            log.error(f"❌ Error triggering emergency stop: {e}")
 
     def emergency_close_all_positions(self):
         """ปิด positions ทั้งหมดในกรณีฉุกเฉิน"""
         try:
             positions = mt5.positions_get(symbol=self.gold_symbol)
             if not positions:
-                print("   No positions to close")
+                log.debug("   No positions to close")
                 return
                 
             closed_count = 0
@@ -1138,31 +1724,34 @@ class SmartProfitManager:
                     "price": close_price,
                     "deviation": 100,
                     "magic": self.magic_number,
-                    "comment": "EMERGENCY_CLOSE_ALL",
-                    "type_filling": mt5.ORDER_FILLING_IOC
+                    "comment": "EMERGENCY_CLOSE_ALL"
                 }
+                # mode ล่าสุดที่เรียนรู้ ณ ตอนส่ง (None = AUTO ไม่ระบุ type_filling)
+                close_mode = self.filling_cache.preferred_mode("CLOSE") if self.filling_cache else self.close_filling_mode
+                if close_mode is not None:
+                    request["type_filling"] = close_mode
                 
-                result = mt5.order_send(request)
+                result = self.submit_order_request(request, OrderPriority.EMERGENCY)
+                self.record_filling_result("CLOSE", close_mode, result)
                 if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"   ✅ Emergency closed: {position.ticket}")
+                    log.debug("   ✅ Emergency closed: %s", position.ticket)
                     closed_count += 1
                     
-                    if position.ticket in self.active_positions:
-                        del self.active_positions[position.ticket]
+                    self.state_store.remove_position(position.ticket)
                 else:
-                    print(f"   ❌ Failed to close: {position.ticket}")
+                    log.error(f"   ❌ Failed to close: {position.ticket}")
                     
-            print(f"🚨 Emergency close completed: {closed_count} positions closed")
+            log.warning(f"🚨 Emergency close completed: {closed_count} positions closed")
             
         except Exception as e:
-            print(f"❌ Error in emergency close: {e}")
+            log.error(f"❌ Error in emergency close: {e}")
 
     def cancel_all_pending_orders(self):
         """ยกเลิก pending orders ทั้งหมด"""
         try:
             orders = mt5.orders_get(symbol=self.gold_symbol)
             if not orders:
-                print("   No pending orders to cancel")
+                log.debug("   No pending orders to cancel")
                 return
                 
             cancelled_count = 0
@@ -1176,21 +1765,21 @@ class SmartProfitManager:
                     "comment": "EMERGENCY_CANCEL_ALL"
                 }
                 
-                result = mt5.order_send(request)
+                result = self.submit_order_request(request, OrderPriority.EMERGENCY)
                 if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                    print(f"   ✅ Emergency cancelled: {order.ticket}")
+                    log.debug("   ✅ Emergency cancelled: %s", order.ticket)
                     cancelled_count += 1
                     
-                    if order.ticket in self.pending_orders:
-                        del self.pending_orders[order.ticket]
+                    self.state_store.remove_pending_order(order.ticket)
                 else:
-                    print(f"   ❌ Failed to cancel: {order.ticket}")
+                    log.error(f"   ❌ Failed to cancel: {order.ticket}")
                     
-            print(f"🚨 Emergency cancel completed: {cancelled_count} orders cancelled")
+            log.warning(f"🚨 Emergency cancel completed: {cancelled_count} orders cancelled")
             
         except Exception as e:
-            print(f"❌ Error in emergency cancel: {e}")
+            log.error(f"❌ Error in emergency cancel: {e}")
 
+    @profiled_stage
     def update_trading_statistics(self):
         """Update trading statistics"""
         try:
@@ -1205,37 +1794,51 @@ class SmartProfitManager:
                 self.last_stats_log = datetime.now()
                 
             if (datetime.now() - self.last_stats_log).seconds >= 60:
-                print(f"🧠 AI STATS: {len(self.active_positions)} pos | ${self.total_pnl:.2f} PnL | {len(self.pending_orders)} pending")
+                log.debug("🧠 AI STATS: %s pos | $%.2f PnL | %s pending",
+                          len(self.active_positions), self.total_pnl, len(self.pending_orders))
                 self.last_stats_log = datetime.now()
                 
         except Exception as e:
-            print(f"❌ Error updating statistics: {e}")
+            log.error(f"❌ Error updating statistics: {e}")
 
     def stop_trading(self):
         """Stop the trading system"""
         try:
-            print("🛑 AI Smart Profit System Stopping...")
+            log.info("🛑 AI Smart Profit System Stopping...")
             
             self.trading_active = False
             
             if hasattr(self, 'ai_thread') and self.ai_thread.is_alive():
-                print("   🧠 Stopping AI Management...")
+                log.info("   🧠 Stopping AI Management...")
                 
             if hasattr(self, 'monitor_thread') and self.monitor_thread.is_alive():
-                print("   📊 Stopping Monitor...")
+                log.info("   📊 Stopping Monitor...")
+                
+            if self.engine_scheduler and self.engine_scheduler.is_alive():
+                log.info("   ⚡ Stopping Engine Scheduler...")
+                self.engine_scheduler.stop()
+                
+            if self.backend_client:
+                self.backend_client.stop()
+
+            if self.metrics_server:
+                self.metrics_server.unregister(self)
+
+            if self.order_metrics and self.order_metrics.settings.dump_file:
+                self.order_metrics.dump(self.order_metrics.settings.dump_file)
                 
             # Final statistics
             final_stats = self.get_final_statistics()
-            print("📊 FINAL STATISTICS:")
-            print(f"   💰 Total PnL: ${final_stats['total_pnl']:.2f}")
-            print(f"   📈 Trades: {final_stats['trades_opened']} opened, {final_stats['trades_closed']} closed")
-            print(f"   🎯 Win Rate: {final_stats['win_rate']:.1f}%")
-            print(f"   🛡️ Max Drawdown: {final_stats['max_drawdown']:,.0f} points")
+            log.info("📊 FINAL STATISTICS:")
+            log.info(f"   💰 Total PnL: ${final_stats['total_pnl']:.2f}")
+            log.info(f"   📈 Trades: {final_stats['trades_opened']} opened, {final_stats['trades_closed']} closed")
+            log.info(f"   🎯 Win Rate: {final_stats['win_rate']:.1f}%")
+            log.info(f"   🛡️ Max Drawdown: {final_stats['max_drawdown']:,.0f} points")
             
-            print("✅ AI Smart Profit System Stopped Successfully")
+            log.info("✅ AI Smart Profit System Stopped Successfully")
             
         except Exception as e:
-            print(f"❌ Error stopping trading: {e}")
+            log.error(f"❌ Error stopping trading: {e}")
 
     def get_final_statistics(self):
         """Get final trading statistics"""
@@ -1259,7 +1862,7 @@ class SmartProfitManager:
             }
             
         except Exception as e:
-            print(f"❌ Error getting final statistics: {e}")
+            log.error(f"❌ Error getting final statistics: {e}")
             return {}
 
     def calculate_smart_profit_target(self, lot_size: float, strategy: ProfitStrategy = None) -> Dict:
@@ -1286,43 +1889,47 @@ class SmartProfitManager:
             'strategy': strategy.value
         }
 
-    def run_smart_profit_management(self):
+    @profiled_stage
+    def run_smart_profit_management(self, snapshot: PortfolioSnapshot = None):
             """🧠 AI หลัก - แก้ไขแล้วเช็ค portfolio status ก่อน"""
             
             try:
-                # ✅ เช็ค account status ก่อนทุกอย่าง
-                account_info = self.mt5_connector.get_account_info()
+                if snapshot is None:
+                    snapshot = self.get_portfolio_snapshot()
+                    
+                # ✅ เช็ค account status ก่อนทุกอย่าง (จาก snapshot ของรอบนี้)
                 portfolio_profitable = False
                 portfolio_balanced = False
                 actual_loss = 0
+                profit_amount = 0
                 
-                if account_info:
-                    balance = account_info.get('balance', 0)
-                    equity = account_info.get('equity', 0)
+                if snapshot.balance > 0:
+                    balance = snapshot.balance
+                    equity = snapshot.equity
                     profit_amount = equity - balance
                     
                     portfolio_profitable = equity > balance
                     portfolio_balanced = abs(profit_amount) <= 5.0
                     actual_loss = abs(profit_amount) if profit_amount < 0 else 0
                     
-                    print(f"💰 Portfolio Status Check:")
-                    print(f"   Balance: ${balance:.2f}, Equity: ${equity:.2f}")
-                    print(f"   Net P&L: ${profit_amount:.2f}")
+                    log.debug("💰 Portfolio Status Check:")
+                    log.debug("   Balance: $%.2f, Equity: $%.2f", balance, equity)
+                    log.debug("   Net P&L: $%.2f", profit_amount)
                     
                     if portfolio_profitable:
-                        print(f"✅ Portfolio Status: PROFITABLE (+${profit_amount:.2f})")
-                        print(f"   🎯 AI Mode: PROFIT OPTIMIZATION")
+                        log.debug("✅ Portfolio Status: PROFITABLE (+$%.2f)", profit_amount)
+                        log.debug("   🎯 AI Mode: PROFIT OPTIMIZATION")
                     elif portfolio_balanced:
-                        print(f"⚖️ Portfolio Status: BALANCED (${profit_amount:.2f})")
-                        print(f"   🎯 AI Mode: MAINTENANCE")
+                        log.debug("⚖️ Portfolio Status: BALANCED ($%.2f)", profit_amount)
+                        log.debug("   🎯 AI Mode: MAINTENANCE")
                     else:
-                        print(f"📉 Portfolio Status: LOSING (-${actual_loss:.2f})")
-                        print(f"   🎯 AI Mode: RECOVERY FOCUS")
+                        log.debug("📉 Portfolio Status: LOSING (-$%.2f)", actual_loss)
+                        log.debug("   🎯 AI Mode: RECOVERY FOCUS")
                 
                 # 1. 🧠 AI วิเคราะห์ positions ปัจจุบัน
-                portfolio = self.analyze_portfolio_positions()
+                portfolio = self.analyze_portfolio_positions(snapshot)
                 if 'error' in portfolio or portfolio.get('total_positions', 0) == 0:
-                    print("🔄 No positions detected - AI creating intelligent grid")
+                    log.debug("🔄 No positions detected - AI creating intelligent grid")
                     self.create_grid_immediately()
                     return
                     
@@ -1333,7 +1940,7 @@ class SmartProfitManager:
                 buy_positions = [p for p in positions if p.direction == "BUY"]
                 sell_positions = [p for p in positions if p.direction == "SELL"]
                 
-                print(f"📊 Portfolio: {len(buy_positions)} BUY, {len(sell_positions)} SELL, PnL: ${total_pnl:.2f}")
+                log.debug("📊 Portfolio: %s BUY, %s SELL, PnL: $%.2f", len(buy_positions), len(sell_positions), total_pnl)
                 
                 # เพิ่ม: เช็ค imbalance และแก้ไข (ปรับตาม portfolio status)
                 position_imbalance = abs(len(buy_positions) - len(sell_positions))
@@ -1341,16 +1948,17 @@ class SmartProfitManager:
                 # ✅ ปรับ imbalance tolerance ตาม portfolio status
                 if portfolio_profitable:
                     max_imbalance_allowed = 8  # ผ่อนปรนเมื่อกำไร
-                    print(f"⚖️ AI: Profitable portfolio - relaxed imbalance tolerance ({max_imbalance_allowed})")
+                    log.debug("⚖️ AI: Profitable portfolio - relaxed imbalance tolerance (%s)", max_imbalance_allowed)
                 elif portfolio_balanced:
                     max_imbalance_allowed = 6  # ปานกลาง
-                    print(f"⚖️ AI: Balanced portfolio - moderate imbalance tolerance ({max_imbalance_allowed})")
+                    log.debug("⚖️ AI: Balanced portfolio - moderate imbalance tolerance (%s)", max_imbalance_allowed)
                 else:
                     max_imbalance_allowed = 4  # เข้มงวดเมื่อขาดทุน
-                    print(f"⚖️ AI: Losing portfolio - strict imbalance tolerance ({max_imbalance_allowed})")
+                    log.debug("⚖️ AI: Losing portfolio - strict imbalance tolerance (%s)", max_imbalance_allowed)
                 
                 if position_imbalance > max_imbalance_allowed:
-                    print(f"⚖️ AI: Position imbalance detected ({position_imbalance} > {max_imbalance_allowed}), adding orders...")
+                    log.debug("⚖️ AI: Position imbalance detected (%s > %s), adding orders...",
+                              position_imbalance, max_imbalance_allowed)
                     self.create_grid_immediately()  # เพิ่ม orders ใหม่
                 
                 # 🧠 AI ตรวจสอบ survivability ปัจจุบัน (ปรับตาม portfolio status)
@@ -1359,25 +1967,28 @@ class SmartProfitManager:
                     current_coverage = self.estimate_current_survivability(positions)
                     survivability_ratio = current_coverage / target_survivability
                     
-                    print(f"🛡️ AI SURVIVABILITY CHECK: {current_coverage:,}/{target_survivability:,} points ({survivability_ratio:.1%})")
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug(f"🛡️ AI SURVIVABILITY CHECK: {current_coverage:,}/{target_survivability:,} points "
+                                  f"({survivability_ratio:.1%})")
                     
                     # ✅ ปรับ survivability requirement ตาม portfolio status
                     if portfolio_profitable:
                         min_survivability_ratio = 0.4  # ผ่อนปรนเมื่อกำไร - 40% ก็พอ
-                        print(f"   💰 Profitable mode: Relaxed survivability requirement (40%)")
+                        log.debug("   💰 Profitable mode: Relaxed survivability requirement (40%%)")
                     elif portfolio_balanced:
                         min_survivability_ratio = 0.5  # ปานกลาง - 50%
-                        print(f"   ⚖️ Balanced mode: Moderate survivability requirement (50%)")
+                        log.debug("   ⚖️ Balanced mode: Moderate survivability requirement (50%%)")
                     else:
                         min_survivability_ratio = 0.6  # เข้มงวดเมื่อขาดทุน - 60%
-                        print(f"   📉 Losing mode: Strict survivability requirement (60%)")
+                        log.debug("   📉 Losing mode: Strict survivability requirement (60%%)")
                     
                     if survivability_ratio < min_survivability_ratio:
-                        print(f"🚨 AI: SURVIVABILITY {'CRITICAL' if not portfolio_profitable else 'LOW'} - Adding protective positions")
+                        log.warning(f"🚨 AI: SURVIVABILITY {'CRITICAL' if not portfolio_profitable else 'LOW'} - Adding protective positions")
                         self.rebalance_portfolio_if_needed(positions)
                         return
                     else:
-                        print(f"✅ AI: Survivability adequate for {('PROFITABLE' if portfolio_profitable else 'BALANCED' if portfolio_balanced else 'LOSING')} portfolio")
+                        log.debug("✅ AI: Survivability adequate for %s portfolio",
+                                  'PROFITABLE' if portfolio_profitable else 'BALANCED' if portfolio_balanced else 'LOSING')
                 
                 # 2. 🧠 AI ปิดไม้อย่างฉลาด (ใช้ method ที่ฉลาดแล้ว)
                 profitable_pairs = self.find_profitable_pairs(positions)
@@ -1386,19 +1997,19 @@ class SmartProfitManager:
                     # ✅ ปรับ execution ตาม portfolio status
                     if portfolio_profitable:
                         max_pairs_to_close = min(3, len(profitable_pairs))  # ปิดน้อยลงเมื่อกำไร
-                        print(f"💰 AI PROFIT MODE: Executing {max_pairs_to_close} conservative closes")
+                        log.debug("💰 AI PROFIT MODE: Executing %s conservative closes", max_pairs_to_close)
                     elif portfolio_balanced:
                         max_pairs_to_close = min(4, len(profitable_pairs))  # ปานกลาง
-                        print(f"⚖️ AI BALANCED MODE: Executing {max_pairs_to_close} moderate closes")
+                        log.debug("⚖️ AI BALANCED MODE: Executing %s moderate closes", max_pairs_to_close)
                     else:
                         max_pairs_to_close = len(profitable_pairs)  # ปิดทุกคู่เมื่อขาดทุน
-                        print(f"📉 AI RECOVERY MODE: Executing {max_pairs_to_close} aggressive closes")
+                        log.debug("📉 AI RECOVERY MODE: Executing %s aggressive closes", max_pairs_to_close)
                     
                     selected_pairs = profitable_pairs[:max_pairs_to_close]
                     self.execute_pair_closes(selected_pairs)
                     time.sleep(1)
                     
-                    # อัพเดท portfolio หลังปิด
+                    # อัพเดท portfolio หลังปิด (snapshot ถูก invalidate โดย order_send แล้ว)
                     portfolio = self.analyze_portfolio_positions()
                     positions = portfolio.get('grid_positions', [])
                     
@@ -1406,141 +2017,144 @@ class SmartProfitManager:
                     if len(positions) < 4:
                         # ✅ ปรับการตอบสนองตาม portfolio status
                         if portfolio_profitable:
-                            print("🔧 AI: Post-close analysis - Coverage adequate for profitable portfolio")
+                            log.debug("🔧 AI: Post-close analysis - Coverage adequate for profitable portfolio")
                         else:
-                            print("🔧 AI: Post-close analysis - Need more coverage")
+                            log.debug("🔧 AI: Post-close analysis - Need more coverage")
                             self.rebalance_portfolio_if_needed(positions)
                 else:
                     # ✅ แสดงข้อความที่เหมาะสมตาม portfolio status
                     if portfolio_profitable:
-                        print("💰 AI: No urgent profit opportunities - Portfolio performing well")
+                        log.debug("💰 AI: No urgent profit opportunities - Portfolio performing well")
                     elif portfolio_balanced:
-                        print("⚖️ AI: No immediate opportunities - Portfolio stable")
+                        log.debug("⚖️ AI: No immediate opportunities - Portfolio stable")
                     else:
-                        print("🤔 AI: No safe profit opportunities found - Monitoring for changes")
+                        log.debug("🤔 AI: No safe profit opportunities found - Monitoring for changes")
                 
                 # 3. 🧠 AI Portfolio Recovery (ถ้าขาดทุน) - ปรับเงื่อนไข
                 if self.recovery_enabled:
                     # ✅ เฉพาะเมื่อ portfolio ขาดทุนจริงๆ ถึงจะเช็ค recovery
                     if not portfolio_profitable and not portfolio_balanced:
-                        print("📉 AI: Portfolio losing - Checking recovery options...")
+                        log.debug("📉 AI: Portfolio losing - Checking recovery options...")
                         self.check_and_run_recovery(portfolio)
                     else:
                         # ถ้า recovery กำลังทำงานแต่ portfolio กลับมากำไรแล้ว
                         if self.recovery_active:
-                            print("💊 AI: Portfolio recovered - Stopping recovery system")
+                            log.debug("💊 AI: Portfolio recovered - Stopping recovery system")
                             self.recovery_active = False
                             self.recovery_start_time = None
                         else:
-                            print("💰 AI: Portfolio healthy - Recovery system standby")
+                            log.debug("💰 AI: Portfolio healthy - Recovery system standby")
                 
                 # ✅ เพิ่ม: AI Profit Optimization เมื่อ portfolio กำไร
                 if portfolio_profitable:
-                    print("🎯 AI PROFIT OPTIMIZATION:")
+                    log.debug("🎯 AI PROFIT OPTIMIZATION:")
                     
                     # 1. เช็คว่ามี positions ที่กำไรมากแล้วควรปิดไหม
                     high_profit_positions = [p for p in positions if p.pnl > 5.0]  # กำไรเกิน $5
                     if high_profit_positions:
-                        print(f"   💎 Found {len(high_profit_positions)} high-profit positions")
-                        print("   💡 Consider taking profits on strong performers")
+                        log.debug("   💎 Found %s high-profit positions", len(high_profit_positions))
+                        log.debug("   💡 Consider taking profits on strong performers")
                     
                     # 2. เช็ค trailing stop opportunities
                     trailing_candidates = [p for p in positions if p.pnl > 3.0]  # กำไรเกิน $3
                     if trailing_candidates:
-                        print(f"   📈 {len(trailing_candidates)} positions eligible for trailing stops")
+                        log.debug("   📈 %s positions eligible for trailing stops", len(trailing_candidates))
                     
                     # 3. Portfolio compound opportunities
                     if profit_amount > 20:  # กำไรเกิน $20
-                        print(f"   🚀 Portfolio ready for compound growth strategies")
-                        print(f"   💡 Consider increasing position sizes gradually")
+                        log.debug("   🚀 Portfolio ready for compound growth strategies")
+                        log.debug("   💡 Consider increasing position sizes gradually")
                 
             except Exception as e:
-                print(f"❌ Smart profit management error: {e}")
+                log.error(f"❌ Smart profit management error: {e}")
                 # เพิ่ม debug info
-                import traceback
-                print(f"🔍 Debug traceback:")
-                traceback.print_exc()
+                log.debug("🔍 Debug traceback:", exc_info=True)
 
+    @profiled_stage
     def create_grid_immediately(self):
         """สร้าง grid ใหม่ทันที - แก้ไขให้กระจายห่างขึ้น"""
+        if self.grid_reconciler:
+            self.request_grid_reconcile()   # reconcile stage จัดการ ladder ทั้งหมด
+            return
+
         try:
             # เช็คว่ามี pending orders อยู่แล้วหรือไม่
             if len(self.pending_orders) >= 10:  # เพิ่มจาก 6 เป็น 10
-                print(f"🔄 Sufficient orders exist ({len(self.pending_orders)}) - checking spread")
+                log.debug("🔄 Sufficient orders exist (%s) - checking spread", len(self.pending_orders))
                 self.ensure_proper_grid_spread()
                 return
                 
-            print("🧠 AI: Creating wide-spread grid coverage...")
+            log.debug("🧠 AI: Creating wide-spread grid coverage...")
             
             current_price = self.get_current_price()
             if not current_price:
-                print("❌ Cannot get current price")
+                log.error("❌ Cannot get current price")
                 return
                 
             # ✅ เพิ่ม spacing ให้กว้างขึ้น
             base_spacing = self.grid_spacing * 0.01
             wide_spacing = base_spacing * 1.5  # เพิ่ม 50%
             
-            print(f"   📏 Base spacing: ${base_spacing:.2f}")
-            print(f"   📏 Wide spacing: ${wide_spacing:.2f}")
+            log.debug("   📏 Base spacing: $%.2f", base_spacing)
+            log.debug("   📏 Wide spacing: $%.2f", wide_spacing)
             
             orders_created = 0
             
             # นับ orders ที่มีอยู่
-            buy_orders = [o for o in self.pending_orders.values() if o['direction'] == 'BUY']
-            sell_orders = [o for o in self.pending_orders.values() if o['direction'] == 'SELL']
+            buy_count = self.pending_orders.count('BUY')
+            sell_count = self.pending_orders.count('SELL')
             
-            print(f"📊 Current orders: {len(buy_orders)} BUY, {len(sell_orders)} SELL")
+            log.debug("📊 Current orders: %s BUY, %s SELL", buy_count, sell_count)
             
             # ✅ BUY orders - กระจายไกลขึ้น
-            if len(buy_orders) < 5:  # เพิ่มเป้าหมาย
-                print("🟢 Creating BUY ladder:")
+            if buy_count < 5:  # เพิ่มเป้าหมาย
+                log.debug("🟢 Creating BUY ladder:")
                 for i in range(1, 8):  # เพิ่มระดับ
                     # ใช้ progressive spacing - ยิ่งไกลยิ่งห่าง
                     distance_multiplier = 1.0 + (i * 0.2)  # 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.2
                     buy_price = current_price - (wide_spacing * i * distance_multiplier)
                     
-                    print(f"   🎯 Level {i}: ${buy_price:.2f} (distance: {wide_spacing * i * distance_multiplier:.2f})")
+                    log.debug("   🎯 Level %s: $%.2f (distance: %.2f)",
+                              i, buy_price, wide_spacing * i * distance_multiplier)
                     
                     if buy_price > 100:  # ป้องกันราคาต่ำเกิน
                         if not self.has_order_near_price(buy_price, 'BUY', tolerance=wide_spacing * 0.3):
                             if self.place_pending_order(buy_price, 'BUY', self.base_lot):
                                 orders_created += 1
-                                print(f"   ✅ BUY placed: ${buy_price:.2f}")
+                                log.debug("   ✅ BUY placed: $%.2f", buy_price)
                                 
                             # หยุดถ้าได้เป้าหมายแล้ว
-                            current_buy_count = len([o for o in self.pending_orders.values() if o['direction'] == 'BUY'])
-                            if current_buy_count >= 5:
+                            if self.pending_orders.count('BUY') >= 5:
                                 break
                                 
             # ✅ SELL orders - กระจายไกลขึ้น
-            if len(sell_orders) < 5:  # เพิ่มเป้าหมาย
-                print("🔴 Creating SELL ladder:")
+            if sell_count < 5:  # เพิ่มเป้าหมาย
+                log.debug("🔴 Creating SELL ladder:")
                 for i in range(1, 8):  # เพิ่มระดับ
                     # ใช้ progressive spacing - ยิ่งไกลยิ่งห่าง
                     distance_multiplier = 1.0 + (i * 0.2)  # 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.2
                     sell_price = current_price + (wide_spacing * i * distance_multiplier)
                     
-                    print(f"   🎯 Level {i}: ${sell_price:.2f} (distance: {wide_spacing * i * distance_multiplier:.2f})")
+                    log.debug("   🎯 Level %s: $%.2f (distance: %.2f)",
+                              i, sell_price, wide_spacing * i * distance_multiplier)
                     
                     if not self.has_order_near_price(sell_price, 'SELL', tolerance=wide_spacing * 0.3):
                         if self.place_pending_order(sell_price, 'SELL', self.base_lot):
                             orders_created += 1
-                            print(f"   ✅ SELL placed: ${sell_price:.2f}")
+                            log.debug("   ✅ SELL placed: $%.2f", sell_price)
                             
                         # หยุดถ้าได้เป้าหมายแล้ว
-                        current_sell_count = len([o for o in self.pending_orders.values() if o['direction'] == 'SELL'])
-                        if current_sell_count >= 5:
+                        if self.pending_orders.count('SELL') >= 5:
                             break
                             
             if orders_created > 0:
-                print(f"✅ Wide-spread grid created: {orders_created} orders")
+                log.debug("✅ Wide-spread grid created: %s orders", orders_created)
                 self.print_grid_coverage()
             else:
-                print(f"✅ Grid coverage adequate")
+                log.debug("✅ Grid coverage adequate")
                 
         except Exception as e:
-            print(f"❌ Grid creation error: {e}")
+            log.error(f"❌ Grid creation error: {e}")
 
     def ensure_proper_grid_spread(self):
         """ใหม่ - ตรวจสอบและแก้ไข grid spread"""
@@ -1549,40 +2163,40 @@ class SmartProfitManager:
             if not current_price:
                 return
                 
-            buy_orders = [o for o in self.pending_orders.values() if o['direction'] == 'BUY']
-            sell_orders = [o for o in self.pending_orders.values() if o['direction'] == 'SELL']
+            buy_bounds = self.pending_orders.price_bounds('BUY')
+            sell_bounds = self.pending_orders.price_bounds('SELL')
             
-            if not buy_orders or not sell_orders:
+            if not buy_bounds or not sell_bounds:
                 return
                 
             # ✅ เช็ค coverage range
-            min_buy_price = min(o['price'] for o in buy_orders)
-            max_sell_price = max(o['price'] for o in sell_orders)
+            min_buy_price = buy_bounds[0]
+            max_sell_price = sell_bounds[1]
             
             buy_coverage = current_price - min_buy_price
             sell_coverage = max_sell_price - current_price
             
             target_coverage = self.survivability * 0.01 * 0.3  # 30% ของ survivability
             
-            print(f"📊 Grid Coverage Check:")
-            print(f"   BUY coverage: ${buy_coverage:.2f} (target: ${target_coverage:.2f})")
-            print(f"   SELL coverage: ${sell_coverage:.2f} (target: ${target_coverage:.2f})")
+            log.debug("📊 Grid Coverage Check:")
+            log.debug("   BUY coverage: $%.2f (target: $%.2f)", buy_coverage, target_coverage)
+            log.debug("   SELL coverage: $%.2f (target: $%.2f)", sell_coverage, target_coverage)
             
             # ✅ ถ้า coverage ไม่พอ ให้เพิ่ม orders ไกลออกไป
             if buy_coverage < target_coverage:
-                print("🟢 Extending BUY coverage...")
+                log.debug("🟢 Extending BUY coverage...")
                 extended_buy_price = current_price - target_coverage
                 if not self.has_order_near_price(extended_buy_price, 'BUY', tolerance=50):
                     self.place_pending_order(extended_buy_price, 'BUY', self.base_lot)
                     
             if sell_coverage < target_coverage:
-                print("🔴 Extending SELL coverage...")
+                log.debug("🔴 Extending SELL coverage...")
                 extended_sell_price = current_price + target_coverage
                 if not self.has_order_near_price(extended_sell_price, 'SELL', tolerance=50):
                     self.place_pending_order(extended_sell_price, 'SELL', self.base_lot)
                     
         except Exception as e:
-            print(f"❌ Grid spread check error: {e}")
+            log.error(f"❌ Grid spread check error: {e}")
 
     def print_grid_coverage(self):
         """ใหม่ - แสดงข้อมูล grid coverage"""
@@ -1591,39 +2205,43 @@ class SmartProfitManager:
             if not current_price:
                 return
                 
-            buy_orders = [o for o in self.pending_orders.values() if o['direction'] == 'BUY']
-            sell_orders = [o for o in self.pending_orders.values() if o['direction'] == 'SELL']
+            buy_orders = self.pending_orders.orders_for('BUY')
+            sell_orders = self.pending_orders.orders_for('SELL')
             
-            print(f"📊 GRID COVERAGE SUMMARY:")
-            print(f"   Current price: ${current_price:.2f}")
+            log.debug("📊 GRID COVERAGE SUMMARY:")
+            log.debug("   Current price: $%.2f", current_price)
             
             if buy_orders:
                 buy_prices = [o['price'] for o in buy_orders]
                 min_buy = min(buy_prices)
                 max_buy = max(buy_prices)
-                print(f"   BUY range: ${min_buy:.2f} to ${max_buy:.2f} ({len(buy_orders)} orders)")
-                print(f"   BUY coverage: ${current_price - min_buy:.2f}")
+                log.debug("   BUY range: $%.2f to $%.2f (%s orders)", min_buy, max_buy, len(buy_orders))
+                log.debug("   BUY coverage: $%.2f", current_price - min_buy)
                 
             if sell_orders:
                 sell_prices = [o['price'] for o in sell_orders]
                 min_sell = min(sell_prices)
                 max_sell = max(sell_prices)
-                print(f"   SELL range: ${min_sell:.2f} to ${max_sell:.2f} ({len(sell_orders)} orders)")
-                print(f"   SELL coverage: ${max_sell - current_price:.2f}")
+                log.debug("   SELL range: $%.2f to $%.2f (%s orders)", min_sell, max_sell, len(sell_orders))
+                log.debug("   SELL coverage: $%.2f", max_sell - current_price)
                 
             total_coverage = 0
             if buy_orders and sell_orders:
                 total_coverage = max(sell_prices) - min(buy_prices)
-                print(f"   TOTAL coverage: ${total_coverage:.2f}")
+                log.debug("   TOTAL coverage: $%.2f", total_coverage)
                 
             survivability_coverage = (total_coverage / (self.survivability * 0.01)) * 100
-            print(f"   Survivability coverage: {survivability_coverage:.1f}%")
+            log.debug("   Survivability coverage: %.1f%%", survivability_coverage)
                 
         except Exception as e:
-            print(f"❌ Print coverage error: {e}")
+            log.error(f"❌ Print coverage error: {e}")
 
     def consider_replacement_order(self, filled_position):
         """วางไม้ใหม่หลังปิด position - แก้ไขให้กระจายไกลขึ้น"""
+        if self.grid_reconciler:
+            self.request_grid_reconcile()   # reconcile stage จัดการ ladder ทั้งหมด
+            return
+
         try:
             current_price = self.get_current_price()
             if not current_price:
@@ -1646,125 +2264,123 @@ class SmartProfitManager:
                 if new_price > 100:
                     success = self.place_pending_order(new_price, 'BUY', self.base_lot)
                     if success:
-                        print(f"   🔄 Replacement BUY: ${new_price:.2f} (spacing: ${replacement_spacing:.2f})")
+                        log.debug("   🔄 Replacement BUY: $%.2f (spacing: $%.2f)", new_price, replacement_spacing)
             else:
                 new_price = entry_price + replacement_spacing  # ไกลขึ้นไป
                 success = self.place_pending_order(new_price, 'SELL', self.base_lot)
                 if success:
-                    print(f"   🔄 Replacement SELL: ${new_price:.2f} (spacing: ${replacement_spacing:.2f})")
+                    log.debug("   🔄 Replacement SELL: $%.2f (spacing: $%.2f)", new_price, replacement_spacing)
                     
             # เช็ค balance หลังวางไม้ใหม่
             self.ensure_balanced_orders()
                     
         except Exception as e:
-            print(f"❌ Replacement order error: {e}")
+            log.error(f"❌ Replacement order error: {e}")
 
     def ensure_balanced_orders(self):
         """แก้ไข method นี้ - เพิ่ม debug และ force BUY orders"""
         try:
             current_price = self.get_current_price()
             if not current_price:
-                print("❌ Cannot get current price for balance")
+                log.error("❌ Cannot get current price for balance")
                 return
                 
-            buy_orders = [o for o in self.pending_orders.values() if o['direction'] == 'BUY']
-            sell_orders = [o for o in self.pending_orders.values() if o['direction'] == 'SELL']
+            buy_orders = self.pending_orders.orders_for('BUY')
+            sell_orders = self.pending_orders.orders_for('SELL')
             
-            print(f"🔍 BALANCE DEBUG:")
-            print(f"   Current price: ${current_price:.2f}")
-            print(f"   BUY orders: {len(buy_orders)}")
-            print(f"   SELL orders: {len(sell_orders)}")
-            print(f"   Pending orders total: {len(self.pending_orders)}")
+            log.debug("🔍 BALANCE DEBUG:")
+            log.debug("   Current price: $%.2f", current_price)
+            log.debug("   BUY orders: %s", len(buy_orders))
+            log.debug("   SELL orders: %s", len(sell_orders))
+            log.debug("   Pending orders total: %s", len(self.pending_orders))
             
             imbalance = abs(len(buy_orders) - len(sell_orders))
             
             if imbalance > 2:  # ไม่ balanced
-                print(f"⚖️ CRITICAL IMBALANCE: {len(buy_orders)} BUY vs {len(sell_orders)} SELL")
+                log.debug("⚖️ CRITICAL IMBALANCE: %s BUY vs %s SELL", len(buy_orders), len(sell_orders))
                 
                 spacing_dollars = self.grid_spacing * 0.01
                 
                 # ✅ Force BUY orders if missing
                 if len(buy_orders) < len(sell_orders):
                     needed = len(sell_orders) - len(buy_orders)
-                    print(f"🟢 FORCING {needed} BUY orders")
+                    log.debug("🟢 FORCING %s BUY orders", needed)
                     
                     # วาง BUY orders หลายระดับ
                     for i in range(1, min(needed + 3, 8)):  # วางสูงสุด 7 orders
                         buy_price = current_price - (spacing_dollars * i * 0.6)  # ใกล้ขึ้น
                         
-                        print(f"   🎯 Attempting BUY at ${buy_price:.2f}")
+                        log.debug("   🎯 Attempting BUY at $%.2f", buy_price)
                         
                         if buy_price > 100:  # ป้องกันราคาต่ำเกิน
                             if not self.has_order_near_price(buy_price, 'BUY', tolerance=1.0):
                                 success = self.place_pending_order(buy_price, 'BUY', self.base_lot)
                                 if success:
-                                    print(f"   ✅ BUY order placed: ${buy_price:.2f}")
+                                    log.debug("   ✅ BUY order placed: $%.2f", buy_price)
                                 else:
-                                    print(f"   ❌ BUY order FAILED: ${buy_price:.2f}")
+                                    log.error(f"   ❌ BUY order FAILED: ${buy_price:.2f}")
                                     # ลองราคาใกล้ขึ้น
                                     retry_price = current_price - (spacing_dollars * i * 0.4)
                                     if retry_price > 100:
                                         retry_success = self.place_pending_order(retry_price, 'BUY', self.base_lot)
                                         if retry_success:
-                                            print(f"   🔄 BUY retry SUCCESS: ${retry_price:.2f}")
+                                            log.debug("   🔄 BUY retry SUCCESS: $%.2f", retry_price)
                             else:
-                                print(f"   ⚠️ BUY order exists near ${buy_price:.2f}")
+                                log.warning(f"   ⚠️ BUY order exists near ${buy_price:.2f}")
                                 
                         # เช็คว่าเพิ่มได้แล้วหรือยัง
-                        current_buy_count = len([o for o in self.pending_orders.values() if o['direction'] == 'BUY'])
+                        current_buy_count = self.pending_orders.count('BUY')
                         if current_buy_count >= len(sell_orders) - 1:
-                            print(f"   ✅ Balance achieved: {current_buy_count} BUY orders")
+                            log.debug("   ✅ Balance achieved: %s BUY orders", current_buy_count)
                             break
                             
                 # ✅ Force SELL orders if missing (น่าจะไม่ใช่กรณีนี้)
                 elif len(sell_orders) < len(buy_orders):
                     needed = len(buy_orders) - len(sell_orders)
-                    print(f"🔴 FORCING {needed} SELL orders")
+                    log.debug("🔴 FORCING %s SELL orders", needed)
                     
                     for i in range(1, needed + 2):
                         sell_price = current_price + (spacing_dollars * i * 0.6)
                         if not self.has_order_near_price(sell_price, 'SELL', tolerance=1.0):
                             success = self.place_pending_order(sell_price, 'SELL', self.base_lot)
                             if success:
-                                print(f"   ✅ SELL order placed: ${sell_price:.2f}")
+                                log.debug("   ✅ SELL order placed: $%.2f", sell_price)
                             else:
-                                print(f"   ❌ SELL order FAILED: ${sell_price:.2f}")
+                                log.error(f"   ❌ SELL order FAILED: ${sell_price:.2f}")
             else:
-                print(f"✅ Grid balanced: {len(buy_orders)} BUY, {len(sell_orders)} SELL")
+                log.debug("✅ Grid balanced: %s BUY, %s SELL", len(buy_orders), len(sell_orders))
                 
         except Exception as e:
-            print(f"❌ Balance check error: {e}")
+            log.error(f"❌ Balance check error: {e}")
 
     def has_order_near_price(self, target_price, direction, tolerance=0.50):
         """เพิ่ม tolerance parameter และ debug"""
         try:
-            found_near = False
-            closest_distance = float('inf')
-            
-            for order_info in self.pending_orders.values():
-                if order_info['direction'] == direction:
-                    distance = abs(order_info['price'] - target_price)
-                    if distance < closest_distance:
-                        closest_distance = distance
-                    if distance < tolerance:
-                        found_near = True
+            nearest = self.pending_orders.nearest(target_price, direction)
+            closest_distance = nearest[0] if nearest else float('inf')
+            found_near = closest_distance < tolerance
                         
             if found_near:
-                print(f"   📍 Found {direction} order near ${target_price:.2f} (distance: {closest_distance:.2f})")
+                log.debug("   📍 Found %s order near $%.2f (distance: %.2f)", direction, target_price, closest_distance)
             else:
-                print(f"   🆕 No {direction} order near ${target_price:.2f} (closest: {closest_distance:.2f})")
+                log.debug("   🆕 No %s order near $%.2f (closest: %.2f)", direction, target_price, closest_distance)
                 
             return found_near
             
         except Exception as e:
-            print(f"❌ Check order near price error: {e}")
+            log.error(f"❌ Check order near price error: {e}")
             return False
 
         
+    @profiled_stage
     def rebalance_portfolio_if_needed(self, positions):
         """Rebalance portfolio if needed"""
+        if self.grid_reconciler:
+            self.request_grid_reconcile()   # reconcile stage จัดการ ladder ทั้งหมด
+            return
+
         try:
-            print("🔧 AI: Rebalancing portfolio...")
+            log.debug("🔧 AI: Rebalancing portfolio...")
             
             # ตรวจสอบ BUY:SELL ratio
             buy_positions = [p for p in positions if p.direction == "BUY"]
@@ -1773,7 +2389,7 @@ class SmartProfitManager:
             buy_count = len(buy_positions)
             sell_count = len(sell_positions)
             
-            print(f"📊 Current ratio: {buy_count} BUY : {sell_count} SELL")
+            log.debug("📊 Current ratio: %s BUY : %s SELL", buy_count, sell_count)
             
             current_price = self.get_current_price()
             if not current_price:
@@ -1792,44 +2408,31 @@ class SmartProfitManager:
                     sell_price = current_price + (spacing_dollars * i)
                     self.place_pending_order(sell_price, 'SELL', self.base_lot)
                     
-            print("✅ AI: Portfolio rebalancing completed")
+            log.debug("✅ AI: Portfolio rebalancing completed")
             
         except Exception as e:
-            print(f"❌ Rebalance error: {e}")
+            log.error(f"❌ Rebalance error: {e}")
 
-    def analyze_portfolio_positions(self) -> Dict:
-        """AI Portfolio Analysis - ทับของเดิมเลย"""
+    @profiled_stage
+    def analyze_portfolio_positions(self, snapshot: PortfolioSnapshot = None) -> Dict:
+        """AI Portfolio Analysis - ใช้ snapshot ของรอบนี้ (ไม่เรียก MT5 ซ้ำ)"""
         
         try:
-            # Get all positions from MT5
-            positions = mt5.positions_get(symbol=self.gold_symbol)
-            if not positions:
-                return {'total_positions': 0, 'grid_positions': [], 'total_pnl': 0}
-                
-            # Filter our positions
-            our_positions = [pos for pos in positions if pos.magic == self.magic_number]
-            
-            # Create SmartPosition objects
-            grid_positions = []
-            hedge_positions = []
-            
-            for pos in our_positions:
-                smart_pos = SmartPosition(
-                    position_id=pos.ticket,
-                    symbol=pos.symbol,
-                    direction="BUY" if pos.type == mt5.POSITION_TYPE_BUY else "SELL",
-                    lot_size=pos.volume,
-                    entry_price=pos.price_open,
-                    current_price=pos.price_current,
-                    entry_time=datetime.fromtimestamp(pos.time),
-                    pnl=pos.profit,
-                    is_hedge="HEDGE" in pos.comment if hasattr(pos, 'comment') else False
-                )
-                
-                if smart_pos.is_hedge:
-                    hedge_positions.append(smart_pos)
-                else:
-                    grid_positions.append(smart_pos)
+            if snapshot is None:
+                snapshot = self.get_portfolio_snapshot()
+                
+            if snapshot.total_positions == 0:
+                return {
+                    'total_positions': 0,
+                    'grid_positions': [],
+                    'total_pnl': 0,
+                    'balance': snapshot.balance,
+                    'equity': snapshot.equity,
+                    'snapshot_version': snapshot.version
+                }
+                
+            grid_positions = list(snapshot.grid_positions)
+            hedge_positions = list(snapshot.hedge_positions)
             
             # Calculate metrics
             total_pnl = sum(pos.pnl for pos in grid_positions + hedge_positions)
@@ -1838,10 +2441,11 @@ class SmartProfitManager:
             profitable_positions = [p for p in grid_positions if p.pnl > 0]
             losing_positions = [p for p in grid_positions if p.pnl < 0]
             
-            print(f"📊 Portfolio: {len(grid_positions)} total, {len(profitable_positions)} profit, {len(losing_positions)} loss")
+            log.debug("📊 Portfolio: %s total, %s profit, %s loss",
+                      len(grid_positions), len(profitable_positions), len(losing_positions))
             
             return {
-                'total_positions': len(our_positions),
+                'total_positions': snapshot.total_positions,
                 'grid_positions': grid_positions,
                 'hedge_positions': hedge_positions,
                 'profitable_positions': profitable_positions,
@@ -1850,11 +2454,14 @@ class SmartProfitManager:
                 'total_exposure': sum(p.lot_size for p in grid_positions),
                 'hedge_exposure': sum(p.lot_size for p in hedge_positions),
                 'portfolio_health': self.calculate_portfolio_health(grid_positions, total_pnl),
-                'risk_percentage': self.calculate_portfolio_risk_percentage(grid_positions)
+                'risk_percentage': self.calculate_portfolio_risk_percentage(grid_positions),
+                'balance': snapshot.balance,
+                'equity': snapshot.equity,
+                'snapshot_version': snapshot.version
             }
             
         except Exception as e:
-            print(f"❌ Portfolio analysis error: {e}")
+            log.error(f"❌ Portfolio analysis error: {e}")
             return {'error': str(e)}
 
     def calculate_portfolio_health(self, positions, total_pnl) -> int:
@@ -1897,329 +2504,109 @@ class SmartProfitManager:
         except:
             return 0
 
+    @profiled_stage
     def find_profitable_pairs(self, positions):
-        """🧠 AI หาคู่ไม้ที่ควรปิด - FLEXIBLE VERSION ยืดหยุ่นข้าม BUY/SELL"""
+        """🧠 AI หาคู่ไม้ที่ควรปิด - BASKET SOLVER (conflict-free, ข้าม BUY/SELL)"""
         
         try:
             if len(positions) < 2:
                 return []
                 
-            print(f"🧠 AI FLEXIBLE PAIR TRADING: {len(positions)} positions")
+            log.debug("🧠 AI BASKET SOLVER: %s positions", len(positions))
             
-            current_price = self.get_current_price()
-            buy_positions = [p for p in positions if p.direction == "BUY"]
-            sell_positions = [p for p in positions if p.direction == "SELL"]
-            
-            # 🔄 แยกตามประเภท กำไร/ขาดทุน (ไม่สนใจ BUY/SELL)
-            profitable_positions = [p for p in positions if p.pnl > 0.3]  # ลด threshold
-            losing_positions = [p for p in positions if p.pnl < -0.5]     # ลด threshold
-            
-            # 🎯 เรียงไม้ขาดทุนตามความรุนแรง (ขาดทุนมากสุดก่อน)
-            losing_positions.sort(key=lambda x: x.pnl)  # เรียงจากขาดทุนมากสุด
-            
-            # 🎯 เรียงไม้กำไรตามความแข็งแกร่ง (กำไรมากสุดก่อน)  
-            profitable_positions.sort(key=lambda x: x.pnl, reverse=True)
-            
-            print(f"📊 Flexible Portfolio Analysis:")
-            print(f"   💰 Profitable positions: {len(profitable_positions)}")
-            print(f"   📉 Losing positions: {len(losing_positions)}")
-            print(f"   🔄 BUY/SELL: {len(buy_positions)}/{len(sell_positions)}")
-            
-            if len(profitable_positions) == 0:
-                print("❌ No profitable positions to help")
-                return []
+            # 🛡️ เก็บ position ไว้ขั้นต่ำ 15% (อย่างน้อย 8 ตัว)
+            total_positions = len(positions)
+            min_positions_to_keep = max(8, int(total_positions * 0.15))
+            max_close = max(0, total_positions - min_positions_to_keep)
             
-            # แสดงไม้ขาดทุนรุนแรงสุด
-            if losing_positions:
-                worst_losses = losing_positions[:5]  # 5 ตัวแย่สุด
-                print(f"   🆘 Worst losing positions:")
-                for i, pos in enumerate(worst_losses, 1):
-                    print(f"      {i}. {pos.direction} ${pos.pnl:.2f} (ID: {pos.position_id})")
+            pnl_vector = [p.pnl for p in positions]
+            result = self.basket_solver.solve(pnl_vector, max_close=max_close)
             
             smart_pairs = []
-            
-            # 🎯 STRATEGY 1: HEAVY RESCUE - 1 ขาดทุนหนัก + หลายไม้กำไร (1:N)
-            print("🎯 Strategy 1: Heavy Rescue Operations (1:N)")
-            
-            for losing_pos in losing_positions:
-                print(f"\n   🆘 TARGETING LOSS: {losing_pos.direction} ${losing_pos.pnl:.2f}")
-                
-                # ลองใช้ไม้กำไรหลายตัวช่วย (1:2, 1:3, 1:4, 1:5)
-                for num_helpers in range(2, min(6, len(profitable_positions) + 1)):
-                    
-                    # เลือกไม้กำไรที่ดีที่สุด
-                    best_helpers = profitable_positions[:num_helpers]
-                    total_helper_profit = sum(h.pnl for h in best_helpers)
-                    net_result = losing_pos.pnl + total_helper_profit
-                    
-                    print(f"      🧮 1:{num_helpers} Test: ${losing_pos.pnl:.2f} + ${total_helper_profit:.2f} = ${net_result:.2f}")
-                    
-                    # เงื่อนไขการยอมรับ
-                    loss_ratio = abs(losing_pos.pnl) / total_helper_profit if total_helper_profit > 0 else 999
-                    
-                    acceptable_conditions = [
-                        net_result >= -1.0,  # ขาดทุนสุทธิไม่เกิน $1
-                        net_result >= losing_pos.pnl * 0.8,  # ลดการขาดทุนได้อย่างน้อย 20%
-                        loss_ratio <= 2.0,  # ไม้กำไรรวมต้องมากกว่า 50% ของไม้ขาดทุน
-                    ]
-                    
-                    if any(acceptable_conditions):
-                        position_ids = {losing_pos.position_id}
-                        position_ids.update(h.position_id for h in best_helpers)
-                        
-                        # คำนวณ priority score
-                        rescue_urgency = abs(losing_pos.pnl) * 100  # ยิ่งขาดทุนมาก priority ยิ่งสูง
-                        profit_strength = total_helper_profit * 50
-                        efficiency_bonus = max(0, net_result) * 200
-                        
-                        priority_score = rescue_urgency + profit_strength + efficiency_bonus
-                        
-                        smart_pairs.append({
-                            'losing_positions': [losing_pos],
-                            'profitable_positions': best_helpers,
-                            'net_profit': net_result,
-                            'total_positions': 1 + num_helpers,
-                            'pair_type': f"HEAVY_RESCUE_1_{num_helpers}",
-                            'priority_score': priority_score,
-                            'position_ids': position_ids,
-                            'loss_reduction': abs(net_result - losing_pos.pnl),
-                            'helper_strength': total_helper_profit,
-                            'reason': f"Heavy rescue 1:{num_helpers}: ${losing_pos.pnl:.2f} + {num_helpers} helpers = ${net_result:.2f}"
-                        })
-                        
-                        helpers_detail = [f"{h.direction}${h.pnl:.2f}" for h in best_helpers]
-                        print(f"      ✅ APPROVED 1:{num_helpers}: Loss reduction ${abs(net_result - losing_pos.pnl):.2f}")
-                        print(f"         Helpers: {helpers_detail}")
-                        
-                        break  # หาได้แล้วไม่ต้องลองเพิ่ม helper
-                    else:
-                        print(f"      ❌ REJECTED 1:{num_helpers}: Conditions not met")
-            
-            # 🎯 STRATEGY 2: MULTI-LOSS RESCUE - หลายไม้ขาดทุน + หลายไม้กำไร (N:M)
-            print("\n🎯 Strategy 2: Multi-Loss Rescue (N:M)")
-            
-            if len(losing_positions) >= 2 and len(profitable_positions) >= 2:
-                
-                # ลองรวมไม้ขาดทุน 2-4 ตัว
-                for num_losers in range(2, min(5, len(losing_positions) + 1)):
-                    
-                    selected_losers = losing_positions[:num_losers]  # เลือกขาดทุนหนักสุด
-                    total_loss = sum(pos.pnl for pos in selected_losers)
-                    
-                    print(f"\n   🆘 COMBINING {num_losers} LOSSES: Total ${total_loss:.2f}")
-                    losers_detail = [f"{pos.direction}${pos.pnl:.2f}" for pos in selected_losers]
-                    print(f"      Losers: {losers_detail}")
-                    
-                    if total_loss < -20:  # ถ้าขาดทุนรวมเกิน $20 ข้าม
-                        print(f"      ❌ SKIP: Total loss too high (${total_loss:.2f})")
-                        continue
-                    
-                    # หาไม้กำไรที่ช่วยได้
-                    available_helpers = [p for p in profitable_positions]
-                    
-                    # ลองใช้ไม้กำไร 2-6 ตัว
-                    for num_helpers in range(2, min(7, len(available_helpers) + 1)):
-                        
-                        best_helpers = available_helpers[:num_helpers]
-                        total_profit = sum(h.pnl for h in best_helpers)
-                        net_result = total_loss + total_profit
-                        
-                        print(f"      🧮 {num_losers}:{num_helpers} Test: ${total_loss:.2f} + ${total_profit:.2f} = ${net_result:.2f}")
-                        
-                        # เงื่อนไขการยอมรับ
-                        coverage_ratio = total_profit / abs(total_loss) if total_loss < 0 else 999
-                        
-                        acceptable_conditions = [
-                            net_result >= -2.0,  # ขาดทุนสุทธิไม่เกิน $2
-                            net_result >= total_loss * 0.7,  # ลดการขาดทุนได้อย่างน้อย 30%
-                            coverage_ratio >= 0.6,  # ไม้กำไรต้องคลุม 60% ของไม้ขาดทุน
-                        ]
-                        
-                        if any(acceptable_conditions):
-                            position_ids = set()
-                            position_ids.update(pos.position_id for pos in selected_losers)
-                            position_ids.update(h.position_id for h in best_helpers)
-                            
-                            # คำนวณ priority
-                            multi_rescue_bonus = num_losers * 500  # โบนัสสำหรับช่วยหลายตัว
-                            loss_severity = abs(total_loss) * 80
-                            profit_power = total_profit * 60
-                            net_gain_bonus = max(0, net_result) * 300
-                            
-                            priority_score = multi_rescue_bonus + loss_severity + profit_power + net_gain_bonus
-                            
-                            smart_pairs.append({
-                                'losing_positions': selected_losers,
-                                'profitable_positions': best_helpers,
-                                'net_profit': net_result,
-                                'total_positions': num_losers + num_helpers,
-                                'pair_type': f"MULTI_RESCUE_{num_losers}_{num_helpers}",
-                                'priority_score': priority_score,
-                                'position_ids': position_ids,
-                                'total_loss_covered': abs(total_loss),
-                                'coverage_ratio': coverage_ratio,
-                                'reason': f"Multi rescue {num_losers}:{num_helpers}: ${total_loss:.2f} + ${total_profit:.2f} = ${net_result:.2f}"
-                            })
-                            
-                            helpers_detail = [f"{h.direction}${h.pnl:.2f}" for h in best_helpers]
-                            print(f"      ✅ APPROVED {num_losers}:{num_helpers}: Coverage {coverage_ratio:.1%}")
-                            print(f"         Helpers: {helpers_detail}")
-                            
-                            break  # หาได้แล้วไม่ต้องลองเพิ่ม helper
-                        else:
-                            print(f"      ❌ REJECTED {num_losers}:{num_helpers}: Insufficient coverage")
-            
-            # 🎯 STRATEGY 3: CROSS-DIRECTION RESCUE - ข้าม BUY/SELL อย่างชัดเจน
-            print("\n🎯 Strategy 3: Cross-Direction Rescue (BUY helps SELL, SELL helps BUY)")
-            
-            # BUY กำไรช่วย SELL ขาดทุน
-            buy_profits = [p for p in buy_positions if p.pnl > 0.5]
-            sell_losses = [p for p in sell_positions if p.pnl < -1.0]
-            
-            if buy_profits and sell_losses:
-                print(f"   🔄 BUY profits helping SELL losses:")
-                for sell_loss in sell_losses[:3]:  # 3 ตัวแย่สุด
-                    best_buy_helpers = buy_profits[:3]  # 3 ตัวดีสุด
-                    total_help = sum(h.pnl for h in best_buy_helpers)
-                    net_result = sell_loss.pnl + total_help
-                    
-                    if net_result >= -1.0:
-                        position_ids = {sell_loss.position_id}
-                        position_ids.update(h.position_id for h in best_buy_helpers)
-                        
-                        smart_pairs.append({
-                            'losing_positions': [sell_loss],
-                            'profitable_positions': best_buy_helpers,
-                            'net_profit': net_result,
-                            'total_positions': 1 + len(best_buy_helpers),
-                            'pair_type': "CROSS_BUY_HELPS_SELL",
-                            'priority_score': 6000 + net_result * 100,
-                            'position_ids': position_ids,
-                            'cross_direction': True,
-                            'reason': f"BUY helps SELL: {sell_loss.pnl:.2f} + {total_help:.2f} = {net_result:.2f}"
-                        })
-                        
-                        print(f"      ✅ BUY→SELL: ${sell_loss.pnl:.2f} + ${total_help:.2f} = ${net_result:.2f}")
-            
-            # SELL กำไรช่วย BUY ขาดทุน  
-            sell_profits = [p for p in sell_positions if p.pnl > 0.5]
-            buy_losses = [p for p in buy_positions if p.pnl < -1.0]
-            
-            if sell_profits and buy_losses:
-                print(f"   🔄 SELL profits helping BUY losses:")
-                for buy_loss in buy_losses[:3]:  # 3 ตัวแย่สุด
-                    best_sell_helpers = sell_profits[:3]  # 3 ตัวดีสุด
-                    total_help = sum(h.pnl for h in best_sell_helpers)
-                    net_result = buy_loss.pnl + total_help
-                    
-                    if net_result >= -1.0:
-                        position_ids = {buy_loss.position_id}
-                        position_ids.update(h.position_id for h in best_sell_helpers)
-                        
-                        smart_pairs.append({
-                            'losing_positions': [buy_loss],
-                            'profitable_positions': best_sell_helpers,
-                            'net_profit': net_result,
-                            'total_positions': 1 + len(best_sell_helpers),
-                            'pair_type': "CROSS_SELL_HELPS_BUY",
-                            'priority_score': 6000 + net_result * 100,
-                            'position_ids': position_ids,
-                            'cross_direction': True,
-                            'reason': f"SELL helps BUY: {buy_loss.pnl:.2f} + {total_help:.2f} = {net_result:.2f}"
-                        })
-                        
-                        print(f"      ✅ SELL→BUY: ${buy_loss.pnl:.2f} + ${total_help:.2f} = ${net_result:.2f}")
-            
-            # 🎯 STRATEGY 4: EMERGENCY HIGH PROFITS - กำไรสูงมากๆ เท่านั้น
-            print("\n🎯 Strategy 4: Emergency High Profits")
-            for pos in profitable_positions:
-                if pos.pnl > 10.0:  # เฉพาะกำไรสูงมากๆ
-                    smart_pairs.append({
-                        'losing_positions': [],
-                        'profitable_positions': [pos],
-                        'net_profit': pos.pnl,
-                        'total_positions': 1,
-                        'pair_type': "EMERGENCY_HIGH_PROFIT",
-                        'priority_score': 4000 + pos.pnl * 50,
-                        'position_ids': {pos.position_id},
-                        'reason': f"Emergency high profit: ${pos.pnl:.2f}"
-                    })
-                    print(f"   💎 EMERGENCY SINGLE: {pos.direction} ${pos.pnl:.2f}")
-            
-            # เรียงตาม priority score
-            smart_pairs.sort(key=lambda x: x['priority_score'], reverse=True)
-            
-            # 🛡️ FLEXIBLE PROTECTION - ป้องกันแบบยืดหยุ่น
-            print(f"\n🛡️ Flexible Portfolio Protection:")
-            
-            protected_pairs = []
             used_position_ids = set()
             
-            total_positions = len(positions)
-            min_positions_to_keep = max(8, int(total_positions * 0.15))  # เก็บ 15%
-            
-            print(f"   📊 Total: {total_positions}, Must keep: {min_positions_to_keep}")
-            
-            for pair in smart_pairs[:15]:  # พิจารณาสูงสุด 15 pairs
-                
-                # เช็คการใช้ position ซ้ำ
-                if pair['position_ids'].intersection(used_position_ids):
-                    continue
-                
-                # เช็คจำนวน position ที่เหลือ
-                remaining = total_positions - len(used_position_ids) - pair['total_positions']
-                if remaining < min_positions_to_keep:
+            # 🎯 Rescue baskets จาก solver (ไม่มีไม้ซ้ำกันระหว่าง basket)
+            for loser_idx, helper_idx in result.baskets:
+                losing = [positions[i] for i in loser_idx]
+                helpers = [positions[i] for i in helper_idx]
+                smart_pairs.append(self.build_close_basket(losing, helpers))
+                used_position_ids.update(p.position_id for p in losing + helpers)
+            
+            # 🎯 EMERGENCY HIGH PROFITS - กำไรสูงมากๆ ที่ solver ไม่ได้ใช้
+            for pos in sorted(positions, key=lambda x: x.pnl, reverse=True):
+                if pos.pnl <= 10.0:
+                    break
+                if pos.position_id in used_position_ids or len(used_position_ids) >= max_close:
                     continue
-                
-                # เงื่อนไขการอนุมัติ
-                approval_conditions = [
-                    len(pair['losing_positions']) > 0,  # มีไม้ขาดทุน (true pair)
-                    pair['net_profit'] > 8.0,          # กำไรสูงมาก
-                    pair['net_profit'] >= -1.5,        # ขาดทุนไม่เกิน $1.5
-                    'CROSS' in pair['pair_type'],       # Cross-direction rescue
-                ]
-                
-                if any(approval_conditions):
-                    protected_pairs.append(pair)
-                    used_position_ids.update(pair['position_ids'])
-                    
-                    losing_count = len(pair['losing_positions'])
-                    profit_count = len(pair['profitable_positions'])
-                    cross_indicator = "🔄" if pair.get('cross_direction', False) else ""
-                    
-                    print(f"   ✅ {cross_indicator} {pair['pair_type']}: {losing_count}L+{profit_count}P = ${pair['net_profit']:.2f}")
+                smart_pairs.append({
+                    'losing_positions': [],
+                    'profitable_positions': [pos],
+                    'net_profit': pos.pnl,
+                    'total_positions': 1,
+                    'pair_type': "EMERGENCY_HIGH_PROFIT",
+                    'priority_score': 4000 + pos.pnl * 50,
+                    'position_ids': {pos.position_id},
+                    'reason': f"Emergency high profit: ${pos.pnl:.2f}"
+                })
+                used_position_ids.add(pos.position_id)
+            
+            smart_pairs.sort(key=lambda x: x['priority_score'], reverse=True)
             
             # 📋 สรุปผล
-            print(f"\n🎯 FLEXIBLE PAIR TRADING RESULTS:")
-            print(f"   📋 Candidates found: {len(smart_pairs)}")
-            print(f"   ✅ Approved pairs: {len(protected_pairs)}")
-            
-            if protected_pairs:
-                total_expected = sum(pair['net_profit'] for pair in protected_pairs)
-                total_positions_closing = sum(pair['total_positions'] for pair in protected_pairs)
-                total_losses_rescued = sum(len(pair['losing_positions']) for pair in protected_pairs)
-                
-                print(f"   💰 Expected profit: ${total_expected:.2f}")
-                print(f"   📊 Positions closing: {total_positions_closing}")
-                print(f"   🆘 Losses rescued: {total_losses_rescued}")
-                
-                print(f"\n   📋 Approved Operations:")
-                for i, pair in enumerate(protected_pairs, 1):
-                    losing_detail = f"{len(pair['losing_positions'])}L" if pair['losing_positions'] else "0L"
-                    profit_detail = f"{len(pair['profitable_positions'])}P"
-                    cross_mark = "🔄" if pair.get('cross_direction', False) else ""
-                    print(f"     {i}. {cross_mark}{pair['pair_type']}: {losing_detail}+{profit_detail} = ${pair['net_profit']:.2f}")
-            else:
-                print("   ⚠️ No suitable flexible pairs found")
+            log.debug("🎯 BASKET SOLVER RESULTS: %s baskets | loss closed $%.2f | net $%.2f | "
+                      "keep %s | %s iters in %.1fms", len(smart_pairs), result.loss_reduction, result.net_profit,
+                      min_positions_to_keep, result.iterations, result.elapsed_ms)
+            
+            for i, pair in enumerate(smart_pairs, 1):
+                cross_mark = "🔄" if pair.get('cross_direction', False) else ""
+                log.debug("     %s. %s%s: %sL+%sP = $%.2f", i, cross_mark, pair['pair_type'],
+                          len(pair['losing_positions']), len(pair['profitable_positions']), pair['net_profit'])
                 
-            return protected_pairs
+            return smart_pairs
             
         except Exception as e:
-            print(f"❌ Flexible pair analysis error: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error(f"❌ Basket solver error: {e}")
+            log.debug("🔍 Debug traceback:", exc_info=True)
             return []
     
+    def build_close_basket(self, losing_positions, profitable_positions) -> Dict:
+        """สร้าง basket dict (รูปแบบเดียวกับ pair เดิม) จากไม้ขาดทุน + ไม้ช่วย"""
+        total_loss = sum(p.pnl for p in losing_positions)
+        total_profit = sum(p.pnl for p in profitable_positions)
+        net_result = total_loss + total_profit
+        num_losers = len(losing_positions)
+        num_helpers = len(profitable_positions)
+        
+        loser_directions = {p.direction for p in losing_positions}
+        helper_directions = {p.direction for p in profitable_positions}
+        cross_direction = (len(loser_directions) == 1 and len(helper_directions) == 1
+                           and loser_directions != helper_directions)
+        
+        if cross_direction:
+            pair_type = f"CROSS_{helper_directions.pop()}_HELPS_{loser_directions.pop()}"
+            priority_score = 6000 + net_result * 100
+        elif num_losers == 1:
+            pair_type = f"HEAVY_RESCUE_1_{num_helpers}"
+            priority_score = abs(total_loss) * 100 + total_profit * 50 + max(0, net_result) * 200
+        else:
+            pair_type = f"MULTI_RESCUE_{num_losers}_{num_helpers}"
+            priority_score = (num_losers * 500 + abs(total_loss) * 80
+                              + total_profit * 60 + max(0, net_result) * 300)
+        
+        return {
+            'losing_positions': list(losing_positions),
+            'profitable_positions': list(profitable_positions),
+            'net_profit': net_result,
+            'total_positions': num_losers + num_helpers,
+            'pair_type': pair_type,
+            'priority_score': priority_score,
+            'position_ids': {p.position_id for p in list(losing_positions) + list(profitable_positions)},
+            'loss_reduction': abs(total_loss),
+            'helper_strength': total_profit,
+            'cross_direction': cross_direction,
+            'reason': f"{pair_type}: ${total_loss:.2f} + ${total_profit:.2f} = ${net_result:.2f}"
+        }
+    
     def find_single_profit_opportunities(self, profitable_positions):
         """หาโอกาสปิดไม้กำไรเดี่ยว - เฉพาะกรณีไม่มีไม้ขาดทุน"""
         
@@ -2239,58 +2626,26 @@ class SmartProfitManager:
                     'reason': f"Single high profit: ${pos.pnl:.2f}"
                 })
         
-        print(f"📈 Single profit opportunities: {len(single_opportunities)}")
+        log.debug("📈 Single profit opportunities: %s", len(single_opportunities))
         
         return single_opportunities[:3]  # สูงสุด 3 ตัว
     
+    @profiled_stage
     def execute_pair_closes(self, pairs):
-        """ปิดคู่ positions - FIXED VERSION บังคับปิดทั้งคู่"""
+        """ปิดหลาย basket - เตรียม request จาก tick เดียว ส่งต่อเนื่องผ่าน basket executor"""
         
-        for pair in pairs:
-            try:
-                all_positions = pair['losing_positions'] + pair['profitable_positions']
-                losing_count = len(pair['losing_positions'])
-                profit_count = len(pair['profitable_positions'])
-                
-                print(f"💰 EXECUTING PAIR CLOSE: {pair['pair_type']}")
-                print(f"   📊 {losing_count} losing + {profit_count} profit positions")
-                print(f"   💲 Expected net: ${pair['net_profit']:.2f}")
-                
-                success_count = 0
-                failed_positions = []
-                
-                # ปิดทุก position ในคู่
-                for i, pos in enumerate(all_positions):
-                    pos_type = "LOSING" if pos in pair['losing_positions'] else "PROFIT"
-                    print(f"   🎯 Closing {pos_type} position: {pos.position_id} (${pos.pnl:.2f})")
-                    
-                    success = self.close_entire_position(pos)
-                    if success:
-                        success_count += 1
-                        print(f"      ✅ Closed: ${pos.pnl:.2f}")
-                    else:
-                        failed_positions.append(pos)
-                        print(f"      ❌ FAILED to close: ${pos.pnl:.2f}")
-                    
-                    # หยุดเล็กน้อยระหว่างการปิด
-                    if i < len(all_positions) - 1:
-                        time.sleep(0.3)
-                
-                # รายงานผล
-                if success_count == len(all_positions):
-                    print(f"   🎉 PAIR CLOSE SUCCESS: All {len(all_positions)} positions closed")
-                    print(f"   💰 Net profit realized: ${pair['net_profit']:.2f}")
-                elif success_count > 0:
-                    print(f"   ⚠️ PARTIAL SUCCESS: {success_count}/{len(all_positions)} positions closed")
-                    for failed_pos in failed_positions:
-                        print(f"      ⚠️ Failed: {failed_pos.position_id} (${failed_pos.pnl:.2f})")
-                else:
-                    print(f"   ❌ COMPLETE FAILURE: No positions closed")
-                    
-            except Exception as e:
-                print(f"❌ Pair close error: {e}")
+        try:
+            if not pairs:
+                return []
                 
-            print("   " + "="*50)  # Separator
+            total_legs = sum(len(p['losing_positions']) + len(p['profitable_positions']) for p in pairs)
+            log.info(f"💰 EXECUTING {len(pairs)} BASKET CLOSES: {total_legs} legs")
+            
+            return self.basket_executor.close_baskets(pairs)
+            
+        except Exception as e:
+            log.error(f"❌ Pair close error: {e}")
+            return []
 
     def get_current_margin_level(self):
         """Get current margin level percentage"""
@@ -2310,7 +2665,7 @@ class SmartProfitManager:
             return round(margin_level, 1)
             
         except Exception as e:
-            print(f"❌ Error getting margin level: {e}")
+            log.error(f"❌ Error getting margin level: {e}")
             return 1000  # Safe default
 
     def calculate_position_age(self, position):
@@ -2332,7 +2687,7 @@ class SmartProfitManager:
             return max(0, age_minutes)
             
         except Exception as e:
-            print(f"❌ Error calculating position age: {e}")
+            log.error(f"❌ Error calculating position age: {e}")
             return 0
     
 
@@ -2423,7 +2778,7 @@ class SmartProfitManager:
             return opportunities[:5]  # Top 5 opportunities
             
         except Exception as e:
-            print(f"❌ Identify opportunities error: {e}")
+            log.error(f"❌ Identify opportunities error: {e}")
             return []
 
     def execute_smart_close(self, position, reason, details: Dict) -> bool:
@@ -2434,7 +2789,7 @@ class SmartProfitManager:
             success = self.close_entire_position(position)
             
             if success:
-                print(f"✅ AI Close: {position.position_id} - ${position.pnl:.2f} - Reason: {reason.value if hasattr(reason, 'value') else reason}")
+                log.info(f"✅ AI Close: {position.position_id} - ${position.pnl:.2f} - Reason: {reason.value if hasattr(reason, 'value') else reason}")
                 
                 # วางไม้ใหม่ทดแทนทันที
                 if self.auto_reposition_enabled:
@@ -2442,17 +2797,20 @@ class SmartProfitManager:
                 
                 return True
             else:
-                print(f"❌ AI Close failed: {position.position_id}")
+                log.error(f"❌ AI Close failed: {position.position_id}")
                 return False
                 
         except Exception as e:
-            print(f"❌ Smart close error: {e}")
+            log.error(f"❌ Smart close error: {e}")
             return False
 
 
     def place_replacement_after_close(self, closed_position):
         """วางไม้ใหม่หลังปิด position"""
-        
+        if self.grid_reconciler:
+            self.request_grid_reconcile()   # reconcile stage จัดการ ladder ทั้งหมด
+            return
+
         try:
             current_price = self.get_current_price()
             if not current_price:
@@ -2478,10 +2836,10 @@ class SmartProfitManager:
             if distance_from_market > spacing_dollars * 0.5:  # อย่างน้อยครึ่ง spacing
                 success = self.place_pending_order(new_price, direction, self.base_lot)
                 if success:
-                    print(f"   🔄 Replacement order: {direction} @ ${new_price:.2f}")
+                    log.debug("   🔄 Replacement order: %s @ $%.2f", direction, new_price)
                     
         except Exception as e:
-            print(f"❌ Replacement order error: {e}")
+            log.error(f"❌ Replacement order error: {e}")
 
     def check_smart_profit_opportunities(self):
         """🧠 เช็คโอกาสทำกำไรอัจฉริยะ"""
@@ -2500,21 +2858,21 @@ class SmartProfitManager:
             profitable_pairs = self.find_profitable_pairs(positions)
             
             if profitable_pairs:
-                print(f"💰 Found {len(profitable_pairs)} profit opportunities")
+                log.debug("💰 Found %s profit opportunities", len(profitable_pairs))
                 
                 # ปิดคู่ที่ดีที่สุด
                 best_pair = profitable_pairs[0]
-                print(f"🎯 Executing best opportunity: {best_pair['pair_type']} → ${best_pair['net_profit']:.2f}")
+                log.debug("🎯 Executing best opportunity: %s → $%.2f", best_pair['pair_type'], best_pair['net_profit'])
                 
                 success = self.execute_pair_close(best_pair)
                 if success:
-                    print(f"✅ Pair closed successfully: +${best_pair['net_profit']:.2f}")
+                    log.debug("✅ Pair closed successfully: +$%.2f", best_pair['net_profit'])
                     
                     # หน่วงเวลาก่อนหาโอกาสใหม่
                     time.sleep(2)
                     
         except Exception as e:
-            print(f"❌ Check profit opportunities error: {e}")
+            log.error(f"❌ Check profit opportunities error: {e}")
 
     def execute_pair_close(self, pair) -> bool:
         """ปิด pair positions"""
@@ -2522,27 +2880,13 @@ class SmartProfitManager:
         try:
             all_positions = pair['losing_positions'] + pair['profitable_positions']
             
-            print(f"💰 Closing {pair['pair_type']}: {len(all_positions)} positions = +${pair['net_profit']:.2f}")
-            
-            success_count = 0
-            for pos in all_positions:
-                success = self.close_entire_position(pos)
-                if success:
-                    success_count += 1
-                    print(f"   ✅ Closed: ${pos.pnl:.2f}")
-                    time.sleep(0.5)  # รอสักครู่ระหว่างการปิด
-                else:
-                    print(f"   ❌ Failed: ${pos.pnl:.2f}")
+            log.info(f"💰 Closing {pair['pair_type']}: {len(all_positions)} positions = +${pair['net_profit']:.2f}")
             
-            if success_count == len(all_positions):
-                print(f"   🎉 {pair['pair_type']} completed: +${pair['net_profit']:.2f}")
-                return True
-            else:
-                print(f"   ⚠️ Partial success: {success_count}/{len(all_positions)} closed")
-                return False
+            report = self.basket_executor.close_basket(pair)
+            return report.completed
                 
         except Exception as e:
-            print(f"❌ Pair close error: {e}")
+            log.error(f"❌ Pair close error: {e}")
             return False
 
     def find_hedge_opportunities(self, positions):
@@ -2588,7 +2932,7 @@ class SmartProfitManager:
             return hedge_opportunities
             
         except Exception as e:
-            print(f"❌ Find hedge opportunities error: {e}")
+            log.error(f"❌ Find hedge opportunities error: {e}")
             return []
 
     def execute_smart_hedges(self, hedge_opportunities):
@@ -2600,28 +2944,29 @@ class SmartProfitManager:
                 lot_size = hedge['lot_size']
                 target_loss = hedge['target_loss']
                 
-                print(f"🛡️ Placing {direction} hedge: {lot_size} lots for ${target_loss:.2f} loss")
+                log.info(f"🛡️ Placing {direction} hedge: {lot_size} lots for ${target_loss:.2f} loss")
                 
                 # วาง market order เป็น hedge
-                result = self.place_market_order(direction, lot_size, f"HEDGE_{direction}")
+                result = self.place_market_order(direction, lot_size, f"HEDGE_{direction}", OrderPriority.RESCUE)
                 if result:
-                    print(f"   ✅ {direction} hedge placed successfully")
+                    log.debug("   ✅ %s hedge placed successfully", direction)
                 else:
-                    print(f"   ❌ Failed to place {direction} hedge")
+                    log.error(f"   ❌ Failed to place {direction} hedge")
                     
             except Exception as e:
-                print(f"❌ Execute hedge error: {e}")
+                log.error(f"❌ Execute hedge error: {e}")
 
-    def get_profit_management_status(self) -> Dict:
+    def get_profit_management_status(self, portfolio_analysis: Dict = None) -> Dict:
         """Get current profit management status for GUI"""
         
         try:
-            portfolio_analysis = self.analyze_portfolio_positions()
+            if portfolio_analysis is None:
+                portfolio_analysis = self.analyze_portfolio_positions()
             
             return {
                 'strategy': self.default_strategy.value,
                 'total_positions': portfolio_analysis.get('total_positions', 0),
-                'hedge_positions': portfolio_analysis.get('hedge_positions', 0),
+                'hedge_positions': len(portfolio_analysis.get('hedge_positions', [])),
                 'total_pnl': portfolio_analysis.get('total_pnl', 0),
                 'risk_percentage': portfolio_analysis.get('risk_percentage', 0),
                 'trailing_stops_active': sum(1 for pos in portfolio_analysis.get('grid_positions', []) 
@@ -2632,32 +2977,39 @@ class SmartProfitManager:
         except Exception as e:
             return {'error': str(e)}
 
+    @profiled_stage
     def check_and_run_recovery(self, portfolio_analysis: Dict):
         """ตรวจสอบและเรียกใช้ Recovery System - Fixed Version with Equity Check"""
         try:
             total_pnl = portfolio_analysis.get('total_pnl', 0)
             
-            # 🔧 เพิ่มการเช็ค equity vs balance ก่อนทุกอย่าง
-            account_info = self.mt5_connector.get_account_info()
+            # 🔧 เพิ่มการเช็ค equity vs balance ก่อนทุกอย่าง (ใช้ค่าจาก snapshot ถ้ามี)
+            if 'balance' in portfolio_analysis:
+                account_info = {
+                    'balance': portfolio_analysis.get('balance', 0),
+                    'equity': portfolio_analysis.get('equity', 0)
+                }
+            else:
+                account_info = self.mt5_connector.get_account_info()
             if account_info:
                 balance = account_info.get('balance', 0)
                 equity = account_info.get('equity', 0)
                 profit_amount = equity - balance
                 
-                print(f"💰 Account Status Check:")
-                print(f"   Balance: ${balance:.2f}")
-                print(f"   Equity: ${equity:.2f}")
-                print(f"   Net Profit: ${profit_amount:.2f}")
+                log.debug("💰 Account Status Check:")
+                log.debug("   Balance: $%.2f", balance)
+                log.debug("   Equity: $%.2f", equity)
+                log.debug("   Net Profit: $%.2f", profit_amount)
                 
                 # ✅ ถ้า equity > balance = Portfolio มีกำไร ไม่ต้อง recovery เลย
                 if equity > balance:
-                    print(f"✅ Portfolio PROFITABLE: +${profit_amount:.2f}")
-                    print(f"   💡 Recovery system DISABLED - Account is making profit")
-                    print(f"   🎯 Focus on normal profit optimization instead")
+                    log.debug("✅ Portfolio PROFITABLE: +$%.2f", profit_amount)
+                    log.debug("   💡 Recovery system DISABLED - Account is making profit")
+                    log.debug("   🎯 Focus on normal profit optimization instead")
                     
                     # ปิด recovery ถ้าเปิดอยู่
                     if self.recovery_active:
-                        print(f"💊 Stopping active recovery - Portfolio now profitable")
+                        log.debug("💊 Stopping active recovery - Portfolio now profitable")
                         self.recovery_active = False
                         self.recovery_start_time = None
                     
@@ -2665,12 +3017,12 @@ class SmartProfitManager:
                 
                 # ✅ ถ้า equity ≈ balance (ใกล้เคียงกันใน ±$5)
                 elif abs(profit_amount) <= 5.0:
-                    print(f"⚖️ Portfolio BALANCED: ${profit_amount:.2f}")
-                    print(f"   💡 Minor fluctuation - no recovery needed")
+                    log.debug("⚖️ Portfolio BALANCED: $%.2f", profit_amount)
+                    log.debug("   💡 Minor fluctuation - no recovery needed")
                     
                     # ปิด recovery ถ้าเปิดอยู่
                     if self.recovery_active:
-                        print(f"💊 Stopping recovery - Portfolio balanced")
+                        log.debug("💊 Stopping recovery - Portfolio balanced")
                         self.recovery_active = False
                         self.recovery_start_time = None
                     
@@ -2679,13 +3031,13 @@ class SmartProfitManager:
                 # ✅ เฉพาะตอนที่ equity < balance ถึงจะพิจารณา recovery
                 else:
                     actual_loss = abs(profit_amount)
-                    print(f"📉 Portfolio LOSING: -${actual_loss:.2f}")
+                    log.debug("📉 Portfolio LOSING: -$%.2f", actual_loss)
                     
                     # ใช้ actual loss จาก equity แทน total_pnl
                     effective_trigger_loss = abs(self.recovery_trigger_loss)
                     
-                    print(f"   🔍 Actual Loss: ${actual_loss:.2f}")
-                    print(f"   🎯 Recovery Trigger: ${effective_trigger_loss:.2f}")
+                    log.debug("   🔍 Actual Loss: $%.2f", actual_loss)
+                    log.debug("   🎯 Recovery Trigger: $%.2f", effective_trigger_loss)
                     
                     # เช็คเงื่อนไข trigger ใหม่
                     should_trigger = (
@@ -2695,45 +3047,43 @@ class SmartProfitManager:
                     )
                     
                     if should_trigger:
-                        print(f"🚨 Recovery trigger conditions met:")
-                        print(f"   Loss ${actual_loss:.2f} >= Trigger ${effective_trigger_loss:.2f}")
+                        log.warning(f"🚨 Recovery trigger conditions met:")
+                        log.debug("   Loss $%.2f >= Trigger $%.2f", actual_loss, effective_trigger_loss)
                         
                         if self.recovery_auto_mode:
-                            print(f"💊 Auto-recovery ACTIVATED")
+                            log.debug("💊 Auto-recovery ACTIVATED")
                             self.start_portfolio_recovery(portfolio_analysis)
                         else:
-                            print(f"💊 Recovery trigger ready - Use manual activation")
-                            print(f"   Or enable auto_mode for automatic recovery")
+                            log.debug("💊 Recovery trigger ready - Use manual activation")
+                            log.debug("   Or enable auto_mode for automatic recovery")
                     else:
                         # แสดงสถานะปัจจุบัน
                         if actual_loss > 0:
                             progress_pct = (actual_loss / effective_trigger_loss) * 100
-                            print(f"⏳ Recovery progress: {progress_pct:.1f}% to trigger")
+                            log.debug("⏳ Recovery progress: %.1f%% to trigger", progress_pct)
                         
                         if self.recovery_active:
                             self.monitor_recovery_progress(portfolio_analysis)
             
             else:
-                print(f"❌ Cannot get account info for recovery check")
+                log.error(f"❌ Cannot get account info for recovery check")
                 
         except Exception as e:
-            print(f"❌ Recovery check error: {e}")
+            log.error(f"❌ Recovery check error: {e}")
             # แสดง debug info
-            import traceback
-            print(f"🔍 Debug traceback:")
-            traceback.print_exc()
+            log.debug("🔍 Debug traceback:", exc_info=True)
 
     def start_portfolio_recovery(self, portfolio_analysis: Dict):
         """เริ่ม Portfolio Recovery Process"""
         try:
-            print(f"💊 === PORTFOLIO RECOVERY STARTED ===")
+            log.info(f"💊 === PORTFOLIO RECOVERY STARTED ===")
             
             self.recovery_active = True
             self.recovery_start_time = datetime.now()
             self.recovery_initial_pnl = portfolio_analysis.get('total_pnl', 0)
             
-            print(f"   Initial PnL: ${self.recovery_initial_pnl:.2f}")
-            print(f"   Target: Break-even or positive")
+            log.debug("   Initial PnL: $%.2f", self.recovery_initial_pnl)
+            log.debug("   Target: Break-even or positive")
             
             # วิเคราะห์โอกาสในการ recovery
             recovery_plan = self.analyze_recovery_opportunities(portfolio_analysis)
@@ -2741,11 +3091,11 @@ class SmartProfitManager:
             if recovery_plan['viable']:
                 self.execute_recovery_plan(recovery_plan)
             else:
-                print(f"   ⚠️ No viable recovery options found")
+                log.warning(f"   ⚠️ No viable recovery options found")
                 self.recovery_active = False
                 
         except Exception as e:
-            print(f"❌ Recovery start error: {e}")
+            log.error(f"❌ Recovery start error: {e}")
             self.recovery_active = False
 
     def analyze_recovery_opportunities(self, portfolio_analysis: Dict) -> Dict:
@@ -2762,10 +3112,10 @@ class SmartProfitManager:
             total_profit = sum(p.pnl for p in profitable_positions)
             net_pnl = total_loss + total_profit
             
-            print(f"   📊 Recovery Analysis:")
-            print(f"      Losing: {len(losing_positions)} positions, ${total_loss:.2f}")
-            print(f"      Profitable: {len(profitable_positions)} positions, ${total_profit:.2f}")
-            print(f"      Net PnL: ${net_pnl:.2f}")
+            log.debug("   📊 Recovery Analysis:")
+            log.debug("      Losing: %s positions, $%.2f", len(losing_positions), total_loss)
+            log.debug("      Profitable: %s positions, $%.2f", len(profitable_positions), total_profit)
+            log.debug("      Net PnL: $%.2f", net_pnl)
             
             # ประเมินความเป็นไปได้
             viable = False
@@ -2790,7 +3140,7 @@ class SmartProfitManager:
             }
             
         except Exception as e:
-            print(f"❌ Recovery analysis error: {e}")
+            log.error(f"❌ Recovery analysis error: {e}")
             return {'viable': False}
 
     def execute_recovery_plan(self, recovery_plan: Dict):
@@ -2799,7 +3149,7 @@ class SmartProfitManager:
             method = recovery_plan['method']
             
             if method == "PROFIT_CLOSE_RECOVERY":
-                print(f"   💰 Executing PROFIT CLOSE RECOVERY")
+                log.debug("   💰 Executing PROFIT CLOSE RECOVERY")
                 
                 # ใช้ profitable positions ปิด losing positions
                 profit_positions = recovery_plan['profitable_positions']
@@ -2822,7 +3172,7 @@ class SmartProfitManager:
                     self.execute_pair_closes(recovery_pairs[:2])  # ปิดสูงสุด 2 คู่
                     
             elif method == "HEDGE_RECOVERY":
-                print(f"   🛡️ Executing HEDGE RECOVERY")
+                log.debug("   🛡️ Executing HEDGE RECOVERY")
                 
                 # วาง hedge orders
                 hedge_opportunities = self.find_hedge_opportunities(recovery_plan['losing_positions'])
@@ -2830,7 +3180,7 @@ class SmartProfitManager:
                     self.execute_smart_hedges(hedge_opportunities)
                     
         except Exception as e:
-            print(f"❌ Recovery execution error: {e}")
+            log.error(f"❌ Recovery execution error: {e}")
 
     def monitor_recovery_progress(self, portfolio_analysis: Dict):
         """ติดตาม progress ของ recovery"""
@@ -2840,10 +3190,10 @@ class SmartProfitManager:
             
             # เช็คว่า recovery สำเร็จหรือยัง
             if current_pnl >= -5:  # เกือบ break-even หรือกำไร
-                print(f"💊 === PORTFOLIO RECOVERY SUCCESSFUL ===")
-                print(f"   Initial PnL: ${self.recovery_initial_pnl:.2f}")
-                print(f"   Current PnL: ${current_pnl:.2f}")
-                print(f"   Recovery Gain: +${recovery_pnl:.2f}")
+                log.debug("💊 === PORTFOLIO RECOVERY SUCCESSFUL ===")
+                log.debug("   Initial PnL: $%.2f", self.recovery_initial_pnl)
+                log.debug("   Current PnL: $%.2f", current_pnl)
+                log.debug("   Recovery Gain: +$%.2f", recovery_pnl)
                 
                 self.recovery_active = False
                 self.recovery_start_time = None
@@ -2852,18 +3202,19 @@ class SmartProfitManager:
             elif self.recovery_start_time:
                 elapsed = (datetime.now() - self.recovery_start_time).total_seconds() / 60
                 if elapsed > 30:
-                    print(f"💊 Recovery timeout after {elapsed:.1f} minutes")
-                    print(f"   Recovery gain: +${recovery_pnl:.2f}")
+                    log.debug("💊 Recovery timeout after %.1f minutes", elapsed)
+                    log.debug("   Recovery gain: +$%.2f", recovery_pnl)
                     self.recovery_active = False
                     
             # แสดงความคืบหน้าทุก 5 นาที
             elif self.recovery_start_time:
                 elapsed = (datetime.now() - self.recovery_start_time).total_seconds() / 60
                 if int(elapsed) % 5 == 0:  # ทุก 5 นาที
-                    print(f"💊 Recovery progress: {elapsed:.1f}min, PnL: ${current_pnl:.2f}, Gain: +${recovery_pnl:.2f}")
+                    log.debug("💊 Recovery progress: %.1fmin, PnL: $%.2f, Gain: +$%.2f",
+                              elapsed, current_pnl, recovery_pnl)
                     
         except Exception as e:
-            print(f"❌ Recovery monitoring error: {e}")
+            log.error(f"❌ Recovery monitoring error: {e}")
 
     def get_recovery_status(self) -> Dict:
         """Get recovery system status"""
@@ -2894,25 +3245,26 @@ class SmartProfitManager:
         """Manual trigger สำหรับ GUI"""
         try:
             if self.recovery_active:
-                print(f"💊 Recovery already active")
+                log.info(f"💊 Recovery already active")
                 return False
                 
             portfolio = self.analyze_portfolio_positions()
             if 'error' in portfolio:
-                print(f"💊 Cannot analyze portfolio for recovery")
+                log.info(f"💊 Cannot analyze portfolio for recovery")
                 return False
                 
-            print(f"💊 Manual recovery triggered")
+            log.info(f"💊 Manual recovery triggered")
             self.start_portfolio_recovery(portfolio)
             return True
             
         except Exception as e:
-            print(f"❌ Manual recovery error: {e}")
+            log.error(f"❌ Manual recovery error: {e}")
             return False
 
     def get_grid_status(self):
         """Get comprehensive grid status for GUI"""
         try:
+            state = self.state_store.current  # อ่านครั้งเดียว - positions/orders เป็นชุดเดียวกัน
             base_status = {
                 'trading_active': self.trading_active,
                 'gold_symbol': self.gold_symbol,
@@ -2922,8 +3274,9 @@ class SmartProfitManager:
                 'realized_pnl': round(self.realized_pnl, 2),
                 'current_drawdown': round(self.current_drawdown, 0),
                 'max_drawdown': round(self.max_drawdown_points, 0),
-                'active_positions': len(self.active_positions),
-                'pending_orders': len(self.pending_orders),
+                'active_positions': len(state.active_positions),
+                'pending_orders': len(state.pending_orders),
+                'state_version': state.version,
                 'trades_opened': self.trades_opened,
                 'trades_closed': self.trades_closed,
                 'win_rate': round(self.win_rate * 100, 1),
@@ -2934,20 +3287,29 @@ class SmartProfitManager:
                 'survivability_used': round((self.current_drawdown / self.survivability) * 100, 1) if self.survivability > 0 else 0,
                 'daily_pnl': round(self.total_pnl, 2),
                 'magic_number': self.magic_number,
+                'grid_reconcile': self.get_recenter_status() if self.grid_reconciler else None,
+                'virtual_orders': self.virtual_ladder.status() if self.virtual_ladder else None,
+                'order_dispatcher': self.order_dispatcher.stats() if self.order_dispatcher else None,
+                'order_metrics': self.order_metrics.snapshot() if self.order_metrics else None,
+                'cycle_profiler': self.profiler.summary(),
                 'ai_control_mode': True,
                 'smart_profit_enabled': True
             }
             
             # Add Smart Profit status
             try:
-                smart_status = self.get_profit_management_status()
+                # GUI อ่าน snapshot ล่าสุด - ไม่เรียก MT5 ซ้ำถ้ายังไม่หมดอายุ
+                snapshot = self.get_portfolio_snapshot()
+                portfolio = self.analyze_portfolio_positions(snapshot)
+                base_status['portfolio_snapshot_version'] = snapshot.version
+                
+                smart_status = self.get_profit_management_status(portfolio)
                 base_status['smart_profit_status'] = smart_status
                 
                 recovery_status = self.get_recovery_status()
                 base_status['recovery_system'] = recovery_status
                 
                 # Add AI health score
-                portfolio = self.analyze_portfolio_positions()
                 ai_health = self.calculate_ai_health_score(portfolio)
                 base_status['ai_health_score'] = ai_health
                 
@@ -2959,7 +3321,7 @@ class SmartProfitManager:
             return base_status
             
         except Exception as e:
-            print(f"❌ Error getting grid status: {e}")
+            log.error(f"❌ Error getting grid status: {e}")
             return {'error': str(e)}
 
     def is_market_open(self) -> bool:
@@ -2977,18 +3339,18 @@ class SmartProfitManager:
             return tick.time > 0
             
         except Exception as e:
-            print(f"❌ Error checking market status: {e}")
+            log.error(f"❌ Error checking market status: {e}")
             return False
 
     def reset_emergency_stop(self):
         """Reset emergency stop status"""
         try:
             self.emergency_stop_triggered = False
-            print("✅ Emergency stop status reset")
-            print("🔄 Ready to start AI trading again")
+            log.info("✅ Emergency stop status reset")
+            log.info("🔄 Ready to start AI trading again")
             
         except Exception as e:
-            print(f"❌ Error resetting emergency stop: {e}")
+            log.error(f"❌ Error resetting emergency stop: {e}")
 
     def __del__(self):
         """Cleanup when object is destroyed"""
@@ -0,0 +1,174 @@
+"""
+Engine State Store - Copy-on-Write Shared State
+state_store.py
+Lock-free snapshots of active_positions / pending_orders for readers
+(GUI poll, engine loops) with a single serialized writer path
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping
+
+from pending_order_book import PendingOrderBook
+
+@dataclass(frozen=True)
+class EngineState:
+    """Published state - ห้ามแก้ไข (active_positions เป็น read-only view, pending_orders ถูก freeze)"""
+    version: int
+    active_positions: Mapping
+    pending_orders: PendingOrderBook
+    updated_at: datetime
+
+class StateDraft:
+    """Mutable working copy ภายใน write() - copy เฉพาะส่วนที่ถูกแตะ"""
+
+    def __init__(self, base: EngineState):
+        self.base = base
+        self._positions = None
+        self._orders = None
+
+    @property
+    def active_positions(self) -> Dict:
+        if self._positions is None:
+            self._positions = dict(self.base.active_positions)
+        return self._positions
+
+    @property
+    def pending_orders(self) -> PendingOrderBook:
+        if self._orders is None:
+            self._orders = self.base.pending_orders.copy()
+        return self._orders
+
+    @property
+    def changed(self) -> bool:
+        return self._positions is not None or self._orders is not None
+
+class EngineStateStore:
+    """
+    Copy-on-write store
+
+    Readers: store.current (หรือ properties ของ manager) - แค่อ่าน attribute เดียว ไม่มี lock,
+    ได้ active_positions + pending_orders ที่ตรงกันเสมอ (publish พร้อมกันเป็น object เดียว)
+    Writers: ทุกการแก้ไขผ่าน write() / helper methods - serialize ด้วย writer lock,
+    แก้บน copy แล้วสลับ reference ทีเดียว จึงไม่มี torn read / dict changed size ระหว่าง iterate
+    """
+
+    def __init__(self):
+        self.write_lock = threading.RLock()
+        self.current = EngineState(
+            version=0,
+            active_positions=MappingProxyType({}),
+            pending_orders=PendingOrderBook().freeze(),
+            updated_at=datetime.now(),
+        )
+
+    @contextmanager
+    def write(self):
+        """with store.write() as draft: แก้ draft.active_positions / draft.pending_orders"""
+        with self.write_lock:
+            draft = StateDraft(self.current)
+            yield draft
+            if draft.changed:
+                self._publish(draft)
+
+    def _publish(self, draft: StateDraft):
+        base = draft.base
+        positions = MappingProxyType(draft._positions) if draft._positions is not None else base.active_positions
+        orders = draft._orders.freeze() if draft._orders is not None else base.pending_orders
+        self.current = EngineState(
+            version=base.version + 1,
+            active_positions=positions,
+            pending_orders=orders,
+            updated_at=datetime.now(),
+        )
+
+    # ----- Writer helpers -----
+
+    def set_pending_order(self, order_id, order_info: Dict):
+        with self.write() as draft:
+            draft.pending_orders[order_id] = order_info
+
+    def remove_pending_order(self, order_id) -> bool:
+        with self.write_lock:
+            if order_id not in self.current.pending_orders:
+                return False
+            with self.write() as draft:
+                del draft.pending_orders[order_id]
+            return True
+
+    def retain_pending_orders(self, order_ids: Iterable) -> int:
+        """เก็บไว้เฉพาะ orders ที่ยังอยู่ใน MT5 - คืนจำนวนที่ถูกลบ"""
+        keep = set(order_ids)
+        with self.write_lock:
+            stale = [order_id for order_id in self.current.pending_orders if order_id not in keep]
+            if stale:
+                with self.write() as draft:
+                    for order_id in stale:
+                        del draft.pending_orders[order_id]
+            return len(stale)
+
+    def replace_positions(self, positions: Dict):
+        with self.write() as draft:
+            draft._positions = dict(positions)
+
+    def remove_position(self, ticket) -> bool:
+        with self.write_lock:
+            if ticket not in self.current.active_positions:
+                return False
+            with self.write() as draft:
+                del draft.active_positions[ticket]
+            return True
+
+# Test function for standalone usage
+def test_state_store():
+    """Test copy-on-write state store under concurrent readers/writers"""
+    print("🧪 Testing Engine State Store...")
+
+    store = EngineStateStore()
+    errors = []
+    stop = threading.Event()
+
+    def writer(offset):
+        for i in range(2000):
+            order_id = offset + i
+            store.set_pending_order(order_id, {'order_id': order_id, 'price': 2000 + (i % 50) * 0.5,
+                                               'direction': 'BUY' if i % 2 else 'SELL', 'lot_size': 0.01})
+            store.replace_positions({order_id: {'ticket': order_id}})
+            if i % 3 == 0:
+                store.remove_pending_order(order_id)
+
+    def reader():
+        while not stop.is_set():
+            try:
+                state = store.current
+                total = sum(1 for _ in state.pending_orders.values())
+                if total != len(state.pending_orders):
+                    errors.append("torn read")
+                list(state.active_positions.items())
+            except Exception as e:
+                errors.append(str(e))
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    writers = [threading.Thread(target=writer, args=(n * 100000,)) for n in range(2)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+
+    print(f"   Version: {store.current.version} | Pending: {len(store.current.pending_orders)} | Errors: {len(errors)}")
+    try:
+        store.current.pending_orders[1] = {}
+        print("   ❌ Published state is writable")
+    except TypeError:
+        print("   ✅ Published state is read-only")
+
+    print("✅ Engine State Store Test Completed")
+
+if __name__ == "__main__":
+    test_state_store()
@@ -4,9 +4,13 @@ survivability_engine.py
 AI-powered calculation engine for grid trading survivability with guaranteed 20,000+ points endurance
 """
 
+import copy
 import math
+import threading
+import numpy as np
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
 from enum import Enum
 
 class TradingMode(Enum):
@@ -16,6 +20,8 @@ class TradingMode(Enum):
     TURBO = "TURBO"        # 5,000 points - Maximum speed
 
 class SurvivabilityEngine:
+    CACHE_SYMBOL_FIELDS = ('volume_min', 'volume_step', 'contract_size', 'point')
+
     def __init__(self, config: dict):
         self.config = config
         # ลบ target_survivability แบบเดิมออก (จะใช้จาก mode แทน)
@@ -34,6 +40,22 @@ class SurvivabilityEngine:
         self.efficiency_factor = 0.85  # Account for real-world inefficiencies
         self.volatility_buffer = 1.15  # 15% buffer for volatility
         self.emergency_reserve = 0.2   # 20% emergency reserve
+
+        # Inverse solver (target survivability -> lot / spacing / levels)
+        solver_config = config.get('target_solver', {})
+        self.solver_min_spacing = solver_config.get('min_spacing', 25)
+        self.solver_max_spacing = solver_config.get('max_spacing', 600)
+        self.solver_spacing_step = solver_config.get('spacing_step', 5)
+        self.solver_max_levels = solver_config.get('max_levels', 80)
+        self.solver_budget_ratio = solver_config.get('budget_ratio', 0.9)
+        self.solver_mode_min_spacing = solver_config.get('mode_min_spacing', 100)
+
+        # Results cache ของ calculate_for_balance (LRU)
+        self.cache_size = config.get('survivability_cache_size', 256)
+        self.results_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
         
         # ⭐ เพิ่มส่วนนี้ - Trading mode configurations
         # Trading mode configurations
@@ -80,6 +102,12 @@ class SurvivabilityEngine:
                             trading_mode: TradingMode = TradingMode.BALANCED, 
                             symbol_info: Dict = None) -> Dict:
         try:
+            cache_key = self.make_cache_key(account_balance, min_lot, trading_mode, symbol_info)
+            cached = self.get_cached_results(cache_key)
+            if cached is not None:
+                print(f"♻️ Survivability for ${account_balance:,.2f} ({cached['trading_mode']}) from cache")
+                return cached
+
             # Input validation
             if account_balance <= 0:
                 raise ValueError("Account balance must be positive")
@@ -216,6 +244,7 @@ class SurvivabilityEngine:
                 print(f"   ⚠️ Warning: Lot size limited by broker minimum")
                 print(f"   📉 Actual survivability reduced due to minimum lot constraint")
             
+            self.store_cached_results(cache_key, results)
             return results
             
         except Exception as e:
@@ -224,6 +253,195 @@ class SurvivabilityEngine:
             traceback.print_exc()  # แสดง full error trace
             raise
 
+    # ----- Results cache -----
+
+    def make_cache_key(self, account_balance: float, min_lot: float, trading_mode: TradingMode,
+                       symbol_info: Dict = None) -> Tuple:
+        """Key ของ cache: balance (ถึงเซนต์) + mode + เฉพาะ spec ของ symbol ที่มีผลกับผลลัพธ์ (ไม่ใช่ spread / tick)"""
+        symbol_key = tuple((field, symbol_info.get(field)) for field in self.CACHE_SYMBOL_FIELDS) if symbol_info else ()
+        mode_key = trading_mode.value if isinstance(trading_mode, TradingMode) else str(trading_mode)
+        return (round(float(account_balance), 2), mode_key, float(min_lot), symbol_key)
+
+    def get_cached_results(self, cache_key: Tuple) -> Optional[Dict]:
+        with self.cache_lock:
+            results = self.results_cache.get(cache_key)
+            if results is None:
+                self.cache_misses += 1
+                return None
+            self.results_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return copy.deepcopy(results)
+
+    def store_cached_results(self, cache_key: Tuple, results: Dict):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.results_cache[cache_key] = copy.deepcopy(results)
+            self.results_cache.move_to_end(cache_key)
+            while len(self.results_cache) > self.cache_size:
+                self.results_cache.popitem(last=False)
+
+    def clear_cache(self):
+        """ล้าง cache (เรียกหลังแก้ mode_configs / safety ratios)"""
+        with self.cache_lock:
+            self.results_cache.clear()
+
+    def get_cache_stats(self) -> Dict:
+        with self.cache_lock:
+            return {'size': len(self.results_cache), 'max_size': self.cache_size,
+                    'hits': self.cache_hits, 'misses': self.cache_misses}
+
+    # ----- Batch (vectorized) -----
+
+    def calculate_batch(self, balances: Sequence[float], trading_modes: Sequence[TradingMode] = None,
+                        symbol_specs: Sequence[Dict] = None) -> Dict[str, np.ndarray]:
+        """
+        Vectorized calculate_for_balance: balances x trading_modes x symbol_specs ในครั้งเดียว
+
+        symbol_specs: [{'volume_min': 0.01, 'volume_step': 0.01}, ...] (ค่า default = 0.01 / 0.01)
+        คืน dict ของ arrays shape (len(balances), len(trading_modes), len(symbol_specs))
+        ด้วยสูตรเดียวกับ path แบบ scalar (ไม่ print, ไม่มี warnings / breakdown)
+        """
+        modes = list(trading_modes or TradingMode)
+        specs = list(symbol_specs or [{}])
+        shape = (len(balances), len(modes), len(specs))
+
+        balance = np.broadcast_to(np.asarray(balances, dtype=float)[:, None, None], shape).ravel()
+        mode_index = np.broadcast_to(np.arange(len(modes))[None, :, None], shape).ravel()
+        spec_index = np.broadcast_to(np.arange(len(specs))[None, None, :], shape).ravel()
+        if np.any(balance < 100):
+            raise ValueError("Minimum account balance required: $100")
+
+        def mode_value(key, default=None):
+            values = [self.mode_configs[mode].get(key, default) for mode in modes]
+            if key == 'safety_margin_override':
+                values = [self.safety_ratio if v is None else v for v in values]
+            return np.asarray(values, dtype=float)[mode_index]
+
+        target = mode_value('target_survivability')
+        min_lot = np.asarray([spec.get('volume_min', 0.01) for spec in specs], dtype=float)[spec_index]
+        lot_step = np.asarray([spec.get('volume_step', 0.01) for spec in specs], dtype=float)[spec_index]
+
+        # calculate_usable_capital
+        safety_ratio = mode_value('safety_margin_override')
+        safety_factor = np.select(
+            [balance < 1000, balance < 5000, balance < 10000],
+            [np.minimum(0.5, safety_ratio), np.minimum(0.55, safety_ratio), np.minimum(0.6, safety_ratio)],
+            safety_ratio)
+        usable = np.minimum(balance * safety_factor * self.efficiency_factor,
+                            balance * (1 - self.minimum_safety_margin))
+        usable = np.round(usable, 2)
+
+        # calculate_optimal_base_lot
+        max_affordable_lot = usable / (target * self.gold_point_value * 100 * self.volatility_buffer)
+        base_multiplier = np.select(
+            [balance >= 100000, balance >= 50000, balance >= 25000, balance >= 10000, balance >= 5000, balance >= 1000],
+            [0.8, 0.7, 0.6, 0.5, 0.4, 0.3], 0.2)
+        calculated_lot = max_affordable_lot * base_multiplier * mode_value('lot_multiplier', 1.0)
+        lot = np.maximum(np.ceil(calculated_lot / lot_step) * lot_step, min_lot)
+        lot = np.minimum(lot, np.minimum(1.0, usable / 10000))
+        lot = np.maximum(np.round(lot / lot_step) * lot_step, min_lot)
+        ideal_lot = np.round(lot, 3)
+
+        actual_lot = np.maximum(ideal_lot, min_lot)
+        lot_adjusted = actual_lot > ideal_lot
+
+        # calculate_optimal_grid_spacing
+        base_spacing = np.select(
+            [usable >= 50000, usable >= 30000, usable >= 15000, usable >= 10000,
+             usable >= 6000, usable >= 4000, usable >= 2500, usable >= 1500],
+            [30, 40, 50, 60, 70, 80, 90, 100], 120)
+        spacing = np.clip(np.trunc(base_spacing / mode_value('grid_tightness', 1.0)), 25, 150)
+        spacing = np.where(spacing >= 100, np.round(spacing / 10) * 10, np.round(spacing / 5) * 5)
+
+        # calculate_max_grid_levels_realistic
+        levels = self._max_levels_batch(usable, actual_lot, spacing, target)
+        survivability = levels * spacing
+
+        # adjust_for_target_survivability (เฉพาะแถวที่ต่ำกว่าเป้าและไม่ได้โดน min lot)
+        adjust = (survivability < target) & ~lot_adjusted
+        if adjust.any():
+            adjusted = self._adjust_for_target_batch(usable[adjust], min_lot[adjust], target[adjust],
+                                                     mode_value('grid_tightness', 1.0)[adjust])
+            actual_lot[adjust] = adjusted['base_lot']
+            spacing[adjust] = adjusted['grid_spacing']
+            levels[adjust] = adjusted['max_levels']
+            survivability[adjust] = adjusted['survivability']
+
+        # calculate_realistic_survivability_metrics
+        base_cost_per_level = spacing * (actual_lot / 0.01) + actual_lot * 200
+        effective_cost_per_level = base_cost_per_level / 1.15
+        max_affordable_levels = usable * 0.85 / effective_cost_per_level
+        realistic_levels = np.maximum(np.minimum(levels, np.trunc(max_affordable_levels * 0.85)), 5)
+        capital_utilization = realistic_levels * effective_cost_per_level / (usable / 0.6) * 100
+
+        total_exposure = actual_lot * levels
+        max_drawdown_value = total_exposure * levels * spacing * self.base_point_value
+        risk_ratio = max_drawdown_value / balance
+
+        results = {
+            'account_balance': balance,
+            'target_survivability': target,
+            'usable_capital': usable,
+            'safety_margin': balance - usable,
+            'ideal_base_lot': ideal_lot,
+            'base_lot': actual_lot,
+            'lot_size_adjusted': lot_adjusted,
+            'grid_spacing': spacing.astype(int),
+            'max_levels': levels.astype(int),
+            'survivability': survivability,
+            'realistic_survivability': realistic_levels * spacing,
+            'actual_cost_per_level': np.round(effective_cost_per_level, 2),
+            'max_affordable_levels': np.trunc(max_affordable_levels).astype(int),
+            'target_met': survivability >= target,
+            'total_exposure': total_exposure,
+            'max_drawdown_value': max_drawdown_value,
+            'capital_utilization': np.round(capital_utilization, 1),
+            'efficiency_rating': np.select(
+                [survivability >= target * 1.25, survivability >= target * 1.1, survivability >= target,
+                 survivability >= target * 0.9],
+                ["EXCELLENT", "VERY_GOOD", "GOOD", "ACCEPTABLE"], "LIMITED"),
+            'risk_level': np.select([risk_ratio <= 0.3, risk_ratio <= 0.5, risk_ratio <= 0.7],
+                                    ["LOW", "MODERATE", "HIGH"], "VERY_HIGH"),
+        }
+        results = {key: value.reshape(shape) for key, value in results.items()}
+        results['trading_modes'] = np.asarray([mode.value for mode in modes])
+        return results
+
+    def _max_levels_batch(self, usable: np.ndarray, lot: np.ndarray, spacing: np.ndarray,
+                          target: np.ndarray) -> np.ndarray:
+        """calculate_max_grid_levels_realistic แบบ arrays"""
+        total_cost_per_level = (spacing * (lot / 0.01) + lot * 400) / 1.3
+        affordable = np.trunc(usable * 0.95 / total_cost_per_level)
+        reasonable = np.minimum(80, np.trunc(target / spacing))
+        return np.maximum(np.minimum(affordable, reasonable), 8)
+
+    def _adjust_for_target_batch(self, usable: np.ndarray, min_lot: np.ndarray, target: np.ndarray,
+                                 tightness: np.ndarray) -> Dict[str, np.ndarray]:
+        """adjust_for_target_survivability แบบ arrays (frontier จุด min lot ต่อแถว ภายใต้ขอบเขตของ mode)"""
+        spacings = np.arange(self.solver_min_spacing, self.solver_max_spacing + 1, self.solver_spacing_step, dtype=float)
+        min_spacing = np.maximum(max(self.solver_min_spacing, self.solver_mode_min_spacing),
+                                 np.trunc(self.solver_mode_min_spacing / tightness))
+        max_levels = np.maximum(1, np.trunc(self.solver_max_levels * tightness))
+        levels = np.floor(usable[:, None] * self.solver_budget_ratio
+                          / self.target_cost_per_level(min_lot[:, None], spacings[None, :]))
+        levels = np.minimum(levels, max_levels[:, None])
+        fits = ((levels >= 1) & (levels * spacings[None, :] >= target[:, None])
+                & (spacings[None, :] >= min_spacing[:, None]))
+        found = fits.any(axis=1)
+        first = fits.argmax(axis=1)
+        rows = np.arange(len(usable))
+
+        fallback_spacing = np.trunc((usable * 0.8 / 20 - min_lot * 2000) / (min_lot * self.gold_point_value * 100))
+        fallback_spacing = np.clip(fallback_spacing, 100, 600)
+        fallback_levels = np.trunc(usable * 0.8 / (min_lot * fallback_spacing * self.gold_point_value * 100
+                                                   + min_lot * 2000))
+        fallback_levels = np.maximum(fallback_levels, 15)
+
+        spacing = np.where(found, spacings[first], fallback_spacing)
+        levels = np.where(found, levels[rows, first], fallback_levels)
+        return {'base_lot': min_lot, 'grid_spacing': spacing, 'max_levels': levels, 'survivability': levels * spacing}
+
     def calculate_usable_capital(self, account_balance: float, mode_config: Dict = None) -> float:
         """Calculate usable capital with safety margins and optional mode override"""
         
@@ -646,36 +864,18 @@ class SurvivabilityEngine:
             else:
                 target_points = self.config.get('target_survivability', 20000)  # ใช้จาก config แทน self.target_survivability
         
-        # Work backwards from target survivability considering minimum lot
-        # Try different grid spacing options from wide to tight
-        spacing_options = [600, 500, 400, 350, 300, 250, 200, 175, 150, 125, 100]
-        
-        # Apply mode tightness if provided
-        if mode_config and 'grid_tightness' in mode_config:
-            grid_tightness = mode_config['grid_tightness']
-            spacing_options = [int(spacing / grid_tightness) for spacing in spacing_options]
-            spacing_options = [max(100, spacing) for spacing in spacing_options]  # Ensure minimum 100
-        
-        for grid_spacing in spacing_options:
-            required_levels = math.ceil(target_points / grid_spacing)
-            
-            # Calculate cost per level with minimum lot
-            cost_per_level = min_lot * grid_spacing * self.gold_point_value * 100
-            margin_per_level = min_lot * 2000  # More realistic margin estimate
-            total_cost_per_level = cost_per_level + margin_per_level
-            
-            total_cost = required_levels * total_cost_per_level
-            
-            if total_cost <= usable_capital * 0.9:  # 90% of capital
-                # This configuration works with minimum lot
-                actual_survivability = required_levels * grid_spacing
-                
-                return {
-                    'base_lot': min_lot,
-                    'grid_spacing': grid_spacing,
-                    'max_levels': required_levels,
-                    'survivability': actual_survivability
-                }
+        # Tightest spacing ที่ min lot ยังถึงเป้า ภายใต้ขอบเขตของ mode (integer search บน cost model เดียวกับ solver)
+        min_spacing, max_levels = self.mode_solver_bounds(mode_config)
+        frontier = self.solve_frontier_for_capital(usable_capital, target_points, min_lot, lot_step=min_lot, max_lot=min_lot,
+                                                   min_spacing=min_spacing, max_levels=max_levels)
+        if frontier:
+            point = frontier[0]
+            return {
+                'base_lot': point['base_lot'],
+                'grid_spacing': point['grid_spacing'],
+                'max_levels': point['max_levels'],
+                'survivability': point['survivability']
+            }
                 
         # Fallback: use maximum possible with minimum lot
         max_cost_per_level = usable_capital * 0.8 / 20  # At least 20 levels
@@ -692,6 +892,92 @@ class SurvivabilityEngine:
             'survivability': fallback_levels * affordable_spacing
         }
         
+    def target_cost_per_level(self, lot, grid_spacing):
+        """Cost model ของ solver: floating loss ต่อ level + margin estimate (ใช้ได้ทั้ง scalar และ arrays)"""
+        return lot * grid_spacing * self.gold_point_value * 100 + lot * 2000
+
+    def mode_solver_bounds(self, mode_config: Dict = None) -> Tuple[float, int]:
+        """
+        ขอบเขตของ solver ตาม grid_tightness ของ mode: (spacing ต่ำสุด, levels สูงสุด)
+
+        spacing ต่ำสุด = max(mode_min_spacing, mode_min_spacing / tightness) แบบ adjust เดิม
+        levels สูงสุด = max_levels * tightness (mode ที่ tight กว่าได้ grid ถี่และลึกกว่า)
+        """
+        tightness = (mode_config or {}).get('grid_tightness', 1.0)
+        min_spacing = max(self.solver_min_spacing, self.solver_mode_min_spacing,
+                          int(self.solver_mode_min_spacing / tightness))
+        max_levels = max(1, int(self.solver_max_levels * tightness))
+        return min_spacing, max_levels
+
+    def solve_frontier_for_capital(self, usable_capital: float, target_points: float, min_lot: float = 0.01,
+                                   lot_step: float = 0.01, max_lot: float = None, min_spacing: float = None,
+                                   max_levels: int = None) -> List[Dict]:
+        """
+        Pareto frontier ของ (base_lot สูงสุด, grid_spacing แคบสุด) ที่ survivability >= target_points
+
+        ทุก lot บน broker step x ทุก spacing บน spacing_step ถูกประเมินเป็น matrix เดียว:
+        levels = min(max_levels, floor(budget / cost_per_level)), feasible = levels * spacing >= target
+        ต่อ lot เลือก spacing แคบสุดที่ feasible แล้วตัดจุดที่ถูก dominate (lot ใหญ่กว่าได้ spacing เท่ากัน)
+        min_spacing / max_levels: ขอบเขตของ mode (ดู mode_solver_bounds) ค่า default = ขอบเขตของ solver
+        """
+        if min_spacing is None:
+            min_spacing = self.solver_min_spacing
+        if max_levels is None:
+            max_levels = self.solver_max_levels
+        budget = usable_capital * self.solver_budget_ratio
+        if max_lot is None:
+            max_lot = min(1.0, usable_capital / 10000)
+        max_lot = max(max_lot, min_lot)
+
+        lot_count = int(math.floor((max_lot - min_lot) / lot_step + 1e-9)) + 1
+        lots = np.round(min_lot + lot_step * np.arange(lot_count), 8)
+        spacings = np.arange(self.solver_min_spacing, self.solver_max_spacing + 1, self.solver_spacing_step, dtype=float)
+        spacings = spacings[spacings >= min_spacing]
+
+        levels = np.floor(budget / self.target_cost_per_level(lots[:, None], spacings[None, :]))
+        levels = np.minimum(levels, max_levels)
+        feasible = (levels >= 1) & (levels * spacings[None, :] >= target_points)
+        has_point = feasible.any(axis=1)
+        first = feasible.argmax(axis=1)
+
+        frontier = []
+        tightest = np.inf
+        for index in np.flatnonzero(has_point)[::-1]:        # lot ใหญ่ -> เล็ก
+            spacing = spacings[first[index]]
+            if spacing >= tightest:
+                continue                                      # lot ที่ใหญ่กว่าได้ spacing นี้อยู่แล้ว
+            tightest = spacing
+            lot = float(lots[index])
+            point_levels = int(levels[index, first[index]])
+            total_cost = point_levels * self.target_cost_per_level(lot, spacing)
+            frontier.append({
+                'base_lot': round(lot, 3),
+                'grid_spacing': int(spacing),
+                'max_levels': point_levels,
+                'survivability': int(point_levels * spacing),
+                'total_cost': round(total_cost, 2),
+                'capital_usage': round(total_cost / usable_capital * 100, 1) if usable_capital > 0 else 0.0,
+            })
+        frontier.reverse()
+        return frontier
+
+    def solve_target_frontier(self, account_balance: float, trading_mode: TradingMode = TradingMode.BALANCED,
+                              target_points: float = None, min_lot: float = 0.01, lot_step: float = 0.01) -> List[Dict]:
+        """Inverse solver: balance + mode + broker lot constraints + เป้า points -> Pareto frontier (lot น้อย -> มาก)"""
+        mode_config = self.mode_configs.get(trading_mode, self.mode_configs[TradingMode.BALANCED])
+        if target_points is None:
+            target_points = mode_config['target_survivability']
+        usable_capital = self.calculate_usable_capital(account_balance, mode_config)
+        min_spacing, max_levels = self.mode_solver_bounds(mode_config)
+        frontier = self.solve_frontier_for_capital(usable_capital, target_points, min_lot, lot_step,
+                                                   min_spacing=min_spacing, max_levels=max_levels)
+
+        print(f"🎯 Target frontier for ${account_balance:,.2f} ({target_points:,.0f} points): {len(frontier)} points")
+        for point in frontier:
+            print(f"   {point['base_lot']:.3f} lots @ {point['grid_spacing']} points x {point['max_levels']} levels "
+                  f"→ {point['survivability']:,} points ({point['capital_usage']:.1f}% capital)")
+        return frontier
+
     def determine_lot_step(self, lot_size: float) -> float:
         """Determine appropriate lot step based on size"""
         if lot_size >= 1.0:
@@ -812,6 +1098,17 @@ class SurvivabilityEngine:
                 }
                 
         return scenarios
+
+    def simulate_monte_carlo(self, results: Dict, hedge_plan: List[Tuple[float, float]] = None,
+                             paths: int = None, returns: List[float] = None, workers: int = None) -> Dict:
+        """Monte Carlo distribution (margin call / max drawdown / recovery) ของ grid + hedge ladder"""
+        from monte_carlo_engine import GridLadder, MonteCarloSettings, MonteCarloSurvivability
+
+        simulator = MonteCarloSurvivability(MonteCarloSettings.from_config(self.config))
+        result = simulator.run(GridLadder.from_results(results, hedge_plan), paths=paths,
+                               returns=returns, workers=workers)
+        result.print_summary()
+        return result.to_dict()
         
     def optimize_for_account_growth(self, current_results: Dict, target_balance: float) -> Dict:
         """Optimize parameters for account growth scenario"""
@@ -925,6 +1222,48 @@ def test_survivability_engine():
             
         except Exception as e:
             print(f"❌ Error: {e}")
+
+    # Cache + batch
+    engine.calculate_for_balance(10000)
+    live_info = {'name': "XAUUSD", 'volume_min': 0.01, 'volume_step': 0.01, 'contract_size': 100, 'point': 0.01,
+                 'spread': 25, 'bid': 2000.10, 'tags': ["metal"]}
+    engine.calculate_for_balance(12000, symbol_info=live_info)
+    engine.calculate_for_balance(12000, symbol_info=dict(live_info, spread=31, bid=2001.55))
+    print(f"\n♻️ Cache: {engine.get_cache_stats()}")
+
+    import io, contextlib, time
+    balances = [500, 1000, 2500, 7500, 10000, 33000, 100000, 250000]
+    specs = [{'volume_min': 0.01, 'volume_step': 0.01}, {'volume_min': 0.1, 'volume_step': 0.1}]
+    batch = engine.calculate_batch(balances, list(TradingMode), specs)
+    mismatches = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, balance in enumerate(balances):
+            for j, mode in enumerate(TradingMode):
+                for k, spec in enumerate(specs):
+                    scalar = engine.calculate_for_balance(balance, spec['volume_min'], mode, spec)
+                    for key in ('base_lot', 'grid_spacing', 'max_levels', 'survivability', 'realistic_survivability',
+                                'capital_utilization'):
+                        mismatches += not np.isclose(scalar[key], batch[key][i, j, k])
+                    for key in ('efficiency_rating', 'risk_level'):
+                        mismatches += scalar[key] != batch[key][i, j, k]
+    print(f"📊 Batch vs scalar mismatches: {mismatches} / {batch['base_lot'].size} parameter sets")
+
+    frontier = engine.solve_target_frontier(25000, TradingMode.SAFE)
+    dominated = any(a['base_lot'] <= b['base_lot'] and a['grid_spacing'] >= b['grid_spacing']
+                    for i, a in enumerate(frontier) for b in frontier[i + 1:])
+    print(f"🎯 Frontier feasible: {all(p['survivability'] >= 20000 for p in frontier)} | dominated points: {dominated}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        by_mode = {mode.value: engine.adjust_for_target_survivability(5000, 8000, 0.01, engine.mode_configs[mode], 20000)
+                   for mode in TradingMode}
+    distinct = len({(p['grid_spacing'], p['max_levels']) for p in by_mode.values()})
+    print(f"🎛️ Adjust by mode @ 20,000 points: "
+          + ", ".join(f"{mode} {p['grid_spacing']}x{p['max_levels']}" for mode, p in by_mode.items())
+          + f" | distinct: {distinct} / {len(by_mode)}")
+
+    started = time.perf_counter()
+    curve = engine.calculate_batch(np.linspace(100, 500000, 5000), list(TradingMode))
+    print(f"⚡ {curve['base_lot'].size:,} parameter sets in {(time.perf_counter() - started) * 1000:.1f}ms")
             
     print("\n" + "="*80)
     print("✅ Survivability Engine Test Completed")
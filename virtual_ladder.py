@@ -0,0 +1,126 @@
+"""
+Virtual Ladder - Deep grid with a sliding live window
+virtual_ladder.py
+Keeps the full desired ladder in memory, only the K nearest levels per side are real
+broker orders. Far levels are triggered client-side from the tick stream
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List
+
+from grid_reconciler import BUY, DIRECTION_NAMES, LADDER_DTYPE, SELL
+
+@dataclass
+class VirtualOrderSettings:
+    """ขนาด live window + ladder ทั้งหมด"""
+    enabled: bool = True
+    live_levels_per_side: int = 3       # K - จำนวน order จริงต่อฝั่ง
+    deep_levels_per_side: int = 0       # ladder ทั้งหมดต่อฝั่ง (0 = max_levels จาก survivability)
+    max_triggers_per_tick: int = 5      # กัน gap ใหญ่ยิง market orders รัว
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'VirtualOrderSettings':
+        virtual_config = (config or {}).get('virtual_orders', {})
+        return cls(**{key: value for key, value in virtual_config.items() if key in cls.__dataclass_fields__})
+
+class VirtualLadder:
+    """
+    Sliding live window over a deep ladder
+
+    split(): desired ladder (nearest first per side, from GridReconciler.desired_ladder)
+    -> the first K levels per side go to the reconciler as real orders, the rest stay
+    virtual. As price moves the window slides: levels entering it are promoted (placed /
+    modified in), orders leaving it are demoted (cancelled / modified out) by the reconciler.
+    take_triggered(): a virtual BUY level triggers when ask <= level, SELL when bid >= level
+    (same as the broker would for a limit order). Triggered levels are removed until the
+    next split. Scalar bounds keep the per-tick check O(1) when nothing is crossed.
+    """
+
+    def __init__(self, settings: VirtualOrderSettings = None):
+        self.settings = settings or VirtualOrderSettings()
+        self.levels = np.empty(0, dtype=LADDER_DTYPE)
+        self.buy_bound = -np.inf      # virtual BUY สูงสุด
+        self.sell_bound = np.inf      # virtual SELL ต่ำสุด
+        self.live_count = 0
+        self.triggered_total = 0
+
+    def split(self, desired: np.ndarray) -> np.ndarray:
+        """desired ทั้ง ladder -> live window (K ต่อฝั่ง) เก็บที่เหลือเป็น virtual"""
+        k = self.settings.live_levels_per_side
+        live_mask = np.zeros(len(desired), dtype=bool)
+        for direction in (BUY, SELL):
+            side = np.flatnonzero(desired['direction'] == direction)
+            live_mask[side[:k]] = True
+
+        self.levels = desired[~live_mask].copy()
+        self.live_count = int(live_mask.sum())
+        self._update_bounds()
+        return desired[live_mask]
+
+    def take_triggered(self, bid: float, ask: float) -> List[Dict]:
+        """Virtual levels ที่ราคาวิ่งผ่านแล้ว (ใกล้ราคาก่อน) - ลบออกจาก ladder"""
+        if ask > self.buy_bound and bid < self.sell_bound:
+            return []
+
+        levels = self.levels
+        crossed = ((levels['direction'] == BUY) & (levels['price'] >= ask)) | \
+                  ((levels['direction'] == SELL) & (levels['price'] <= bid))
+        hit = np.flatnonzero(crossed)
+        hit = hit[np.argsort(np.abs(levels['price'][hit] - (bid + ask) / 2), kind='stable')]
+        hit = hit[:self.settings.max_triggers_per_tick]
+
+        triggered = [{'price': float(levels['price'][i]), 'direction': DIRECTION_NAMES[int(levels['direction'][i])],
+                      'lot': float(levels['lot'][i])} for i in hit]
+        keep = np.ones(len(levels), dtype=bool)
+        keep[hit] = False
+        self.levels = levels[keep]
+        self.triggered_total += len(triggered)
+        self._update_bounds()
+        return triggered
+
+    def _update_bounds(self):
+        levels = self.levels
+        buys = levels['price'][levels['direction'] == BUY]
+        sells = levels['price'][levels['direction'] == SELL]
+        self.buy_bound = float(buys.max()) if len(buys) else -np.inf
+        self.sell_bound = float(sells.min()) if len(sells) else np.inf
+
+    def status(self) -> Dict:
+        return {
+            'live_levels': self.live_count,
+            'virtual_levels': len(self.levels),
+            'virtual_buy_top': round(self.buy_bound, 2) if np.isfinite(self.buy_bound) else None,
+            'virtual_sell_bottom': round(self.sell_bound, 2) if np.isfinite(self.sell_bound) else None,
+            'triggered_total': self.triggered_total,
+        }
+
+# Test function for standalone usage
+def test_virtual_ladder():
+    """Deep ladder 40/side, live window 3/side"""
+    from grid_reconciler import GridReconciler, ReconcileSettings
+    print("🧪 Testing Virtual Ladder...")
+    reconciler = GridReconciler(ReconcileSettings())
+    ladder = VirtualLadder(VirtualOrderSettings(live_levels_per_side=3, max_triggers_per_tick=5))
+
+    desired = reconciler.desired_ladder(2000.0, 0.90, 0.01, levels_per_side=40)
+    live = ladder.split(desired)
+    print(f"   Deep ladder {len(desired)} levels -> live {len(live)}: {np.round(np.sort(live['price']), 2).tolist()}")
+    print(f"   {ladder.status()}")
+
+    print(f"   Quiet tick: {ladder.take_triggered(2000.1, 2000.4)}")
+    gap = ladder.take_triggered(1993.0, 1993.3)
+    print(f"   Gap down to 1993: {[(t['direction'], round(t['price'], 2)) for t in gap]}")
+    print(f"   {ladder.status()}")
+
+    orders = [{'order_id': 1 + i, 'price': float(p), 'direction': DIRECTION_NAMES[int(d)], 'lot_size': 0.01}
+              for i, (p, d, _) in enumerate(live)]
+    window = ladder.split(reconciler.desired_ladder(2002.0, 0.90, 0.01, levels_per_side=40))
+    plan = reconciler.plan(2002.0, 0.90, 0.01, orders, desired=window)
+    print(f"   Price up 2.0 - window slides: {plan.summary()}")
+    for action in plan.actions:
+        print(f"      {action.kind} {action.direction} ${action.price:.2f} (from ${action.from_price:.2f})")
+    print("✅ Virtual Ladder Test Completed")
+
+if __name__ == "__main__":
+    test_virtual_ladder()